@@ -1,4 +1,5 @@
 import json
+from pathlib import Path
 
 # Create comprehensive cell mapping for LeadersTeachersQualifications worksheet
 cell_mapping = {
@@ -259,7 +260,7 @@ cell_mapping['tables']['B7'] = {
 
 # Save to JSON file
 if __name__ == '__main__':
-    output_file = r'C:\Users\Clendon\oecs-education-dashboard\DIGEST_WEB\LeadersTeachersQualifications_CellMapping.json'
+    output_file = Path(__file__).parent / 'LeadersTeachersQualifications_CellMapping.json'
     with open(output_file, 'w', encoding='utf-8') as f:
         json.dump(cell_mapping, f, indent=2, ensure_ascii=False)
 
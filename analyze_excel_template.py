@@ -1,8 +1,18 @@
+import argparse
+import sys
+from pathlib import Path
 import openpyxl
 from openpyxl.utils import get_column_letter
-from openpyxl.cell.cell import MergedCell
 import json
 
+sys.path.insert(0, str(Path(__file__).parent / 'scripts'))
+from merged_ranges import MergedRangeIndex
+from profiling import add_profile_argument, profiled
+
+BASE_DIR = Path(__file__).parent
+DEFAULT_TEMPLATE = BASE_DIR / 'DIGEST_WEB' / 'Blank OECS MS Template.xlsx'
+DEFAULT_OUTPUT = BASE_DIR / 'template_analysis_report.json'
+
 def analyze_worksheet(ws):
     """Comprehensive analysis of a worksheet"""
     analysis = {
@@ -23,18 +33,25 @@ def analyze_worksheet(ws):
     # Get merged cells
     for merged_range in ws.merged_cells.ranges:
         analysis['merged_cells'].append(str(merged_range))
+    merged = MergedRangeIndex.from_sheet(ws)
 
     # Analyze first 20 rows to understand structure
     for row_idx in range(1, min(21, ws.max_row + 1)):
         row_data = []
         for col_idx in range(1, ws.max_column + 1):
-            cell = ws.cell(row_idx, col_idx)
-
-            # Skip if part of merged cell
-            if isinstance(cell, MergedCell):
-                row_data.append({'value': '[MERGED]', 'col': get_column_letter(col_idx)})
+            # Part of a merged range: point at the anchor cell that holds its value
+            anchor_row, anchor_col = merged.anchor(row_idx, col_idx)
+            if (anchor_row, anchor_col) != (row_idx, col_idx):
+                row_data.append({
+                    'value': '[MERGED]',
+                    'col': get_column_letter(col_idx),
+                    'anchor': f"{get_column_letter(anchor_col)}{anchor_row}",
+                    'anchor_value': ws.cell(anchor_row, anchor_col).value,
+                })
                 continue
 
+            cell = ws.cell(row_idx, col_idx)
+
             cell_info = {
                 'col': get_column_letter(col_idx),
                 'value': cell.value,
@@ -89,8 +106,10 @@ def analyze_worksheet(ws):
         has_formula = False
 
         for row_idx in range(1, min(ws.max_row + 1, 100)):
+            if merged.is_follower(row_idx, col_idx):
+                continue
             cell = ws.cell(row_idx, col_idx)
-            if not isinstance(cell, MergedCell) and cell.value is not None:
+            if cell.value is not None:
                 col_values.append(str(cell.value)[:100])  # Limit length
                 col_types.add(cell.data_type)
                 if cell.data_type == 'f':
@@ -106,9 +125,7 @@ def analyze_worksheet(ws):
 
     return analysis
 
-def main():
-    file_path = r"C:\Users\Clendon\oecs-education-dashboard\DIGEST_WEB\Blank OECS MS Template.xlsx"
-
+def analyze_template(file_path, output_file):
     print("="*80)
     print("COMPREHENSIVE EXCEL TEMPLATE ANALYSIS")
     print("="*80)
@@ -185,7 +202,6 @@ def main():
                             print(f"      [Format: {cell['number_format']}]")
 
     # Save detailed JSON report
-    output_file = r"C:\Users\Clendon\oecs-education-dashboard\template_analysis_report.json"
     with open(output_file, 'w', encoding='utf-8') as f:
         json.dump(all_analyses, f, indent=2, ensure_ascii=False)
 
@@ -193,5 +209,15 @@ def main():
     print(f"Detailed JSON report saved to: {output_file}")
     print("="*80)
 
+def main():
+    parser = argparse.ArgumentParser(description='Analyze the structure of an OECS data template workbook')
+    parser.add_argument('file', nargs='?', default=str(DEFAULT_TEMPLATE), help='Workbook to analyze')
+    parser.add_argument('--output', default=str(DEFAULT_OUTPUT), help='JSON report to write')
+    add_profile_argument(parser)
+    args = parser.parse_args()
+
+    with profiled(Path(args.output).with_suffix(''), mode=args.profile):
+        analyze_template(args.file, args.output)
+
 if __name__ == "__main__":
     main()
@@ -96,21 +96,15 @@ export default function StudentEnrollmentPage() {
       const countryId = profile.country_id
       const yearId = academicYear.id
 
-      // Delete existing enrollment data
-      await supabase.from('student_enrollment').delete()
-        .eq('country_id', countryId).eq('academic_year_id', yearId)
-
-      // Prepare inserts
-      const inserts: any[] = []
+      // Prepare rows
+      const rows: any[] = []
       enrollmentData.forEach((count, key) => {
         const [education_level, ownership_str, age_group, category_str, gender] = key.split('|')
         const ownership_type = ownership_str === 'national' ? null : ownership_str
         const category = category_str === 'none' ? null : category_str
 
         if (count > 0) {
-          inserts.push({
-            country_id: countryId,
-            academic_year_id: yearId,
+          rows.push({
             education_level,
             ownership_type,
             age_group,
@@ -121,9 +115,15 @@ export default function StudentEnrollmentPage() {
         }
       })
 
-      if (inserts.length > 0) {
-        await supabase.from('student_enrollment').insert(inserts)
-      }
+      // One transactional call: deletes cleared cells, updates changed ones, inserts new ones
+      // (see supabase-save-digest-rows-function.sql)
+      const { error } = await supabase.rpc('save_digest_rows', {
+        p_table: 'student_enrollment',
+        p_country_id: String(countryId),
+        p_academic_year_id: String(yearId),
+        p_rows: rows
+      })
+      if (error) throw error
 
       setLastSaved(new Date())
       toast.success('All enrollment data saved successfully!')
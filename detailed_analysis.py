@@ -1,21 +1,59 @@
+import argparse
+import sys
+from pathlib import Path
 import openpyxl
 from openpyxl.utils import get_column_letter
-from openpyxl.cell.cell import MergedCell
+
+sys.path.insert(0, str(Path(__file__).parent / 'scripts'))
+from merged_ranges import MergedRangeIndex
+from profiling import add_profile_argument, profiled
+
+BASE_DIR = Path(__file__).parent
+DEFAULT_TEMPLATE = BASE_DIR / 'DIGEST_WEB' / 'Blank OECS MS Template.xlsx'
+DEFAULT_OUTPUT = BASE_DIR / 'comprehensive_template_report.txt'
+
+# Most leading rows of a table read as its column headers
+MAX_HEADER_ROWS = 4
+
+def header_rows(table):
+    """Leading rows of a table that hold only labels (no numbers or formulas)"""
+    rows = []
+    for row in table['rows'][:MAX_HEADER_ROWS]:
+        if any(cell['type'] in ('n', 'f') for cell in row['data']):
+            break
+        rows.append(row['row_num'])
+    return rows
 
 def analyze_data_tables(ws):
     """Extract actual data tables from worksheets"""
     tables = []
     current_table = None
+    merged = MergedRangeIndex.from_sheet(ws)
+    max_col = min(ws.max_column, 49)
 
     for row_idx in range(1, min(ws.max_row + 1, 200)):
         row_data = []
         has_data = False
 
-        for col_idx in range(1, min(ws.max_column + 1, 50)):
-            cell = ws.cell(row_idx, col_idx)
-            if isinstance(cell, MergedCell):
+        for col_idx in range(1, max_col + 1):
+            anchor_row, anchor_col = merged.anchor(row_idx, col_idx)
+            if (anchor_row, anchor_col) != (row_idx, col_idx):
+                # A label merged down from the row above (e.g. an age group over
+                # its M and F rows) applies to this row too; cells merged across
+                # the row would only repeat the anchor
+                anchor = ws.cell(anchor_row, anchor_col)
+                if anchor_col == col_idx and anchor.value is not None:
+                    row_data.append({
+                        'col': get_column_letter(col_idx),
+                        'value': str(anchor.value)[:100],
+                        'type': anchor.data_type,
+                        'format': anchor.number_format,
+                        'merged_from': anchor.coordinate,
+                    })
                 continue
 
+            cell = ws.cell(row_idx, col_idx)
+
             if cell.value is not None:
                 has_data = True
                 row_data.append({
@@ -35,10 +73,14 @@ def analyze_data_tables(ws):
                 tables.append(current_table)
             current_table = None
 
+    # Multi-level column headers, with merged header cells resolved
+    for table in tables:
+        headers = merged.column_headers(ws, header_rows(table), 1, max_col)
+        table['column_headers'] = {get_column_letter(col): labels for col, labels in headers.items() if labels}
+
     return tables
 
-def main():
-    file_path = r"C:\Users\Clendon\oecs-education-dashboard\DIGEST_WEB\Blank OECS MS Template.xlsx"
+def analyze_template(file_path, output_file):
     wb = openpyxl.load_workbook(file_path, data_only=False)
 
     report = []
@@ -92,6 +134,10 @@ def main():
             report.append(f"  TABLE {i}:")
             report.append(f"    Row Range: {table['start_row']}-{table.get('end_row', 'ongoing')}")
             report.append(f"    Total Rows: {len(table['rows'])}")
+            if table['column_headers']:
+                report.append("    Column Headers:")
+                for col, labels in list(table['column_headers'].items())[:8]:  # Limit columns shown
+                    report.append(f"      {col}: {' / '.join(label[:30] for label in labels)}")
 
             # Show first few rows as structure
             report.append("    Structure (first 5 rows):")
@@ -156,12 +202,21 @@ def main():
             report.append("")
 
     # Save report
-    output_file = r"C:\Users\Clendon\oecs-education-dashboard\comprehensive_template_report.txt"
     with open(output_file, 'w', encoding='utf-8') as f:
         f.write('\n'.join(report))
 
     print('\n'.join(report))
     print(f"\n\nReport saved to: {output_file}")
 
+def main():
+    parser = argparse.ArgumentParser(description='Write a detailed text report of an OECS data template workbook')
+    parser.add_argument('file', nargs='?', default=str(DEFAULT_TEMPLATE), help='Workbook to analyze')
+    parser.add_argument('--output', default=str(DEFAULT_OUTPUT), help='Text report to write')
+    add_profile_argument(parser)
+    args = parser.parse_args()
+
+    with profiled(Path(args.output).with_suffix(''), mode=args.profile):
+        analyze_template(args.file, args.output)
+
 if __name__ == "__main__":
     main()
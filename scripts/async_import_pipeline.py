@@ -0,0 +1,328 @@
+"""
+Asynchronous producer/consumer pipeline for the Chapter 1 import
+
+The synchronous import parses every workbook before writing anything, and
+then waits for each HTTP round trip before sending the next batch. Here the
+stages run at the same time, connected by bounded queues:
+
+    worker processes          planner                     uploaders
+    extract_chapter1_file --> resolve ids, load stored --> delete / upsert /
+    (one per workbook)        rows, compute delta         insert batches
+                  [parsed queue]              [write queue]
+
+- Workbooks are parsed in a process pool, so openpyxl's CPU time overlaps
+  with network time instead of adding to it.
+- Write batches go out concurrently over one pooled HTTP/2 httpx.AsyncClient,
+  with at most --max-in-flight requests outstanding.
+- Backpressure: the queues are bounded, so when uploads slow down the planner
+  blocks, the parsed queue fills and no further workbooks are submitted.
+  When the database answers 429/502/503/504 the in-flight limit is halved
+  and then grown back by one after each run of successes, and idempotent
+  requests are retried with the same backoff as supabase_client.
+
+A full backfill then takes close to max(parse time, upload time) rather than
+their sum. With an audit trail, each workbook's changes become one import_audit
+entry, appended when its last batch has been written (not at all if one of
+its batches failed). With a checkpoint (import_checkpoint.py), every committed
+batch and finished workbook is recorded so an interrupted run can resume.
+
+Usage:
+    python scripts/import_chapter1_institutions.py --pipeline
+    python scripts/import_chapter1_institutions.py --pipeline --max-in-flight 8 --workers 3
+"""
+
+import asyncio
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import httpx
+
+from cell_delta import compute_delta
+from import_audit import AUDIT_TABLE, delta_change_set
+from import_chapter1_institutions import (INSTITUTION_COLUMNS, INSTITUTION_KEY, extract_chapter1_file,
+                                          record_extract_stages, resolve_ids)
+from supabase_client import (DEFAULT_RETRIES, DEFAULT_TIMEOUT, RETRY_STATUSES, backoff_delay,
+                             is_idempotent, load_credentials, logger, request_stats)
+from table_reader import DEFAULT_PAGE_SIZE
+
+DEFAULT_MAX_IN_FLIGHT = 4
+DEFAULT_QUEUE_SIZE = 2
+DEFAULT_BATCH_SIZE = 50
+
+# Sentinel closing a queue
+_DONE = None
+
+
+class AdaptiveLimit:
+    """Concurrency limit that halves on throttling and grows back by one per window of successes"""
+
+    def __init__(self, maximum: int):
+        self.maximum = maximum
+        self.limit = maximum
+        self.in_flight = 0
+        self.successes = 0
+        self.condition = asyncio.Condition()
+
+    async def __aenter__(self):
+        async with self.condition:
+            await self.condition.wait_for(lambda: self.in_flight < self.limit)
+            self.in_flight += 1
+        return self
+
+    async def __aexit__(self, *exc_info):
+        async with self.condition:
+            self.in_flight -= 1
+            self.condition.notify_all()
+
+    def throttled(self):
+        if self.limit > 1:
+            self.limit = max(1, self.limit // 2)
+            logger.info("Database is throttling, in-flight limit lowered to %d", self.limit)
+        self.successes = 0
+
+    def succeeded(self):
+        self.successes += 1
+        if self.limit < self.maximum and self.successes >= self.limit:
+            self.limit += 1
+            self.successes = 0
+
+
+class AsyncRest:
+    """Minimal async PostgREST client over one pooled connection pool"""
+
+    def __init__(self, max_in_flight: int = DEFAULT_MAX_IN_FLIGHT, timeout: float = DEFAULT_TIMEOUT,
+                 retries: int = DEFAULT_RETRIES):
+        url, key = load_credentials('service')
+        self.retries = retries
+        self.limit = AdaptiveLimit(max_in_flight)
+        self.client = httpx.AsyncClient(
+            base_url=f"{url}/rest/v1",
+            headers={'apikey': key, 'Authorization': f'Bearer {key}'},
+            http2=True,
+            limits=httpx.Limits(max_connections=max_in_flight, max_keepalive_connections=max_in_flight),
+            timeout=timeout,
+        )
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.client.aclose()
+
+    async def request(self, method: str, path: str, params: dict = None, rows: list = None,
+                      prefer: str = None) -> httpx.Response:
+        headers = {'Prefer': prefer} if prefer else {}
+        request = self.client.build_request(method, path, params=params, json=rows, headers=headers)
+        retryable = is_idempotent(request)
+        attempt = 0
+
+        while True:
+            start = time.perf_counter()
+            try:
+                async with self.limit:
+                    response = await self.client.send(request)
+            except httpx.TransportError:
+                elapsed = time.perf_counter() - start
+                if not retryable or attempt >= self.retries:
+                    request_stats.record(elapsed, failed=True)
+                    raise
+                request_stats.record(elapsed, retried=True)
+                self.limit.throttled()
+                await asyncio.sleep(backoff_delay(attempt))
+                attempt += 1
+                continue
+
+            elapsed = time.perf_counter() - start
+            if response.status_code in RETRY_STATUSES:
+                self.limit.throttled()
+                if retryable and attempt < self.retries:
+                    request_stats.record(elapsed, retried=True)
+                    await asyncio.sleep(backoff_delay(attempt, response.headers.get('retry-after')))
+                    attempt += 1
+                    continue
+
+            request_stats.record(elapsed, failed=response.is_error)
+            if response.is_error:
+                raise RuntimeError(f"{method} {path} -> {response.status_code}: {response.text[:200]}")
+            self.limit.succeeded()
+            logger.debug("%s %s -> %d in %.0f ms", method, path, response.status_code, elapsed * 1000)
+            return response
+
+    async def select(self, table: str, columns: str, filters: dict = None, key: str = 'id',
+                     page_size: int = DEFAULT_PAGE_SIZE) -> list:
+        """Every matching row, fetched in keyset pages like table_reader.fetch_pages
+
+        `columns` must include `key`; a single GET would stop at the PostgREST
+        max-rows limit.
+        """
+        params = {'select': columns, 'order': key, 'limit': page_size,
+                  **{column: f"eq.{value}" for column, value in (filters or {}).items()}}
+        rows = []
+        while True:
+            page = (await self.request('GET', f"/{table}", params=params)).json()
+            rows.extend(page)
+            if len(page) < page_size:
+                return rows
+            params[key] = f"gt.{page[-1][key]}"
+
+    async def insert(self, table: str, rows: list):
+        await self.request('POST', f"/{table}", rows=rows, prefer='return=minimal')
+
+    async def upsert(self, table: str, rows: list, on_conflict: str):
+        await self.request('POST', f"/{table}", params={'on_conflict': on_conflict}, rows=rows,
+                           prefer='resolution=merge-duplicates,return=minimal')
+
+    async def delete_ids(self, table: str, ids: list):
+        await self.request('DELETE', f"/{table}", params={'id': f"in.({','.join(map(str, ids))})"})
+
+
+def write_batches(table: str, delta, batch_size: int) -> list:
+    """Split a delta into (operation, table, rows) write batches"""
+    batches = []
+    ids = [row['id'] for row in delta.deletes]
+    updates = [{'id': stored['id'], **incoming} for stored, incoming, _ in delta.updates]
+    for operation, records in (('delete', ids), ('update_batch', updates), ('insert_batch', delta.inserts)):
+        for i in range(0, len(records), batch_size):
+            batches.append((operation, table, records[i:i + batch_size]))
+    return batches
+
+
+async def run_chapter1_pipeline(jobs: list, metrics, max_in_flight: int = DEFAULT_MAX_IN_FLIGHT,
+                                workers: int = None, queue_size: int = DEFAULT_QUEUE_SIZE,
+                                batch_size: int = DEFAULT_BATCH_SIZE, dry_run: bool = False, audit=None,
+                                checkpoint=None) -> int:
+    """Import Chapter 1 workbooks; `jobs` is [(path, year_label), ...]. Returns records changed."""
+    loop = asyncio.get_running_loop()
+    parsed_queue = asyncio.Queue(maxsize=queue_size)
+    write_queue = asyncio.Queue(maxsize=queue_size * max_in_flight)
+    workers = workers or min(len(jobs), os.cpu_count() or 1)
+    changed = 0
+    failed_years = set()
+    remaining = {}      # year_label -> write batches not yet done
+    finishing = {}      # year_label -> (checkpoint unit, counts, audit entry), for when its last batch is done
+
+    async with AsyncRest(max_in_flight) as rest:
+        countries, years = await asyncio.gather(
+            rest.select('countries', 'id,country_code'),
+            rest.select('academic_years', 'id,year_label'),
+        )
+        country_ids = {row['country_code']: row['id'] for row in countries}
+        year_ids = {row['year_label']: row['id'] for row in years}
+
+        async def produce(pool):
+            """Keep `workers` workbooks parsing; submit the next only when its result was queued"""
+            pending = {}
+            remaining = iter(jobs)
+
+            def submit():
+                job = next(remaining, None)
+                if job is not None:
+                    future = loop.run_in_executor(pool, extract_chapter1_file, str(job[0]))
+                    pending[future] = job
+
+            for _ in range(workers):
+                submit()
+            while pending:
+                done, _ = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for future in done:
+                    path, year_label = pending.pop(future)
+                    await parsed_queue.put((path, year_label, future.result()))
+                    submit()
+            await parsed_queue.put(_DONE)
+
+        async def plan():
+            """Diff each parsed workbook against the stored rows and queue the writes"""
+            nonlocal changed
+            while (item := await parsed_queue.get()) is not _DONE:
+                path, year_label, result = item
+                record_extract_stages(metrics, result)
+                if year_label not in year_ids:
+                    print(f"   ⚠️  Skipping {result['file']}: academic year not found: {year_label}")
+                    continue
+
+                year_id = year_ids[year_label]
+                rows = resolve_ids(result['records'], country_ids, year_id)
+                start = time.perf_counter()
+                stored = await rest.select('institutions', ', '.join(['id', *INSTITUTION_KEY, *INSTITUTION_COLUMNS]),
+                                           {'academic_year_id': year_id})
+                metrics.record('load_stored', time.perf_counter() - start, rows=len(stored), year=year_label)
+
+                delta = compute_delta(stored, rows, INSTITUTION_KEY, INSTITUTION_COLUMNS)
+                print(f"   {year_label} ({result['file']}): {delta.summary()}")
+                if dry_run:
+                    for line in delta.report_lines():
+                        print(f"      {line}")
+                    continue
+
+                changed += len(delta)
+                unit = checkpoint.unit('institutions', year_label, source_file=path) if checkpoint else None
+                changes = checkpoint.begin(unit, delta) if unit else delta_change_set(delta)
+                entry = audit.entry('institutions', changes, {'academic_year_id': year_id}, path) if audit else None
+                batches = write_batches('institutions', delta, batch_size)
+                finishing[year_label] = (unit, delta.counts(), entry)
+                remaining[year_label] = len(batches)
+                if not batches:
+                    await finish_year(year_label)
+                for batch in batches:
+                    await write_queue.put((year_label, *batch))
+
+            for _ in range(max_in_flight):
+                await write_queue.put(_DONE)
+
+        async def finish_year(year_label):
+            """A year's last batch is written: append its audit entry, then checkpoint it"""
+            unit, counts, entry = finishing.pop(year_label)
+            if year_label in failed_years:
+                return
+            if entry is not None:
+                await rest.insert(AUDIT_TABLE, audit.rest_rows([entry]))
+                audit.written += 1
+            if unit:
+                checkpoint.complete(unit, **counts)
+
+        async def upload():
+            while (item := await write_queue.get()) is not _DONE:
+                year_label, operation, table, records = item
+                start = time.perf_counter()
+                try:
+                    if operation == 'delete':
+                        await rest.delete_ids(table, records)
+                    elif operation == 'update_batch':
+                        await rest.upsert(table, records, on_conflict='id')
+                    else:
+                        await rest.insert(table, records)
+                except Exception as e:
+                    metrics.failed = True
+                    failed_years.add(year_label)
+                    if checkpoint is not None:
+                        checkpoint.fail()
+                    print(f"   ❌ Error writing {operation} for {year_label}: {e}")
+                else:
+                    size = 0 if operation == 'delete' else len(json.dumps(records))
+                    metrics.record(operation, time.perf_counter() - start, rows=len(records), bytes=size,
+                                   table=table, year=year_label)
+                    unit = finishing[year_label][0]
+                    if unit:
+                        checkpoint.batch(unit, len(records))
+                remaining[year_label] -= 1
+                if remaining[year_label] == 0:
+                    await finish_year(year_label)
+
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            tasks = [asyncio.ensure_future(coroutine)
+                     for coroutine in (produce(pool), plan(), *(upload() for _ in range(max_in_flight)))]
+            try:
+                await asyncio.gather(*tasks)
+            except BaseException:
+                for task in tasks:
+                    task.cancel()
+                raise
+
+    return changed
+
+
+def import_chapter1_pipeline(jobs: list, metrics, **options) -> int:
+    """Synchronous entry point for run_chapter1_pipeline"""
+    return asyncio.run(run_chapter1_pipeline(jobs, metrics, **options))
@@ -1,34 +1,14 @@
 """
 Quick diagnostic script to check what data exists in Supabase
 """
-import os
-import sys
-import io
-from pathlib import Path
-from dotenv import load_dotenv
-from supabase import create_client, Client
-
-# Fix Windows console encoding
-if sys.platform == 'win32':
-    sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8', errors='replace')
-    sys.stderr = io.TextIOWrapper(sys.stderr.buffer, encoding='utf-8', errors='replace')
-
-# Load environment variables
-env_path = Path(__file__).parent.parent / '.env.local'
-load_dotenv(dotenv_path=env_path)
-
-# Get Supabase credentials
-supabase_url = os.getenv('NEXT_PUBLIC_SUPABASE_URL')
-supabase_key = os.getenv('SUPABASE_SERVICE_ROLE_KEY')
-
-if not supabase_url or not supabase_key:
-    print("ERROR: Missing Supabase credentials in .env.local")
-    print(f"NEXT_PUBLIC_SUPABASE_URL: {'Found' if supabase_url else 'MISSING'}")
-    print(f"SUPABASE_SERVICE_ROLE_KEY: {'Found' if supabase_key else 'MISSING'}")
-    sys.exit(1)
+from console import utf8_console
+from supabase_client import get_client
+from table_reader import iter_table
+
+utf8_console()
 
 # Create Supabase client
-supabase: Client = create_client(supabase_url, supabase_key)
+supabase = get_client()
 
 print("=" * 80)
 print("SUPABASE DATABASE DIAGNOSTICS")
@@ -69,21 +49,18 @@ print()
 print("3. INSTITUTIONS DATA:")
 print("-" * 80)
 try:
-    response = supabase.table('institutions').select('id, country_id, academic_year_id').execute()
-    if response.data:
-        print(f"   Found {len(response.data)} institution records")
+    # Stream the table in pages and keep only per-year counts
+    by_year = {}
+    for inst in iter_table(supabase, 'institutions', columns='academic_year_id'):
+        year_id = inst['academic_year_id']
+        by_year[year_id] = by_year.get(year_id, 0) + 1
 
-        # Group by academic year
-        by_year = {}
-        for inst in response.data:
-            year_id = inst['academic_year_id']
-            if year_id not in by_year:
-                by_year[year_id] = []
-            by_year[year_id].append(inst)
+    if by_year:
+        print(f"   Found {sum(by_year.values())} institution records")
 
         print(f"   Records by academic year:")
-        for year_id, records in by_year.items():
-            print(f"      Academic Year ID {year_id}: {len(records)} records")
+        for year_id, count in by_year.items():
+            print(f"      Academic Year ID {year_id}: {count} records")
     else:
         print("   ⚠ No institution data found!")
 except Exception as e:
@@ -113,26 +90,25 @@ try:
         print(f"   Active Year: {active_year['year_label']} (ID: {active_year['id']})")
 
         # Get institutions for active year
-        inst_response = supabase.table('institutions').select('*').eq('academic_year_id', active_year['id']).execute()
+        inst_records = iter_table(supabase, 'institutions', filters={'academic_year_id': active_year['id']})
+        sample = next(inst_records, None)
 
-        if inst_response.data:
-            print(f"   ✓ Found {len(inst_response.data)} institution records for active year")
+        if sample:
+            inst_count = 1 + sum(1 for _ in inst_records)
+            print(f"   ✓ Found {inst_count} institution records for active year")
 
             # Show sample data
-            if inst_response.data:
-                print()
-                print("   Sample record:")
-                sample = inst_response.data[0]
-                print(f"      Country ID: {sample['country_id']}")
-                print(f"      Daycare total: {sample['daycare_public'] + sample['daycare_private_church'] + sample['daycare_private_non_affiliated']}")
-                print(f"      Preschool total: {sample['preschool_public'] + sample['preschool_private_church'] + sample['preschool_private_non_affiliated']}")
-                print(f"      Primary total: {sample['primary_public'] + sample['primary_private_church'] + sample['primary_private_non_affiliated']}")
+            print()
+            print("   Sample record:")
+            print(f"      Country ID: {sample['country_id']}")
+            print(f"      Daycare total: {sample['daycare_public'] + sample['daycare_private_church'] + sample['daycare_private_non_affiliated']}")
+            print(f"      Preschool total: {sample['preschool_public'] + sample['preschool_private_church'] + sample['preschool_private_non_affiliated']}")
+            print(f"      Primary total: {sample['primary_public'] + sample['primary_private_church'] + sample['primary_private_non_affiliated']}")
         else:
             print(f"   ✗ No institution data for active year {active_year['year_label']}!")
             print()
             print("   Checking which years DO have data...")
-            all_inst = supabase.table('institutions').select('academic_year_id').execute()
-            year_ids = set(inst['academic_year_id'] for inst in all_inst.data)
+            year_ids = set(inst['academic_year_id'] for inst in iter_table(supabase, 'institutions', columns='academic_year_id'))
             print(f"   Data exists for academic year IDs: {year_ids}")
 
 except Exception as e:
@@ -1,25 +1,16 @@
 """
 Check what data exists in academic year 10 (2021-2022)
 """
-import os
-import sys
-import io
-from pathlib import Path
-from dotenv import load_dotenv
-from supabase import create_client, Client
+import itertools
 
-# Fix Windows console encoding
-if sys.platform == 'win32':
-    sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8', errors='replace')
-    sys.stderr = io.TextIOWrapper(sys.stderr.buffer, encoding='utf-8', errors='replace')
+from console import utf8_console
+from supabase_client import get_client
+from table_reader import iter_table
 
-# Load environment variables
-env_path = Path(__file__).parent.parent / '.env.local'
-load_dotenv(dotenv_path=env_path)
+utf8_console()
 
-supabase_url = os.getenv('NEXT_PUBLIC_SUPABASE_URL')
-supabase_key = os.getenv('SUPABASE_SERVICE_ROLE_KEY')
-supabase: Client = create_client(supabase_url, supabase_key)
+# Create Supabase client
+supabase = get_client()
 
 print("=" * 80)
 print("COMPARING DATA IN DIFFERENT ACADEMIC YEARS")
@@ -45,22 +36,24 @@ print()
 # Check year 10 (2021-2022)
 print("Academic Year ID 10 (2021-2022):")
 print("-" * 80)
-response10 = supabase.table('institutions').select('*').eq('academic_year_id', 10).execute()
-if response10.data:
-    print(f"  Records: {len(response10.data)}")
-
+institutions10 = iter_table(supabase, 'institutions', filters={'academic_year_id': 10})
+sample = next(institutions10, None)
+if sample:
     # Calculate totals
+    record_count = 0
     total_daycare = 0
     total_preschool = 0
     total_primary = 0
     total_secondary = 0
 
-    for inst in response10.data:
+    for inst in itertools.chain([sample], institutions10):
+        record_count += 1
         total_daycare += inst['daycare_public'] + inst['daycare_private_church'] + inst['daycare_private_non_affiliated']
         total_preschool += inst['preschool_public'] + inst['preschool_private_church'] + inst['preschool_private_non_affiliated']
         total_primary += inst['primary_public'] + inst['primary_private_church'] + inst['primary_private_non_affiliated']
         total_secondary += inst['secondary_public'] + inst['secondary_private_church'] + inst['secondary_private_non_affiliated']
 
+    print(f"  Records: {record_count}")
     print(f"  Total Daycare: {total_daycare}")
     print(f"  Total Preschool: {total_preschool}")
     print(f"  Total Primary: {total_primary}")
@@ -68,7 +61,6 @@ if response10.data:
     print()
 
     print("  Sample record:")
-    sample = response10.data[0]
     print(f"    Country ID: {sample['country_id']}")
     print(f"    Daycare public: {sample['daycare_public']}")
     print(f"    Preschool public: {sample['preschool_public']}")
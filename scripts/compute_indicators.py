@@ -0,0 +1,336 @@
+"""
+Compute population-normalised enrollment indicators into education_indicators
+
+student_enrollment holds counts by age group, grade and gender; population_data
+holds single-year-of-age male/female counts. This batch job joins the two by
+age for every country × year × level at once (NumPy arrays indexed by
+country, year, level, gender and age) and stores, per gender and for the
+total:
+
+- gross enrollment ratio (GER): enrollment at the level / population of the
+  level's official age range, in %
+- net enrollment ratio (NER): enrollment of official age / that population, in %
+- under- and over-age shares: % of the level's enrollment younger or older
+  than the official ages (age groups that straddle a boundary, and 'unknown',
+  count as unknown age)
+- gender parity index of GER and NER (female / male), on the 'total' rows
+
+Official ages are in OFFICIAL_AGES. Early childhood uses the pre-primary ages
+3-4, so daycare enrolment under age 3 counts as under-age; special education
+has no official age range and is left out.
+
+The table is written like the importers write theirs: the stored rows are
+compared with the fresh ones and only changed rows are written (cell_delta.py),
+or merged with COPY with --backend copy (pg_copy_loader.py). Pages read the
+stored rows, so no rate is computed per request. Run it after every import.
+
+Usage:
+    python compute_indicators.py
+    python compute_indicators.py --dry-run
+    python compute_indicators.py --backend copy
+    python compute_indicators.py --csv synthetic/supabase      # writes synthetic/supabase/education_indicators.csv
+"""
+
+import argparse
+import csv
+import sys
+import time
+from pathlib import Path
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+from console import utf8_console
+from indicator_cube import CsvSource, SupabaseSource, number
+
+TABLE = 'education_indicators'
+
+# Official age range (inclusive) of each level, as in the template's grade ages
+OFFICIAL_AGES = {
+    'early_childhood': (3, 4),
+    'primary': (5, 11),
+    'secondary': (12, 16),
+    'post_secondary': (17, 21),
+}
+LEVELS = tuple(OFFICIAL_AGES)
+GENDERS = ('male', 'female')
+MAX_AGE = 100
+
+# Age classes relative to a level's official ages
+OFFICIAL, UNDER, OVER, UNKNOWN = range(4)
+
+KEY_FIELDS = ('country_id', 'academic_year_id', 'education_level', 'gender')
+VALUE_FIELDS = ('official_age_from', 'official_age_to', 'enrollment', 'official_age_enrollment',
+                'under_age_enrollment', 'over_age_enrollment', 'unknown_age_enrollment',
+                'official_age_population', 'gross_enrollment_ratio', 'net_enrollment_ratio',
+                'under_age_share', 'over_age_share', 'gender_parity_index_ger', 'gender_parity_index_ner')
+
+
+def require_numpy():
+    if np is None:
+        raise RuntimeError('Indicator computation needs NumPy: pip install numpy')
+
+
+def age_bounds(age_group: str):
+    """'7' -> (7, 7), 'under_5' -> (0, 4), 'over_15' -> (16, MAX_AGE), '9_11' -> (9, 11), 'unknown' -> None"""
+    if age_group is None or age_group == 'unknown':
+        return None
+    if age_group.startswith('under_'):
+        return 0, int(age_group[6:]) - 1
+    if age_group.startswith('over_'):
+        return int(age_group[5:]) + 1, MAX_AGE
+    if '_' in age_group:
+        low, high = age_group.split('_')
+        return int(low), int(high)
+    return int(age_group), int(age_group)
+
+
+def age_class(level: str, age_group: str) -> int:
+    bounds = age_bounds(age_group)
+    if bounds is None:
+        return UNKNOWN
+    low, high = bounds
+    first, last = OFFICIAL_AGES[level]
+    if high < first:
+        return UNDER
+    if low > last:
+        return OVER
+    if low >= first and high <= last:
+        return OFFICIAL
+    return UNKNOWN
+
+
+def enrollment_array(rows, countries: dict, years: dict):
+    """Counts as an array [country, year, level, gender, age class]"""
+    level_index = {level: index for index, level in enumerate(LEVELS)}
+    gender_index = {gender: index for index, gender in enumerate(GENDERS)}
+    classes = {}
+    coords, counts = [], []
+    for row in rows:
+        level = row['education_level']
+        if level not in level_index or row['gender'] not in gender_index:
+            continue
+        country = countries.get(number(row['country_id']))
+        year = years.get(number(row['academic_year_id']))
+        if country is None or year is None:
+            continue
+        key = (level, row['age_group'])
+        if key not in classes:
+            classes[key] = age_class(*key)
+        coords.append((country, year, level_index[level], gender_index[row['gender']], classes[key]))
+        counts.append(number(row['count']))
+
+    shape = (len(countries), len(years), len(LEVELS), len(GENDERS), 4)
+    if not coords:
+        return np.zeros(shape, dtype=np.int64)
+    flat = np.ravel_multi_index(np.array(coords, dtype=np.intp).T, shape)
+    totals = np.bincount(flat, weights=np.array(counts, dtype=np.float64), minlength=int(np.prod(shape)))
+    return np.rint(totals).astype(np.int64).reshape(shape)
+
+
+def population_array(rows, countries: dict, years: dict):
+    """Population as an array [country, year, age, gender]"""
+    shape = (len(countries), len(years), MAX_AGE + 1, len(GENDERS))
+    population = np.zeros(shape, dtype=np.int64)
+    coords, values = [], []
+    for row in rows:
+        country = countries.get(number(row['country_id']))
+        year = years.get(number(row['academic_year_id']))
+        if country is None or year is None:
+            continue
+        coords.append((country, year, number(row['age'])))
+        values.append((number(row['male']), number(row['female'])))
+    if coords:
+        index = np.array(coords, dtype=np.intp).T
+        np.add.at(population, (index[0], index[1], index[2]), np.array(values, dtype=np.int64))
+    return population
+
+
+def official_population(population):
+    """Population of each level's official ages: [country, year, level, gender]"""
+    cumulative = np.cumsum(population, axis=2)
+    padded = np.concatenate([np.zeros_like(cumulative[:, :, :1]), cumulative], axis=2)
+    return np.stack([padded[:, :, last + 1] - padded[:, :, first] for first, last in OFFICIAL_AGES.values()],
+                    axis=2)
+
+
+def percent(numerator, denominator):
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return np.where(denominator > 0, numerator * 100.0 / denominator, np.nan)
+
+
+def compute_arrays(enrollment, population) -> dict:
+    """Every indicator as an array [country, year, level, gender] with gender = male, female, total"""
+    def with_total(array):
+        return np.concatenate([array, array.sum(axis=3, keepdims=True)], axis=3)
+
+    counts = with_total(enrollment)                         # [..., gender, class]
+    enrolled = counts.sum(axis=4)
+    pop = with_total(official_population(population))
+    result = {
+        'enrollment': enrolled,
+        'official_age_enrollment': counts[..., OFFICIAL],
+        'under_age_enrollment': counts[..., UNDER],
+        'over_age_enrollment': counts[..., OVER],
+        'unknown_age_enrollment': counts[..., UNKNOWN],
+        'official_age_population': pop,
+        'gross_enrollment_ratio': percent(enrolled, pop),
+        'net_enrollment_ratio': percent(counts[..., OFFICIAL], pop),
+        'under_age_share': percent(counts[..., UNDER], enrolled),
+        'over_age_share': percent(counts[..., OVER], enrolled),
+    }
+    for name, ratio in (('gender_parity_index_ger', result['gross_enrollment_ratio']),
+                        ('gender_parity_index_ner', result['net_enrollment_ratio'])):
+        male, female = ratio[..., 0], ratio[..., 1]
+        with np.errstate(divide='ignore', invalid='ignore'):
+            parity = np.where(male > 0, female / male, np.nan)
+        result[name] = np.stack([np.full_like(parity, np.nan), np.full_like(parity, np.nan), parity], axis=3)
+    return result
+
+
+ROUNDING = {'gross_enrollment_ratio': 2, 'net_enrollment_ratio': 2, 'under_age_share': 2, 'over_age_share': 2,
+            'gender_parity_index_ger': 3, 'gender_parity_index_ner': 3}
+
+
+def indicator_rows(arrays: dict, country_ids: list, year_ids: list) -> list:
+    """Rows for every (country, year, level) with enrollment; ratios without population are NULL"""
+    rows = []
+    enrolled = arrays['enrollment'][..., 2]
+    for country, year, level in zip(*np.nonzero(enrolled > 0)):
+        first, last = OFFICIAL_AGES[LEVELS[level]]
+        for gender_index, gender in enumerate(GENDERS + ('total',)):
+            row = {'country_id': country_ids[country], 'academic_year_id': year_ids[year],
+                   'education_level': LEVELS[level], 'gender': gender,
+                   'official_age_from': first, 'official_age_to': last}
+            for name, array in arrays.items():
+                value = array[country, year, level, gender_index].item()
+                if name in ROUNDING:
+                    value = None if np.isnan(value) else round(value, ROUNDING[name])
+                row[name] = value
+            rows.append(row)
+    return rows
+
+
+def compute_indicators(source) -> list:
+    """education_indicators rows from a source (indicator_cube.SupabaseSource or CsvSource)"""
+    require_numpy()
+    country_ids = sorted(source.countries())
+    year_ids = sorted(source.years())
+    countries = {id_: index for index, id_ in enumerate(country_ids)}
+    years = {id_: index for index, id_ in enumerate(year_ids)}
+    enrollment = enrollment_array(
+        source.rows('student_enrollment', 'country_id, academic_year_id, education_level, age_group, gender, count'),
+        countries, years)
+    population = population_array(
+        source.rows('population_data', 'country_id, academic_year_id, age, male, female'), countries, years)
+    return indicator_rows(compute_arrays(enrollment, population), country_ids, year_ids)
+
+
+def write_supabase(rows: list, dry_run: bool) -> dict:
+    from cell_delta import apply_delta, compute_delta, load_slice
+    from supabase_client import get_client
+
+    client = get_client()
+    stored = load_slice(client, TABLE, KEY_FIELDS, VALUE_FIELDS, {})
+    delta = compute_delta(stored, rows, KEY_FIELDS, VALUE_FIELDS)
+    print(f"\n   {delta.summary()}")
+    if dry_run:
+        for line in delta.report_lines(limit=20):
+            print(f"   {line}")
+        return delta.counts()
+    return apply_delta(client, TABLE, delta)
+
+
+def write_copy(rows: list, slices: list, dry_run: bool) -> dict:
+    """Merge through COPY; `slices` are the (country_id, academic_year_id) pairs to replace
+
+    Every country x year of the source is passed rather than the pairs found
+    in `rows`, so a slice whose enrollment was removed loses its stale rows.
+    """
+    from pg_copy_loader import CopyLoader
+
+    with CopyLoader() as loader:
+        counts = loader.merge(TABLE, rows, KEY_FIELDS[2:], VALUE_FIELDS, slices=slices, dry_run=dry_run)
+    print(f"\n   {', '.join(f'{value} {name}' for name, value in counts.items())}")
+    return counts
+
+
+def write_csv(rows: list, path: Path):
+    with open(path, 'w', encoding='utf-8', newline='') as handle:
+        writer = csv.DictWriter(handle, fieldnames=list(KEY_FIELDS + VALUE_FIELDS))
+        writer.writeheader()
+        writer.writerows(rows)
+
+
+def print_summary(rows: list, source):
+    """Regional view of the newest year: GER / NER / GPI per level for the total rows"""
+    labels = source.years()
+    newest = max((row['academic_year_id'] for row in rows), default=None, key=lambda id_: labels.get(id_, ''))
+    if newest is None:
+        return
+    codes = source.countries()
+    print(f"\n   {labels.get(newest, newest)}: GER / NER (GPI of GER) for the total rows")
+    print(f"   {'Country':<8}" + ''.join(f"{level:>24}" for level in LEVELS))
+    table = {(row['country_id'], row['education_level']): row for row in rows
+             if row['academic_year_id'] == newest and row['gender'] == 'total'}
+    for country_id in sorted({country for country, _ in table}, key=lambda id_: codes.get(id_, '')):
+        cells = []
+        for level in LEVELS:
+            row = table.get((country_id, level))
+            if row is None or row['gross_enrollment_ratio'] is None:
+                cells.append(f"{'-':>24}")
+                continue
+            gpi = row['gender_parity_index_ger']
+            cells.append(f"{row['gross_enrollment_ratio']:>8.1f} / {row['net_enrollment_ratio']:>5.1f} "
+                         f"({'-' if gpi is None else f'{gpi:.2f}'})".rjust(24))
+        print(f"   {codes.get(country_id, country_id):<8}" + ''.join(cells))
+
+
+def main():
+    utf8_console()
+
+    parser = argparse.ArgumentParser(description='Compute GER, NER, GPI and age shares into education_indicators')
+    parser.add_argument('--csv', help='Read table CSVs from this directory (generate_synthetic_data.py output) '
+                                      'and write education_indicators.csv there instead of Supabase')
+    parser.add_argument('--backend', choices=['rest', 'copy'], default='rest',
+                        help='rest: write through the Supabase API (default); copy: COPY straight into Postgres '
+                             '(needs psycopg and DATABASE_URL, see pg_copy_loader.py)')
+    parser.add_argument('--dry-run', action='store_true', help='Compute and list the changes without writing')
+    args = parser.parse_args()
+    require_numpy()
+
+    print("\n" + "=" * 80)
+    print("📐 COMPUTING EDUCATION INDICATORS")
+    print("=" * 80)
+
+    source = CsvSource(args.csv) if args.csv else SupabaseSource()
+    start = time.perf_counter()
+    rows = compute_indicators(source)
+    print(f"\n   {len(rows):,} indicator rows computed in {time.perf_counter() - start:.2f}s")
+    print_summary(rows, source)
+
+    if args.csv:
+        path = Path(args.csv) / f"{TABLE}.csv"
+        if not args.dry_run:
+            write_csv(rows, path)
+            print(f"\n✅ Wrote {path}")
+        return
+    if args.backend == 'copy':
+        slices = [(country_id, year_id) for country_id in sorted(source.countries())
+                  for year_id in sorted(source.years())]
+        write_copy(rows, slices, args.dry_run)
+    else:
+        write_supabase(rows, args.dry_run)
+    print(f"\n✅ {'Dry run complete' if args.dry_run else 'education_indicators updated'}")
+
+
+if __name__ == '__main__':
+    try:
+        main()
+    except Exception as e:
+        print(f"\n❌ Error computing indicators: {e}")
+        import traceback
+        traceback.print_exc()
+        sys.exit(1)
@@ -0,0 +1,28 @@
+"""
+UTF-8 console output for the digest scripts
+
+The scripts print emoji and accented country names. The Windows console
+defaults to a legacy code page that cannot encode them, so every script used
+to rewrap sys.stdout and sys.stderr itself. Rewrapping twice (a script run
+through digest.py, or one entry point importing another) left the first
+wrapper to close the shared buffer when it was garbage-collected;
+reconfigure() changes the streams in place and is safe to call repeatedly.
+
+Usage:
+    from console import utf8_console
+
+    def main():
+        utf8_console()
+        ...
+"""
+
+import sys
+
+
+def utf8_console():
+    """Encode stdout/stderr as UTF-8 on Windows, replacing what cannot be written"""
+    if sys.platform != 'win32':
+        return
+    for stream in (sys.stdout, sys.stderr):
+        if hasattr(stream, 'reconfigure'):
+            stream.reconfigure(encoding='utf-8', errors='replace')
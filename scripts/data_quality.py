@@ -0,0 +1,450 @@
+"""
+Data-quality checks over the imported figures, ranked as an anomaly report
+
+The importers turn unreadable cells into 0 (`safe_int`) and only print
+totals, so a halved school count or a dropped worksheet goes unnoticed. This
+stage loads every indicator cube (indicator_cube.py) into one array of
+country × year × indicator, where the indicators are each cube's total, its
+breakdown by every dimension and, for cubes with a level, by level × every
+other dimension. In one vectorized pass it computes:
+
+- year-over-year change: log((this + 1) / (last + 1)) for consecutive years;
+  flagged beyond --max-ratio (default 1.5, i.e. +50% or -33%) when either
+  year has at least --min-count
+- cross-country z-score: the same change compared with the other countries'
+  change that year (median and MAD, so one outlier does not hide itself);
+  flagged beyond --z (default 3.5)
+- missing slices: a table with no rows for a country and year when the
+  country had rows the year before and most countries have rows this year
+- internal-consistency residuals, flagged beyond --tolerance (default 1%):
+  subtotal columns against their grade columns in the wide enrollment tables,
+  wide tables against student_enrollment by ownership and gender, and
+  teachers and school leaders in staff_qualifications against
+  staff_age_distribution and staff_years_of_service
+
+Every finding gets a score (how many times its threshold it exceeds) and the
+report lists them highest first. Both importers run it after writing with
+--check.
+
+Needs NumPy (pip install numpy).
+
+Usage:
+    python data_quality.py
+    python data_quality.py --top 50 --output anomalies.csv
+    python data_quality.py --csv synthetic/supabase --countries GRD LCA --years 2023-2024
+    python digest.py check --years 2023-2024
+"""
+
+import argparse
+import csv
+import json
+import math
+import re
+import sys
+import time
+import warnings
+from dataclasses import asdict, dataclass
+from pathlib import Path
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+from console import utf8_console
+from indicator_cube import CUBES, SCOPE_DIMS, CubeService, number, order_labels
+
+DEFAULT_MAX_RATIO = 1.5
+DEFAULT_Z = 3.5
+DEFAULT_MIN_COUNT = 20
+DEFAULT_TOLERANCE = 0.01
+MIN_COUNTRIES = 5          # for a cross-country z-score
+MISSING_SCORE = 10.0      # a whole table missing for a country and year
+
+LEVEL_DIMS = ('education_level', 'institution_level')
+
+# Wide enrollment tables: table -> (student_enrollment level, ownership column)
+WIDE_ENROLLMENT = {
+    'early_childhood_enrollment': ('early_childhood', 'institution_type'),
+    'special_education_enrollment': ('special_education', 'institution_type'),
+    'primary_enrollment': ('primary', 'school_type'),
+    'secondary_enrollment': ('secondary', 'school_type'),
+}
+WIDE_OWNERSHIP = {'Public': 'public', 'Private': 'private', 'Private/Gov Assisted': 'private'}
+OWNERSHIPS = ('public', 'private')
+GENDERS = ('male', 'female')
+
+# Grade columns of the wide tables; Form 6 is CAPE, which student_enrollment
+# counts under post_secondary, so it is left out of the cross-table comparison
+GRADE_COLUMN = re.compile(r'^(k|g\d|f\d)_(male|female)$')
+CROSS_TABLE_EXCLUDED = re.compile(r'^f6_')
+
+# (label, cube, filter) pairs that count the same people, by level and gender
+STAFF_PAIRS = [
+    ('teachers', ('staff_qualifications', {'role': 'teacher'}), ('staff_age', {'role': 'teacher'})),
+    ('teachers', ('staff_qualifications', {'role': 'teacher'}), ('staff_service', {'role': 'teacher'})),
+    ('principals and deputies', ('staff_qualifications', {'role': ['principal', 'deputy_principal']}),
+     ('staff_age', {'role': 'principal_deputy'})),
+    ('principals and deputies', ('staff_qualifications', {'role': ['principal', 'deputy_principal']}),
+     ('staff_service', {'role': 'principal_deputy'})),
+]
+
+
+@dataclass
+class Anomaly:
+    score: float
+    check: str          # year_over_year, cross_country, missing, residual
+    country: str
+    year: str
+    indicator: str
+    value: float
+    reference: float    # last year's value, the value at the regional median change, or the other table's
+    detail: str
+
+
+def require_numpy():
+    if np is None:
+        raise RuntimeError('Data-quality checks need NumPy: pip install numpy')
+
+
+class Panel:
+    """Every indicator of every cube on one country × year × indicator grid"""
+
+    def __init__(self, service: CubeService):
+        cubes = service.cubes.values()
+        self.countries = order_labels('country', {label for cube in cubes for label in cube.labels['country']})
+        self.years = order_labels('year', {label for cube in cubes for label in cube.labels['year']})
+        self.country_index = {label: index for index, label in enumerate(self.countries)}
+        self.year_index = {label: index for index, label in enumerate(self.years)}
+        self.present = {}      # cube name -> bool [country, year]
+        values, present, names = [], [], []
+        self.seen = set()
+        for cube in cubes:
+            block_values, block_names = self.cube_indicators(cube)
+            self.present[cube.name] = self.presence(cube)
+            values.append(block_values)
+            present.append(np.broadcast_to(self.present[cube.name][:, :, None], block_values.shape))
+            names.extend(block_names)
+        shape = (len(self.countries), len(self.years), 0)
+        self.values = np.concatenate(values, axis=2) if values else np.zeros(shape)
+        self.mask = np.concatenate(present, axis=2) if present else np.zeros(shape, dtype=bool)
+        self.names = names
+
+    def positions(self, cube):
+        return (np.array([self.country_index[label] for label in cube.labels['country']], dtype=np.intp),
+                np.array([self.year_index[label] for label in cube.labels['year']], dtype=np.intp))
+
+    def presence(self, cube):
+        present = np.zeros((len(self.countries), len(self.years)), dtype=bool)
+        countries, years = self.positions(cube)
+        for country, year in cube.blocks:
+            present[countries[country], years[year]] = True
+        return present
+
+    def align(self, cube, local):
+        """[cube country, cube year, k] -> [country, year, k] on the panel's labels"""
+        countries, years = self.positions(cube)
+        aligned = np.zeros((len(self.countries), len(self.years)) + local.shape[2:], dtype=np.float64)
+        aligned[np.ix_(countries, years)] = local
+        return aligned
+
+    def cube_indicators(self, cube):
+        """The table's total, its breakdown by each dimension, and level × each other dimension"""
+        dims = [dim for dim in cube.dims if dim not in SCOPE_DIMS]
+        level = next((dim for dim in dims if dim in LEVEL_DIMS), None)
+        groups = [()] + [(dim,) for dim in dims]
+        if level:
+            groups += [(level, dim) for dim in dims if dim != level]
+
+        values, names = [], []
+        for group in groups:
+            axes = tuple(sorted({cube.axis[dim] for dim in SCOPE_DIMS + group}))
+            marginal = cube.marginal(axes)[tuple(slice(0, cube.shape[axis]) for axis in axes)]
+            ordered = [cube.dims[axis] for axis in axes if cube.dims[axis] not in SCOPE_DIMS]
+            local = marginal.reshape(cube.shape[cube.axis['country']], cube.shape[cube.axis['year']], -1)
+            combos = np.ndindex(*[cube.shape[cube.axis[dim]] for dim in ordered]) if ordered else [()]
+            for offset, combo in enumerate(combos):
+                if not local[:, :, offset].any():
+                    continue
+                labels = ', '.join(f"{dim}={cube.labels[dim][index]}" for dim, index in zip(ordered, combo))
+                name = f"{CUBES[cube.name].table}[{labels}]" if labels else CUBES[cube.name].table
+                if name in self.seen:
+                    continue    # the same figure from another cube over the table
+                self.seen.add(name)
+                names.append(name)
+                values.append(local[:, :, offset])
+        if not values:
+            return np.zeros((len(self.countries), len(self.years), 0)), []
+        return self.align(cube, np.stack(values, axis=2)), names
+
+
+def year_over_year(panel: Panel, max_ratio: float, min_count: int, z_limit: float) -> list:
+    """Year-over-year and cross-country findings for every indicator at once"""
+    if len(panel.years) < 2:
+        return []
+    last, this = panel.values[:, :-1], panel.values[:, 1:]
+    both = panel.mask[:, :-1] & panel.mask[:, 1:] & (np.maximum(last, this) >= min_count)
+    change = np.log((this + 1) / (last + 1))
+    limit = math.log(max_ratio)
+
+    findings = []
+    for country, year, k in zip(*np.nonzero(both & (np.abs(change) > limit))):
+        ratio = (this[country, year, k] + 1) / (last[country, year, k] + 1)
+        findings.append(Anomaly(
+            abs(change[country, year, k]) / limit, 'year_over_year', panel.countries[country],
+            panel.years[year + 1], panel.names[k], this[country, year, k].item(), last[country, year, k].item(),
+            f"{ratio:.2f}× {panel.years[year]}"))
+
+    # Regional median and MAD of the change for each year and indicator
+    changes = np.where(both, change, np.nan)
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore', RuntimeWarning)
+        median = np.nanmedian(changes, axis=0)
+        spread = 1.4826 * np.nanmedian(np.abs(changes - median), axis=0)
+    reporting = both.sum(axis=0)
+    scale = np.maximum(np.nan_to_num(spread), 0.05)
+    z = np.where(both & (reporting >= MIN_COUNTRIES), (changes - median) / scale, 0.0)
+    for country, year, k in zip(*np.nonzero(np.abs(z) > z_limit)):
+        findings.append(Anomaly(
+            abs(z[country, year, k]) / z_limit, 'cross_country', panel.countries[country], panel.years[year + 1],
+            panel.names[k], this[country, year, k].item(),
+            (last[country, year, k] + 1) * math.exp(median[year, k]) - 1,
+            f"z = {z[country, year, k]:+.1f} against {reporting[year, k]} countries"))
+    return findings
+
+
+def missing_slices(panel: Panel) -> list:
+    findings = []
+    for name, present in panel.present.items():
+        if present.shape[1] < 2:
+            continue
+        coverage = present.mean(axis=0)
+        gaps = ~present[:, 1:] & present[:, :-1] & (coverage[1:] >= 0.5)
+        for country, year in zip(*np.nonzero(gaps)):
+            findings.append(Anomaly(
+                MISSING_SCORE, 'missing', panel.countries[country], panel.years[year + 1], CUBES[name].table,
+                0, 1, f"no rows, but {panel.years[year]} has them and "
+                      f"{present[:, year + 1].sum()} of {len(panel.countries)} countries report"))
+    return findings
+
+
+def residual_findings(panel: Panel, check: str, left, right, names: list, tolerance: float, min_count: int,
+                      detail: str, present=None) -> list:
+    """Residuals |left - right| / max(left, right) above tolerance; arrays are [country, year, k]"""
+    larger = np.maximum(left, right)
+    gap = np.abs(left - right) / np.maximum(larger, 1)
+    flagged = (gap > tolerance) & (larger >= min_count)
+    if present is not None:
+        flagged &= present
+    return [Anomaly(gap[country, year, k].item() / tolerance, check, panel.countries[country],
+                    panel.years[year], names[k], left[country, year, k].item(), right[country, year, k].item(),
+                    detail)
+            for country, year, k in zip(*np.nonzero(flagged))]
+
+
+def staff_residuals(panel: Panel, service: CubeService, tolerance: float, min_count: int) -> list:
+    findings = []
+    for label, (left_name, left_filter), (right_name, right_filter) in STAFF_PAIRS:
+        if left_name not in service.cubes or right_name not in service.cubes:
+            continue
+        by = ('country', 'year', 'education_level', 'gender')
+        left_cube, right_cube = service[left_name], service[right_name]
+        levels = [level for level in left_cube.labels['education_level']
+                  if level in right_cube.labels['education_level']]
+        genders = [gender for gender in GENDERS
+                   if gender in left_cube.labels['gender'] and gender in right_cube.labels['gender']]
+        try:
+            left = left_cube.query(by, education_level=levels, gender=genders, **left_filter)
+            right = right_cube.query(by, education_level=levels, gender=genders, **right_filter)
+        except KeyError:
+            continue    # a role the data does not have
+        names = [f"{label}[education_level={level}, gender={gender}]" for level in levels for gender in genders]
+        shape = left.values.shape[:2] + (-1,)
+        findings += residual_findings(
+            panel, 'residual', panel.align(left_cube, left.values.reshape(shape)),
+            panel.align(right_cube, right.values.reshape(shape)), names, tolerance, min_count,
+            f"{left_name} vs {CUBES[right_name].table}",
+            (panel.present[left_name] & panel.present[right_name])[:, :, None])
+    return findings
+
+
+def wide_matrix(rows: list, columns: list):
+    return np.array([[number(row.get(column)) for column in columns] for row in rows],
+                    dtype=np.float64).reshape(len(rows), len(columns))
+
+
+def wide_enrollment_residuals(panel: Panel, service: CubeService, tolerance: float, min_count: int) -> list:
+    """Subtotal columns against grade columns, and wide tables against student_enrollment"""
+    source = service.source
+    findings = []
+    enrollment = service.cubes.get('enrollment')
+    for table, (level, ownership_column) in WIDE_ENROLLMENT.items():
+        try:
+            rows = [row for row in source.rows(table)
+                    if number(row['country_id']) in service.country_codes
+                    and number(row['academic_year_id']) in service.year_labels]
+        except Exception:
+            continue    # table not deployed / not exported
+        if not rows:
+            continue
+        columns = list(rows[0])
+        country = np.array([panel.country_index.get(service.country_codes[number(row['country_id'])], -1)
+                            for row in rows])
+        year = np.array([panel.year_index.get(service.year_labels[number(row['academic_year_id'])], -1)
+                         for row in rows])
+        known = (country >= 0) & (year >= 0)
+        ownership = np.array([OWNERSHIPS.index(WIDE_OWNERSHIP.get(row[ownership_column], 'public'))
+                              for row in rows])
+
+        # Per gender: the value columns, and the subtotal column if the table has one
+        per_gender = {}
+        for gender in GENDERS:
+            grades = [column for column in columns if GRADE_COLUMN.match(column) and column.endswith('_' + gender)]
+            per_gender[gender] = (grades or [gender], f"subtotal_{gender}" if grades else None)
+
+        # Row level: subtotal = sum of grades
+        for gender, (grades, subtotal) in per_gender.items():
+            if subtotal is None or subtotal not in columns:
+                continue
+            matrix = wide_matrix(rows, grades + [subtotal])
+            summed, stated = matrix[:, :-1].sum(axis=1), matrix[:, -1]
+            larger = np.maximum(summed, stated)
+            gap = np.abs(summed - stated) / np.maximum(larger, 1)
+            for index in np.nonzero((gap > tolerance) & (larger >= min_count) & known)[0]:
+                row = rows[index]
+                findings.append(Anomaly(
+                    gap[index] / tolerance, 'residual', panel.countries[country[index]], panel.years[year[index]],
+                    f"{table}[{ownership_column}={row[ownership_column]}, age_group={row.get('age_group')}, "
+                    f"{subtotal}]", stated[index].item(), summed[index].item(), "subtotal vs sum of grades"))
+
+        # Table level: wide totals by ownership and gender against student_enrollment
+        if enrollment is None or level not in enrollment.labels['education_level']:
+            continue
+        wide = np.zeros((len(panel.countries), len(panel.years), len(OWNERSHIPS), len(GENDERS)))
+        for gender_index, gender in enumerate(GENDERS):
+            grades, _ = per_gender[gender]
+            grades = [column for column in grades if not CROSS_TABLE_EXCLUDED.match(column)]
+            totals = wide_matrix(rows, grades).sum(axis=1)
+            np.add.at(wide, (country[known], year[known], ownership[known], gender_index), totals[known])
+        owners = [label for label in OWNERSHIPS if label in enrollment.labels['ownership_type']]
+        genders = [label for label in GENDERS if label in enrollment.labels['gender']]
+        long = enrollment.query(('country', 'year', 'ownership_type', 'gender'), education_level=level,
+                                ownership_type=owners, gender=genders)
+        long_values = np.zeros((len(panel.countries), len(panel.years), len(OWNERSHIPS), len(GENDERS)))
+        aligned = panel.align(enrollment, long.values)
+        for position, owner in enumerate(owners):
+            for gender_position, gender in enumerate(genders):
+                long_values[:, :, OWNERSHIPS.index(owner), GENDERS.index(gender)] = \
+                    aligned[:, :, position, gender_position]
+        reported = np.zeros((len(panel.countries), len(panel.years)), dtype=bool)
+        reported[country[known], year[known]] = True
+        names = [f"{level} enrollment[ownership_type={owner}, gender={gender}]"
+                 for owner in OWNERSHIPS for gender in GENDERS]
+        findings += residual_findings(
+            panel, 'residual', wide.reshape(len(panel.countries), len(panel.years), -1),
+            long_values.reshape(len(panel.countries), len(panel.years), -1), names, tolerance, min_count,
+            f"{table} vs student_enrollment", (reported & panel.present['enrollment'])[:, :, None])
+    return findings
+
+
+def run_checks(service: CubeService, max_ratio: float = DEFAULT_MAX_RATIO, z_limit: float = DEFAULT_Z,
+               min_count: int = DEFAULT_MIN_COUNT, tolerance: float = DEFAULT_TOLERANCE) -> list:
+    """Every finding, highest score first"""
+    require_numpy()
+    panel = Panel(service)
+    findings = (year_over_year(panel, max_ratio, min_count, z_limit) + missing_slices(panel)
+                + staff_residuals(panel, service, tolerance, min_count)
+                + wide_enrollment_residuals(panel, service, tolerance, min_count))
+    findings.sort(key=lambda finding: (-finding.score, finding.country, finding.year, finding.indicator))
+    return findings
+
+
+def scoped(findings: list, countries=None, years=None) -> list:
+    return [finding for finding in findings
+            if (not countries or finding.country in countries) and (not years or finding.year in years)]
+
+
+def print_report(findings: list, top: int):
+    counts = {}
+    for finding in findings:
+        counts[finding.check] = counts.get(finding.check, 0) + 1
+    print(f"\n🔎 {len(findings):,} findings ({', '.join(f'{count} {check}' for check, count in counts.items()) or 'none'})")
+    if not findings:
+        return
+    print(f"\n{'Score':>6}  {'Check':<15} {'Country':<7} {'Year':<10} {'Value':>12} {'Reference':>12}  Indicator / detail")
+    print("-" * 110)
+    for finding in findings[:top]:
+        print(f"{finding.score:>6.1f}  {finding.check:<15} {finding.country:<7} {finding.year:<10} "
+              f"{finding.value:>12,.2f} {finding.reference:>12,.2f}  {finding.indicator}")
+        print(f"{'':>53}{finding.detail}")
+    if len(findings) > top:
+        print(f"\n   … {len(findings) - top:,} more (--top, --output)")
+
+
+def write_report(findings: list, path: Path):
+    rows = [asdict(finding) for finding in findings]
+    if path.suffix == '.json':
+        path.write_text(json.dumps(rows, indent=2), encoding='utf-8')
+        return
+    with open(path, 'w', encoding='utf-8', newline='') as handle:
+        writer = csv.DictWriter(handle, fieldnames=list(Anomaly.__dataclass_fields__))
+        writer.writeheader()
+        writer.writerows(rows)
+
+
+def check_after_import(metrics=None, countries=None, years=None, top: int = 15) -> list:
+    """The importers' --check stage: rebuild the cubes from Supabase and report the imported slices"""
+    print("\n🔎 Checking the imported figures...")
+    if metrics is None:
+        findings = scoped(run_checks(CubeService.from_supabase()), countries, years)
+    else:
+        with metrics.stage('quality_check') as record:
+            findings = scoped(run_checks(CubeService.from_supabase()), countries, years)
+            record.rows = len(findings)
+    print_report(findings, top)
+    return findings
+
+
+def main():
+    utf8_console()
+
+    parser = argparse.ArgumentParser(description='Rank anomalies in the imported figures')
+    parser.add_argument('--csv', help='Check a directory of table CSVs (generate_synthetic_data.py output) instead of Supabase')
+    parser.add_argument('--countries', nargs='+', help='Only report these country codes')
+    parser.add_argument('--years', nargs='+', help='Only report these academic years, e.g. 2023-2024')
+    parser.add_argument('--max-ratio', type=float, default=DEFAULT_MAX_RATIO,
+                        help=f'Flag year-over-year changes beyond this factor (default: {DEFAULT_MAX_RATIO})')
+    parser.add_argument('--z', type=float, default=DEFAULT_Z,
+                        help=f'Flag changes this many robust deviations from the regional median (default: {DEFAULT_Z})')
+    parser.add_argument('--min-count', type=int, default=DEFAULT_MIN_COUNT,
+                        help=f'Ignore changes and residuals of figures below this (default: {DEFAULT_MIN_COUNT})')
+    parser.add_argument('--tolerance', type=float, default=DEFAULT_TOLERANCE,
+                        help=f'Relative residual allowed between figures that should agree (default: {DEFAULT_TOLERANCE})')
+    parser.add_argument('--top', type=int, default=30, help='Findings to print (default: 30)')
+    parser.add_argument('--output', help='Write every finding to this .csv or .json file')
+    args = parser.parse_args()
+    require_numpy()
+
+    print("\n" + "=" * 80)
+    print("🔎 DATA-QUALITY CHECKS")
+    print("=" * 80)
+    start = time.perf_counter()
+    service = CubeService.from_csv(args.csv) if args.csv else CubeService.from_supabase()
+    loaded = time.perf_counter()
+    findings = run_checks(service, args.max_ratio, args.z, args.min_count, args.tolerance)
+    findings = scoped(findings, args.countries, args.years)
+    print(f"\n   Loaded in {loaded - start:.1f}s, checked in {(time.perf_counter() - loaded) * 1000:.0f} ms")
+    print_report(findings, args.top)
+    if args.output:
+        write_report(findings, Path(args.output))
+        print(f"\n✅ Wrote {len(findings):,} findings to {args.output}")
+
+
+if __name__ == '__main__':
+    try:
+        main()
+    except Exception as e:
+        print(f"\n❌ Error during data-quality checks: {e}")
+        import traceback
+        traceback.print_exc()
+        sys.exit(1)
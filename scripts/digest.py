@@ -0,0 +1,106 @@
+"""
+One command for the digest tools
+
+`digest <command> [options]` runs the import, check, admin and export scripts
+through a single entry point. Only the chosen command's module is imported,
+after the command line has been read: `digest --help` or a mistyped command
+needs nothing beyond the standard library, and openpyxl, NumPy, httpx and the
+Supabase client are loaded by the commands that use them, when they first use
+them (the client is created on the first request, see supabase_client.py).
+
+Each command takes the options of the script it runs; `digest <command> --help`
+lists them.
+
+Commands:
+    import chapter1     import_chapter1_institutions.py
+    import templates    import_member_templates.py
+    check               data_quality.py
+    set-active-year     set_active_year.py
+    analyze             analyze_excel_template.py
+    export              export_digest_workbooks.py
+
+Usage:
+    python scripts/digest.py import chapter1 --check
+    python scripts/digest.py import templates returns/ --dry-run
+    python scripts/digest.py check --years 2023-2024 --output anomalies.csv
+    python scripts/digest.py set-active-year 2023-2024
+    python scripts/digest.py analyze "DIGEST_WEB/Blank OECS MS Template.xlsx"
+    python scripts/digest.py export --years 2022-2023
+"""
+
+import argparse
+import importlib
+import sys
+from pathlib import Path
+
+from console import utf8_console
+
+# analyze_excel_template.py lives in the repository root
+ROOT_DIR = Path(__file__).parent.parent
+
+# command -> (module, description)
+COMMANDS = {
+    'import': (None, 'Import workbooks into Supabase: chapter1 (historical Chapter 1 files) '
+                     'or templates (member-state returns)'),
+    'check': ('data_quality', 'Rank anomalies in the imported figures'),
+    'set-active-year': ('set_active_year', 'Set the academic year the dashboard shows'),
+    'analyze': ('analyze_excel_template', 'Analyze the structure of a data template workbook'),
+    'export': ('export_digest_workbooks', 'Export digest-format chapter workbooks'),
+}
+
+# digest import <source> -> module
+IMPORT_SOURCES = {
+    'chapter1': 'import_chapter1_institutions',
+    'templates': 'import_member_templates',
+}
+
+
+def command_list() -> str:
+    lines = ['commands:']
+    for command, (_, description) in COMMANDS.items():
+        lines.append(f"  {command:<17} {description}")
+    lines.append("\nRun 'digest <command> --help' for a command's options.")
+    return '\n'.join(lines)
+
+
+def resolve(parser: argparse.ArgumentParser, command: str, args: list) -> tuple:
+    """(module name, program name, arguments for the module's main())"""
+    module, _ = COMMANDS[command]
+    if command != 'import':
+        return module, f"digest {command}", args
+    if not args or args[0] not in IMPORT_SOURCES:
+        parser.error(f"digest import needs a source: {' or '.join(IMPORT_SOURCES)}")
+    return IMPORT_SOURCES[args[0]], f"digest import {args[0]}", args[1:]
+
+
+def run(module_name: str, prog: str, args: list):
+    """Import the command's module and run its main() with `args` as the command line"""
+    if str(ROOT_DIR) not in sys.path:
+        sys.path.append(str(ROOT_DIR))
+    module = importlib.import_module(module_name)
+    sys.argv = [prog, *args]
+    module.main()
+
+
+def main(argv=None):
+    utf8_console()
+
+    parser = argparse.ArgumentParser(
+        prog='digest', description='OECS Education Digest tools',
+        epilog=command_list(), formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('command', choices=COMMANDS, metavar='command', help='One of the commands below')
+    parser.add_argument('args', nargs=argparse.REMAINDER, help="The command's options")
+    args = parser.parse_args(argv)
+
+    module_name, prog, command_args = resolve(parser, args.command, args.args)
+    try:
+        run(module_name, prog, command_args)
+    except Exception as e:
+        print(f"\n❌ Error during {prog}: {e}")
+        import traceback
+        traceback.print_exc()
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,434 @@
+"""
+Offline SQL over a Parquet snapshot of the digest tables
+
+Exports every imported table once to Parquet (one file per table, typed from
+the schema files) and opens the snapshot in an in-process DuckDB database, so
+ad hoc analysis across all years runs locally in milliseconds instead of
+re-querying Supabase and looping in Python.
+
+- `export_snapshot()` writes `<table>.parquet` for every table of the schema,
+  read from Supabase (service role, keyset-paginated) or from a directory of
+  CSVs written by generate_synthetic_data.py, plus `workbook_cells.parquet`
+  with every value cell of the given workbooks (by default the chapter
+  workbooks under `DIGEST_WEB/Extracted Chapters`) and `manifest.json`
+- `open_snapshot()` returns a DuckDB connection with one view per table and
+  the predefined views in VIEWS
+
+The predefined views mirror `v_total_enrollment`, `v_student_teacher_ratios`
+and `v_csec_pass_rates` from create_database_schema.sql. A snapshot of the
+legacy schema uses those definitions as written; for the Supabase tables they
+are rewritten over student_enrollment and staff_qualifications (see VIEWS).
+The Supabase schema has no CSEC results table, so `v_csec_pass_rates` exists
+only over a legacy snapshot.
+
+Needs DuckDB (pip install duckdb).
+
+Usage:
+    python digest_query.py --export
+    python digest_query.py --export --csv synthetic/supabase
+    python digest_query.py --export --csv synthetic/legacy --schema legacy --snapshot synthetic/parquet
+    python digest_query.py --list
+    python digest_query.py "SELECT level, SUM(total_students) FROM v_total_enrollment GROUP BY level"
+    python digest_query.py --file checks.sql --format csv > checks.csv
+
+    from digest_query import open_snapshot
+
+    db = open_snapshot()
+    db.sql("SELECT * FROM v_student_teacher_ratios WHERE country_code = 'GRD'").fetchall()
+"""
+
+import argparse
+import csv
+import functools
+import itertools
+import json
+import re
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+
+try:
+    import duckdb
+except ImportError:
+    duckdb = None
+
+from console import utf8_console
+from digest_records import SCHEMA_DIR
+from generate_synthetic_data import SCHEMAS, schema_specs
+from import_metrics import write_atomic
+
+DEFAULT_SNAPSHOT_DIR = SCHEMA_DIR / 'digest_parquet'
+DEFAULT_WORKBOOKS = SCHEMA_DIR / 'DIGEST_WEB' / 'Extracted Chapters'
+LEGACY_VIEWS_FILE = 'create_database_schema.sql'
+
+# Leading word of a schema column type -> DuckDB type
+DUCKDB_TYPES = {
+    'SERIAL': 'INTEGER', 'INTEGER': 'INTEGER', 'INT': 'INTEGER', 'SMALLINT': 'INTEGER',
+    'BIGINT': 'BIGINT', 'BIGSERIAL': 'BIGINT',
+    'DECIMAL': 'DOUBLE', 'NUMERIC': 'DOUBLE', 'REAL': 'DOUBLE', 'FLOAT': 'DOUBLE',
+    'BOOLEAN': 'BOOLEAN', 'DATE': 'DATE', 'TIMESTAMP': 'TIMESTAMPTZ', 'TIMESTAMPTZ': 'TIMESTAMPTZ',
+    'UUID': 'UUID',
+}
+
+CREATE_VIEW = re.compile(r'CREATE (?:OR REPLACE )?VIEW (\w+) AS\s*(.*?);', re.S | re.I)
+
+# Views over the Supabase tables with the columns of the legacy views.
+# Post-secondary enrolment has no ownership type (national), so its teachers
+# are pooled across ownership to match. Specialist teachers are not recorded by
+# level or ownership, so there is no effective_ratio column.
+VIEWS = {
+    'v_total_enrollment': """
+        SELECT c.country_code, y.year_label AS academic_year, e.education_level AS level,
+               SUM(e.count) AS total_students
+        FROM student_enrollment e
+        JOIN countries c ON e.country_id = c.id
+        JOIN academic_years y ON e.academic_year_id = y.id
+        GROUP BY c.country_code, y.year_label, e.education_level
+    """,
+    'v_student_teacher_ratios': """
+        WITH students AS (
+            SELECT country_id, academic_year_id,
+                   CASE education_level WHEN 'early_childhood' THEN 'pre_primary' ELSE education_level END
+                       AS education_level,
+                   ownership_type, SUM(count) AS total_students
+            FROM student_enrollment
+            WHERE education_level <> 'special_education'
+            GROUP BY ALL
+        ), teachers AS (
+            SELECT country_id, academic_year_id, education_level,
+                   CASE WHEN education_level = 'post_secondary' THEN NULL ELSE ownership_type END AS ownership_type,
+                   SUM(count) AS number_of_teachers
+            FROM staff_qualifications
+            WHERE role = 'teacher'
+            GROUP BY ALL
+        )
+        SELECT c.country_code, y.year_label AS academic_year, s.education_level, s.ownership_type,
+               s.total_students, t.number_of_teachers,
+               CASE WHEN t.number_of_teachers > 0
+                    THEN ROUND(s.total_students::DECIMAL / t.number_of_teachers, 2) END AS student_teacher_ratio
+        FROM students s
+        LEFT JOIN teachers t
+          ON t.country_id = s.country_id AND t.academic_year_id = s.academic_year_id
+         AND t.education_level = s.education_level AND t.ownership_type IS NOT DISTINCT FROM s.ownership_type
+        JOIN countries c ON s.country_id = c.id
+        JOIN academic_years y ON s.academic_year_id = y.id
+    """,
+}
+
+
+def require_duckdb():
+    if duckdb is None:
+        raise RuntimeError('The query snapshot needs DuckDB: pip install duckdb')
+
+
+def duckdb_type(sql_type: str) -> str:
+    word = re.match(r'[A-Z]*', sql_type.upper()).group(0)
+    return DUCKDB_TYPES.get(word, 'VARCHAR')
+
+
+def column_types(schema: str) -> dict:
+    """{table: {column: DuckDB type}}; foreign keys take the type of the referenced id
+
+    The Supabase files declare some foreign keys as UUID against SERIAL ids
+    (see local_postgres.py); the referenced type is the one the data has.
+    """
+    specs = schema_specs(schema)
+    types = {name: {column.name: duckdb_type(column.sql_type) for column in spec.columns}
+             for name, spec in specs.items()}
+    for name, spec in specs.items():
+        for column, target in spec.references.items():
+            if target in types and 'id' in types[target]:
+                types[name][column] = types[target]['id']
+    return types
+
+
+def quote(name: str) -> str:
+    return '"' + name.replace('"', '""') + '"'
+
+
+def literal(text) -> str:
+    return "'" + str(text).replace("'", "''") + "'"
+
+
+def copy_csv_to_parquet(db, source: Path, target: Path, types: dict):
+    """COPY one CSV (with header) to Parquet, typing the columns the schema knows"""
+    with open(source, encoding='utf-8', newline='') as handle:
+        header = next(csv.reader(handle), [])
+    columns = ', '.join(f"{literal(name)}: {literal(types.get(name, 'VARCHAR'))}" for name in header)
+    db.execute(f"COPY (SELECT * FROM read_csv({literal(source)}, header = true, columns = {{{columns}}})) "
+               f"TO {literal(target)} (FORMAT parquet, COMPRESSION zstd)")
+    return db.execute(f"SELECT count(*) FROM read_parquet({literal(target)})").fetchone()[0]
+
+
+def spool_rows(rows, path: Path, columns: list) -> int:
+    """Write row dicts to a CSV spool file; columns not in `columns` are appended as first seen"""
+    rows = iter(rows)
+    first = next(rows, None)
+    header = list(columns)
+    if first is not None:
+        header += [name for name in first if name not in header]
+    count = 0
+    with open(path, 'w', encoding='utf-8', newline='') as handle:
+        writer = csv.writer(handle)
+        writer.writerow(header)
+        if first is None:
+            return 0
+        for row in itertools.chain([first], rows):
+            writer.writerow([json.dumps(value) if isinstance(value, (dict, list)) else value
+                             for value in (row.get(name) for name in header)])
+            count += 1
+    return count
+
+
+def workbook_files(paths) -> list:
+    """[(path, name)] for the given workbooks and the .xlsx files under the given directories
+
+    The name is the path relative to the directory it was found in.
+    """
+    files = []
+    for path in map(Path, paths):
+        if path.is_dir():
+            files.extend((found, found.relative_to(path).as_posix()) for found in sorted(path.rglob('*.xlsx'))
+                         if not found.name.startswith('~$'))
+        elif path.exists():
+            files.append((path, path.name))
+    return files
+
+
+def workbook_cell_rows(files):
+    """One row per value cell: file, sheet, row, column, coordinate, text and number"""
+    import openpyxl
+    from openpyxl.utils import get_column_letter
+    from workbook_slim import slim_workbook
+
+    for path, name in files:
+        wb = openpyxl.load_workbook(slim_workbook(path), read_only=True, data_only=True)
+        try:
+            for ws in wb.worksheets:
+                for row in ws.iter_rows():
+                    for cell in row:
+                        value = getattr(cell, 'value', None)
+                        if value is None or value == '':
+                            continue
+                        number = value if isinstance(value, (int, float)) and not isinstance(value, bool) else None
+                        yield {'file': name, 'sheet': ws.title, 'row': cell.row, 'column': cell.column,
+                               'coordinate': f"{get_column_letter(cell.column)}{cell.row}",
+                               'text': str(value), 'number': number}
+        finally:
+            wb.close()
+
+
+WORKBOOK_CELL_TYPES = {'file': 'VARCHAR', 'sheet': 'VARCHAR', 'row': 'INTEGER', 'column': 'INTEGER',
+                       'coordinate': 'VARCHAR', 'text': 'VARCHAR', 'number': 'DOUBLE'}
+
+
+def export_snapshot(output_dir=DEFAULT_SNAPSHOT_DIR, schema: str = 'supabase', csv_dir=None,
+                    tables=None, workbooks=(DEFAULT_WORKBOOKS,), log=print) -> dict:
+    """Write the Parquet snapshot; returns the manifest
+
+    Tables come from `csv_dir` (generate_synthetic_data.py output for `schema`)
+    or from Supabase. Tables that the source does not have are skipped and
+    listed under 'missing' in the manifest. With `tables`, only those are
+    rewritten and the rest of an existing snapshot of the schema is kept.
+    Progress lines go to `log`.
+    """
+    require_duckdb()
+    output_dir = Path(output_dir)
+    output_dir.mkdir(parents=True, exist_ok=True)
+    types = column_types(schema)
+    wanted = list(tables) if tables else list(types)
+    manifest = {'schema': schema, 'source': str(csv_dir) if csv_dir else 'supabase',
+                'exported_at': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+                'tables': {}, 'missing': []}
+    manifest_path = output_dir / 'manifest.json'
+    if tables and manifest_path.exists():
+        # Refreshing some tables: keep the rest of a snapshot of the same schema
+        previous = json.loads(manifest_path.read_text(encoding='utf-8'))
+        if previous['schema'] == schema:
+            manifest['tables'] = previous['tables']
+
+    client = None
+    if csv_dir is None:
+        from supabase_client import get_client
+        client = get_client()
+
+    db = duckdb.connect()
+    with tempfile.TemporaryDirectory() as spool_dir:
+        for table in wanted:
+            start = time.perf_counter()
+            target = output_dir / f"{table}.parquet"
+            if csv_dir is not None:
+                source = Path(csv_dir) / f"{table}.csv"
+                if not source.exists():
+                    manifest['missing'].append(table)
+                    continue
+            else:
+                from table_reader import iter_table
+                source = Path(spool_dir) / f"{table}.csv"
+                try:
+                    spool_rows(iter_table(client, table), source, list(types.get(table, {})))
+                except Exception as e:
+                    log(f"   ⚠️  {table}: {e}")
+                    manifest['missing'].append(table)
+                    continue
+            rows = copy_csv_to_parquet(db, source, target, types.get(table, {}))
+            manifest['tables'][table] = {'rows': rows, 'bytes': target.stat().st_size,
+                                         'seconds': round(time.perf_counter() - start, 3)}
+            log(f"   ✓ {table:<40} {rows:>12,} rows")
+
+        files = workbook_files(workbooks or [])
+        if files:
+            start = time.perf_counter()
+            source = Path(spool_dir) / 'workbook_cells.csv'
+            spool_rows(workbook_cell_rows(files), source, list(WORKBOOK_CELL_TYPES))
+            target = output_dir / 'workbook_cells.parquet'
+            rows = copy_csv_to_parquet(db, source, target, WORKBOOK_CELL_TYPES)
+            manifest['tables']['workbook_cells'] = {'rows': rows, 'bytes': target.stat().st_size,
+                                                    'seconds': round(time.perf_counter() - start, 3),
+                                                    'files': len(files)}
+            log(f"   ✓ {'workbook_cells':<40} {rows:>12,} cells from {len(files)} workbooks")
+    db.close()
+
+    # Parquet files of tables no longer exported would otherwise be picked up as views
+    for stale in output_dir.glob('*.parquet'):
+        if stale.stem not in manifest['tables']:
+            stale.unlink()
+    write_atomic(manifest_path, json.dumps(manifest, indent=2))
+    return manifest
+
+
+def view_definitions(schema: str) -> dict:
+    """{view: SELECT} for the snapshot's schema"""
+    if schema == 'legacy':
+        text = (SCHEMA_DIR / LEGACY_VIEWS_FILE).read_text(encoding='utf-8')
+        return {name: body for name, body in CREATE_VIEW.findall(text)}
+    return dict(VIEWS)
+
+
+def open_snapshot(snapshot_dir=DEFAULT_SNAPSHOT_DIR, database: str = ':memory:'):
+    """DuckDB connection with a view per exported table and the predefined views
+
+    Predefined views whose tables are not in the snapshot are skipped; the
+    ones created are listed in the connection's `digest_views` table.
+    """
+    require_duckdb()
+    snapshot_dir = Path(snapshot_dir)
+    manifest_path = snapshot_dir / 'manifest.json'
+    if not manifest_path.exists():
+        raise FileNotFoundError(f"No snapshot in {snapshot_dir}; run: python digest_query.py --export")
+    manifest = json.loads(manifest_path.read_text(encoding='utf-8'))
+
+    db = duckdb.connect(database)
+    for table in manifest['tables']:
+        db.execute(f"CREATE OR REPLACE VIEW {quote(table)} AS "
+                   f"SELECT * FROM read_parquet({literal(snapshot_dir / (table + '.parquet'))})")
+    created = []
+    for name, body in view_definitions(manifest['schema']).items():
+        try:
+            db.execute(f"CREATE OR REPLACE VIEW {quote(name)} AS {body}")
+            created.append((name, 'ok'))
+        except duckdb.Error as e:  # a missing table, or a column a Parquet file lacks
+            created.append((name, f"skipped: {str(e).splitlines()[0]}"))
+    db.execute("CREATE OR REPLACE TEMP TABLE digest_views (name VARCHAR, status VARCHAR)")
+    if created:
+        db.executemany("INSERT INTO digest_views VALUES (?, ?)", created)
+    return db
+
+
+def print_result(result, output_format: str):
+    columns = [description[0] for description in result.description]
+    rows = result.fetchall()
+    if output_format == 'csv':
+        writer = csv.writer(sys.stdout)
+        writer.writerow(columns)
+        writer.writerows(rows)
+        return len(rows)
+    if output_format == 'json':
+        print(json.dumps([dict(zip(columns, row)) for row in rows], indent=2, default=str))
+        return len(rows)
+    text = [[('' if value is None else f"{value:,}" if isinstance(value, int) else str(value)) for value in row]
+            for row in rows]
+    widths = [max([len(column)] + [len(row[index]) for row in text]) for index, column in enumerate(columns)]
+    print('  '.join(column.ljust(width) for column, width in zip(columns, widths)))
+    print('  '.join('-' * width for width in widths))
+    for row, raw in zip(text, rows):
+        print('  '.join(value.rjust(width) if isinstance(original, (int, float)) else value.ljust(width)
+                        for value, width, original in zip(row, widths, raw)))
+    return len(rows)
+
+
+def main():
+    utf8_console()
+
+    parser = argparse.ArgumentParser(description='Query a local Parquet snapshot of the digest tables with DuckDB')
+    parser.add_argument('sql', nargs='?', help='SQL to run against the snapshot')
+    parser.add_argument('--file', help='Run the SQL statements in this file instead')
+    parser.add_argument('--snapshot', default=str(DEFAULT_SNAPSHOT_DIR),
+                        help='Snapshot directory (default: digest_parquet/ in the repository root)')
+    parser.add_argument('--export', action='store_true', help='(Re)write the snapshot before querying')
+    parser.add_argument('--csv', help='Export from this directory of table CSVs instead of Supabase')
+    parser.add_argument('--schema', choices=list(SCHEMAS), default='supabase', help='Schema of the exported tables')
+    parser.add_argument('--tables', nargs='+', help='Export only these tables')
+    parser.add_argument('--workbooks', nargs='*', default=[str(DEFAULT_WORKBOOKS)],
+                        help='Workbooks or directories to export as workbook_cells (default: DIGEST_WEB/Extracted '
+                             'Chapters; pass no value to skip)')
+    parser.add_argument('--list', action='store_true', help='List the snapshot tables and views')
+    parser.add_argument('--format', choices=['table', 'csv', 'json'], default='table', help='Output format')
+    args = parser.parse_args()
+    require_duckdb()
+
+    quiet = args.format != 'table'
+    # With --format csv/json stdout carries only the result, so it can be piped
+    log = functools.partial(print, file=sys.stderr) if quiet else print
+    if args.export:
+        log("\n" + "=" * 80)
+        log("📦 EXPORTING QUERY SNAPSHOT")
+        log("=" * 80)
+        start = time.perf_counter()
+        manifest = export_snapshot(args.snapshot, args.schema, args.csv, args.tables, args.workbooks, log)
+        total = sum(entry['rows'] for entry in manifest['tables'].values())
+        size = sum(entry['bytes'] for entry in manifest['tables'].values())
+        if manifest['missing']:
+            log(f"\n   ⚠️  Not in the source: {', '.join(manifest['missing'])}")
+        log(f"\n✅ {total:,} rows in {len(manifest['tables'])} Parquet files ({size / 1e6:.1f} MB) "
+              f"written to {args.snapshot} in {time.perf_counter() - start:.1f}s")
+
+    if not (args.sql or args.file or args.list):
+        return
+
+    start = time.perf_counter()
+    db = open_snapshot(args.snapshot)
+    opened = time.perf_counter() - start
+
+    if args.list:
+        manifest = json.loads((Path(args.snapshot) / 'manifest.json').read_text(encoding='utf-8'))
+        print(f"\n📂 {args.snapshot} ({manifest['schema']} schema from {manifest['source']}, "
+              f"exported {manifest['exported_at']})\n")
+        for table, entry in manifest['tables'].items():
+            print(f"   {table:<40} {entry['rows']:>12,} rows")
+        print()
+        for name, status in db.execute("SELECT * FROM digest_views").fetchall():
+            print(f"   {'✓' if status == 'ok' else '–'} {name:<38} {'' if status == 'ok' else status}")
+        return
+
+    statements = Path(args.file).read_text(encoding='utf-8') if args.file else args.sql
+    start = time.perf_counter()
+    result = db.execute(statements)
+    if result.description is None:
+        return
+    count = print_result(result, args.format)
+    if not quiet:
+        print(f"\n   {count:,} rows in {(time.perf_counter() - start) * 1000:.1f} ms "
+              f"(snapshot opened in {opened * 1000:.1f} ms)")
+
+
+if __name__ == '__main__':
+    try:
+        main()
+    except Exception as e:
+        print(f"\n❌ Error querying the snapshot: {e}")
+        import traceback
+        traceback.print_exc()
+        sys.exit(1)
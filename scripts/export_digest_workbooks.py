@@ -0,0 +1,344 @@
+"""
+Export digest-format chapter workbooks from Supabase into a single archive
+
+Writes one workbook per chapter and academic year, laid out like the files in
+`DIGEST_WEB/Extracted Chapters/` (one `Table X.Y` sheet per table, countries in
+digest order, OECS totals row). Workbooks are produced with openpyxl write-only
+mode and database rows are read page by page, so memory stays flat no matter
+how many chapters and years are exported (see table_reader.py). openpyxl and
+the Supabase client are imported on first use, so modules that only need
+DIGEST_COUNTRIES or the sheet layout do not pay for them.
+
+Chapters exported:
+- Chapter 1: Tables 1.1, 1.2, 1.3 (from the institutions table)
+- Chapter 3: Tables 3.1, 3.2 (from student_enrollment, early childhood)
+
+Usage:
+    python scripts/export_digest_workbooks.py
+    python scripts/export_digest_workbooks.py --output digest_2023.zip --years 2022-2023
+    python scripts/digest.py export --years 2022-2023
+"""
+
+import sys
+import argparse
+import tempfile
+import zipfile
+
+from pathlib import Path
+
+from console import utf8_console
+from profiling import add_profile_argument, profiled
+from table_reader import iter_table
+
+# Digest row order: (Excel abbreviation, ISO code)
+DIGEST_COUNTRIES = [
+    ('ANG', 'AIA'),
+    ('A&B', 'ATG'),
+    ('DOM', 'DMA'),
+    ('GRD', 'GRD'),
+    ('MON', 'MSR'),
+    ('SKN', 'KNA'),
+    ('SLU', 'LCA'),
+    ('SVG', 'VCT'),
+    ('VI', 'VGB'),
+]
+
+# Early childhood age groups as stored by the data-entry page -> digest label
+EARLY_CHILDHOOD_AGES = [
+    ('under_1', '< 1 Year'),
+    ('1', '1 Year'),
+    ('2', '2 Years'),
+    ('3', '3 Years'),
+    ('4', '4 Years'),
+    ('over_4', '>4 Years'),
+    ('unknown', 'Age Unknown'),
+]
+
+
+def short_year_label(year_label: str) -> str:
+    """Convert '2022-2023' to the '2022-23' form used for digest file names"""
+    start, end = year_label.split('-')
+    return f"{start}-{end[-2:]}"
+
+
+def add_merges(ws, ranges):
+    """Merge header ranges on a write-only worksheet"""
+    for cell_range in ranges:
+        ws.merged_cells.add(cell_range)
+
+
+def rows_by_country(rows, country_codes: dict):
+    """Key streamed rows by digest country abbreviation (bounded by country count)"""
+    by_country = {}
+    for row in rows:
+        code = country_codes.get(row['country_id'])
+        if code is None:
+            continue
+        by_country[code] = row
+    return by_country
+
+
+def write_ownership_table(ws, title: str, sections, data: dict, countries=DIGEST_COUNTRIES):
+    """Write a Table 1.1/1.2 style sheet: sections of public/church/non-affiliated/total"""
+    from openpyxl.utils import get_column_letter
+
+    ws.append([])
+    ws.append([None, title])
+
+    header = [None, 'Country']
+    ownership = [None, None]
+    private = [None, None]
+    merges = ['B3:B5']
+    for index, (label, _) in enumerate(sections):
+        first_col = 3 + index * 4
+        header.extend([label, None, None, None])
+        ownership.extend(['Public', 'Private', None, 'Total'])
+        private.extend([None, 'Church assisted', 'Non affiliated', None])
+        letters = [get_column_letter(first_col + offset) for offset in range(4)]
+        merges.extend([
+            f"{letters[0]}3:{letters[3]}3",
+            f"{letters[0]}4:{letters[0]}5",
+            f"{letters[1]}4:{letters[2]}4",
+            f"{letters[3]}4:{letters[3]}5",
+        ])
+    ws.append(header)
+    ws.append(ownership)
+    ws.append(private)
+    add_merges(ws, merges)
+
+    totals = [0] * (len(sections) * 4)
+    for abbr, _ in countries:
+        record = data.get(abbr, {})
+        values = []
+        for _, prefix in sections:
+            public = record.get(f'{prefix}_public', 0) or 0
+            church = record.get(f'{prefix}_private_church', 0) or 0
+            non_affiliated = record.get(f'{prefix}_private_non_affiliated', 0) or 0
+            values.extend([public, church, non_affiliated, public + church + non_affiliated])
+        totals = [total + value for total, value in zip(totals, values)]
+        ws.append([None, abbr] + values)
+    ws.append([None, 'OECS '] + totals)
+
+
+def write_table_1_1(ws, data: dict, countries=DIGEST_COUNTRIES):
+    """Table 1.1: Early Childhood Centres"""
+    write_ownership_table(ws, 'Table 1.1: Early Childhood Centres', [
+        ('Day-care Centres / Crèches', 'daycare'),
+        ('Pre-schools', 'preschool'),
+    ], data, countries)
+
+
+def write_table_1_2(ws, data: dict, countries=DIGEST_COUNTRIES):
+    """Table 1.2: Primary, Secondary and Special Education institutions"""
+    write_ownership_table(ws, 'Table 1.2: Number of Educational Institutions by Member State and Level', [
+        ('Primary', 'primary'),
+        ('Secondary', 'secondary'),
+        ('Special Education', 'special_ed'),
+    ], data, countries)
+
+
+def write_table_1_3(ws, data: dict, countries=DIGEST_COUNTRIES):
+    """Table 1.3: Post-Secondary Institutions"""
+    ws.append([])
+    ws.append([None, 'Table 1.3: Number of Post-Secondary Institutions'])
+    ws.append([None, 'Country', 'Post-Secondary', None, 'Total'])
+    ws.append([None, None, '(includes tertiary and non-tertiary)'])
+    ws.append([None, None, 'Public', 'Private Institutions'])
+    add_merges(ws, ['B2:E2', 'B3:B5', 'C3:D3', 'C4:D4', 'E3:E5'])
+
+    total_public = 0
+    total_private = 0
+    for abbr, _ in countries:
+        record = data.get(abbr, {})
+        public = record.get('post_secondary_public', 0) or 0
+        private = record.get('post_secondary_private', 0) or 0
+        total_public += public
+        total_private += private
+        ws.append([None, abbr, public, private, public + private])
+    ws.append([None, 'OECS ', total_public, total_private, total_public + total_private])
+
+
+def write_early_childhood_table(ws, title: str, grid: dict, countries=DIGEST_COUNTRIES):
+    """Table 3.1/3.2: enrolment by age and sex, countries across the columns"""
+    abbrs = [abbr for abbr, _ in countries]
+    ws.append([title])
+    ws.append(['Age as of  15th October', None, 'Country'])
+    ws.append([None, 'Sex'] + abbrs + ['OECS'])
+
+    totals = {'male': [0] * len(abbrs), 'female': [0] * len(abbrs)}
+    for age_group, label in EARLY_CHILDHOOD_AGES:
+        male = [grid.get((age_group, 'male', abbr), 0) for abbr in abbrs]
+        female = [grid.get((age_group, 'female', abbr), 0) for abbr in abbrs]
+        ws.append([label, 'M'] + male + [sum(male), sum(male) + sum(female)])
+        ws.append([None, 'F'] + female + [sum(female)])
+        totals['male'] = [total + value for total, value in zip(totals['male'], male)]
+        totals['female'] = [total + value for total, value in zip(totals['female'], female)]
+
+    male_total = sum(totals['male'])
+    female_total = sum(totals['female'])
+    ws.append(['Total', 'M'] + totals['male'] + [male_total, male_total + female_total])
+    ws.append([None, 'F'] + totals['female'] + [female_total])
+    ws.append([None, 'T'] + [m + f for m, f in zip(totals['male'], totals['female'])]
+              + [male_total + female_total])
+
+
+def write_chapter1(wb, data: dict, countries=DIGEST_COUNTRIES):
+    """Chapter 1 sheets from institutions rows keyed by digest abbreviation"""
+    write_table_1_1(wb.create_sheet('Table 1.1'), data, countries)
+    write_table_1_2(wb.create_sheet('Table 1.2'), data, countries)
+    write_table_1_3(wb.create_sheet('Table 1.3'), data, countries)
+
+
+def early_childhood_grids(rows, country_codes: dict) -> dict:
+    """{'public'|'private': {(age_group, gender, abbr): count}} from student_enrollment rows"""
+    grids = {'public': {}, 'private': {}}
+    for row in rows:
+        abbr = country_codes.get(row['country_id'])
+        grid = grids.get(row['ownership_type'])
+        if abbr is None or grid is None:
+            continue
+        key = (row['age_group'], row['gender'], abbr)
+        grid[key] = grid.get(key, 0) + (row['count'] or 0)
+    return grids
+
+
+def write_chapter3(wb, grids: dict, countries=DIGEST_COUNTRIES):
+    """Chapter 3 early childhood sheets from early_childhood_grids()"""
+    write_early_childhood_table(
+        wb.create_sheet('Table 3.1'),
+        'Table 3.1: Summary Enrolment in Public Early Childhood Education Institutions',
+        grids['public'],
+        countries,
+    )
+    write_early_childhood_table(
+        wb.create_sheet('Table 3.2'),
+        'Table 3.2: Summary Enrolment in Private/Government Assisted Early Childhood Education Institutions',
+        grids['private'],
+        countries,
+    )
+
+
+def build_chapter1(wb, year_id, country_codes: dict):
+    """Populate a write-only workbook with the Chapter 1 tables for one year"""
+    from supabase_client import get_client
+
+    rows = iter_table(get_client(), 'institutions', filters={'academic_year_id': year_id})
+    data = rows_by_country(rows, country_codes)
+    if not data:
+        return False
+
+    write_chapter1(wb, data)
+    return True
+
+
+def build_chapter3(wb, year_id, country_codes: dict):
+    """Populate a write-only workbook with the Chapter 3 early childhood tables"""
+    from supabase_client import get_client
+
+    rows = iter_table(
+        get_client(),
+        'student_enrollment',
+        columns='country_id, ownership_type, age_group, gender, count',
+        filters={'academic_year_id': year_id, 'education_level': 'early_childhood'},
+    )
+    grids = early_childhood_grids(rows, country_codes)
+    if not grids['public'] and not grids['private']:
+        return False
+
+    write_chapter3(wb, grids)
+    return True
+
+
+# Chapter folder name (as in Extracted Chapters) -> workbook builder
+CHAPTERS = [
+    ('Chapter 1', build_chapter1),
+    ('Chp3', build_chapter3),
+]
+
+
+def load_country_codes() -> dict:
+    """Map country UUID/ID -> digest abbreviation"""
+    from supabase_client import get_client
+
+    iso_to_abbr = {iso: abbr for abbr, iso in DIGEST_COUNTRIES}
+    result = get_client().table('countries').select('id, country_code').execute()
+    return {
+        country['id']: iso_to_abbr[country['country_code']]
+        for country in result.data
+        if country['country_code'] in iso_to_abbr
+    }
+
+
+def load_academic_years(year_labels=None):
+    """Return academic years to export, oldest first"""
+    from supabase_client import get_client
+
+    result = get_client().table('academic_years').select('id, year_label').order('start_year').execute()
+    years = result.data or []
+    if year_labels:
+        years = [year for year in years if year['year_label'] in year_labels]
+    return years
+
+
+def export_digest(output_path: Path, year_labels=None):
+    """Export every chapter x year into one zip archive"""
+    import openpyxl
+
+    print("\n" + "=" * 80)
+    print("📤 EXPORTING DIGEST WORKBOOKS")
+    print("=" * 80)
+
+    country_codes = load_country_codes()
+    years = load_academic_years(year_labels)
+    if not years:
+        print("\n⚠️  No academic years to export")
+        return 0
+
+    exported = 0
+    with zipfile.ZipFile(output_path, 'w', compression=zipfile.ZIP_DEFLATED) as archive, \
+            tempfile.TemporaryDirectory() as tmp_dir:
+        for year in years:
+            file_label = short_year_label(year['year_label'])
+            print(f"\n📅 {year['year_label']}")
+
+            for chapter, build in CHAPTERS:
+                wb = openpyxl.Workbook(write_only=True)
+                if not build(wb, year['id'], country_codes):
+                    wb.close()
+                    print(f"   • {chapter}: no data")
+                    continue
+
+                # Each workbook goes to disk and into the archive before the next is built
+                tmp_path = Path(tmp_dir) / f"{file_label}.xlsx"
+                wb.save(tmp_path)
+                archive.write(tmp_path, arcname=f"{chapter}/{file_label}.xlsx")
+                tmp_path.unlink()
+                exported += 1
+                print(f"   ✓ {chapter}/{file_label}.xlsx")
+
+    print(f"\n✅ Exported {exported} workbooks to {output_path}")
+    return exported
+
+
+def main():
+    utf8_console()
+
+    parser = argparse.ArgumentParser(description='Export digest-format chapter workbooks from Supabase')
+    parser.add_argument('--output', default='digest_export.zip', help='Zip archive to write')
+    parser.add_argument('--years', nargs='*', help="Academic years to export, e.g. 2022-2023 (default: all)")
+    add_profile_argument(parser)
+    args = parser.parse_args()
+
+    output_path = Path(args.output)
+    with profiled(output_path.with_suffix(''), mode=args.profile):
+        export_digest(output_path, args.years)
+
+
+if __name__ == '__main__':
+    try:
+        main()
+    except Exception as e:
+        print(f"\n❌ Error during export: {e}")
+        import traceback
+        traceback.print_exc()
+        sys.exit(1)
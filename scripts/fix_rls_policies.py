@@ -1,32 +1,15 @@
 """
 Apply RLS policy fixes to allow public dashboard access
 """
-import os
-import sys
-import io
 from pathlib import Path
-from dotenv import load_dotenv
-from supabase import create_client, Client
 
-# Fix Windows console encoding
-if sys.platform == 'win32':
-    sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8', errors='replace')
-    sys.stderr = io.TextIOWrapper(sys.stderr.buffer, encoding='utf-8', errors='replace')
+from console import utf8_console
+from supabase_client import get_client
 
-# Load environment variables
-env_path = Path(__file__).parent.parent / '.env.local'
-load_dotenv(dotenv_path=env_path)
-
-# Get Supabase credentials - need service role for policy changes
-supabase_url = os.getenv('NEXT_PUBLIC_SUPABASE_URL')
-supabase_key = os.getenv('SUPABASE_SERVICE_ROLE_KEY')
-
-if not supabase_url or not supabase_key:
-    print("ERROR: Missing Supabase credentials")
-    sys.exit(1)
+utf8_console()
 
 # Create Supabase client
-supabase: Client = create_client(supabase_url, supabase_key)
+supabase = get_client()
 
 print("=" * 80)
 print("APPLYING RLS POLICY FIXES FOR PUBLIC DASHBOARD ACCESS")
@@ -59,3 +42,7 @@ print("=" * 80)
 print("SQL FILE LOCATION:")
 print(f"  {sql_file}")
 print("=" * 80)
+print()
+print("To measure what the policies cost before applying them (the v2 file is one")
+print("of the built-in variants), run them against a local Postgres first:")
+print("  python rls_benchmark.py --dsn postgresql://postgres@localhost:5432/postgres")
@@ -0,0 +1,415 @@
+"""
+Generate cell mappings for every worksheet of the member-state template
+
+`StudentEnrollment_CellMapping.json` and
+`LeadersTeachersQualifications_CellMapping.json` were written by hand (the
+latter from the dictionary typed into DIGEST_WEB/generate_cell_mapping.py),
+and the other worksheets of the template have no mapping at all. This script
+derives them from the template itself:
+
+- total cells: every formula cell (`=SUM(E8:F8)`), with its formula
+- input cells: cells that formulas read but that hold no formula or label
+  themselves (the E8 and F8 of `=SUM(E8:F8)`, resolved to the anchor of a
+  merged range), plus cells covered by a data validation. Tables without
+  formulas (e.g. B7, one number per labelled row) fall back to the filled,
+  empty cells of their labelled rows.
+- tables: one per title cell ('B1.Qualifications & Training: Pre-schools'),
+  from the title row to the last non-empty row before the next title
+- labels: column headers from the rows between the title and the first
+  input row (merged ranges resolved with MergedRangeIndex), row labels from
+  the text cells to the left of each input cell
+
+One `<Worksheet>_CellMapping.json` per worksheet is written to
+DIGEST_WEB/generated_mappings: worksheet_name, academic_year, and tables
+keyed by table number, each with title, cell_range, rows, header_rows,
+input_cells (with their row and column labels) and total_cells (with their
+formulas). They say where the inputs and totals are, not which database value
+a cell holds; that comes from the hand-written documents, which
+template_mapping.py translates to database keys. template_mapping.py reads
+the generated documents for the total formulas and to check the hand-written
+cells against the template (`unmatched_cells()`).
+
+The documents are derived files and are not committed: template_mapping.py
+generates them on first use. `index.json` records the SHA-256 of the
+template they came from, so later runs only hash the file while the
+template is unchanged; pass --force to regenerate anyway.
+
+Usage:
+    python scripts/generate_cell_mappings.py
+    python scripts/generate_cell_mappings.py --force
+    python scripts/generate_cell_mappings.py --template "returns/New Template.xlsx" --output-dir /tmp/mappings
+"""
+
+import sys
+import os
+import re
+import json
+import time
+import argparse
+import tempfile
+from pathlib import Path
+
+import openpyxl
+from openpyxl.formula import Tokenizer
+from openpyxl.utils import get_column_letter, range_boundaries
+
+from console import utf8_console
+from merged_ranges import MergedRangeIndex
+from workbook_slim import file_digest
+
+DIGEST_WEB = Path(__file__).parent.parent / 'DIGEST_WEB'
+TEMPLATE_PATH = DIGEST_WEB / 'Blank OECS MS Template.xlsx'
+OUTPUT_DIR = DIGEST_WEB / 'generated_mappings'
+
+# Bump when the generated documents change shape or content for the same template
+MAPPING_VERSION = 1
+
+# 'B1.Qualifications & Training: Pre-schools', 'E2 Dropouts - 2022-2023', 'B6- Specialist Teachers'
+TABLE_TITLE = re.compile(r'^\s*([A-Z]\d{1,2})\s*[.:\-\s]\s*\S')
+# Text standing in for a number to be entered (Systems Output F2)
+PLACEHOLDERS = {'…', '...'}
+ACADEMIC_YEAR = re.compile(r'\b(\d{4})\s*[-/]\s*(\d{4}|\d{2})\b')
+
+
+def cell_text(value) -> str:
+    """Label text of a cell value (2023.0 -> '2023')"""
+    if isinstance(value, float) and value.is_integer():
+        value = int(value)
+    return str(value).strip()
+
+
+def is_formula(value) -> bool:
+    return isinstance(value, str) and value.startswith('=')
+
+
+def is_label(value) -> bool:
+    """Text that is not a number: row and column labels, not input values"""
+    if (not isinstance(value, str) or is_formula(value) or not value.strip()
+            or value.strip() in PLACEHOLDERS):
+        return False
+    try:
+        float(value.replace(',', ''))
+    except ValueError:
+        return True
+    return False
+
+
+def formula_references(formula: str, sheet: str):
+    """(sheet, min_col, min_row, max_col, max_row) for each cell or range a formula reads
+
+    Whole-column / whole-row references and defined names are skipped.
+    """
+    try:
+        tokens = Tokenizer(formula).items
+    except Exception:
+        return
+    for token in tokens:
+        if token.type != 'OPERAND' or token.subtype != 'RANGE':
+            continue
+        target, reference = sheet, token.value
+        if '!' in reference:
+            target, reference = reference.rsplit('!', 1)
+            target = target.strip("'").replace("''", "'")
+        try:
+            min_col, min_row, max_col, max_row = range_boundaries(reference.replace('$', ''))
+        except ValueError:
+            continue
+        if None in (min_col, min_row, max_col, max_row):
+            continue
+        yield target, min_col, min_row, max_col, max_row
+
+
+def academic_year(text) -> str:
+    match = ACADEMIC_YEAR.search(str(text))
+    return f"{match.group(1)}-{match.group(2)}" if match else None
+
+
+class SheetCells:
+    """One worksheet's values, formulas, merged ranges and classified cells, by (row, col)"""
+
+    def __init__(self, ws):
+        self.title = ws.title
+        self.values = {}
+        self.formulas = {}
+        self.fills = set()
+        for row in ws.iter_rows():
+            for cell in row:
+                if cell.value is not None:
+                    self.values[(cell.row, cell.column)] = cell.value
+                    if is_formula(cell.value):
+                        self.formulas[(cell.row, cell.column)] = cell.value
+                elif cell.fill is not None and cell.fill.fill_type == 'solid':
+                    self.fills.add((cell.row, cell.column))
+        self.merged = MergedRangeIndex.from_sheet(ws)
+        self.inputs = {cell for cell, value in self.values.items()
+                       if isinstance(value, str) and value.strip() in PLACEHOLDERS}
+        self.validations = {}
+        for validation in ws.data_validations.dataValidation:
+            rule = {key: value for key, value in (('type', validation.type),
+                                                  ('formula1', validation.formula1),
+                                                  ('formula2', validation.formula2)) if value}
+            for bounds in validation.sqref.ranges:
+                for cell in self.cells_in(*bounds.bounds):
+                    self.inputs.add(cell)
+                    self.validations[cell] = rule
+
+    def cells_in(self, min_col, min_row, max_col, max_row):
+        """Anchor (row, col) of every cell in a range, merged followers folded into their anchor"""
+        return {self.merged.anchor(row, col)
+                for row in range(min_row, max_row + 1) for col in range(min_col, max_col + 1)}
+
+    def add_precedents(self, min_col, min_row, max_col, max_row):
+        """Cells a formula reads become inputs unless they hold a formula or a label"""
+        for cell in self.cells_in(min_col, min_row, max_col, max_row):
+            if cell not in self.formulas and not is_label(self.values.get(cell)):
+                self.inputs.add(cell)
+
+    def label(self, row, col) -> str:
+        value = self.values.get(self.merged.anchor(row, col))
+        return cell_text(value) if is_label(value) or isinstance(value, (int, float)) else None
+
+    def row_labels(self, row, col, min_col) -> list:
+        """Labels to the left of an input cell, nearest block only
+
+        Input and total cells directly left of the cell are skipped (F8 gets
+        the labels of E8); the run of labels then ends at the next input or
+        formula, so side-by-side PUBLIC / PRIVATE blocks keep their own labels.
+        """
+        labels = []
+        for left in range(col - 1, min_col - 1, -1):
+            anchor = self.merged.anchor(row, left)
+            if anchor in self.inputs or anchor in self.formulas:
+                if labels:
+                    break
+                continue
+            text = self.label(row, left)
+            if text and text not in labels:
+                labels.append(text)
+        return labels[::-1]
+
+
+def find_tables(sheet: SheetCells) -> list:
+    """[(table id, title row, title)] in row order; one untitled table for sheets without titles"""
+    titles = {}
+    for (row, col), value in sorted(sheet.values.items()):
+        if row in titles or not isinstance(value, str):
+            continue
+        match = TABLE_TITLE.match(value)
+        if match:
+            titles[row] = (match.group(1), row, value.strip())
+    if titles:
+        return [titles[row] for row in sorted(titles)]
+    first = next((value for _, value in sorted(sheet.values.items()) if is_label(value)), sheet.title)
+    return [(re.sub(r'\W+', '', sheet.title.title()), 1, cell_text(first))]
+
+
+def uncomputed_inputs(sheet: SheetCells, occupied, first_row: int, last_row: int,
+                      computed_rows: set, grid: bool) -> list:
+    """Empty input cells of rows that no formula reads
+
+    A filled, empty cell with a row label to its left is an input (B7: one
+    count per labelled row). With `grid`, so for tables without formulas,
+    any empty cell with a row label to its left and a column label above it
+    within the table is one too (F3: 'No. sitting' × 'English A' / 'M').
+    """
+    max_col = max((col for row, col in list(occupied) + list(sheet.fills)
+                   if first_row <= row <= last_row), default=0)
+    inputs = []
+    for row in range(first_row, last_row + 1):
+        if row in computed_rows:
+            continue
+        for col in range(1, max_col + 1):
+            cell = (row, col)
+            if (cell in sheet.values or cell in sheet.inputs or sheet.merged.anchor(row, col) != cell
+                    or not any(sheet.label(row, left) for left in range(1, col))):
+                continue
+            if cell in sheet.fills or (grid and any(sheet.label(above, col)
+                                                    for above in range(first_row, row))):
+                inputs.append(cell)
+    sheet.inputs.update(inputs)
+    return inputs
+
+
+def table_mapping(sheet: SheetCells, title: str, first_row: int, last_row: int) -> dict:
+    """Mapping document for the table in rows first_row..last_row (inclusive, untrimmed)"""
+    occupied = [cell for cell in sheet.values if first_row <= cell[0] <= last_row]
+    inputs = sorted(cell for cell in sheet.inputs if first_row <= cell[0] <= last_row)
+    totals = sorted(cell for cell in sheet.formulas if first_row <= cell[0] <= last_row)
+
+    # Rows with nothing computed (every row, for tables without formulas)
+    body_start = min((cell[0] for cell in inputs + totals), default=first_row + 1)
+    computed_rows = {row for row, _ in inputs + totals}
+    inputs += uncomputed_inputs(sheet, occupied, body_start, last_row, computed_rows,
+                                grid=not computed_rows)
+    inputs.sort()
+
+    cells = occupied + inputs
+    end_row = max(row for row, _ in cells)
+    min_col = min(col for _, col in cells)
+    max_col = max(col for _, col in cells)
+    body_start = min((cell[0] for cell in inputs + totals), default=end_row + 1)
+    header_rows = list(range(first_row + 1, body_start))
+
+    column_labels = {}
+    for row in header_rows:
+        for col in range(min_col, max_col + 1):
+            anchor = sheet.merged.anchor(row, col)
+            text = sheet.label(row, col)
+            labels = column_labels.setdefault(col, [])
+            if text and (anchor, text) not in labels:
+                labels.append((anchor, text))
+
+    mapping = {
+        'title': title,
+        'cell_range': f"{get_column_letter(min_col)}{first_row}:{get_column_letter(max_col)}{end_row}",
+        'rows': f"{first_row}-{end_row}",
+    }
+    year = academic_year(title)
+    if year:
+        mapping['academic_year'] = year
+    mapping['header_rows'] = header_rows
+    mapping['input_cells'] = {
+        f"{get_column_letter(col)}{row}": {
+            'row_labels': sheet.row_labels(row, col, min_col),
+            'column_labels': [text for _, text in column_labels.get(col, [])],
+        }
+        for row, col in inputs
+    }
+    mapping['total_cells'] = {f"{get_column_letter(col)}{row}": sheet.formulas[(row, col)]
+                              for row, col in totals}
+    validations = {f"{get_column_letter(col)}{row}": sheet.validations[(row, col)]
+                   for row, col in inputs if (row, col) in sheet.validations}
+    if validations:
+        mapping['validations'] = validations
+    return mapping
+
+
+def sheet_mapping(sheet: SheetCells) -> dict:
+    tables = find_tables(sheet)
+    last_row = max((row for row, _ in list(sheet.values) + list(sheet.inputs)), default=1)
+    first_title_row = tables[0][1]
+    year = next((academic_year(value) for (row, _), value in sorted(sheet.values.items())
+                 if row <= first_title_row and academic_year(value)), None)
+
+    mapping = {'worksheet_name': sheet.title, 'academic_year': year, 'tables': {}}
+    for index, (table_id, title_row, title) in enumerate(tables):
+        end = tables[index + 1][1] - 1 if index + 1 < len(tables) else last_row
+        if table_id in mapping['tables']:
+            table_id = f"{table_id}_{title_row}"
+        mapping['tables'][table_id] = table_mapping(sheet, title, title_row, end)
+    return mapping
+
+
+def generate_mappings(template_path=TEMPLATE_PATH) -> dict:
+    """{worksheet name: mapping document} for every worksheet of the template"""
+    wb = openpyxl.load_workbook(template_path, data_only=False)
+    sheets = {ws.title: SheetCells(ws) for ws in wb.worksheets}
+
+    # References may cross sheets (a summary sheet summing another sheet's inputs)
+    for sheet in sheets.values():
+        for formula in sheet.formulas.values():
+            for target, *bounds in formula_references(formula, sheet.title):
+                if target in sheets:
+                    sheets[target].add_precedents(*bounds)
+
+    return {name: sheet_mapping(sheet) for name, sheet in sheets.items()}
+
+
+def mapping_filename(worksheet: str) -> str:
+    """'Age & Years of Service' -> 'AgeYearsOfService_CellMapping.json'"""
+    return ''.join(word[:1].upper() + word[1:] for word in re.findall(r'\w+', worksheet)) + '_CellMapping.json'
+
+
+def write_json(path: Path, document):
+    """Write through a temporary file so readers never see a partial document"""
+    fd, partial = tempfile.mkstemp(suffix='.json', dir=path.parent)
+    try:
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            json.dump(document, f, indent=2, ensure_ascii=False)
+            f.write('\n')
+        os.replace(partial, path)
+    finally:
+        if os.path.exists(partial):
+            os.unlink(partial)
+
+
+def write_mappings(template_path=TEMPLATE_PATH, output_dir=OUTPUT_DIR, force=False) -> dict:
+    """Generate and write the mappings unless `output_dir` already holds them for this template
+
+    Returns the index: template name, its SHA-256, and {worksheet: file}.
+    """
+    template_path, output_dir = Path(template_path), Path(output_dir)
+    digest = file_digest(template_path)
+    index_path = output_dir / 'index.json'
+    if index_path.exists() and not force:
+        index = json.loads(index_path.read_text(encoding='utf-8'))
+        if (index.get('sha256') == digest and index.get('mapping_version') == MAPPING_VERSION
+                and all((output_dir / name).exists() for name in index['sheets'].values())):
+            index['up_to_date'] = True
+            return index
+
+    mappings = generate_mappings(template_path)
+    output_dir.mkdir(parents=True, exist_ok=True)
+    index = {'template': template_path.name, 'sha256': digest,
+             'mapping_version': MAPPING_VERSION, 'sheets': {}}
+    for worksheet, mapping in mappings.items():
+        filename = mapping_filename(worksheet)
+        write_json(output_dir / filename, mapping)
+        index['sheets'][worksheet] = filename
+    write_json(index_path, index)
+    index['up_to_date'] = False
+    return index
+
+
+def main():
+    utf8_console()
+
+    parser = argparse.ArgumentParser(description='Generate cell mappings for every worksheet of the data template')
+    parser.add_argument('--template', default=str(TEMPLATE_PATH), help='Template workbook to analyze')
+    parser.add_argument('--output-dir', default=str(OUTPUT_DIR), help='Directory for the *_CellMapping.json files')
+    parser.add_argument('--force', action='store_true', help='Regenerate even if the template is unchanged')
+    args = parser.parse_args()
+
+    print("\n" + "=" * 80)
+    print("🗺️  GENERATING CELL MAPPINGS")
+    print("=" * 80)
+    print(f"\n📄 Template: {args.template}")
+
+    try:
+        start = time.perf_counter()
+        index = write_mappings(args.template, args.output_dir, force=args.force)
+        if index['up_to_date']:
+            print(f"\n✅ Mappings in {args.output_dir} are up to date (template unchanged); use --force to regenerate")
+            return
+
+        for worksheet, filename in index['sheets'].items():
+            mapping = json.loads((Path(args.output_dir) / filename).read_text(encoding='utf-8'))
+            tables = mapping['tables']
+            inputs = sum(len(table['input_cells']) for table in tables.values())
+            totals = sum(len(table['total_cells']) for table in tables.values())
+            print(f"\n📋 {worksheet} → {filename}")
+            print(f"   {len(tables)} tables, {inputs} input cells, {totals} total cells")
+            for table_id, table in tables.items():
+                marker = '⚠️ ' if not table['input_cells'] else '   '
+                print(f"  {marker}{table_id:<22} {table['cell_range']:<10} "
+                      f"{len(table['input_cells']):>5} inputs {len(table['total_cells']):>5} totals")
+
+        print(f"\n✅ Wrote {len(index['sheets'])} mappings to {args.output_dir} "
+              f"in {time.perf_counter() - start:.2f}s")
+
+        # template_mapping imports this module
+        from template_mapping import generated_mappings, unmatched_cells
+        unmatched = unmatched_cells(generated_mappings(args.template, args.output_dir))
+        if unmatched:
+            print(f"\n⚠️  {len(unmatched)} hand-mapped cells are not input cells of this template:")
+            for cell in unmatched[:20]:
+                print(f"   {cell.sheet}!{cell.coordinate} → {cell.table} {dict(cell.fields)}")
+    except Exception as e:
+        print(f"\n❌ Error during mapping generation: {e}")
+        import traceback
+        traceback.print_exc()
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,1303 @@
+"""
+Generate synthetic digest data at 10×–100× today's volume for scale testing
+
+Nine countries × three years hides every O(n²) loop and missing index. This
+script produces statistically plausible rows for every table defined in
+create_database_schema.sql (the legacy long-format schema) and in the
+supabase-*.sql files, for any number of countries and academic years, so
+importer, aggregation and query benchmarks can run at future scale.
+
+Tables are read from the schema files themselves (columns, UNIQUE keys and
+the value lists in CHECK constraints and column comments), so a table added
+to a schema file is generated without touching this script (tables computed
+from the others, DERIVED_TABLES, are left to their batch job). The numbers come
+from one model per country and year, which keeps the tables consistent with
+each other:
+
+- population by single year of age and sex from a population pyramid scaled
+  to the country's size (the nine OECS members start near their real size,
+  extra countries are drawn from a lognormal), with a per-country growth rate
+- enrolment from the school-age cohorts: each grade is concentrated on its
+  official age with over-age tails, secondary forms lose pupils form by form,
+  girls outnumber boys in post-secondary, boys in special education
+- institutions from enrolment divided by a typical school size per level,
+  split into public, church and non-affiliated schools
+- teachers from enrolment through a pupil-teacher ratio, principals and
+  deputies from the number of schools, with age, years-of-service and
+  qualification profiles per role and level
+- everything else (examinations, finance, efficiency tables) scaled to the
+  country's population with fixed magnitudes, achievers never exceeding
+  candidates and budgets in proportion to the national budget
+
+A seed makes runs reproducible; each (table, country, year) draws from its
+own generator, so a subset of tables or countries gives the same numbers as
+a full run.
+
+`--granularity school` adds `school_enrollment`, one synthetic row per
+school, whose counts add up to the institutions and enrolment tables. The
+schema has no school dimension, so that file exists for aggregation
+benchmarks only.
+
+Output is one CSV per table (header = column names, empty = NULL), ready for
+`\\copy table (columns) FROM 'file.csv' CSV HEADER`, under
+OUTPUT/supabase/ and OUTPUT/legacy/. `--workbooks` also writes chapter
+workbooks in the exporter's layout (export_digest_workbooks.py).
+
+Usage:
+    python generate_synthetic_data.py --output synthetic
+    python generate_synthetic_data.py --countries 90 --years 30 --seed 7 --workbooks
+    python generate_synthetic_data.py --schemas supabase --tables student_enrollment population_data
+    python generate_synthetic_data.py --granularity school --countries 30
+    python generate_synthetic_data.py --list-tables
+"""
+
+import argparse
+import csv
+import hashlib
+import itertools
+import json
+import math
+import random
+import re
+import sys
+import time
+import uuid
+from dataclasses import dataclass, field
+from pathlib import Path
+
+import openpyxl
+
+from console import utf8_console
+from digest_records import CREATE_TABLE, SCHEMA_DIR, SCHEMA_FILES, Column, parse_columns
+from export_digest_workbooks import (
+    CHAPTERS, DIGEST_COUNTRIES, early_childhood_grids, rows_by_country,
+    short_year_label, write_chapter1, write_chapter3,
+)
+
+# Schema name -> files, searched in order (the first definition of a table wins)
+SCHEMAS = {
+    'supabase': SCHEMA_FILES,
+    'legacy': ['create_database_schema.sql'],
+}
+
+# Filled in by the database, never generated
+SYSTEM_COLUMNS = {'created_at', 'updated_at'}
+
+# Computed from the generated tables by a batch job: (schema, table) -> script
+DERIVED_TABLES = {
+    ('supabase', 'education_indicators'): 'compute_indicators.py --csv <output>/supabase',
+}
+
+# Columns that place a row in a country and year; set for every data row
+YEAR_COLUMNS = ('academic_year_id', 'academic_year', 'fiscal_year', 'year')
+
+LAST_START_YEAR = 2024
+BASE_YEAR = 2022
+
+# ISO code -> (name, population around BASE_YEAR)
+OECS_MEMBERS = {
+    'AIA': ('Anguilla', 15_800),
+    'ATG': ('Antigua and Barbuda', 94_000),
+    'DMA': ('Dominica', 72_000),
+    'GRD': ('Grenada', 126_000),
+    'MSR': ('Montserrat', 4_400),
+    'KNA': ('Saint Kitts and Nevis', 47_000),
+    'LCA': ('Saint Lucia', 180_000),
+    'VCT': ('Saint Vincent and the Grenadines', 104_000),
+    'VGB': ('British Virgin Islands', 31_000),
+}
+
+GENDERS = ('male', 'female')
+OWNERSHIPS = ('public', 'private')
+
+# (education_level, ownership types, age groups, categories) of the enrollment grid
+ENROLLMENT_GRID = [
+    ('early_childhood', ('public', 'private'), ('under_1', '1', '2', '3', '4', 'over_4', 'unknown'), (None,)),
+    ('special_education', ('public', 'private'), ('5_8', '9_11', '12_14', '15_17', '18_20', 'over_20'), (None,)),
+    ('primary', ('public', 'private'),
+     ('under_5', '5', '6', '7', '8', '9', '10', '11', '12', '13', '14', '15', 'over_15', 'unknown'),
+     ('K', 'G1', 'G2', 'G3', 'G4', 'G5', 'G6')),
+    ('secondary', ('public', 'private'),
+     ('under_11', '11', '12', '13', '14', '15', '16', '17', '18', 'over_18', 'unknown'),
+     ('F1', 'F2', 'F3', 'F4', 'F5')),
+    ('post_secondary', (None,),
+     ('under_16', '16', '17', '18', '19', '20', '21', '22', '23', '24', '25', 'over_25', 'unknown'),
+     ('TVET', 'CAPE', 'Hospitality', 'Other', 'Tertiary')),
+]
+
+STAFF_LEVELS = ('pre_primary', 'primary', 'secondary', 'post_secondary')
+QUALIFICATION_CATEGORIES = ('graduate_trained', 'graduate_untrained', 'non_graduate_trained',
+                            'non_graduate_untrained', 'unknown')
+QUALIFICATION_ROLES = ('principal', 'deputy_principal', 'teacher')
+AGE_RANGES = ('under_19', '20_29', '30_39', '40_49', '50_59', '60_plus', 'unknown')
+SERVICE_RANGES = ('under_1', '1_5', '6_10', '11_15', '16_20', '21_25', '26_30', '31_35', 'over_35', 'unknown')
+
+# Institutions column prefix -> typical enrolment per institution
+SCHOOL_SIZES = {
+    'daycare': 22, 'preschool': 45, 'primary': 260, 'secondary': 620,
+    'special_ed': 55, 'tvet': 350, 'post_secondary': 900,
+}
+# Staff education level -> institutions column prefixes
+STAFF_SCHOOLS = {
+    'pre_primary': ('daycare', 'preschool'),
+    'primary': ('primary', 'special_ed'),
+    'secondary': ('secondary',),
+    'post_secondary': ('tvet', 'post_secondary'),
+}
+PUPIL_TEACHER_RATIOS = {'pre_primary': 11, 'primary': 16, 'secondary': 13, 'post_secondary': 14}
+DEPUTIES_PER_SCHOOL = {'pre_primary': 0.1, 'primary': 0.6, 'secondary': 1.6, 'post_secondary': 0.9}
+FEMALE_STAFF_SHARE = {'pre_primary': 0.97, 'primary': 0.86, 'secondary': 0.66, 'post_secondary': 0.55}
+
+# Private share of enrolment, and the church-run part of private schools
+PRIVATE_SHARES = {'early_childhood': 0.55, 'special_education': 0.3, 'primary': 0.12,
+                  'secondary': 0.08, 'post_secondary': 0.25}
+CHURCH_SHARES = {'daycare': 0.2, 'preschool': 0.35, 'primary': 0.7, 'secondary': 0.65,
+                 'special_ed': 0.4, 'tvet': 0.2}
+
+# Early childhood participation by age (5 = over_4)
+EARLY_CHILDHOOD_RATES = {0: 0.05, 1: 0.15, 2: 0.35, 3: 0.75, 4: 0.85, 5: 0.03}
+PRIMARY_GRADES = [('K', 5), ('G1', 6), ('G2', 7), ('G3', 8), ('G4', 9), ('G5', 10), ('G6', 11)]
+SECONDARY_FORMS = [('F1', 12), ('F2', 13), ('F3', 14), ('F4', 15), ('F5', 16)]
+# Share of a grade at (age - official age)
+AGE_SPREAD = {-1: 0.03, 0: 0.80, 1: 0.12, 2: 0.035, 3: 0.015}
+SECONDARY_RETENTION = 0.97
+# Post-secondary programme -> (share, mean age, sd)
+PROGRAMMES = {
+    'CAPE': (0.30, 17.5, 1.0),
+    'TVET': (0.30, 19.0, 2.5),
+    'Hospitality': (0.08, 20.0, 2.5),
+    'Other': (0.07, 21.0, 3.0),
+    'Tertiary': (0.25, 21.0, 2.5),
+}
+POST_SECONDARY_RATE = 0.09      # of the population aged 16-25
+SPECIAL_EDUCATION_RATE = 0.005  # of the population aged 5-22
+UNKNOWN_AGE_SHARE = 0.004
+FEMALE_TILT = {'early_childhood': 0.0, 'special_education': -0.12, 'primary': 0.0,
+               'secondary': 0.015, 'post_secondary': 0.1}
+
+# Staff profiles, in AGE_RANGES / SERVICE_RANGES / QUALIFICATION_CATEGORIES order
+AGE_PROFILES = {
+    'teacher': (0.005, 0.2, 0.3, 0.27, 0.18, 0.035, 0.01),
+    'principal_deputy': (0.0, 0.02, 0.18, 0.38, 0.35, 0.06, 0.01),
+}
+SERVICE_PROFILES = {
+    'teacher': (0.05, 0.22, 0.2, 0.16, 0.13, 0.1, 0.07, 0.04, 0.02, 0.01),
+    'principal_deputy': (0.0, 0.02, 0.06, 0.12, 0.2, 0.22, 0.2, 0.11, 0.06, 0.01),
+}
+QUALIFICATION_PROFILES = {
+    'pre_primary': (0.05, 0.02, 0.5, 0.4, 0.03),
+    'primary': (0.3, 0.05, 0.45, 0.17, 0.03),
+    'secondary': (0.45, 0.25, 0.15, 0.12, 0.03),
+    'post_secondary': (0.6, 0.25, 0.08, 0.05, 0.02),
+}
+LEADER_QUALIFICATIONS = (0.55, 0.05, 0.35, 0.03, 0.02)
+QUALIFICATION_FLAGS = {
+    'graduate_trained': (True, True), 'graduate_untrained': (True, False),
+    'non_graduate_trained': (False, True), 'non_graduate_untrained': (False, False),
+    'unknown': (None, None),
+}
+
+# Value lists for columns the schema files leave open: (table, column) first,
+# then column. A tuple of columns takes tuples of values (linked keys).
+DOMAINS = {
+    'gender': GENDERS,
+    'education_level': STAFF_LEVELS,
+    'role': ('principal', 'deputy_principal', 'teacher'),
+    ('professional_development', 'education_level'): ('primary', 'secondary'),
+    ('professional_development', 'role'): ('principal', 'teacher'),
+    ('leadership_degree_holders', 'role'): ('principal', 'deputy_principal'),
+    ('leadership_degree_holders', 'education_level'): ('primary', 'secondary'),
+    ('repeaters', ('education_level', 'grade_or_form')): (
+        [('primary', grade) for grade, _ in PRIMARY_GRADES]
+        + [('secondary', form) for form, _ in SECONDARY_FORMS]),
+    'reason': ('financial', 'pregnancy', 'migration', 'illness', 'employment', 'expulsion',
+               'lack_of_interest', 'other'),
+    ('performance_grade_level', 'subject'): ('English', 'Mathematics'),
+    ('performance_grade_level', 'grade_level'): ('Grade 2', 'Grade 4', 'Grade 6'),
+    ('performance_ccslc', 'subject'): ('English', 'Mathematics', 'Integrated Science',
+                                       'Social Studies', 'Spanish', 'French'),
+    'subject': ('English A', 'English B', 'Mathematics', 'Biology', 'Chemistry', 'Physics',
+                'Integrated Science', 'Human and Social Biology', 'Principles of Business',
+                'Principles of Accounts', 'Economics', 'Social Studies', 'Geography',
+                'Caribbean History', 'Spanish', 'French', 'Information Technology',
+                'Electronic Document Preparation and Management', 'Agricultural Science',
+                'Food and Nutrition', 'Technical Drawing', 'Visual Arts', 'Physical Education'),
+    ('performance_cape', 'subject'): ('Caribbean Studies', 'Communication Studies', 'Accounting',
+                                      'Biology', 'Chemistry', 'Physics', 'Pure Mathematics',
+                                      'Economics', 'Management of Business', 'Sociology',
+                                      'Literatures in English', 'Computer Science'),
+    'unit': ('Unit 1', 'Unit 2'),
+    'program_name': ('School Feeding', 'Textbook Programme', 'Transportation',
+                     'Uniform Assistance', 'Examination Fee Subsidy', 'Bursaries'),
+    'education_stage': ('pre_primary', 'primary', 'secondary', 'post_secondary',
+                        'tertiary', 'administration'),
+    'worksheet_name': ('Institutions', 'Staff Qualifications', 'Staff Demographics', 'Enrollment',
+                       'Internal Efficiency', 'Performance', 'Financial', 'Population'),
+}
+
+# Expected value per 100,000 population for generated count and money columns
+MAGNITUDES = {
+    'participants_count': 150,
+    'count': 40,
+    'count_at_or_above_level': 650,
+    'students_sitting': 260,
+    'number_participating': 900,
+    'recurrent_budget': 28_000_000,
+    'total_national_budget': 900_000_000,
+}
+# Table-specific expectations where the column name alone is ambiguous
+TABLE_MAGNITUDES = {
+    ('leadership_degree_holders', 'count'): 25,
+    ('teacher_academic_qualifications', 'count'): 70,
+    ('specialist_teachers', 'count'): 9,
+    ('dropout_reasons_secondary', 'count'): 12,
+    ('performance_ccslc', 'students_sitting'): 160,
+    ('performance_cape', 'students_sitting'): 35,
+    ('performance_csec_five_plus', 'students_sitting'): 1100,
+}
+# Column -> (base column, low share, high share): generated as a share of the base
+DERIVED = {
+    'students_achieving_i_iii': ('students_sitting', 0.45, 0.8),
+    'students_achieving_i_v': ('students_sitting', 0.8, 0.95),
+    'students_achieving_merit': ('students_sitting', 0.15, 0.3),
+    'students_achieving_competent': ('students_sitting', 0.4, 0.55),
+    'students_sitting_five_plus': ('students_sitting', 0.6, 0.75),
+    'students_achieving_five_plus_excluding_eng_math': ('students_sitting', 0.35, 0.5),
+    'students_achieving_five_plus_including_eng_math': ('students_sitting', 0.2, 0.35),
+    'total_amount_spent': ('number_participating', 150, 600),
+    'capital_budget': ('recurrent_budget', 0.05, 0.2),
+    'total_education_budget_recurrent': ('total_national_budget', 0.1, 0.16),
+    'total_education_budget_capital': ('total_national_budget', 0.01, 0.04),
+    'total_government_expenditure': ('total_national_budget', 0.9, 1.05),
+}
+# Columns filled with a fixed value, or drawn from a list
+FILL_VALUES = {
+    'currency': 'XCD',
+    'data_type': 'estimate',
+    'target_population': ('primary students', 'secondary students', 'all students',
+                          'low-income households'),
+}
+
+EXAMINATIONS = {
+    'CSEC': DOMAINS['subject'],
+    'CAPE': DOMAINS[('performance_cape', 'subject')],
+    'CCSLC': DOMAINS[('performance_ccslc', 'subject')],
+}
+
+CHECK_IN = re.compile(r'CHECK\s*\(\s*(\w+)\s+IN\s*\((.*?)\)\s*\)', re.S | re.I)
+COMMENT_VALUES = re.compile(r"^\s*(\w+)\s[^\n]*?--\s*('.*)$", re.M)
+REFERENCES = re.compile(r'^\s*(\w+)\s[^\n]*\bREFERENCES\s+(?:\w+\.)?(\w+)', re.M | re.I)
+QUOTED = re.compile(r"'([^']*)'|\bNULL\b", re.I)
+UNIQUE_START = re.compile(r'\bUNIQUE\s*\(', re.I)
+NUMERIC_TYPES = ('INTEGER', 'DECIMAL', 'NUMERIC', 'BIGINT', 'SMALLINT')
+
+
+@dataclass
+class TableSpec:
+    """One CREATE TABLE statement: columns, foreign keys, unique key and value lists"""
+
+    schema: str
+    name: str
+    columns: list
+    references: dict = field(default_factory=dict)
+    unique: tuple = ()
+    domains: dict = field(default_factory=dict)
+
+    @property
+    def column_names(self) -> list:
+        return [column.name for column in self.columns]
+
+    @property
+    def output_columns(self) -> list:
+        """Columns written to the CSV: the id only where other tables reference it"""
+        names = [name for name in self.column_names if name not in SYSTEM_COLUMNS]
+        if self.name not in REFERENCE_TABLES[self.schema]:
+            names = [name for name in names if name != 'id']
+        return names
+
+
+@dataclass
+class SyntheticCountry:
+    id: int
+    code: str
+    abbr: str
+    name: str
+    population: int
+    profile: dict
+
+
+@dataclass
+class CountryYear:
+    """Model of one country in one academic year; the shapers read from it"""
+
+    country: SyntheticCountry
+    year: dict
+    population: dict        # age -> (male, female)
+    enrollment: dict        # (level, ownership, age_group, category, gender) -> count
+    institutions: dict      # institutions column -> count
+    teachers: dict          # (staff level, ownership) -> count
+    schools: dict           # (staff level, ownership) -> institutions
+
+
+def strip_comments(body: str) -> str:
+    return re.sub(r'--[^\n]*', '', body)
+
+
+def unique_columns(body: str) -> tuple:
+    """Columns of the table's UNIQUE constraint (COALESCE(x, ...) counts as x)"""
+    text = strip_comments(body)
+    match = UNIQUE_START.search(text)
+    if not match:
+        return ()
+    depth = 1
+    position = match.end()
+    while depth and position < len(text):
+        depth += {'(': 1, ')': -1}.get(text[position], 0)
+        position += 1
+    inner = text[match.end():position - 1]
+    columns = []
+    for part in re.split(r',(?![^()]*\))', inner):
+        names = re.findall(r'\b(?!COALESCE\b)([a-z_]\w*)\b', part)
+        if names:
+            columns.append(names[0])
+    return tuple(columns)
+
+
+def value_list(text: str) -> tuple:
+    return tuple(match.group(1) if match.group(1) is not None else None
+                 for match in QUOTED.finditer(text))
+
+
+def parse_table(schema: str, name: str, body: str) -> TableSpec:
+    domains = {column: value_list(values) for column, values in COMMENT_VALUES.findall(body)}
+    domains.update((column, value_list(values))
+                   for column, values in CHECK_IN.findall(strip_comments(body)))
+    return TableSpec(
+        schema=schema,
+        name=name,
+        columns=parse_columns(body),
+        references=dict(REFERENCES.findall(body)),
+        unique=unique_columns(body),
+        domains=domains,
+    )
+
+
+def schema_specs(schema: str, schema_dir: Path = SCHEMA_DIR) -> dict:
+    """{table: TableSpec} for every CREATE TABLE in the schema's files"""
+    specs = {}
+    for filename in SCHEMAS[schema]:
+        path = Path(schema_dir) / filename
+        if not path.exists():
+            continue
+        for match in CREATE_TABLE.finditer(path.read_text(encoding='utf-8')):
+            if match.group(1) not in specs:
+                specs[match.group(1)] = parse_table(schema, match.group(1), match.group(2))
+    return specs
+
+
+def draw(rng: random.Random, expected: float, spread: float = 0.05) -> int:
+    """Non-negative integer near `expected`: lognormal noise, then stochastic rounding"""
+    if expected <= 0:
+        return 0
+    value = expected * rng.lognormvariate(0, spread)
+    whole = int(value)
+    return whole + (rng.random() < value - whole)
+
+
+def split(total: int, weights, rng: random.Random) -> list:
+    """Split an integer total into parts proportional to (noisy) weights, exactly"""
+    noisy = [weight * rng.lognormvariate(0, 0.15) if weight > 0 else 0.0 for weight in weights]
+    scale = sum(noisy)
+    if not total or not scale:
+        return [0] * len(noisy)
+    shares = [total * weight / scale for weight in noisy]
+    parts = [int(share) for share in shares]
+    remainders = sorted(range(len(shares)), key=lambda index: parts[index] - shares[index])
+    for index in remainders[:total - sum(parts)]:
+        parts[index] += 1
+    return parts
+
+
+def base36(number: int) -> str:
+    digits = '0123456789ABCDEFGHIJKLMNOPQRSTUVWXYZ'
+    text = ''
+    while number:
+        number, remainder = divmod(number, 36)
+        text = digits[remainder] + text
+    return text.rjust(2, '0')
+
+
+def age_bands(labels) -> list:
+    """[(label, low, high)] for an age group list such as ENROLLMENT_GRID's"""
+    bands = []
+    for label in labels:
+        if label == 'unknown':
+            continue
+        kind, _, number = label.partition('_')
+        if kind == 'under':
+            bands.append((label, -1, int(number) - 1))
+        elif kind == 'over':
+            bands.append((label, int(number) + 1, 999))
+        elif number:
+            bands.append((label, int(kind), int(number)))
+        else:
+            bands.append((label, int(label), int(label)))
+    return bands
+
+
+def age_label(bands, age: int) -> str:
+    for label, low, high in bands:
+        if low <= age <= high:
+            return label
+    return bands[0][0] if age < bands[0][1] else bands[-1][0]
+
+
+def institution_type(level: str, age_group: str, category: str) -> str:
+    """Institutions column prefix an enrolment cell belongs to"""
+    if level == 'early_childhood':
+        return 'daycare' if age_group in ('under_1', '1', '2') else 'preschool'
+    if level == 'special_education':
+        return 'special_ed'
+    if level == 'post_secondary':
+        return 'tvet' if category == 'TVET' else 'post_secondary'
+    return level
+
+
+def enrollment_pools(enrollment: dict) -> dict:
+    """{(institution type, 'public'|'private', gender): students}
+
+    Post-secondary enrolment is national (no ownership); PRIVATE_SHARES
+    splits it between public and private institutions.
+    """
+    pools = {}
+    for (level, ownership, age_group, category, gender), count in enrollment.items():
+        prefix = institution_type(level, age_group, category)
+        if ownership is None:
+            private = PRIVATE_SHARES['post_secondary']
+            parts = (('public', count * (1 - private)), ('private', count * private))
+        else:
+            parts = ((ownership, count),)
+        for owner, students in parts:
+            pools[prefix, owner, gender] = pools.get((prefix, owner, gender), 0) + students
+    return pools
+
+
+def split_column(column: str) -> tuple:
+    """'primary_private_church' -> ('primary', 'private_church')"""
+    for ownership in ('private_church', 'private_non_affiliated', 'public', 'private'):
+        if column.endswith('_' + ownership):
+            return column[:-len(ownership) - 1], ownership
+    raise ValueError(f"Not an institutions count column: {column}")
+
+
+def normal_density(x: float, mean: float, sd: float) -> float:
+    return math.exp(-0.5 * ((x - mean) / sd) ** 2) / (sd * math.sqrt(2 * math.pi))
+
+
+def user_uuid(email: str) -> str:
+    """auth.users id of a generated user: md5(email) as a UUID, as local_postgres loads them"""
+    return str(uuid.UUID(hashlib.md5(email.encode()).hexdigest()))
+
+
+class SyntheticDigest:
+    """Seeded generator of every schema table for `countries` × `years`"""
+
+    def __init__(self, countries: int = 9, years: int = 3, seed: int = 42,
+                 last_year: int = LAST_START_YEAR, granularity: str = 'country',
+                 schema_dir: Path = SCHEMA_DIR):
+        self.seed = seed
+        self.granularity = granularity
+        self.schema_dir = schema_dir
+        self.countries = [self.make_country(index) for index in range(countries)]
+        first_year = last_year - years + 1
+        self.years = [
+            {'id': index + 1, 'year_label': f"{start}-{start + 1}", 'start_year': start,
+             'end_year': start + 1, 'is_active': start == last_year}
+            for index, start in enumerate(range(first_year, last_year + 1))
+        ]
+
+    def rng(self, *parts) -> random.Random:
+        """Independent generator for one (table, country, year, ...) combination"""
+        return random.Random(':'.join(str(part) for part in (self.seed,) + parts))
+
+    def make_country(self, index: int) -> SyntheticCountry:
+        members = list(OECS_MEMBERS)
+        if index < len(DIGEST_COUNTRIES):
+            abbr, code = DIGEST_COUNTRIES[index]
+            name, population = OECS_MEMBERS[code]
+        else:
+            code = abbr = f"Z{base36(index - len(members) + 1)}"
+            if len(code) > 3:
+                raise ValueError('At most 1,304 countries fit in a 3-letter country code')
+            name = f"Synthetic Country {index - len(members) + 1}"
+            population = None
+
+        rng = self.rng('country', code)
+        if population is None:
+            population = int(min(max(rng.lognormvariate(math.log(50_000), 1.0), 2_000), 2_000_000))
+        profile = {
+            'growth': rng.gauss(0.004, 0.008),
+            'decline': rng.uniform(0.008, 0.018),
+            'participation': {level: min(rng.lognormvariate(0, 0.08), 1.15)
+                              for level, *_ in ENROLLMENT_GRID},
+            'private': {level: min(share * rng.lognormvariate(0, 0.3), 0.9)
+                        for level, share in PRIVATE_SHARES.items()},
+            'ptr': {level: ratio * rng.lognormvariate(0, 0.15)
+                    for level, ratio in PUPIL_TEACHER_RATIOS.items()},
+            'school_size': {prefix: size * rng.lognormvariate(0, 0.25)
+                            for prefix, size in SCHOOL_SIZES.items()},
+            'church': {prefix: min(share * rng.lognormvariate(0, 0.2), 0.95)
+                       for prefix, share in CHURCH_SHARES.items()},
+        }
+        return SyntheticCountry(index + 1, code, abbr, name, population, profile)
+
+    def scale(self, country: SyntheticCountry, year: dict) -> float:
+        """Population of the country in `year`, in units of 100,000"""
+        years = year['start_year'] - BASE_YEAR
+        return country.population * (1 + country.profile['growth']) ** years / 100_000
+
+    # ---- the country-year model ------------------------------------------------
+
+    def model(self, country: SyntheticCountry, year: dict) -> CountryYear:
+        rng = self.rng('model', country.code, year['start_year'])
+        population = self.population(country, year, rng)
+        enrollment = self.enrollment(country, population, rng)
+        pools = enrollment_pools(enrollment)
+        institutions, schools = self.institutions(country, pools, rng)
+        teachers = {}
+        for level, prefixes in STAFF_SCHOOLS.items():
+            for ownership in OWNERSHIPS:
+                students = sum(count for (prefix, owner, _), count in pools.items()
+                               if prefix in prefixes and owner == ownership)
+                teachers[level, ownership] = draw(rng, students / country.profile['ptr'][level])
+        return CountryYear(country, year, population, enrollment, institutions, teachers, schools)
+
+    def population(self, country, year, rng) -> dict:
+        decline = country.profile['decline']
+        weights = [math.exp(-age * decline) / (1 + math.exp((age - 76) / 5.5)) for age in range(101)]
+        total = self.scale(country, year) * 100_000
+        result = {}
+        for age, weight in enumerate(weights):
+            people = total * weight / sum(weights) * rng.lognormvariate(0, 0.03)
+            male_share = max(0.512 - 0.0012 * max(0, age - 40), 0.38)
+            result[age] = (draw(rng, people * male_share, 0), draw(rng, people * (1 - male_share), 0))
+        return result
+
+    def enrollment(self, country, population, rng) -> dict:
+        """Student enrolment on the ENROLLMENT_GRID, from the population's cohorts"""
+        profile = country.profile
+        expected = {}
+
+        def cohort(age):
+            return sum(population.get(age, (0, 0)))
+
+        def female_share(level, age):
+            male, female = population.get(min(max(age, 0), 100), (1, 1))
+            return min(max(female / max(male + female, 1) + FEMALE_TILT[level], 0.05), 0.95)
+
+        def add(level, age, category, students):
+            students *= profile['participation'][level]
+            if level == 'post_secondary':
+                ownerships = [(None, 1.0)]
+            else:
+                private = profile['private'][level]
+                ownerships = [('public', 1 - private), ('private', private)]
+            label = age_label(bands[level], age)
+            female = female_share(level, age)
+            for ownership, share in ownerships:
+                for gender, gender_share in (('male', 1 - female), ('female', female)):
+                    key = (level, ownership, label, category, gender)
+                    expected[key] = expected.get(key, 0) + students * share * gender_share
+
+        bands = {level: age_bands(ages) for level, _, ages, _ in ENROLLMENT_GRID}
+        for age, rate in EARLY_CHILDHOOD_RATES.items():
+            add('early_childhood', age, None, cohort(age) * rate)
+        for age in range(5, 23):
+            add('special_education', age, None, cohort(age) * SPECIAL_EDUCATION_RATE)
+        for category, official_age in PRIMARY_GRADES:
+            for offset, share in AGE_SPREAD.items():
+                boys_extra = 1 + 0.3 * max(offset, 0)
+                add('primary', official_age + offset, category,
+                    cohort(official_age) * 0.97 * share * boys_extra)
+        for index, (category, official_age) in enumerate(SECONDARY_FORMS):
+            for offset, share in AGE_SPREAD.items():
+                add('secondary', official_age + offset, category,
+                    cohort(official_age) * 0.92 * SECONDARY_RETENTION ** index * share)
+        students = POST_SECONDARY_RATE * sum(cohort(age) for age in range(16, 26))
+        for category, (share, mean_age, sd) in PROGRAMMES.items():
+            for age in range(14, 36):
+                add('post_secondary', age, category,
+                    students * share * normal_density(age, mean_age, sd))
+
+        counts = {}
+        for level, ownerships, ages, categories in ENROLLMENT_GRID:
+            for ownership in ownerships:
+                for category in categories:
+                    for gender in GENDERS:
+                        known = 0
+                        for age in ages:
+                            if age == 'unknown':
+                                continue
+                            count = draw(rng, expected.get((level, ownership, age, category, gender), 0))
+                            counts[level, ownership, age, category, gender] = count
+                            known += count
+                        if 'unknown' in ages:
+                            counts[level, ownership, 'unknown', category, gender] = \
+                                draw(rng, known * UNKNOWN_AGE_SHARE, 0.5)
+        return counts
+
+    def institutions(self, country, pools, rng):
+        """Institutions columns and schools per staff level, from enrolment pools"""
+        profile = country.profile
+        students_by_type = {}
+        for (prefix, ownership, _), students in pools.items():
+            students_by_type[prefix, ownership] = students_by_type.get((prefix, ownership), 0) + students
+
+        columns = {}
+        for (prefix, ownership), students in sorted(students_by_type.items()):
+            count = math.ceil(draw(rng, students / profile['school_size'][prefix], 0.1)) if students else 0
+            if ownership == 'public' and students:
+                count = max(count, 1)
+            if ownership == 'public' or prefix == 'post_secondary':
+                columns[f'{prefix}_{ownership}'] = count
+            else:
+                church = split(count, (profile['church'][prefix], 1 - profile['church'][prefix]), rng)
+                columns[f'{prefix}_private_church'], columns[f'{prefix}_private_non_affiliated'] = church
+
+        schools = {}
+        for level, prefixes in STAFF_SCHOOLS.items():
+            for ownership in OWNERSHIPS:
+                schools[level, ownership] = sum(
+                    count for column, count in columns.items()
+                    if column.startswith(prefixes) and column.endswith('_public') == (ownership == 'public'))
+        return columns, schools
+
+    # ---- rows --------------------------------------------------------------------
+
+    def table_rows(self, spec: TableSpec, models=None):
+        """Rows (dicts) of one table; `models` reuses already built CountryYear models"""
+        if spec.name in REFERENCE_TABLES[spec.schema]:
+            yield from REFERENCE_TABLES[spec.schema][spec.name](self, spec)
+            return
+        shaper = SHAPERS.get((spec.schema, spec.name))
+        for model in models or (self.model(country, year)
+                                for country in self.countries for year in self.years):
+            scope = self.scope(spec, model)
+            rows = shaper(self, spec, model) if shaper else self.generic_rows(spec, model)
+            for row in rows:
+                row.update(scope)
+                yield row
+
+    def scope(self, spec: TableSpec, model: CountryYear) -> dict:
+        year = model.year
+        values = {'country_id': model.country.id, 'academic_year_id': year['id'],
+                  'academic_year': year['year_label'], 'fiscal_year': year['year_label'],
+                  'year': year['start_year']}
+        return {column: values[column] for column in ('country_id',) + YEAR_COLUMNS
+                if column in spec.column_names}
+
+    def domain(self, spec: TableSpec, column):
+        for key in ((spec.name, column), column):
+            if key in DOMAINS:
+                return DOMAINS[key]
+        if column in spec.domains:
+            return spec.domains[column]
+        raise ValueError(f"No value list for {spec.name}.{column}; add one to DOMAINS")
+
+    def key_grid(self, spec: TableSpec) -> tuple:
+        """(key columns, [value tuples]) covering the table's unique key"""
+        keys = [column for column in spec.unique
+                if column != 'country_id' and column not in YEAR_COLUMNS]
+        linked = [key for key in DOMAINS if isinstance(key, tuple) and key[0] == spec.name
+                  and isinstance(key[1], tuple) and set(key[1]) <= set(keys)]
+        columns, domains = [], []
+        for _, group in linked:
+            columns.extend(group)
+            domains.append(DOMAINS[spec.name, group])
+        for column in keys:
+            if column not in columns:
+                columns.append(column)
+                domains.append([(value,) for value in self.domain(spec, column)])
+        return columns, [sum(values, ()) for values in itertools.product(*domains)]
+
+    def generic_rows(self, spec: TableSpec, model: CountryYear):
+        """Rows for tables without a shaper: the key grid × population-scaled values
+
+        Each cell keeps its level from year to year (drawn per country) and
+        moves with the population plus a little yearly noise.
+        """
+        levels = self.rng(spec.schema, spec.name, model.country.code)
+        rng = self.rng(spec.schema, spec.name, model.country.code, model.year['start_year'])
+        scale = self.scale(model.country, model.year)
+        columns, grid = self.key_grid(spec)
+        measures = [column for column in spec.columns
+                    if column.sql_type.startswith(NUMERIC_TYPES) and column.name not in columns
+                    and column.name != 'id' and column.name not in spec.references
+                    and column.name not in YEAR_COLUMNS]
+        fills = [name for name in spec.column_names if name in FILL_VALUES and name not in columns]
+        for values in grid:
+            row = dict(zip(columns, values))
+            for column in measures:
+                money = not column.sql_type.startswith('INTEGER')
+                if column.name in DERIVED:
+                    base, low, high = DERIVED[column.name]
+                    value = (row.get(base) or 0) * levels.uniform(low, high) * rng.lognormvariate(0, 0.03)
+                else:
+                    magnitude = TABLE_MAGNITUDES.get((spec.name, column.name),
+                                                     MAGNITUDES.get(column.name, 50))
+                    value = magnitude * scale * levels.lognormvariate(0, 0.35) * rng.lognormvariate(0, 0.05)
+                row[column.name] = round(value, 2) if money else draw(rng, value, 0)
+            for column in fills:
+                fill = FILL_VALUES[column]
+                row[column] = rng.choice(fill) if isinstance(fill, tuple) else fill
+            yield row
+
+    # ---- output ------------------------------------------------------------------
+
+    def specs(self, schemas, tables=None) -> list:
+        specs = []
+        for schema in schemas:
+            for name, spec in schema_specs(schema, self.schema_dir).items():
+                if (schema, name) not in DERIVED_TABLES and (not tables or name in tables):
+                    specs.append(spec)
+        if self.granularity == 'school' and 'supabase' in schemas \
+                and (not tables or SCHOOL_TABLE.name in tables):
+            specs.append(SCHOOL_TABLE)
+        return specs
+
+    def write_csv(self, output_dir: Path, schemas, tables=None) -> dict:
+        """Write one CSV per table; returns {(schema, table): (rows, bytes, seconds)}"""
+        specs = self.specs(schemas, tables)
+        stats = {}
+        writers = {}
+        files = []
+        try:
+            for spec in specs:
+                path = Path(output_dir) / spec.schema / f"{spec.name}.csv"
+                path.parent.mkdir(parents=True, exist_ok=True)
+                handle = open(path, 'w', encoding='utf-8', newline='')
+                files.append((spec, path, handle))
+                writer = csv.writer(handle)
+                writer.writerow(spec.output_columns)
+                writers[spec.schema, spec.name] = (spec, writer)
+                stats[spec.schema, spec.name] = [0, 0, 0.0]
+
+            def write(spec, rows):
+                _, writer = writers[spec.schema, spec.name]
+                entry = stats[spec.schema, spec.name]
+                start = time.perf_counter()
+                columns = spec.output_columns
+                for row in rows:
+                    writer.writerow([row.get(column) for column in columns])
+                    entry[0] += 1
+                entry[2] += time.perf_counter() - start
+
+            data_specs = [spec for spec, _ in writers.values() if spec.name not in REFERENCE_TABLES[spec.schema]]
+            for spec, _ in writers.values():
+                if spec.name in REFERENCE_TABLES[spec.schema]:
+                    write(spec, self.table_rows(spec))
+            # Country-year outer loop: one model at a time, shared by every table
+            for country in self.countries:
+                for year in self.years:
+                    model = self.model(country, year)
+                    for spec in data_specs:
+                        write(spec, self.table_rows(spec, [model]))
+        finally:
+            for spec, path, handle in files:
+                handle.close()
+                if (spec.schema, spec.name) in stats:
+                    stats[spec.schema, spec.name][1] = path.stat().st_size
+        return {key: tuple(value) for key, value in stats.items()}
+
+    def write_workbooks(self, output_dir: Path) -> list:
+        """Chapter 1 and Chapter 3 workbooks per year, as export_digest_workbooks writes them"""
+        specs = schema_specs('supabase', self.schema_dir)
+        countries = [(country.abbr, country.code) for country in self.countries]
+        country_codes = {country.id: country.abbr for country in self.countries}
+        builders = {'Chapter 1': 'institutions', 'Chp3': 'student_enrollment'}
+        written = []
+        for year in self.years:
+            models = [self.model(country, year) for country in self.countries]
+            for chapter, _ in CHAPTERS:
+                rows = list(self.table_rows(specs[builders[chapter]], models))
+                wb = openpyxl.Workbook(write_only=True)
+                if chapter == 'Chapter 1':
+                    write_chapter1(wb, rows_by_country(rows, country_codes), countries)
+                else:
+                    early = [row for row in rows if row['education_level'] == 'early_childhood']
+                    write_chapter3(wb, early_childhood_grids(early, country_codes), countries)
+                path = Path(output_dir) / chapter / f"{short_year_label(year['year_label'])}.xlsx"
+                path.parent.mkdir(parents=True, exist_ok=True)
+                wb.save(path)
+                written.append(path)
+        return written
+
+
+# ---- reference tables ---------------------------------------------------------------
+
+def country_rows(synth, spec):
+    for country in synth.countries:
+        yield {'id': country.id, 'country_code': country.code, 'country_name': country.name,
+               'region': 'OECS' if country.code in OECS_MEMBERS else 'SYNTHETIC', 'is_active': True}
+
+
+def academic_year_rows(synth, spec):
+    for year in synth.years:
+        yield dict(year, is_current=year['is_active'])
+
+
+def users(synth) -> list:
+    """(id, email, full_name, role, country): a statistician per country (id = country id),
+    then an admin and a viewer"""
+    people = [(f"statistician.{country.code.lower()}@sandbox.test",
+               f"{country.name} Statistician", 'statistician', country) for country in synth.countries]
+    people += [('admin@sandbox.test', 'Digest Administrator', 'admin', None),
+               ('viewer@sandbox.test', 'Digest Viewer', 'viewer', None)]
+    return [(index + 1, email, name, role, country) for index, (email, name, role, country) in enumerate(people)]
+
+
+def user_profile_rows(synth, spec):
+    for _, email, name, role, country in users(synth):
+        yield {'id': user_uuid(email), 'email': email, 'full_name': name,
+               'country_id': country.id if country else None, 'role': role, 'is_active': True}
+
+
+def legacy_user_rows(synth, spec):
+    for user_id, email, name, role, country in users(synth):
+        yield {'id': user_id, 'email': email, 'password_hash': 'synthetic', 'full_name': name,
+               'country_id': country.id if country else None, 'role': role, 'is_active': True}
+
+
+def subject_rows(synth, spec):
+    subjects = [(examination, subject) for examination, names in EXAMINATIONS.items() for subject in names]
+    for index, (examination, subject) in enumerate(subjects):
+        code = examination + '-' + ''.join(word[0] for word in subject.split()).upper()
+        yield {'id': index + 1, 'subject_code': f"{code}{index + 1}", 'subject_name': subject,
+               'examination_type': examination, 'is_active': True}
+
+
+def legacy_submissions(synth, country, year):
+    """(id, worksheet, status) of a country-year's data_submissions rows, ids in CSV order"""
+    worksheets = DOMAINS['worksheet_name']
+    first = ((country.id - 1) * len(synth.years) + year['id'] - 1) * len(worksheets)
+    for offset, worksheet in enumerate(worksheets):
+        status = 'approved' if not year['is_active'] else \
+            synth.rng('status', country.code, worksheet).choice(('in_progress', 'submitted', 'approved'))
+        yield first + offset + 1, worksheet, status
+
+
+def submitted_at(synth, country, year, label) -> str:
+    rng = synth.rng('submitted', country.code, year['start_year'], label)
+    return f"{year['end_year']}-{rng.randint(1, 6):02d}-{rng.randint(1, 28):02d}T{rng.randint(8, 17):02d}:00:00+00"
+
+
+REFERENCE_TABLES = {
+    'supabase': {
+        'countries': country_rows,
+        'academic_years': academic_year_rows,
+        'user_profiles': user_profile_rows,
+    },
+    'legacy': {
+        'countries': country_rows,
+        'academic_years': academic_year_rows,
+        'users': legacy_user_rows,
+        'subjects': subject_rows,
+    },
+}
+
+
+# ---- shaped tables: read from the country-year model ----------------------------------
+
+SHAPERS = {}
+
+
+def shaper(*keys):
+    """Register a row function for (schema, table) keys"""
+    def register(function):
+        for key in keys:
+            SHAPERS[key] = function
+        return function
+    return register
+
+
+@shaper(('legacy', 'audit_log'))
+def audit_log_rows(synth, spec, model):
+    """One status change per submitted worksheet (the table has no country or year column)"""
+    country, year = model.country, model.year
+    for index, worksheet, status in legacy_submissions(synth, country, year):
+        if status == 'in_progress':
+            continue
+        yield {'table_name': 'data_submissions', 'record_id': index, 'action': 'UPDATE',
+               'old_values': json.dumps({'status': 'in_progress'}), 'new_values': json.dumps({'status': status}),
+               'changed_by': country.id, 'changed_at': submitted_at(synth, country, year, worksheet),
+               'ip_address': f"10.{country.id % 250}.{year['id'] % 250}.{index % 250}",
+               'user_agent': 'synthetic-data-generator'}
+
+
+@shaper(('supabase', 'data_submissions'))
+def supabase_submission_rows(synth, spec, model):
+    country, year = model.country, model.year
+    statistician = user_uuid(f"statistician.{country.code.lower()}@sandbox.test")
+    status = 'approved' if not year['is_active'] else \
+        synth.rng('status', country.code).choice(('draft', 'submitted', 'approved'))
+    row = {'status': status, 'submitted_by': statistician}
+    if status != 'draft':
+        row['submitted_at'] = submitted_at(synth, country, year, 'submission')
+    if status == 'approved':
+        row['approved_at'] = row['submitted_at']
+        row['approved_by'] = user_uuid('admin@sandbox.test')
+    yield row
+
+
+@shaper(('legacy', 'data_submissions'))
+def legacy_submission_rows(synth, spec, model):
+    country, year = model.country, model.year
+    for _, worksheet, status in legacy_submissions(synth, country, year):
+        row = {'worksheet_name': worksheet, 'status': status}
+        if status != 'in_progress':
+            row['submitted_by'] = country.id
+            row['submitted_at'] = submitted_at(synth, country, year, worksheet)
+        if status == 'approved':
+            row['reviewed_by'] = len(synth.countries) + 1     # the admin
+            row['reviewed_at'] = row['submitted_at']
+        yield row
+
+
+@shaper(('supabase', 'population_data'))
+def population_rows(synth, spec, model):
+    for age, (male, female) in model.population.items():
+        yield {'age': age, 'male': male, 'female': female}
+
+
+@shaper(('legacy', 'population_data'))
+def legacy_population_rows(synth, spec, model):
+    # Ages 0-88 single years, 89 holds 89 and over
+    top = 89
+    for age in range(top + 1):
+        ages = range(age, 101) if age == top else (age,)
+        for index, gender in enumerate(GENDERS):
+            yield {'age': age, 'gender': gender, 'data_type': 'estimate',
+                   'population_count': sum(model.population[a][index] for a in ages)}
+
+
+@shaper(('supabase', 'student_enrollment'))
+def student_enrollment_rows(synth, spec, model):
+    for (level, ownership, age_group, category, gender), count in model.enrollment.items():
+        yield {'education_level': level, 'ownership_type': ownership, 'age_group': age_group,
+               'category': category, 'gender': gender, 'count': count}
+
+
+def enrollment_cells(model, level):
+    """{(ownership, age_group): {(category, gender): count}} for one level"""
+    cells = {}
+    for (cell_level, ownership, age_group, category, gender), count in model.enrollment.items():
+        if cell_level == level:
+            cells.setdefault((ownership, age_group), {})[category, gender] = count
+    return cells
+
+
+@shaper(('supabase', 'early_childhood_enrollment'), ('supabase', 'special_education_enrollment'))
+def wide_age_rows(synth, spec, model):
+    level = 'early_childhood' if spec.name.startswith('early') else 'special_education'
+    institution_types = {'public': 'Public', 'private': 'Private/Gov Assisted'}
+    for (ownership, age_group), counts in enrollment_cells(model, level).items():
+        yield {'institution_type': institution_types[ownership], 'age_group': age_group,
+               'male': counts.get((None, 'male'), 0), 'female': counts.get((None, 'female'), 0)}
+
+
+@shaper(('supabase', 'primary_enrollment'), ('supabase', 'secondary_enrollment'))
+def wide_grade_rows(synth, spec, model):
+    primary = spec.name.startswith('primary')
+    level = 'primary' if primary else 'secondary'
+    cells = enrollment_cells(model, level)
+    if not primary:
+        # Form 6 is the school-based part of CAPE, counted in public schools
+        for (_, age_group), counts in enrollment_cells(model, 'post_secondary').items():
+            if age_group in ('under_16', '16', '17', '18'):
+                target = cells.setdefault(('public', '16' if age_group == 'under_16' else age_group), {})
+                for gender in GENDERS:
+                    target['F6', gender] = target.get(('F6', gender), 0) + counts.get(('CAPE', gender), 0)
+    for (ownership, age_group), counts in cells.items():
+        row = {column.name: 0 for column in spec.columns if column.default == 0}
+        row.update(school_type=ownership.title(), age_group=age_group)
+        for gender in GENDERS:
+            subtotal = 0
+            for (category, cell_gender), count in counts.items():
+                if cell_gender == gender:
+                    row[f"{category.lower()}_{gender}"] = count
+                    subtotal += count
+            row[f"subtotal_{gender}"] = subtotal
+        yield row
+
+
+LEGACY_ENROLLMENT = {
+    'enrollment_early_childhood': ('early_childhood', None),
+    'enrollment_special_schools': ('special_education', None),
+    'enrollment_primary': ('primary', 'grade_level'),
+    'enrollment_secondary': ('secondary', 'form_level'),
+    'enrollment_tertiary': ('post_secondary', 'program_type'),
+}
+
+
+@shaper(*(('legacy', table) for table in LEGACY_ENROLLMENT))
+def legacy_enrollment_rows(synth, spec, model):
+    level, category_column = LEGACY_ENROLLMENT[spec.name]
+    bands = {label: (low, high) for label, low, high in
+             age_bands(next(ages for name, _, ages, _ in ENROLLMENT_GRID if name == level))}
+    merged = {}
+    for (cell_level, ownership, age_group, category, gender), count in model.enrollment.items():
+        if cell_level != level:
+            continue
+        if age_group == 'unknown':
+            age = None
+        else:
+            low, high = bands[age_group]
+            age = max(low, 0) if high - low > 10 else (low + high) // 2 if low >= 0 else high
+        key = (ownership, category, age, gender)
+        merged[key] = merged.get(key, 0) + count
+    for (ownership, category, age, gender), count in merged.items():
+        row = {'age_years': age, 'gender': gender, 'count': count}
+        if 'ownership_type' in spec.column_names:
+            row['ownership_type'] = ownership
+        if category_column:
+            row[category_column] = category
+        yield row
+
+
+@shaper(('supabase', 'institutions'))
+def institution_rows(synth, spec, model):
+    yield dict(model.institutions)
+
+
+@shaper(('legacy', 'institutions'))
+def legacy_institution_rows(synth, spec, model):
+    levels = {'special_ed': 'special_education'}
+    for column, count in model.institutions.items():
+        prefix, ownership = split_column(column)
+        yield {'institution_level': levels.get(prefix, prefix), 'ownership_type': ownership, 'count': count}
+
+
+def leaders(model, level, ownership):
+    """(principals, deputies) for a staff level and ownership"""
+    schools = model.schools[level, ownership]
+    return schools, round(schools * DEPUTIES_PER_SCHOOL[level])
+
+
+def staff_by_gender(synth, model, level, ownership, role, total):
+    """Gender split of one role's staff, drawn once so every staff table agrees on it"""
+    rng = synth.rng('staff', model.country.code, model.year['start_year'], level, ownership, role)
+    female = FEMALE_STAFF_SHARE[level] - (0 if role == 'teacher' else 0.1)
+    females = sum(rng.random() < female for _ in range(total)) if total < 200 else draw(rng, total * female, 0.02)
+    return {'male': total - min(females, total), 'female': min(females, total)}
+
+
+@shaper(('supabase', 'staff_age_distribution'), ('supabase', 'staff_years_of_service'),
+        ('legacy', 'staff_demographics_age'), ('legacy', 'staff_demographics_service'))
+def staff_demographic_rows(synth, spec, model):
+    ages = 'age' in spec.name
+    bands, profiles = (AGE_RANGES, AGE_PROFILES) if ages else (SERVICE_RANGES, SERVICE_PROFILES)
+    band_column = ('age_range' if ages else
+                   next(name for name in spec.column_names if name in ('service_range', 'years_of_service_range')))
+    role_column = 'role' if 'role' in spec.column_names else 'staff_category'
+    rng = synth.rng(spec.schema, spec.name, model.country.code, model.year['start_year'])
+    for level in STAFF_LEVELS:
+        for ownership in OWNERSHIPS:
+            principals, deputies = leaders(model, level, ownership)
+            split_principals = staff_by_gender(synth, model, level, ownership, 'principal', principals)
+            split_deputies = staff_by_gender(synth, model, level, ownership, 'deputy_principal', deputies)
+            genders = {
+                'principal_deputy': {gender: split_principals[gender] + split_deputies[gender]
+                                     for gender in split_principals},
+                'teacher': staff_by_gender(synth, model, level, ownership, 'teacher',
+                                           model.teachers[level, ownership]),
+            }
+            for role in ('principal_deputy', 'teacher'):
+                for gender, staff in genders[role].items():
+                    for band, count in zip(bands, split(staff, profiles[role], rng)):
+                        yield {role_column: role, 'education_level': level, 'ownership_type': ownership,
+                               band_column: band, 'gender': gender, 'count': count}
+
+
+@shaper(('supabase', 'staff_qualifications'), ('legacy', 'staff_qualifications'))
+def staff_qualification_rows(synth, spec, model):
+    rng = synth.rng(spec.schema, spec.name, model.country.code, model.year['start_year'])
+    legacy = spec.schema == 'legacy'
+    for level in STAFF_LEVELS:
+        for ownership in OWNERSHIPS:
+            principals, deputies = leaders(model, level, ownership)
+            totals = {'principal': principals, 'deputy_principal': deputies,
+                      'teacher': model.teachers[level, ownership]}
+            for role in QUALIFICATION_ROLES:
+                profile = QUALIFICATION_PROFILES[level] if role == 'teacher' else LEADER_QUALIFICATIONS
+                for gender, staff in staff_by_gender(synth, model, level, ownership, role, totals[role]).items():
+                    for category, count in zip(QUALIFICATION_CATEGORIES, split(staff, profile, rng)):
+                        row = {'education_level': level, 'ownership_type': ownership, 'role': role,
+                               'gender': gender, 'count': count}
+                        if legacy:
+                            row['is_graduate'], row['is_trained'] = QUALIFICATION_FLAGS[category]
+                        else:
+                            row['qualification_category'] = category
+                        yield row
+
+
+@shaper(('legacy', 'repeaters'))
+def repeater_rows(synth, spec, model):
+    rng = synth.rng(spec.schema, spec.name, model.country.code, model.year['start_year'])
+    totals = {}
+    for (level, _, _, category, gender), count in model.enrollment.items():
+        if level in ('primary', 'secondary'):
+            totals[level, category, gender] = totals.get((level, category, gender), 0) + count
+    for (level, category, gender), students in totals.items():
+        rate = (0.02 if level == 'primary' else 0.045) * (1.4 if gender == 'male' else 1.0)
+        yield {'education_level': level, 'grade_or_form': category, 'gender': gender,
+               'count': draw(rng, students * rate, 0.25)}
+
+
+@shaper(('legacy', 'class_statistics'))
+def class_statistic_rows(synth, spec, model):
+    rng = synth.rng(spec.schema, spec.name, model.country.code, model.year['start_year'])
+    pools = enrollment_pools(model.enrollment)
+    for level in STAFF_LEVELS:
+        for ownership in OWNERSHIPS:
+            students = round(sum(count for (prefix, owner, _), count in pools.items()
+                                 if prefix in STAFF_SCHOOLS[level] and owner == ownership))
+            teachers = model.teachers[level, ownership]
+            yield {'education_level': level, 'ownership_type': ownership, 'total_students': students,
+                   'number_of_classes': draw(rng, students / 24, 0.1),
+                   'number_of_teachers': teachers,
+                   'number_of_specialist_teachers': draw(rng, teachers * 0.08, 0.2)}
+
+
+@shaper(('legacy', 'school_management'))
+def school_management_rows(synth, spec, model):
+    rng = synth.rng(spec.schema, spec.name, model.country.code, model.year['start_year'])
+    for level in STAFF_LEVELS:
+        schools = sum(model.schools[level, ownership] for ownership in OWNERSHIPS)
+        counselling = 0.9 if level == 'secondary' else 0.35
+        yield {'education_level': level,
+               'schools_managed_by_boards': sum(rng.random() < 0.3 for _ in range(schools)),
+               'schools_with_pta': sum(rng.random() < 0.8 for _ in range(schools)),
+               'schools_with_guidance_counselors': sum(rng.random() < counselling for _ in range(schools))}
+
+
+# Not a schema table: school-level rows for --granularity school
+SCHOOL_TABLE = TableSpec(
+    schema='supabase',
+    name='school_enrollment',
+    columns=[Column('school_id', 'VARCHAR', None), Column('country_id', 'INTEGER', None),
+             Column('academic_year_id', 'INTEGER', None), Column('institution_type', 'VARCHAR', None),
+             Column('ownership_type', 'VARCHAR', None), Column('male', 'INTEGER', 0),
+             Column('female', 'INTEGER', 0), Column('teachers', 'INTEGER', 0)],
+    references={'country_id': 'countries', 'academic_year_id': 'academic_years'},
+)
+
+
+@shaper(('supabase', 'school_enrollment'))
+def school_rows(synth, spec, model):
+    """One row per institution; counts add up to the country's enrolment pools"""
+    rng = synth.rng(spec.schema, spec.name, model.country.code, model.year['start_year'])
+    pools = enrollment_pools(model.enrollment)
+    staff_levels = {prefix: level for level, prefixes in STAFF_SCHOOLS.items() for prefix in prefixes}
+    for column, schools in model.institutions.items():
+        if not schools:
+            continue
+        prefix, ownership = split_column(column)
+        owner = 'public' if ownership == 'public' else 'private'
+        # Private enrolment is shared between church and non-affiliated schools by school count
+        same_owner = sum(count for name, count in model.institutions.items()
+                         if split_column(name)[0] == prefix and (split_column(name)[1] == 'public') == (owner == 'public'))
+        sizes = [rng.lognormvariate(0, 0.6) for _ in range(schools)]
+        by_gender = {gender: split(round(pools.get((prefix, owner, gender), 0) * schools / same_owner), sizes, rng)
+                     for gender in GENDERS}
+        ptr = model.country.profile['ptr'][staff_levels[prefix]]
+        for index in range(schools):
+            male, female = by_gender['male'][index], by_gender['female'][index]
+            yield {'school_id': f"{model.country.code}-{column}-{index + 1:04d}",
+                   'institution_type': prefix, 'ownership_type': ownership,
+                   'male': male, 'female': female, 'teachers': max(round((male + female) / ptr), 1)}
+
+
+def generate(output_dir: Path, countries: int, years: int, seed: int, schemas, tables=None,
+             granularity: str = 'country', last_year: int = LAST_START_YEAR, workbooks: bool = False):
+    print("\n" + "=" * 80)
+    print("🧪 GENERATING SYNTHETIC DIGEST DATA")
+    print("=" * 80)
+    print(f"\n   {countries} countries × {years} years, seed {seed}, {granularity} granularity")
+
+    synth = SyntheticDigest(countries, years, seed, last_year, granularity)
+    start = time.perf_counter()
+    stats = synth.write_csv(output_dir, schemas, tables)
+    elapsed = time.perf_counter() - start
+
+    print(f"\n{'Table':<48} {'Rows':>12} {'MB':>9} {'s':>7}")
+    print("-" * 80)
+    for (schema, table), (rows, size, seconds) in stats.items():
+        print(f"{schema + '/' + table:<48} {rows:>12,} {size / 1e6:>9.2f} {seconds:>7.2f}")
+    print("-" * 80)
+    total_rows = sum(rows for rows, _, _ in stats.values())
+    total_bytes = sum(size for _, size, _ in stats.values())
+    print(f"{'Total':<48} {total_rows:>12,} {total_bytes / 1e6:>9.2f} {elapsed:>7.2f}")
+
+    if workbooks:
+        written = synth.write_workbooks(Path(output_dir) / 'workbooks')
+        print(f"\n📗 Wrote {len(written)} chapter workbooks to {Path(output_dir) / 'workbooks'}")
+
+    print(f"\n✅ Synthetic data written to {output_dir}")
+    return stats
+
+
+def list_tables(schemas):
+    synth = SyntheticDigest(countries=1, years=1)
+    print(f"\n{'Table':<48} {'Source':<10} Key")
+    print("-" * 80)
+    for spec in synth.specs(schemas):
+        if spec.name in REFERENCE_TABLES[spec.schema]:
+            source = 'reference'
+        elif (spec.schema, spec.name) in SHAPERS:
+            source = 'model'
+        else:
+            source = 'generic'
+            synth.key_grid(spec)   # fails here if a key column has no value list
+        key = ', '.join(column for column in spec.unique
+                        if column != 'country_id' and column not in YEAR_COLUMNS)
+        print(f"{spec.schema + '/' + spec.name:<48} {source:<10} {key}")
+    for (schema, table), script in DERIVED_TABLES.items():
+        if schema in schemas:
+            print(f"{schema + '/' + table:<48} {'derived':<10} run {script}")
+
+
+def main():
+    utf8_console()
+
+    parser = argparse.ArgumentParser(description='Generate synthetic digest data for scale testing')
+    parser.add_argument('--output', default='synthetic', help='Directory to write CSVs (and workbooks) to')
+    parser.add_argument('--countries', type=int, default=9,
+                        help='Countries; the first nine are the OECS members, the rest Z01, Z02, ...')
+    parser.add_argument('--years', type=int, default=3, help='Academic years, ending at --last-year')
+    parser.add_argument('--last-year', type=int, default=LAST_START_YEAR,
+                        help=f'Start year of the newest (active) academic year (default: {LAST_START_YEAR})')
+    parser.add_argument('--seed', type=int, default=42, help='Random seed; same seed, same data')
+    parser.add_argument('--schemas', nargs='+', choices=list(SCHEMAS), default=list(SCHEMAS))
+    parser.add_argument('--tables', nargs='*', help='Only these tables (default: all)')
+    parser.add_argument('--granularity', choices=('country', 'school'), default='country',
+                        help='school also writes school_enrollment, one row per institution')
+    parser.add_argument('--workbooks', action='store_true',
+                        help='Also write Chapter 1 / Chapter 3 workbooks in the digest layout')
+    parser.add_argument('--list-tables', action='store_true', help='List the tables and how each is generated')
+    args = parser.parse_args()
+
+    if args.list_tables:
+        list_tables(args.schemas)
+        return
+    generate(Path(args.output), args.countries, args.years, args.seed, args.schemas, args.tables,
+             args.granularity, args.last_year, args.workbooks)
+
+
+if __name__ == '__main__':
+    try:
+        main()
+    except Exception as e:
+        print(f"\n❌ Error during synthetic data generation: {e}")
+        import traceback
+        traceback.print_exc()
+        sys.exit(1)
@@ -0,0 +1,292 @@
+"""
+Batched, append-only audit trail for bulk imports
+
+An importer run touches thousands of cells. Row-level audit triggers would
+add an audit write for every one of them, so instead each run writes one
+entry per table slice it changes (supabase-import-audit-table.sql):
+
+- import_id: one UUID per run, shared by all its entries
+- the source workbook and its SHA-256
+- the table, country and year, and the first and last row key changed
+- inserted / updated / deleted counts
+- the change set (key, old and new values of every changed row) as
+  zlib-compressed JSON
+
+The REST path appends each slice's entry right after cell_delta.apply_delta()
+has written it; the COPY path (pg_copy_loader.py) has the merge
+statement return the changed rows and inserts the entry in the same
+transaction. "What changed in this import" is one indexed lookup on import_id.
+
+Usage:
+    python import_audit.py                                  # recent imports
+    python import_audit.py 6f1c2d9e-...                     # entries of one import
+    python import_audit.py 6f1c2d9e-... --changes           # every changed cell
+    python import_audit.py --table student_enrollment --country GRD --year 2023-2024
+"""
+
+import argparse
+import getpass
+import hashlib
+import json
+import sys
+import uuid
+import zlib
+from pathlib import Path
+
+from console import utf8_console
+
+AUDIT_TABLE = 'import_audit'
+RUNS_VIEW = 'import_audit_runs'
+COMPRESSION_LEVEL = 9
+
+ENTRY_COLUMNS = ('import_id', 'source', 'source_file', 'source_sha256', 'table_name', 'country_id',
+                 'academic_year_id', 'key_fields', 'first_key', 'last_key', 'inserted', 'updated', 'deleted',
+                 'changes', 'changes_size', 'imported_by')
+
+
+def file_sha256(path) -> str:
+    digest = hashlib.sha256()
+    with open(path, 'rb') as handle:
+        for chunk in iter(lambda: handle.read(1 << 20), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def change_set(key_fields, value_fields, inserted=(), updated=(), deleted=()) -> dict:
+    """The JSON stored (compressed) per entry
+
+    inserted: [(key, new values)], updated: [(key, old values, new values)],
+    deleted: [(key, old values)]; keys and values are lists in
+    key_fields / value_fields order.
+    """
+    return {'key_fields': list(key_fields), 'value_fields': list(value_fields),
+            'inserted': [[list(key), list(new)] for key, new in inserted],
+            'updated': [[list(key), list(old), list(new)] for key, old, new in updated],
+            'deleted': [[list(key), list(old)] for key, old in deleted]}
+
+
+def delta_change_set(delta) -> dict:
+    """change_set() of a cell_delta.Delta"""
+    def values(row):
+        return [row.get(field) for field in delta.value_fields]
+
+    def key(row):
+        return [row.get(field) for field in delta.key_fields]
+
+    return change_set(delta.key_fields, delta.value_fields,
+                      inserted=[(key(row), values(row)) for row in delta.inserts],
+                      updated=[(key(new), values(old), values(new)) for old, new, _ in delta.updates],
+                      deleted=[(key(row), values(row)) for row in delta.deletes])
+
+
+def compress_changes(changes: dict) -> tuple:
+    """(zlib-compressed JSON, uncompressed size)"""
+    encoded = json.dumps(changes, separators=(',', ':'), default=str).encode('utf-8')
+    return zlib.compress(encoded, COMPRESSION_LEVEL), len(encoded)
+
+
+def decode_changes(data) -> dict:
+    """Accepts bytes (psycopg), PostgREST's '\\x…' hex text for BYTEA, or plain hex"""
+    if isinstance(data, str):
+        data = bytes.fromhex(data[2:] if data.startswith('\\x') else data)
+    return json.loads(zlib.decompress(bytes(data)))
+
+
+def key_order(key):
+    return [(value is None, '' if value is None else value) for value in key]
+
+
+def change_lines(changes: dict, limit: int = None) -> list:
+    """One line per change, like Delta.report_lines(): '+' insert, '~' update (old → new), '-' delete"""
+    def key_text(key):
+        return ' '.join(f"{field}={value}" for field, value in zip(changes['key_fields'], key))
+
+    fields = changes['value_fields']
+    lines = [f"+ {key_text(key)}: " + ', '.join(f"{field}={value}" for field, value in zip(fields, new))
+             for key, new in changes['inserted']]
+    lines += [f"~ {key_text(key)}: " + ', '.join(f"{field} {before} → {after}"
+                                               for field, before, after in zip(fields, old, new) if before != after)
+              for key, old, new in changes['updated']]
+    lines += [f"- {key_text(key)}" for key, _ in changes['deleted']]
+    if limit is not None and len(lines) > limit:
+        lines = lines[:limit] + [f"... and {len(lines) - limit} more"]
+    return lines
+
+
+class AuditTrail:
+    """One import run's audit entries: built per changed slice, appended to import_audit"""
+
+    def __init__(self, source: str, import_id: str = None):
+        self.source = source
+        self.import_id = import_id or str(uuid.uuid4())
+        self.imported_by = getpass.getuser()
+        self.pending = []
+        self.written = 0
+        self.hashes = {}
+
+    def file_hash(self, path):
+        if path is None:
+            return None
+        path = str(path)
+        if path not in self.hashes:
+            self.hashes[path] = file_sha256(path)
+        return self.hashes[path]
+
+    def entry(self, table: str, changes: dict, scope: dict = None, source_file=None) -> dict:
+        """An import_audit row for one slice's change set, or None if nothing changed"""
+        keys = sorted((item[0] for kind in ('inserted', 'updated', 'deleted') for item in changes[kind]),
+                      key=key_order)
+        if not keys:
+            return None
+        compressed, size = compress_changes(changes)
+        scope = scope or {}
+        return {
+            'import_id': self.import_id,
+            'source': self.source,
+            'source_file': Path(source_file).name if source_file else None,
+            'source_sha256': self.file_hash(source_file),
+            'table_name': table,
+            'country_id': scope.get('country_id'),
+            'academic_year_id': scope.get('academic_year_id'),
+            'key_fields': changes['key_fields'],
+            'first_key': keys[0],
+            'last_key': keys[-1],
+            'inserted': len(changes['inserted']),
+            'updated': len(changes['updated']),
+            'deleted': len(changes['deleted']),
+            'changes': compressed,
+            'changes_size': size,
+            'imported_by': self.imported_by,
+        }
+
+    def add(self, table: str, changes: dict, scope: dict = None, source_file=None) -> dict:
+        """Queue an entry for flush()"""
+        entry = self.entry(table, changes, scope, source_file)
+        if entry is not None:
+            self.pending.append(entry)
+        return entry
+
+    def add_delta(self, table: str, delta, scope: dict = None, source_file=None) -> dict:
+        return self.add(table, delta_change_set(delta), scope, source_file)
+
+    def rest_rows(self, entries=None) -> list:
+        """Entries as PostgREST JSON (BYTEA as '\\x…' hex)"""
+        return [{**entry, 'changes': '\\x' + entry['changes'].hex()}
+                for entry in (self.pending if entries is None else entries)]
+
+    def flush(self, client) -> int:
+        """Append the queued entries through the Supabase API in one request"""
+        if not self.pending:
+            return 0
+        client.table(AUDIT_TABLE).insert(self.rest_rows()).execute()
+        count = len(self.pending)
+        self.written += count
+        self.pending = []
+        return count
+
+    def write(self, cursor, entry: dict):
+        """Append one entry over a psycopg cursor (the COPY path, inside the merge's transaction)"""
+        from psycopg.types.json import Jsonb
+        values = {**entry, 'first_key': Jsonb(entry['first_key']), 'last_key': Jsonb(entry['last_key'])}
+        cursor.execute(
+            f"INSERT INTO public.{AUDIT_TABLE} ({', '.join(ENTRY_COLUMNS)}) "
+            f"VALUES ({', '.join(['%s'] * len(ENTRY_COLUMNS))})",
+            [values[column] for column in ENTRY_COLUMNS])
+        self.written += 1
+
+    def summary(self) -> str:
+        return f"{self.written} audit entries in import {self.import_id}"
+
+
+def list_runs(client, limit: int = 20) -> list:
+    return client.table(RUNS_VIEW).select('*').order('started_at', desc=True).limit(limit).execute().data
+
+
+def load_entries(client, filters: dict) -> list:
+    from table_reader import iter_table
+    return list(iter_table(client, AUDIT_TABLE, filters=filters))
+
+
+def print_runs(runs: list):
+    print(f"\n{'Import':<38} {'Source':<18} {'Started':<20} {'Entries':>7} {'Ins':>7} {'Upd':>7} {'Del':>7} {'Stored':>9}")
+    print("-" * 120)
+    for run in runs:
+        print(f"{run['import_id']:<38} {run['source']:<18} {str(run['started_at'])[:19]:<20} {run['entries']:>7} "
+              f"{run['inserted']:>7} {run['updated']:>7} {run['deleted']:>7} "
+              f"{run['compressed_bytes'] / 1024:>7.1f}KB")
+
+
+def print_entries(entries: list, countries: dict, years: dict, changes: bool, limit: int):
+    raw = stored = 0
+    for entry in entries:
+        raw += entry['changes_size']
+        data = entry['changes']
+        stored += len(bytes.fromhex(data[2:])) if isinstance(data, str) else len(data)
+        scope = ' '.join(filter(None, (countries.get(entry['country_id']), years.get(entry['academic_year_id']))))
+        source = f" from {entry['source_file']} ({entry['source_sha256'][:12]})" if entry['source_file'] else ''
+        print(f"\n📄 {entry['table_name']} {scope}{source}")
+        print(f"   {entry['inserted']} inserted, {entry['updated']} updated, {entry['deleted']} deleted; "
+              f"keys {entry['first_key']} … {entry['last_key']}")
+        if changes:
+            for line in change_lines(decode_changes(data), limit):
+                print(f"      {line}")
+    if entries:
+        print(f"\n🧾 {len(entries)} entries, change sets {raw / 1024:.1f}KB compressed to {stored / 1024:.1f}KB")
+
+
+def main():
+    utf8_console()
+
+    parser = argparse.ArgumentParser(description='Show what bulk imports changed (import_audit)')
+    parser.add_argument('import_id', nargs='?', help='Show the entries of this import (default: list recent imports)')
+    parser.add_argument('--table', help='Only entries for this table')
+    parser.add_argument('--country', help='Only entries for this country code')
+    parser.add_argument('--year', help='Only entries for this academic year, e.g. 2023-2024')
+    parser.add_argument('--changes', action='store_true', help='Decompress and list every changed cell')
+    parser.add_argument('--limit', type=int, default=50, help='Changes listed per entry, or imports listed (default: 50)')
+    args = parser.parse_args()
+
+    from supabase_client import get_client
+    client = get_client()
+
+    print("\n" + "=" * 80)
+    print("🧾 IMPORT AUDIT")
+    print("=" * 80)
+
+    if not (args.import_id or args.table or args.country or args.year):
+        print_runs(list_runs(client, args.limit))
+        return
+
+    countries = {row['id']: row['country_code']
+                 for row in client.table('countries').select('id, country_code').execute().data}
+    years = {row['id']: row['year_label']
+             for row in client.table('academic_years').select('id, year_label').execute().data}
+    filters = {}
+    if args.import_id:
+        filters['import_id'] = args.import_id
+    if args.table:
+        filters['table_name'] = args.table
+    if args.country:
+        filters['country_id'] = next((id_ for id_, code in countries.items() if code == args.country), None)
+        if filters['country_id'] is None:
+            raise ValueError(f"Country not found: {args.country}")
+    if args.year:
+        filters['academic_year_id'] = next((id_ for id_, label in years.items() if label == args.year), None)
+        if filters['academic_year_id'] is None:
+            raise ValueError(f"Academic year not found: {args.year}")
+
+    entries = load_entries(client, filters)
+    if not entries:
+        print("\n⚠️  No audit entries found")
+        return
+    print_entries(entries, countries, years, args.changes, args.limit)
+
+
+if __name__ == '__main__':
+    try:
+        main()
+    except Exception as e:
+        print(f"\n❌ Error reading the import audit: {e}")
+        import traceback
+        traceback.print_exc()
+        sys.exit(1)
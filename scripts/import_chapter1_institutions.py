@@ -11,39 +11,46 @@ Tables in Chapter 1:
 
 Usage:
     python scripts/import_chapter1_institutions.py
+    python scripts/import_chapter1_institutions.py --metrics import_metrics.jsonl --prometheus digest_import.prom
+    python scripts/import_chapter1_institutions.py --dry-run
+    python scripts/import_chapter1_institutions.py --pipeline --max-in-flight 8
+    python scripts/import_chapter1_institutions.py --backend copy
+    python scripts/import_chapter1_institutions.py --profile
+    python scripts/import_chapter1_institutions.py --profile memory
+    python scripts/import_chapter1_institutions.py --check
+    python scripts/import_chapter1_institutions.py --restart
+    python scripts/digest.py import chapter1
+
+Re-running the import compares each year with the stored rows and writes only
+the records that changed (see cell_delta.py). Each year's changes are recorded
+as one entry in the import_audit table (see import_audit.py; --no-audit skips it).
+
+Progress is checkpointed to .import-checkpoints/chapter1.json after every
+committed batch and year; if a run dies, the next one skips the finished
+workbooks and resumes the interrupted year (see import_checkpoint.py;
+--restart starts over).
 """
 
-import os
 import sys
-import io
+import argparse
+import time
 
-# Fix Windows console encoding for emojis
-if sys.platform == 'win32':
-    sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8', errors='replace')
-    sys.stderr = io.TextIOWrapper(sys.stderr.buffer, encoding='utf-8', errors='replace')
 from pathlib import Path
 import openpyxl
-from dotenv import load_dotenv
-from supabase import create_client, Client
+from console import utf8_console
+from supabase_client import get_client, request_stats
+from digest_records import record_type
+from cell_delta import apply_delta, compute_delta, load_slice, summarize_counts
+from import_audit import AuditTrail, delta_change_set
+from import_checkpoint import Checkpoint
+from import_metrics import ImportMetrics
+from pg_copy_loader import CopyLoader
+from profiling import add_profile_argument, profiled
+from workbook_slim import slim_workbook
 
 # Add parent directory to path for imports
 sys.path.insert(0, str(Path(__file__).parent.parent))
 
-# Load environment variables from .env.local
-env_path = Path(__file__).parent.parent / '.env.local'
-load_dotenv(dotenv_path=env_path)
-
-# Supabase configuration
-SUPABASE_URL = os.getenv('NEXT_PUBLIC_SUPABASE_URL')
-SUPABASE_KEY = os.getenv('SUPABASE_SERVICE_ROLE_KEY')  # Need service role for bulk insert
-
-if not SUPABASE_URL or not SUPABASE_KEY:
-    print("❌ Error: Missing Supabase credentials in .env.local file")
-    print("   Required: NEXT_PUBLIC_SUPABASE_URL and SUPABASE_SERVICE_ROLE_KEY")
-    sys.exit(1)
-
-supabase: Client = create_client(SUPABASE_URL, SUPABASE_KEY)
-
 # Country code mapping (Excel abbreviation -> ISO code)
 COUNTRY_MAPPING = {
     'A&B': 'ATG',  # Antigua and Barbuda
@@ -58,6 +65,18 @@ COUNTRY_MAPPING = {
     'VI': 'VGB',   # British Virgin Islands
 }
 
+# Parsed record: country code + every count column of institutions (from supabase-schema.sql)
+Institution = record_type('institutions', key_fields=('country_code',))
+
+# institutions has one row per country and year
+INSTITUTION_KEY = ('country_id', 'academic_year_id')
+INSTITUTION_COLUMNS = list(Institution.value_fields)
+
+# Columns each table contributes to the merged record
+TABLE_1_2_COLUMNS = [column for column in INSTITUTION_COLUMNS
+                     if column.startswith(('primary_', 'secondary_', 'special_ed_', 'tvet_'))]
+TABLE_1_3_COLUMNS = ['post_secondary_public', 'post_secondary_private']
+
 # Academic year mapping
 ACADEMIC_YEAR_MAPPING = {
     '2020-21': '2020-2021',
@@ -74,6 +93,7 @@ def get_or_create_academic_years():
         {'year_label': '2023-2024', 'start_year': 2023, 'end_year': 2024, 'is_active': True},
     ]
 
+    supabase = get_client()
     print("\n📅 Checking academic years...")
     for year_data in years_data:
         result = supabase.table('academic_years').select('id').eq('year_label', year_data['year_label']).execute()
@@ -83,17 +103,9 @@ def get_or_create_academic_years():
         else:
             print(f"   • Exists: {year_data['year_label']}")
 
-def get_country_id(country_code: str) -> str:
-    """Get country UUID from country_code"""
-    result = supabase.table('countries').select('id').eq('country_code', country_code).execute()
-    if result.data:
-        return result.data[0]['id']
-    else:
-        raise ValueError(f"Country not found: {country_code}")
-
 def get_academic_year_id(year_label: str) -> str:
     """Get academic year UUID from year_label"""
-    result = supabase.table('academic_years').select('id').eq('year_label', year_label).execute()
+    result = get_client().table('academic_years').select('id').eq('year_label', year_label).execute()
     if result.data:
         return result.data[0]['id']
     else:
@@ -111,7 +123,7 @@ def safe_int(value) -> int:
     except (ValueError, TypeError):
         return 0
 
-def parse_table_1_1(ws, academic_year_id: str):
+def parse_table_1_1(ws):
     """Parse Table 1.1 - Early Childhood Centres"""
     print("   📋 Parsing Table 1.1: Early Childhood...")
 
@@ -143,51 +155,23 @@ def parse_table_1_1(ws, academic_year_id: str):
 
         country_code = COUNTRY_MAPPING[country_abbr]
 
-        try:
-            country_id = get_country_id(country_code)
-        except ValueError as e:
-            print(f"      ⚠️  {e}")
-            continue
+        # Extract data (the other columns keep their schema default of 0)
+        record = Institution(
+            country_code,
+            daycare_public=safe_int(ws.cell(row_idx, 3).value),
+            daycare_private_church=safe_int(ws.cell(row_idx, 4).value),
+            daycare_private_non_affiliated=safe_int(ws.cell(row_idx, 5).value),
+            preschool_public=safe_int(ws.cell(row_idx, 7).value),
+            preschool_private_church=safe_int(ws.cell(row_idx, 8).value),
+            preschool_private_non_affiliated=safe_int(ws.cell(row_idx, 9).value),
+        )
+        institutions.append(record)
 
-        # Extract data
-        daycare_public = safe_int(ws.cell(row_idx, 3).value)
-        daycare_private_church = safe_int(ws.cell(row_idx, 4).value)
-        daycare_private_non_affiliated = safe_int(ws.cell(row_idx, 5).value)
-        preschool_public = safe_int(ws.cell(row_idx, 7).value)
-        preschool_private_church = safe_int(ws.cell(row_idx, 8).value)
-        preschool_private_non_affiliated = safe_int(ws.cell(row_idx, 9).value)
-
-        institutions.append({
-            'country_id': country_id,
-            'academic_year_id': academic_year_id,
-            'daycare_public': daycare_public,
-            'daycare_private_church': daycare_private_church,
-            'daycare_private_non_affiliated': daycare_private_non_affiliated,
-            'preschool_public': preschool_public,
-            'preschool_private_church': preschool_private_church,
-            'preschool_private_non_affiliated': preschool_private_non_affiliated,
-            # Initialize other fields
-            'primary_public': 0,
-            'primary_private_church': 0,
-            'primary_private_non_affiliated': 0,
-            'secondary_public': 0,
-            'secondary_private_church': 0,
-            'secondary_private_non_affiliated': 0,
-            'special_ed_public': 0,
-            'special_ed_private_church': 0,
-            'special_ed_private_non_affiliated': 0,
-            'tvet_public': 0,
-            'tvet_private_church': 0,
-            'tvet_private_non_affiliated': 0,
-            'post_secondary_public': 0,
-            'post_secondary_private': 0,
-        })
-
-        print(f"      ✓ {country_abbr}: Daycare={daycare_public + daycare_private_church + daycare_private_non_affiliated}, Preschool={preschool_public + preschool_private_church + preschool_private_non_affiliated}")
+        print(f"      ✓ {country_abbr}: Daycare={record.daycare_public + record.daycare_private_church + record.daycare_private_non_affiliated}, Preschool={record.preschool_public + record.preschool_private_church + record.preschool_private_non_affiliated}")
 
     return institutions
 
-def parse_table_1_2(ws, academic_year_id: str):
+def parse_table_1_2(ws):
     """Parse Table 1.2 - Primary & Secondary Schools"""
     print("   📋 Parsing Table 1.2: Primary & Secondary...")
 
@@ -213,29 +197,10 @@ def parse_table_1_2(ws, academic_year_id: str):
 
         country_code = COUNTRY_MAPPING[country_abbr]
 
-        try:
-            country_id = get_country_id(country_code)
-        except ValueError:
-            continue
-
         # Initialize country record if not exists
-        if country_id not in institutions:
-            institutions[country_id] = {
-                'country_id': country_id,
-                'academic_year_id': academic_year_id,
-                'primary_public': 0,
-                'primary_private_church': 0,
-                'primary_private_non_affiliated': 0,
-                'secondary_public': 0,
-                'secondary_private_church': 0,
-                'secondary_private_non_affiliated': 0,
-                'special_ed_public': 0,
-                'special_ed_private_church': 0,
-                'special_ed_private_non_affiliated': 0,
-                'tvet_public': 0,
-                'tvet_private_church': 0,
-                'tvet_private_non_affiliated': 0,
-            }
+        if country_code not in institutions:
+            institutions[country_code] = Institution(country_code)
+        record = institutions[country_code]
 
         # Extract primary school data (columns vary by file)
         # This is simplified - actual column positions need inspection
@@ -244,16 +209,16 @@ def parse_table_1_2(ws, academic_year_id: str):
         secondary_public = safe_int(ws.cell(row_idx, 7).value)
         secondary_private = safe_int(ws.cell(row_idx, 8).value)
 
-        institutions[country_id]['primary_public'] = primary_public
-        institutions[country_id]['primary_private_church'] = primary_private
-        institutions[country_id]['secondary_public'] = secondary_public
-        institutions[country_id]['secondary_private_church'] = secondary_private
+        record.primary_public = primary_public
+        record.primary_private_church = primary_private
+        record.secondary_public = secondary_public
+        record.secondary_private_church = secondary_private
 
         print(f"      ✓ {country_abbr}: Primary={primary_public + primary_private}, Secondary={secondary_public + secondary_private}")
 
     return list(institutions.values())
 
-def parse_table_1_3(ws, academic_year_id: str):
+def parse_table_1_3(ws):
     """Parse Table 1.3 - Post-Secondary Institutions"""
     print("   📋 Parsing Table 1.3: Post-Secondary...")
 
@@ -271,108 +236,137 @@ def parse_table_1_3(ws, academic_year_id: str):
 
         country_code = COUNTRY_MAPPING[country_abbr]
 
-        try:
-            country_id = get_country_id(country_code)
-        except ValueError:
-            continue
-
         # Post-secondary data
-        post_secondary_public = safe_int(ws.cell(row_idx, 3).value)
-        post_secondary_private = safe_int(ws.cell(row_idx, 4).value)
-
-        institutions[country_id] = {
-            'country_id': country_id,
-            'academic_year_id': academic_year_id,
-            'post_secondary_public': post_secondary_public,
-            'post_secondary_private': post_secondary_private,
-        }
+        record = Institution(
+            country_code,
+            post_secondary_public=safe_int(ws.cell(row_idx, 3).value),
+            post_secondary_private=safe_int(ws.cell(row_idx, 4).value),
+        )
+        institutions[country_code] = record
 
-        print(f"      ✓ {country_abbr}: Post-Secondary={post_secondary_public + post_secondary_private}")
+        print(f"      ✓ {country_abbr}: Post-Secondary={record.post_secondary_public + record.post_secondary_private}")
 
     return list(institutions.values())
 
 def merge_institution_data(table1_data, table2_data, table3_data):
-    """Merge data from all three tables by country_id"""
+    """Merge data from all three tables by country"""
     print("\n🔗 Merging data from all tables...")
 
-    merged = {}
-
-    # Start with Table 1.1 (Early Childhood)
-    for record in table1_data:
-        country_id = record['country_id']
-        merged[country_id] = record.copy()
-
-    # Merge Table 1.2 (Primary/Secondary)
-    for record in table2_data:
-        country_id = record['country_id']
-        if country_id in merged:
-            merged[country_id].update({
-                'primary_public': record.get('primary_public', 0),
-                'primary_private_church': record.get('primary_private_church', 0),
-                'primary_private_non_affiliated': record.get('primary_private_non_affiliated', 0),
-                'secondary_public': record.get('secondary_public', 0),
-                'secondary_private_church': record.get('secondary_private_church', 0),
-                'secondary_private_non_affiliated': record.get('secondary_private_non_affiliated', 0),
-                'special_ed_public': record.get('special_ed_public', 0),
-                'special_ed_private_church': record.get('special_ed_private_church', 0),
-                'special_ed_private_non_affiliated': record.get('special_ed_private_non_affiliated', 0),
-                'tvet_public': record.get('tvet_public', 0),
-                'tvet_private_church': record.get('tvet_private_church', 0),
-                'tvet_private_non_affiliated': record.get('tvet_private_non_affiliated', 0),
-            })
-
-    # Merge Table 1.3 (Post-Secondary)
-    for record in table3_data:
-        country_id = record['country_id']
-        if country_id in merged:
-            merged[country_id].update({
-                'post_secondary_public': record.get('post_secondary_public', 0),
-                'post_secondary_private': record.get('post_secondary_private', 0),
-            })
+    # Start with Table 1.1 (Early Childhood); its records are completed in place
+    merged = {record.country_code: record for record in table1_data}
+
+    # Merge Table 1.2 (Primary/Secondary) and Table 1.3 (Post-Secondary)
+    for records, columns in ((table2_data, TABLE_1_2_COLUMNS), (table3_data, TABLE_1_3_COLUMNS)):
+        for record in records:
+            if record.country_code in merged:
+                merged[record.country_code].update(record, columns)
 
     print(f"   ✓ Merged data for {len(merged)} countries")
     return list(merged.values())
 
-def parse_chapter1_file(filepath: str, academic_year: str):
+# Worksheet, metrics stage name and parser for each Chapter 1 table
+CHAPTER1_TABLES = [
+    ('Table 1.1', 'parse_table_1_1', parse_table_1_1),
+    ('Table 1.2', 'parse_table_1_2', parse_table_1_2),
+    ('Table 1.3', 'parse_table_1_3', parse_table_1_3),
+]
+
+def extract_chapter1_file(filepath: str) -> dict:
+    """Read a Chapter 1 workbook into one Institution record per country code
+
+    Does no database work, so it can run in a worker process. Returns
+    {'file', 'records', 'stages': [(stage, seconds, rows, bytes), ...]}.
+    """
+    filename = Path(filepath).name
+    stages = []
+
+    # Parse a cached value-only copy of the three tables (see workbook_slim.py)
+    start = time.perf_counter()
+    slim_path = slim_workbook(filepath, [sheet_name for sheet_name, _, _ in CHAPTER1_TABLES])
+    stages.append(('slim', time.perf_counter() - start, 0, Path(filepath).stat().st_size))
+
+    start = time.perf_counter()
+    wb = openpyxl.load_workbook(slim_path, data_only=True)
+    stages.append(('load', time.perf_counter() - start,
+                   sum(wb[name].max_row for name in wb.sheetnames), slim_path.stat().st_size))
+
+    table_data = []
+    for sheet_name, stage_name, parse in CHAPTER1_TABLES:
+        records = []
+        if sheet_name in wb.sheetnames:
+            start = time.perf_counter()
+            records = parse(wb[sheet_name])
+            stages.append((stage_name, time.perf_counter() - start, len(records), 0))
+        table_data.append(records)
+
+    wb.close()
+
+    # Merge all three tables
+    start = time.perf_counter()
+    merged_data = merge_institution_data(*table_data)
+    stages.append(('merge', time.perf_counter() - start, len(merged_data), 0))
+
+    return {'file': filename, 'records': merged_data, 'stages': stages}
+
+def record_extract_stages(metrics: ImportMetrics, result: dict):
+    """Add the stage timings measured by extract_chapter1_file to the run's metrics"""
+    for stage, seconds, rows, size in result['stages']:
+        metrics.record(stage, seconds, rows=rows, bytes=size, file=result['file'])
+
+def load_country_ids() -> dict:
+    """ISO country code -> countries.id"""
+    result = get_client().table('countries').select('id, country_code').execute()
+    return {row['country_code']: row['id'] for row in result.data}
+
+def resolve_ids(records: list, country_ids: dict, academic_year_id) -> list:
+    """Row dicts for writing: country code replaced by country_id, academic_year_id added"""
+    rows = []
+    for record in records:
+        if record.country_code not in country_ids:
+            print(f"      ⚠️  Country not found: {record.country_code}")
+            continue
+        rows.append({'country_id': country_ids[record.country_code], 'academic_year_id': academic_year_id,
+                     **dict(zip(record.value_fields, record.as_row(record.value_fields)))})
+    return rows
+
+def parse_chapter1_file(filepath: str, academic_year: str, metrics: ImportMetrics, country_ids: dict = None):
     """Parse a Chapter 1 Excel file and extract institution counts"""
     print(f"\n📂 Processing: {Path(filepath).name}")
     print(f"   Year: {academic_year}")
 
-    wb = openpyxl.load_workbook(filepath, data_only=True)
+    result = extract_chapter1_file(filepath)
+    record_extract_stages(metrics, result)
 
     # Get academic year ID
     year_label = ACADEMIC_YEAR_MAPPING[academic_year]
     academic_year_id = get_academic_year_id(year_label)
 
-    # Parse each table
-    table1_data = []
-    table2_data = []
-    table3_data = []
-
-    if 'Table 1.1' in wb.sheetnames:
-        table1_data = parse_table_1_1(wb['Table 1.1'], academic_year_id)
-
-    if 'Table 1.2' in wb.sheetnames:
-        table2_data = parse_table_1_2(wb['Table 1.2'], academic_year_id)
+    return resolve_ids(result['records'], country_ids or load_country_ids(), academic_year_id)
+
+def import_chapter1(metrics: ImportMetrics = None, dry_run: bool = False, pipeline: bool = False,
+                    max_in_flight: int = None, workers: int = None, backend: str = 'rest',
+                    audit: bool = True, checkpoint: Checkpoint = None):
+    """Main import function for Chapter 1 data
+
+    With `pipeline`, workbooks are parsed in worker processes while earlier
+    years are written concurrently (see async_import_pipeline.py). With
+    backend='copy', each year is loaded straight into Postgres with COPY
+    (see pg_copy_loader.py). With `audit`, each year's changes are appended
+    to import_audit (see import_audit.py). With a `checkpoint`, years it
+    records as written are skipped and progress is saved as batches commit
+    (see import_checkpoint.py).
+    """
+    if metrics is None:
+        metrics = ImportMetrics('chapter1')
+    trail = AuditTrail('chapter1') if audit and not dry_run else None
 
-    if 'Table 1.3' in wb.sheetnames:
-        table3_data = parse_table_1_3(wb['Table 1.3'], academic_year_id)
-
-    wb.close()
-
-    # Merge all three tables
-    merged_data = merge_institution_data(table1_data, table2_data, table3_data)
-
-    return merged_data
-
-def import_chapter1():
-    """Main import function for Chapter 1 data"""
     print("\n" + "=" * 80)
     print("📊 IMPORTING CHAPTER 1: INSTITUTIONS DATA")
     print("=" * 80)
 
     # Ensure academic years exist
-    get_or_create_academic_years()
+    with metrics.stage('academic_years'):
+        get_or_create_academic_years()
 
     # Base directory
     base_dir = Path(__file__).parent.parent / 'DIGEST_WEB' / 'Extracted Chapters' / 'Chapter 1'
@@ -383,55 +377,219 @@ def import_chapter1():
         ('2021-22.xlsx', '2021-22'),
         ('2022-23.xlsx', '2022-23'),
     ]
+    if checkpoint is not None and not dry_run:
+        files = pending_files(base_dir, files, checkpoint)
+    else:
+        checkpoint = None
+
+    if pipeline:
+        from async_import_pipeline import import_chapter1_pipeline
+
+        jobs = []
+        for filename, year in files:
+            filepath = base_dir / filename
+            if filepath.exists():
+                jobs.append((filepath, ACADEMIC_YEAR_MAPPING[year]))
+            else:
+                print(f"\n⚠️  File not found: {filepath}")
+
+        print(f"\n🚀 Pipelined import of {len(jobs)} workbooks...")
+        options = {'dry_run': dry_run, 'workers': workers, 'audit': trail, 'checkpoint': checkpoint}
+        if max_in_flight:
+            options['max_in_flight'] = max_in_flight
+        changed = import_chapter1_pipeline(jobs, metrics, **options)
+        if dry_run:
+            print("\n✅ Dry run: nothing written")
+        elif metrics.failed:
+            print(f"\n❌ Chapter 1 import incomplete ({changed} institution records changed)")
+        else:
+            print(f"\n✅ Successfully imported Chapter 1 ({changed} institution records changed)")
+    else:
+        import_chapter1_sequential(base_dir, files, metrics, dry_run, backend, trail, checkpoint)
+
+    if trail is not None:
+        print(f"\n🧾 {trail.summary()}")
+    print("\n⏱️  Stage timings:")
+    for line in metrics.summary_lines():
+        print(f"   {line}")
 
-    all_data = []
+def year_unit(checkpoint: Checkpoint, year_label: str, filepath: Path) -> str:
+    return checkpoint.unit('institutions', year_label, source_file=filepath)
 
+def pending_files(base_dir: Path, files: list, checkpoint: Checkpoint) -> list:
+    """The workbooks a checkpoint has not recorded as written"""
+    pending = []
     for filename, year in files:
         filepath = base_dir / filename
-        if filepath.exists():
-            data = parse_chapter1_file(str(filepath), year)
-            all_data.extend(data)
+        if filepath.exists() and checkpoint.is_done(year_unit(checkpoint, ACADEMIC_YEAR_MAPPING[year], filepath)):
+            print(f"   ✓ {filename}: already imported (checkpoint)")
         else:
-            print(f"\n⚠️  File not found: {filepath}")
+            pending.append((filename, year))
+    return pending
 
-    # Insert data into Supabase
-    if all_data:
-        print(f"\n💾 Inserting {len(all_data)} records into institutions table...")
+def import_chapter1_sequential(base_dir: Path, files: list, metrics: ImportMetrics, dry_run: bool,
+                               backend: str = 'rest', audit: AuditTrail = None, checkpoint: Checkpoint = None):
+    """Parse every workbook, then write each year's changes in turn
 
-        # Delete existing data for these years first
-        for year in ['2020-2021', '2021-2022', '2022-2023']:
-            try:
-                year_id = get_academic_year_id(year)
-                result = supabase.table('institutions').delete().eq('academic_year_id', year_id).execute()
-                print(f"   🗑️  Cleared existing data for {year}")
-            except Exception as e:
-                print(f"   ⚠️  Could not clear {year}: {e}")
+    A year that fails to write does not stop the others; it is reported and
+    marks the run failed (metrics.failed), so main() exits non-zero.
+    """
+    country_ids = load_country_ids()
+    parsed = []
+
+    for filename, year in files:
+        filepath = base_dir / filename
+        if filepath.exists():
+            data = parse_chapter1_file(str(filepath), year, metrics, country_ids)
+            parsed.append((ACADEMIC_YEAR_MAPPING[year], data, filepath))
+        else:
+            print(f"\n⚠️  File not found: {filepath}")
 
-        # Batch insert
-        batch_size = 50
-        inserted_count = 0
-        for i in range(0, len(all_data), batch_size):
-            batch = all_data[i:i+batch_size]
+    if parsed and backend == 'copy':
+        copy_chapter1(parsed, metrics, dry_run, audit, checkpoint)
+    # Write only what differs from the stored rows for each year
+    elif parsed:
+        action = "Comparing" if dry_run else "Writing changes for"
+        print(f"\n💾 {action} {sum(len(data) for _, data, _ in parsed)} records against the institutions table...")
+
+        supabase = get_client()
+        changed = 0
+        failed_years = []
+        for year_label, data, filepath in parsed:
+            year_id = get_academic_year_id(year_label)
+            with metrics.stage('load_stored', year=year_label) as stage:
+                stored = load_slice(supabase, 'institutions', INSTITUTION_KEY, INSTITUTION_COLUMNS,
+                                    {'academic_year_id': year_id})
+                stage.rows = len(stored)
+
+            delta = compute_delta(stored, data, INSTITUTION_KEY, INSTITUTION_COLUMNS)
+            print(f"   {year_label}: {delta.summary()}")
+            if dry_run:
+                for line in delta.report_lines():
+                    print(f"      {line}")
+                continue
+
+            unit = year_unit(checkpoint, year_label, filepath) if checkpoint is not None else None
             try:
-                supabase.table('institutions').insert(batch).execute()
-                inserted_count += len(batch)
-                print(f"   ✓ Inserted batch {i//batch_size + 1}/{(len(all_data)-1)//batch_size + 1} ({inserted_count} records)")
+                changes = checkpoint.begin(unit, delta) if unit else delta_change_set(delta)
+                apply_delta(supabase, 'institutions', delta, metrics, batch_size=50,
+                            progress=checkpoint.recorder(unit) if unit else None, year=year_label)
+                changed += len(delta)
+                if unit:
+                    checkpoint.complete(unit, **delta.counts())
             except Exception as e:
-                print(f"   ❌ Error inserting batch: {e}")
-
-        print(f"\n✅ Successfully imported {inserted_count} institution records!")
-        print(f"   📈 Data now available for dashboard visualization")
+                print(f"   ❌ Error writing {year_label}: {e}")
+                failed_years.append(year_label)
+                metrics.failed = True
+                if checkpoint is not None:
+                    checkpoint.fail()
+                continue
+
+            if audit is not None:
+                audit.add('institutions', changes, {'academic_year_id': year_id}, filepath)
+                try:
+                    audit.flush(supabase)
+                except Exception as e:
+                    # The year is written; only the entry is missing (it stays queued for the next flush)
+                    print(f"   ❌ Could not record the import_audit entry for {year_label}: {e}")
+                    metrics.failed = True
+
+        if dry_run:
+            print("\n✅ Dry run: nothing written")
+        elif failed_years:
+            print(f"\n❌ Chapter 1 import incomplete: {', '.join(failed_years)} not written "
+                  f"({changed} institution records changed in the other years)")
+        elif metrics.failed:
+            print(f"\n❌ Chapter 1 imported ({changed} institution records changed) but its import_audit "
+                  f"entries were not all recorded")
+        else:
+            print(f"\n✅ Successfully imported Chapter 1 ({changed} institution records changed)")
+            print(f"   📈 Data now available for dashboard visualization")
     else:
         print("\n⚠️  No data to import")
 
-if __name__ == '__main__':
+def copy_chapter1(parsed: list, metrics: ImportMetrics, dry_run: bool, audit: AuditTrail = None,
+                  checkpoint: Checkpoint = None):
+    """Merge each parsed year into institutions over a direct Postgres connection"""
+    action = "Merging (dry run)" if dry_run else "Merging"
+    print(f"\n💾 {action} {sum(len(data) for _, data, _ in parsed)} records into institutions with COPY...")
+
+    changed = 0
+    with CopyLoader() as loader:
+        for year_label, data, filepath in parsed:
+            year_id = get_academic_year_id(year_label)
+            with metrics.stage('copy_merge', year=year_label) as stage:
+                counts = loader.merge('institutions', data, ('country_id',), INSTITUTION_COLUMNS,
+                                      slices=[(year_id,)], scope_fields=('academic_year_id',), dry_run=dry_run,
+                                      audit=audit, source_file=filepath)
+                stage.rows = len(data)
+            if checkpoint is not None:
+                checkpoint.complete(year_unit(checkpoint, year_label, filepath), **counts)
+            print(f"   {year_label}: {summarize_counts(counts)}")
+            changed += counts['inserted'] + counts['updated'] + counts['deleted']
+
+    if dry_run:
+        print("\n✅ Dry run: nothing written")
+    else:
+        print(f"\n✅ Successfully imported Chapter 1 ({changed} institution records changed)")
+
+def main():
+    utf8_console()
+
+    parser = argparse.ArgumentParser(description='Import Chapter 1 (Institutions) data into Supabase')
+    parser.add_argument('--metrics', metavar='PATH',
+                        help="Append per-stage metrics as JSON lines to PATH ('-' for stderr)")
+    parser.add_argument('--prometheus', metavar='PATH',
+                        help='Write a Prometheus text-format metrics file to PATH when the run ends')
+    parser.add_argument('--dry-run', action='store_true',
+                        help='List the records that would be inserted, updated or deleted without writing')
+    parser.add_argument('--pipeline', action='store_true',
+                        help='Overlap workbook parsing (worker processes) with concurrent uploads')
+    parser.add_argument('--max-in-flight', type=int,
+                        help='With --pipeline: most write requests outstanding at once (default: 4)')
+    parser.add_argument('--workers', type=int,
+                        help='With --pipeline: worker processes for parsing (default: one per workbook)')
+    parser.add_argument('--backend', choices=['rest', 'copy'], default='rest',
+                        help='rest: write through the Supabase API (default); copy: COPY straight into Postgres '
+                             '(needs psycopg and DATABASE_URL, see pg_copy_loader.py)')
+    parser.add_argument('--no-audit', action='store_true',
+                        help='Do not record the changes in import_audit (see import_audit.py)')
+    parser.add_argument('--restart', action='store_true',
+                        help='Ignore the saved progress of an interrupted run and import every workbook again')
+    parser.add_argument('--check', action='store_true',
+                        help='After writing, rank anomalies in the imported years (data_quality.py, needs NumPy)')
+    add_profile_argument(parser)
+    args = parser.parse_args()
+    if args.pipeline and args.backend == 'copy':
+        parser.error('--pipeline writes through the REST API; it cannot be combined with --backend copy')
+
+    metrics = ImportMetrics('chapter1', jsonl_path=args.metrics, prometheus_path=args.prometheus,
+                            request_counter=lambda: request_stats.requests)
+    checkpoint = None if args.dry_run else Checkpoint.for_importer('chapter1', restart=args.restart)
     try:
-        import_chapter1()
+        with profiled(Path.cwd() / 'import_chapter1_institutions', mode=args.profile):
+            import_chapter1(metrics, args.dry_run, args.pipeline, args.max_in_flight, args.workers, args.backend,
+                            not args.no_audit, checkpoint)
+        if checkpoint is not None:
+            checkpoint.finish()
+        if metrics.failed:
+            metrics.close()
+            print("\n❌ Import finished with errors (see above)")
+            sys.exit(1)
+        if args.check and not args.dry_run:
+            from data_quality import check_after_import
+            check_after_import(metrics, years=set(ACADEMIC_YEAR_MAPPING.values()))
+        metrics.close()
         print("\n" + "=" * 80)
         print("✨ Import complete! Check your dashboard to see the real data.")
+        print(f"   🌐 Supabase: {request_stats.summary()}")
         print("=" * 80 + "\n")
     except Exception as e:
+        metrics.close(failed=True)
         print(f"\n❌ Error during import: {e}")
         import traceback
         traceback.print_exc()
         sys.exit(1)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,163 @@
+"""
+Local checkpoints so an interrupted import resumes instead of starting over
+
+An import killed partway through (network drop, Ctrl-C, a failed batch) used
+to be rerun from the first workbook: every file parsed again and every slice
+loaded and diffed again. The importers now record their progress in a small
+JSON state file, rewritten atomically after every committed write batch and
+every finished unit of work (a table/year slice of one source file):
+
+    .import-checkpoints/chapter1.json
+    {"importer": "chapter1", "started_at": "...",
+     "units": {"institutions|2021-2022|<sha256>": {"status": "done", "inserted": 0, ...},
+               "institutions|2022-2023|<sha256>": {"status": "writing", "batches": 3, "rows": 150}}}
+
+On the next run, finished units are skipped without opening their workbook
+(units include the file's SHA-256, so an edited workbook is imported again).
+A unit that stopped mid-write is diffed again against the stored rows; the
+batches that did commit are already stored, so they drop out of the new
+delta and only the remainder is written. Replays are therefore idempotent
+even for an insert batch whose response was lost: at most that one batch is
+redone. The unit keeps the change set it started with (compressed), so its
+import_audit entry still lists every change, not just the remainder.
+
+The state file is removed when a run finishes without errors, so the next
+import starts fresh. --restart discards it; a dry run neither reads nor
+writes it.
+
+Usage:
+    checkpoint = Checkpoint.for_importer('chapter1', restart=args.restart)
+    unit = checkpoint.unit('institutions', year_label, source_file=path)
+    if not checkpoint.is_done(unit):
+        ...
+        changes = checkpoint.begin(unit, delta)
+        apply_delta(..., progress=checkpoint.recorder(unit))
+        checkpoint.complete(unit, **delta.counts())
+    checkpoint.finish()
+"""
+
+import json
+import os
+from datetime import datetime, timezone
+from pathlib import Path
+
+from import_audit import compress_changes, decode_changes, delta_change_set, file_sha256
+
+DEFAULT_DIRECTORY = '.import-checkpoints'
+
+
+def now() -> str:
+    return datetime.now(timezone.utc).isoformat(timespec='seconds')
+
+
+class Checkpoint:
+    """Durable progress of one importer's run, kept in a local JSON file"""
+
+    def __init__(self, path, importer: str):
+        self.path = Path(path)
+        self.importer = importer
+        self.hashes = {}
+        self.failed = False
+        if self.path.exists():
+            self.state = json.loads(self.path.read_text(encoding='utf-8'))
+            if self.state.get('importer') != importer:
+                raise ValueError(f"{self.path} belongs to the {self.state.get('importer')} importer")
+        else:
+            self.state = {'importer': importer, 'started_at': now(), 'units': {}}
+        self.resumed = bool(self.state['units'])
+
+    @classmethod
+    def for_importer(cls, importer: str, path=None, restart: bool = False) -> 'Checkpoint':
+        """The importer's state file (default .import-checkpoints/<importer>.json), or a new one with `restart`"""
+        path = Path(path) if path else Path.cwd() / DEFAULT_DIRECTORY / f"{importer}.json"
+        if restart and path.exists():
+            path.unlink()
+        checkpoint = cls(path, importer)
+        if checkpoint.resumed:
+            done = sum(1 for unit in checkpoint.units.values() if unit['status'] == 'done')
+            print(f"\n♻️  Resuming from {checkpoint.path} ({done} of {len(checkpoint.units)} units already written, "
+                  f"started {checkpoint.state['started_at']}); --restart to start over")
+        return checkpoint
+
+    @property
+    def units(self) -> dict:
+        return self.state['units']
+
+    def file_hash(self, path) -> str:
+        path = str(path)
+        if path not in self.hashes:
+            self.hashes[path] = file_sha256(path)
+        return self.hashes[path]
+
+    def unit(self, *parts, source_file=None) -> str:
+        """Unit id: the parts plus the source file's SHA-256"""
+        if source_file is not None:
+            parts += (self.file_hash(source_file),)
+        return '|'.join(str(part) for part in parts)
+
+    def is_done(self, unit: str) -> bool:
+        return self.units.get(unit, {}).get('status') == 'done'
+
+    def interrupted(self, unit: str) -> dict:
+        """Progress of a unit a previous run stopped writing, or None"""
+        progress = self.units.get(unit)
+        return progress if progress and progress['status'] == 'writing' else None
+
+    def save(self):
+        """Write the state atomically: a crash leaves either the old or the new file"""
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        temporary = self.path.with_suffix('.tmp')
+        with open(temporary, 'w', encoding='utf-8') as handle:
+            json.dump(self.state, handle, indent=1)
+            handle.flush()
+            os.fsync(handle.fileno())
+        os.replace(temporary, self.path)
+
+    def start(self, unit: str, **info):
+        previous = self.units.get(unit, {})
+        self.units[unit] = {'status': 'writing', 'batches': previous.get('batches', 0),
+                            'rows': previous.get('rows', 0), 'updated_at': now(), **info}
+        self.save()
+
+    def begin(self, unit: str, delta) -> dict:
+        """Start writing a unit's delta, or resume it; returns the unit's whole change set
+
+        A resumed unit returns the change set recorded when it was first
+        started, which includes the batches that committed before the interruption.
+        """
+        previous = self.interrupted(unit)
+        if previous and previous.get('changes'):
+            changes = decode_changes(previous['changes'])
+            print(f"   ♻️  Resuming after {previous['batches']} committed batches ({previous['rows']} rows); "
+                  f"{len(delta)} changes left")
+        else:
+            changes = delta_change_set(delta)
+        self.start(unit, changes=compress_changes(changes)[0].hex())
+        return changes
+
+    def batch(self, unit: str, rows: int):
+        """Record one committed write batch"""
+        progress = self.units[unit]
+        progress['batches'] += 1
+        progress['rows'] += rows
+        progress['updated_at'] = now()
+        self.save()
+
+    def recorder(self, unit: str):
+        """`progress` callback for cell_delta.apply_delta"""
+        return lambda operation, rows: self.batch(unit, rows)
+
+    def complete(self, unit: str, **counts):
+        self.units[unit] = {'status': 'done', 'updated_at': now(), **counts}
+        self.save()
+
+    def fail(self):
+        """A unit could not be written; the state file is kept for the next run"""
+        self.failed = True
+
+    def finish(self):
+        """End of run: drop the state after a clean run, keep it to resume otherwise"""
+        if self.failed:
+            print(f"\n♻️  Progress saved to {self.path}; rerun to resume")
+        elif self.path.exists():
+            self.path.unlink()
@@ -0,0 +1,461 @@
+"""
+Import completed member-state templates into Supabase
+
+Member states return filled-in copies of `DIGEST_WEB/Blank OECS MS Template.xlsx`.
+This script opens each returned workbook once, reads every mapped cell of the
+Student Enrolment and LeadersTeachersQualifications worksheets in a single
+streaming pass (see template_mapping.py), and writes the values in bulk to:
+
+- student_enrollment (D1, D3-D5 for the template year, D6-D8 for the prior year)
+- staff_qualifications, leadership_degree_holders (B1-B4)
+- teacher_academic_qualifications (B5), specialist_teachers (B6)
+- professional_development (B7)
+
+Rows use the same keys as the data-entry pages. For each table that has values
+in the return, the country's stored rows for that year are compared with the
+return (cell_delta.py) and only new, changed and cleared cells are written, so
+re-importing a corrected return touches just the corrections; tables left
+blank in the return are not touched. Only the education levels the template
+maps for that table and year are compared (template_mapping.mapped_levels()),
+so special education and prior-year early childhood rows, which the template
+has no cells for, are never deleted. --dry-run lists those changes without
+writing. With --backend copy the rows are streamed into Postgres with COPY
+and merged in one statement per table instead (pg_copy_loader.py). Every
+table/year a return changes gets one import_audit entry with the workbook's
+SHA-256 and the changed cells (import_audit.py; --no-audit skips it).
+
+Progress is checkpointed to .import-checkpoints/member_templates.json after
+every committed batch, table/year and return. If a run dies, rerunning it
+skips the returns and tables already written and resumes the interrupted one
+(import_checkpoint.py; --restart starts over).
+
+Workbooks are parsed in a process pool, so a directory of nine countries'
+returns is extracted concurrently while earlier ones are being written.
+
+The country is taken from the file name (ISO code, digest abbreviation or
+country name, e.g. `GRD.xlsx`, `SLU 2023-24.xlsx`, `Saint Lucia.xlsx`), or from
+--country for a single file. The year comes from the worksheet header.
+
+D2 (Special Schools) is not imported: its age bands (<=5, 6-10, ...) do not
+match the special_education age groups the database accepts.
+
+Usage:
+    python scripts/import_member_templates.py returns/
+    python scripts/import_member_templates.py returns/GRD.xlsx returns/LCA.xlsx
+    python scripts/import_member_templates.py "returns/Return 2024.xlsx" --country DMA
+    python scripts/import_member_templates.py returns/ --dry-run
+    python scripts/import_member_templates.py returns/ --backend copy
+    python scripts/import_member_templates.py returns/ --check
+    python scripts/import_member_templates.py returns/ --restart
+    python scripts/digest.py import templates returns/
+"""
+
+import sys
+import re
+import argparse
+import os
+from collections import defaultdict
+from contextlib import nullcontext
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from pathlib import Path
+
+from cell_delta import Delta, apply_delta, compute_delta, load_slice, summarize_counts
+from console import utf8_console
+from import_audit import AuditTrail, delta_change_set
+from import_checkpoint import Checkpoint
+from import_metrics import ImportMetrics
+from pg_copy_loader import CopyLoader
+from profiling import add_profile_argument, profiled
+from supabase_client import get_client, request_stats
+from template_mapping import extract_workbook, load_mappings, mapped_levels, table_fields
+
+# Note: the Supabase client is created in the functions that need it rather than
+# at import time, because worker processes re-import this module on Windows.
+
+# File name token -> ISO country code
+COUNTRY_ALIASES = {
+    # ISO codes
+    'AIA': 'AIA', 'ATG': 'ATG', 'DMA': 'DMA', 'GRD': 'GRD', 'MSR': 'MSR',
+    'KNA': 'KNA', 'LCA': 'LCA', 'VCT': 'VCT', 'VGB': 'VGB',
+    # Digest abbreviations
+    'ANG': 'AIA', 'A&B': 'ATG', 'ANU': 'ATG', 'DOM': 'DMA', 'MON': 'MSR',
+    'SKN': 'KNA', 'SLU': 'LCA', 'SVG': 'VCT', 'VI': 'VGB', 'BVI': 'VGB',
+}
+
+# Country name fragment (lower case) -> ISO country code
+COUNTRY_NAMES = {
+    'anguilla': 'AIA',
+    'antigua': 'ATG',
+    'dominica': 'DMA',
+    'grenada': 'GRD',
+    'montserrat': 'MSR',
+    'kitts': 'KNA',
+    'lucia': 'LCA',
+    'vincent': 'VCT',
+    'virgin': 'VGB',
+}
+
+# Write order; every table is keyed by (country_id, academic_year_id)
+TABLES = [
+    'student_enrollment',
+    'staff_qualifications',
+    'leadership_degree_holders',
+    'teacher_academic_qualifications',
+    'specialist_teachers',
+    'professional_development',
+]
+
+BATCH_SIZE = 500
+
+# Changes listed per table in a dry run
+REPORT_LINES = 20
+
+
+def find_templates(paths) -> list:
+    """Expand directories into the .xlsx files they contain"""
+    files = []
+    for path in map(Path, paths):
+        if path.is_dir():
+            files.extend(sorted(p for p in path.glob('*.xlsx') if not p.name.startswith('~$')))
+        else:
+            files.append(path)
+    return files
+
+
+def match_country(path: Path, override: str = None):
+    """ISO code of the country a return belongs to, from --country or the file name"""
+    if override:
+        return COUNTRY_ALIASES.get(override.upper())
+
+    stem = path.stem
+    for token in re.split(r'[^A-Za-z&]+', stem):
+        if token.upper() in COUNTRY_ALIASES:
+            return COUNTRY_ALIASES[token.upper()]
+    lowered = stem.lower()
+    for fragment, code in COUNTRY_NAMES.items():
+        if fragment in lowered:
+            return code
+    return None
+
+
+def prior_year_label(year_label: str) -> str:
+    """'2023-2024' -> '2022-2023'"""
+    start = int(year_label[:4])
+    return f"{start - 1}-{start}"
+
+
+def template_year(result: dict, override: str = None):
+    """Academic year label of a return, from --year or the worksheet headers"""
+    if override:
+        return override
+    for label in result['years'].values():
+        if label and re.fullmatch(r'\d{4}-\d{4}', label):
+            return label
+    return None
+
+
+def group_rows(result: dict, year_label: str) -> dict:
+    """{(table, year_label): [row, ...]} for one return, without country/year ids"""
+    grouped = defaultdict(list)
+    for cell, count in result['values']:
+        label = year_label if cell.year_offset == 0 else prior_year_label(year_label)
+        grouped[(cell.table, label)].append({**dict(cell.fields), cell.value_field: count})
+    return grouped
+
+
+def load_country_ids() -> dict:
+    """ISO country code -> countries.id"""
+    supabase = get_client()
+    result = supabase.table('countries').select('id, country_code').execute()
+    return {row['country_code']: row['id'] for row in result.data}
+
+
+def load_academic_year_ids() -> dict:
+    """year_label -> academic_years.id"""
+    supabase = get_client()
+    result = supabase.table('academic_years').select('id, year_label').execute()
+    return {row['year_label']: row['id'] for row in result.data}
+
+
+def template_scope(table: str, year_offset: int) -> dict:
+    """{'education_level': levels} the template covers for a table and year, or {} if all of it"""
+    levels = mapped_levels(table, year_offset)
+    return {'education_level': levels} if levels else {}
+
+
+def return_unit(checkpoint: Checkpoint, country_code: str, path) -> str:
+    return checkpoint.unit('return', country_code, source_file=path)
+
+
+def write_rows(table: str, country_id, year_id, rows: list, metrics: ImportMetrics, labels: dict,
+               dry_run: bool = False, audit: AuditTrail = None, source_file=None,
+               checkpoint: Checkpoint = None, unit: str = None, within: dict = None) -> Delta:
+    """Diff a return's rows for one table/year against the stored rows and write only the changes
+
+    Only stored rows `within` the template's scope (see template_scope()) are
+    compared, so rows the template has no cells for are never deleted.
+    """
+    supabase = get_client()
+    key_fields, value_field = table_fields()[table]
+
+    with metrics.stage('load_stored', table=table, **labels) as stage:
+        stored = load_slice(supabase, table, key_fields, [value_field],
+                            {'country_id': country_id, 'academic_year_id': year_id}, within)
+        stage.rows = len(stored)
+
+    delta = compute_delta(stored, rows, key_fields, [value_field])
+    if not dry_run:
+        scope = {'country_id': country_id, 'academic_year_id': year_id}
+        changes = checkpoint.begin(unit, delta) if unit else delta_change_set(delta)
+        apply_delta(supabase, table, delta, metrics, scope=scope, batch_size=BATCH_SIZE,
+                    progress=checkpoint.recorder(unit) if unit else None, **labels)
+        if audit is not None:
+            audit.add(table, changes, scope, source_file)
+            try:
+                audit.flush(supabase)
+            except Exception as e:
+                # The rows are written; only the entry is missing (it stays queued for the next flush)
+                print(f"   ❌ Could not record the import_audit entry for {table} {labels['year']}: {e}")
+                metrics.failed = True
+        if unit:
+            checkpoint.complete(unit, **delta.counts())
+    return delta
+
+
+def merge_rows(loader: CopyLoader, table: str, country_id, year_id, rows: list, metrics: ImportMetrics,
+               labels: dict, dry_run: bool = False, audit: AuditTrail = None, source_file=None,
+               checkpoint: Checkpoint = None, unit: str = None, within: dict = None) -> dict:
+    """Load a return's rows for one table/year with COPY and merge them in one statement"""
+    key_fields, value_field = table_fields()[table]
+    records = [{'country_id': country_id, 'academic_year_id': year_id, **row} for row in rows]
+    with metrics.stage('copy_merge', table=table, **labels) as stage:
+        counts = loader.merge(table, records, key_fields, [value_field],
+                              slices=[(country_id, year_id)], dry_run=dry_run, audit=audit,
+                              source_file=source_file, within=within)
+        stage.rows = len(records)
+    if unit and not dry_run:
+        checkpoint.complete(unit, **counts)
+    return counts
+
+
+def import_return(result: dict, country_code: str, year_label: str, country_ids: dict,
+                  year_ids: dict, metrics: ImportMetrics, dry_run: bool = False,
+                  loader: CopyLoader = None, audit: AuditTrail = None, source_file=None,
+                  checkpoint: Checkpoint = None) -> tuple:
+    """Write one extracted return; returns (cells changed, whether a table failed)
+
+    A table that fails to write is reported and marks the run failed
+    (metrics.failed); the return's other tables are still written.
+
+    With a CopyLoader the rows go straight to Postgres (--backend copy);
+    otherwise they are diffed and written through the REST API. With an
+    audit trail, each table/year written gets one import_audit entry. With a
+    checkpoint, table/years it records as written are skipped, and the
+    return is recorded as written once all of its tables are.
+    """
+    grouped = group_rows(result, year_label)
+    changed = 0
+    failed = False
+
+    for (table, label), rows in sorted(grouped.items(), key=lambda item: (TABLES.index(item[0][0]), item[0][1])):
+        year_id = year_ids.get(label)
+        if year_id is None:
+            print(f"   ⚠️  Skipping {table} {label}: academic year not found")
+            continue
+
+        unit = checkpoint.unit(table, country_code, label, source_file=source_file) if checkpoint else None
+        if unit and checkpoint.is_done(unit):
+            print(f"   ✓ {table} {label}: already imported (checkpoint)")
+            continue
+
+        labels = {'country': country_code, 'year': label}
+        within = template_scope(table, 0 if label == year_label else -1)
+        try:
+            if loader is not None:
+                counts = merge_rows(loader, table, country_ids[country_code], year_id, rows, metrics, labels, dry_run,
+                                    audit, source_file, checkpoint, unit, within)
+                report = []
+            else:
+                delta = write_rows(table, country_ids[country_code], year_id, rows, metrics, labels, dry_run,
+                                   audit, source_file, checkpoint, unit, within)
+                counts, report = delta.counts(), delta.report_lines(limit=REPORT_LINES)
+        except Exception as e:
+            print(f"   ❌ Error writing {table} {label}: {e}")
+            failed = True
+            metrics.failed = True
+            continue
+
+        changed += counts['inserted'] + counts['updated'] + counts['deleted']
+        print(f"   {'•' if dry_run else '✓'} {table} {label}: {summarize_counts(counts)}")
+        for line in report if dry_run else []:
+            print(f"      {line}")
+
+    if checkpoint is not None:
+        if failed:
+            checkpoint.fail()
+        else:
+            checkpoint.complete(return_unit(checkpoint, country_code, source_file))
+    return changed, failed
+
+
+def import_templates(paths, country: str = None, year: str = None, workers: int = None,
+                     dry_run: bool = False, metrics: ImportMetrics = None, backend: str = 'rest',
+                     check: bool = False, audit: bool = True, checkpoint: Checkpoint = None):
+    """Extract every return in `paths` concurrently and write each as it finishes
+
+    With `check`, the imported countries and years are then run through the
+    data-quality checks (data_quality.py). With `audit`, the changes are
+    recorded in import_audit (import_audit.py). With a `checkpoint`, returns
+    and tables it records as written are skipped (import_checkpoint.py).
+    """
+    if metrics is None:
+        metrics = ImportMetrics('member_templates')
+
+    print("\n" + "=" * 80)
+    print("📥 IMPORTING MEMBER-STATE TEMPLATES")
+    print("=" * 80)
+
+    files = find_templates(paths)
+    if not files:
+        print("\n⚠️  No .xlsx files found")
+        return 0
+    if country and len(files) > 1:
+        raise ValueError("--country can only be used with a single file")
+
+    # Resolve every return to a country before doing any work
+    countries = {}
+    for path in files:
+        code = match_country(path, country)
+        if code is None:
+            print(f"   ⚠️  Skipping {path.name}: cannot tell which country it belongs to (use --country)")
+            continue
+        countries[path] = code
+    if checkpoint is not None and not dry_run:
+        for path, code in list(countries.items()):
+            if checkpoint.is_done(return_unit(checkpoint, code, path)):
+                print(f"   ✓ {path.name}: already imported (checkpoint)")
+                del countries[path]
+    else:
+        checkpoint = None
+    if not countries:
+        return 0
+
+    _, skipped = load_mappings()
+    for table, reason in skipped.items():
+        print(f"   ⚠️  Not importing {table}: {reason}")
+
+    country_ids = load_country_ids()
+    year_ids = load_academic_year_ids()
+
+    workers = workers or min(len(countries), os.cpu_count() or 1)
+    print(f"\n📂 Extracting {len(countries)} returns with {workers} workers...")
+
+    total = 0
+    imported = set()
+    trail = AuditTrail('member_templates') if audit and not dry_run else None
+    loader = CopyLoader() if backend == 'copy' else None
+    with ProcessPoolExecutor(max_workers=workers) as pool, loader or nullcontext():
+        futures = {pool.submit(extract_workbook, str(path)): path for path in countries}
+        for future in as_completed(futures):
+            path = futures[future]
+            code = countries[path]
+            print(f"\n📄 {path.name} → {code}")
+
+            try:
+                result = future.result()
+            except Exception as e:
+                print(f"   ❌ Could not read workbook: {e}")
+                metrics.failed = True
+                if checkpoint is not None:
+                    checkpoint.fail()
+                continue
+
+            metrics.record('extract', result['seconds'], rows=len(result['values']),
+                           bytes=result['bytes'], country=code)
+            for sheet in result['missing_sheets']:
+                print(f"   ⚠️  Worksheet not found: {sheet}")
+
+            year_label = template_year(result, year)
+            if year_label is None:
+                print("   ⚠️  Skipping: no academic year in the worksheet headers (use --year)")
+                continue
+            if code not in country_ids:
+                print(f"   ⚠️  Skipping: country not found: {code}")
+                continue
+
+            print(f"   Year: {year_label}, {len(result['values'])} values")
+            changed, failed = import_return(result, code, year_label, country_ids, year_ids, metrics, dry_run,
+                                            loader, trail, path, checkpoint)
+            total += changed
+            if not failed:
+                imported.add((code, year_label))
+
+    action = "Would change" if dry_run else "Changed"
+    if metrics.failed:
+        print(f"\n❌ {action} {total} cells from {len(countries)} returns; some could not be read or written")
+    else:
+        print(f"\n✅ {action} {total} cells from {len(countries)} returns")
+    if trail is not None:
+        print(f"   🧾 {trail.summary()}")
+    if check and imported and not dry_run:
+        from data_quality import check_after_import
+        check_after_import(metrics, countries={code for code, _ in imported},
+                           years={label for _, label in imported})
+    return total
+
+
+def main():
+    utf8_console()
+
+    parser = argparse.ArgumentParser(description='Import completed member-state data templates into Supabase')
+    parser.add_argument('paths', nargs='+', help='Returned template workbooks, or directories of them')
+    parser.add_argument('--country', help='Country code for a single file whose name does not identify it')
+    parser.add_argument('--year', help='Academic year of the returns, e.g. 2023-2024 (default: from the worksheet header)')
+    parser.add_argument('--workers', type=int, help='Worker processes for parsing (default: one per file, up to CPU count)')
+    parser.add_argument('--dry-run', action='store_true', help='Extract and list the cells that would change, without writing')
+    parser.add_argument('--backend', choices=['rest', 'copy'], default='rest',
+                        help='rest: write through the Supabase API (default); copy: COPY straight into Postgres '
+                             '(needs psycopg and DATABASE_URL, see pg_copy_loader.py)')
+    parser.add_argument('--metrics', metavar='PATH',
+                        help="Append per-stage metrics as JSON lines to PATH ('-' for stderr)")
+    parser.add_argument('--prometheus', metavar='PATH',
+                        help='Write a Prometheus text-format metrics file to PATH when the run ends')
+    parser.add_argument('--no-audit', action='store_true',
+                        help='Do not record the changes in import_audit (see import_audit.py)')
+    parser.add_argument('--restart', action='store_true',
+                        help='Ignore the saved progress of an interrupted run and import every return again')
+    parser.add_argument('--check', action='store_true',
+                        help='After writing, rank anomalies in the imported countries and years '
+                             '(data_quality.py, needs NumPy)')
+    add_profile_argument(parser)
+    args = parser.parse_args()
+
+    metrics = ImportMetrics('member_templates', jsonl_path=args.metrics, prometheus_path=args.prometheus,
+                            request_counter=lambda: request_stats.requests)
+    checkpoint = None if args.dry_run else Checkpoint.for_importer('member_templates', restart=args.restart)
+    try:
+        with profiled(Path.cwd() / 'import_member_templates', mode=args.profile):
+            import_templates(args.paths, args.country, args.year, args.workers, args.dry_run, metrics,
+                             args.backend, args.check, not args.no_audit, checkpoint)
+        if checkpoint is not None:
+            checkpoint.finish()
+        if metrics.failed:
+            metrics.close()
+            print("\n❌ Import finished with errors (see above)")
+            sys.exit(1)
+        metrics.close()
+        print("\n" + "=" * 80)
+        print("✨ Import complete!")
+        print(f"   🌐 Supabase: {request_stats.summary()}")
+        print("=" * 80 + "\n")
+    except Exception as e:
+        metrics.close(failed=True)
+        print(f"\n❌ Error during import: {e}")
+        import traceback
+        traceback.print_exc()
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
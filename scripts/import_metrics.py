@@ -0,0 +1,210 @@
+"""
+Per-stage timing and metrics for the import scripts
+
+Wrap each stage of an import in `metrics.stage(...)` to record its wall time,
+row count, byte count and outcome. Every stage is written as one JSON line
+(to a file, or stderr with '-'), and at the end of the run an optional
+Prometheus text-format file is written for the node_exporter textfile
+collector, so a slow or failing backfill can be graphed and alerted on.
+
+Usage:
+    from import_metrics import ImportMetrics
+
+    metrics = ImportMetrics('chapter1', jsonl_path='import.jsonl',
+                            prometheus_path='digest_import.prom')
+    with metrics.stage('load', file='2022-23.xlsx') as stage:
+        wb = openpyxl.load_workbook(path)
+        stage.bytes = path.stat().st_size
+    ...
+    metrics.close()
+
+JSON line fields: run, stage, labels, status (ok/error), seconds, rows, bytes,
+requests (HTTP requests made during the stage, if a counter is given), ts.
+"""
+
+import json
+import os
+import sys
+import tempfile
+import time
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from pathlib import Path
+
+# Labels that identify one occurrence of a stage rather than a series,
+# dropped when aggregating for Prometheus
+PER_EVENT_LABELS = {'batch'}
+
+
+class StageRecord:
+    """Counters for one stage; set `rows` and `bytes` inside the `with` block"""
+
+    __slots__ = ('stage', 'labels', 'rows', 'bytes', 'requests', 'seconds', 'status')
+
+    def __init__(self, stage: str, labels: dict):
+        self.stage = stage
+        self.labels = labels
+        self.rows = 0
+        self.bytes = 0
+        self.requests = None
+        self.seconds = 0.0
+        self.status = 'ok'
+
+
+class ImportMetrics:
+    """Collects stage records for one import run and writes them out"""
+
+    def __init__(self, run: str, jsonl_path: str = None, prometheus_path: str = None,
+                 request_counter=None):
+        """
+        Args:
+            run: Name of the import (e.g. 'chapter1'), used as a label everywhere
+            jsonl_path: File to append JSON lines to, '-' for stderr, None to disable
+            prometheus_path: Prometheus text file written on close(), None to disable
+            request_counter: Optional callable returning a running HTTP request count
+        """
+        self.run = run
+        self.prometheus_path = prometheus_path
+        self.request_counter = request_counter
+        self.records = []
+        self.started = time.time()
+        self.failed = False
+
+        if jsonl_path == '-':
+            self.jsonl = sys.stderr
+        elif jsonl_path:
+            self.jsonl = open(jsonl_path, 'a', encoding='utf-8')
+        else:
+            self.jsonl = None
+
+    @contextmanager
+    def stage(self, name: str, **labels):
+        """Time the enclosed block as stage `name`; extra kwargs become labels"""
+        record = StageRecord(name, {key: str(value) for key, value in labels.items()})
+        requests_before = self.request_counter() if self.request_counter else None
+        start = time.perf_counter()
+        try:
+            yield record
+        except BaseException:
+            record.status = 'error'
+            self.failed = True
+            raise
+        finally:
+            record.seconds = time.perf_counter() - start
+            if requests_before is not None:
+                record.requests = self.request_counter() - requests_before
+            self.records.append(record)
+            self._write_json(record)
+
+    def record(self, name: str, seconds: float, rows: int = 0, bytes: int = 0, **labels):
+        """Record a stage timed elsewhere (e.g. in a worker process)"""
+        record = StageRecord(name, {key: str(value) for key, value in labels.items()})
+        record.seconds = seconds
+        record.rows = rows
+        record.bytes = bytes
+        self.records.append(record)
+        self._write_json(record)
+
+    def _write_json(self, record: StageRecord):
+        if self.jsonl is None:
+            return
+        line = {
+            'run': self.run,
+            'stage': record.stage,
+            'labels': record.labels,
+            'status': record.status,
+            'seconds': round(record.seconds, 6),
+            'rows': record.rows,
+            'bytes': record.bytes,
+            'ts': datetime.now(timezone.utc).isoformat(timespec='milliseconds'),
+        }
+        if record.requests is not None:
+            line['requests'] = record.requests
+        self.jsonl.write(json.dumps(line) + '\n')
+        self.jsonl.flush()
+
+    def totals_by_stage(self) -> dict:
+        """Stage name -> {'count', 'seconds', 'rows', 'bytes'} summed over the run"""
+        totals = {}
+        for record in self.records:
+            total = totals.setdefault(record.stage, {'count': 0, 'seconds': 0.0, 'rows': 0, 'bytes': 0})
+            total['count'] += 1
+            total['seconds'] += record.seconds
+            total['rows'] += record.rows
+            total['bytes'] += record.bytes
+        return totals
+
+    def summary_lines(self) -> list:
+        """Human-readable per-stage totals, slowest first"""
+        totals = sorted(self.totals_by_stage().items(), key=lambda item: -item[1]['seconds'])
+        return [f"{stage:<20} {t['seconds']:>8.3f}s  x{t['count']:<4} {t['rows']:>7} rows  {t['bytes']:>10} bytes"
+                for stage, t in totals]
+
+    def prometheus_text(self) -> str:
+        """Render the run in Prometheus text exposition format"""
+        series = {}
+        for record in self.records:
+            labels = {key: value for key, value in record.labels.items() if key not in PER_EVENT_LABELS}
+            key = (record.stage, tuple(sorted(labels.items())))
+            values = series.setdefault(key, {'seconds': 0.0, 'rows': 0, 'bytes': 0, 'runs': 0, 'errors': 0})
+            values['seconds'] += record.seconds
+            values['rows'] += record.rows
+            values['bytes'] += record.bytes
+            values['runs'] += 1
+            values['errors'] += int(record.status == 'error')
+
+        metrics = [
+            ('seconds', 'digest_import_stage_seconds', 'Wall time spent in the stage'),
+            ('rows', 'digest_import_stage_rows', 'Rows handled by the stage'),
+            ('bytes', 'digest_import_stage_bytes', 'Bytes read or sent by the stage'),
+            ('runs', 'digest_import_stage_executions', 'Times the stage ran'),
+            ('errors', 'digest_import_stage_errors', 'Times the stage raised'),
+        ]
+        lines = []
+        for field, name, help_text in metrics:
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} gauge")
+            for (stage, labels), values in sorted(series.items()):
+                label_text = format_labels({'run': self.run, 'stage': stage, **dict(labels)})
+                lines.append(f"{name}{label_text} {values[field]}")
+
+        run_labels = format_labels({'run': self.run})
+        lines += [
+            "# HELP digest_import_last_run_timestamp_seconds Unix time the run finished",
+            "# TYPE digest_import_last_run_timestamp_seconds gauge",
+            f"digest_import_last_run_timestamp_seconds{run_labels} {time.time():.3f}",
+            "# HELP digest_import_last_run_duration_seconds Total wall time of the run",
+            "# TYPE digest_import_last_run_duration_seconds gauge",
+            f"digest_import_last_run_duration_seconds{run_labels} {time.time() - self.started:.3f}",
+            "# HELP digest_import_last_run_success 1 if the run finished without errors",
+            "# TYPE digest_import_last_run_success gauge",
+            f"digest_import_last_run_success{run_labels} {0 if self.failed else 1}",
+        ]
+        return '\n'.join(lines) + '\n'
+
+    def close(self, failed: bool = False):
+        """Flush the JSON lines sink and write the Prometheus file, if configured"""
+        self.failed = self.failed or failed
+        if self.prometheus_path:
+            write_atomic(self.prometheus_path, self.prometheus_text())
+        if self.jsonl is not None and self.jsonl is not sys.stderr:
+            self.jsonl.close()
+        self.jsonl = None
+
+
+def format_labels(labels: dict) -> str:
+    """Prometheus label set, with values escaped"""
+    def escape(value: str) -> str:
+        return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+    return '{' + ','.join(f'{key}="{escape(str(value))}"' for key, value in labels.items()) + '}'
+
+
+def write_atomic(path: str, text: str):
+    """Write via a temp file and rename, so collectors never see a partial file"""
+    target = Path(path)
+    fd, tmp_path = tempfile.mkstemp(dir=target.parent, prefix=f'.{target.name}.')
+    with os.fdopen(fd, 'w', encoding='utf-8') as f:
+        f.write(text)
+    os.chmod(tmp_path, 0o644)
+    os.replace(tmp_path, target)
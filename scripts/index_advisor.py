@@ -0,0 +1,681 @@
+"""
+Index advisor: check the schema's indexes against the queries we actually run
+
+The only index in the schema files for most tables is (country_id,
+academic_year_id), while the dashboard and the scripts filter on
+academic_year_id alone, on is_active, on education_level, and page through
+tables ordered by id. This tool finds out which indexes those queries use:
+
+1. Collects query shapes from the code: PostgREST builder chains
+   (`.table('t')` in scripts/*.py, `.from('t')` in lib/ and app/) and
+   `iter_table()` calls, recording the table, projection, filter columns,
+   ordering, limit and any literal filter values. Calls whose table is a
+   variable (cell_delta's slice loads) are expanded to every table with the
+   filtered columns.
+2. Builds a scaled local sandbox (local_postgres.LocalSandbox) and replays
+   each shape with representative values under EXPLAIN (ANALYZE, BUFFERS).
+3. Flags sequential scans of large tables, scans that throw away most of the
+   rows they read, and explicit sorts, and lists indexes no shape used
+   (separating those that back a constraint and those made redundant by a
+   longer index with the same leading columns).
+4. For each flagged shape, tries composite, covering (INCLUDE) and partial
+   indexes inside a rolled-back transaction and keeps the best one that the
+   planner uses and that is at least --min-speedup faster.
+
+Shapes are replayed as the table owner, so RLS is not involved; the cost of
+the policies is what rls_benchmark.py measures.
+
+Proposals are printed with before/after timings and can be written as SQL
+(--output) for review; nothing is changed outside the sandbox. The legacy
+create_database_schema.sql is not used by the app and is not checked.
+
+Needs psycopg 3 and a local Postgres, as for local_postgres.py (--list-shapes needs neither).
+
+Usage:
+    python index_advisor.py --dsn postgresql://postgres@localhost:5432/postgres
+    python index_advisor.py --countries 27 --years 20 --output index_proposals.sql
+    python index_advisor.py --list-shapes          # just show the collected shapes
+    python index_advisor.py --report index_report.json
+"""
+
+import argparse
+import json
+import re
+import statistics
+import sys
+import time
+from dataclasses import dataclass, field
+from pathlib import Path
+
+from console import utf8_console
+from digest_records import schema_tables
+from import_metrics import write_atomic
+from local_postgres import LocalSandbox, SCHEMA_DIR, psycopg, sql
+from pg_copy_loader import SCOPE_FIELDS
+from rls_benchmark import plan_nodes
+from table_reader import DEFAULT_PAGE_SIZE
+
+# Where the query shapes come from, relative to the repository root
+SOURCE_GLOBS = ['scripts/*.py', 'lib/**/*.ts', 'app/**/*.tsx', 'components/**/*.tsx', 'hooks/**/*.ts']
+
+TABLE_CALL = re.compile(r"""\.(?:table|from)\(\s*(['"])(\w+)\1\s*\)""")
+ITER_TABLE_CALL = re.compile(r'\biter_table\(')
+METHOD = re.compile(r'\s*\.\s*(\w+)\s*\(')
+FILTER_METHODS = {'eq': '=', 'neq': '<>', 'gt': '>', 'gte': '>=', 'lt': '<', 'lte': '<=',
+                  'is_': 'IS', 'is': 'IS', 'in_': 'IN', 'in': 'IN'}
+WRITE_METHODS = {'insert', 'upsert', 'update', 'delete'}
+
+# Not query code: this module's own patterns, table_reader's usage example
+SKIP_SOURCES = {'scripts/index_advisor.py', 'scripts/table_reader.py'}
+# Among candidates within this factor of the fastest, the smallest wins
+TIME_TOLERANCE = 1.1
+
+# Columns with at most this many distinct values are partial-index candidates
+PARTIAL_MAX_DISTINCT = 20
+# Projections up to this many extra columns are tried as covering indexes
+MAX_INCLUDE = 6
+
+
+@dataclass
+class QueryShape:
+    """One query pattern: table, projection, filters, ordering and where it is used"""
+
+    table: str
+    action: str = 'select'
+    columns: str = '*'
+    filters: tuple = ()         # ((column, operator), ...)
+    order: tuple = ()
+    limit: int = None
+    literals: dict = field(default_factory=dict)   # column -> value written in the code
+    sources: list = field(default_factory=list)
+
+    def key(self) -> tuple:
+        return (self.table, self.action, self.columns, self.filters, self.order, self.limit,
+                tuple(sorted(self.literals.items(), key=str)))
+
+    def describe(self) -> str:
+        where = ' AND '.join(f"{column} {operator}" for column, operator in self.filters)
+        text = {'select': f"SELECT {self.columns} FROM {self.table}",
+                'delete': f"DELETE FROM {self.table}"}.get(self.action, f"UPDATE {self.table}")
+        if where:
+            text += f" WHERE {where}"
+        if self.order:
+            text += f" ORDER BY {', '.join(self.order)}"
+        if self.limit:
+            text += f" LIMIT {self.limit}"
+        return text
+
+
+# ---------------------------------------------------------------------------
+# Collecting shapes from the source
+# ---------------------------------------------------------------------------
+
+def balanced_arguments(text: str, start: int):
+    """(argument text, index after the closing parenthesis) for a call opened at text[start - 1]"""
+    depth = 1
+    position = start
+    quote = None
+    while position < len(text) and depth:
+        char = text[position]
+        if quote:
+            if text.startswith(quote, position):
+                position += len(quote) - 1
+                quote = None
+            elif char == '\\':
+                position += 1
+        elif text.startswith("'''", position) or text.startswith('"""', position):
+            quote = text[position:position + 3]
+            position += 2
+        elif char in '\'"`':
+            quote = char
+        elif char in '([{':
+            depth += 1
+        elif char in ')]}':
+            depth -= 1
+        position += 1
+    return text[start:position - 1], position
+
+
+def string_literal(text: str):
+    """Content of a leading string literal (any Python/JS quoting), or None"""
+    match = re.match(r'\s*(\'\'\'|"""|[\'"`])(.*?)\1', text, re.S)
+    return match.group(2) if match else None
+
+
+def value_literal(text: str):
+    """Python value of a simple literal argument, or None for expressions"""
+    text = text.strip()
+    if text in ('True', 'true'):
+        return True
+    if text in ('False', 'false'):
+        return False
+    if re.fullmatch(r'-?\d+', text):
+        return int(text)
+    literal = string_literal(text)
+    if literal is not None and re.fullmatch(r'\s*([\'"])[^\'"]*\1\s*', text):
+        return literal
+    return None
+
+
+def split_arguments(text: str) -> list:
+    """Top-level comma-separated arguments of a call"""
+    arguments, depth, current, quote = [], 0, '', None
+    for char in text:
+        if quote:
+            quote = None if char == quote else quote
+        elif char in '\'"`':
+            quote = char
+        elif char in '([{':
+            depth += 1
+        elif char in ')]}':
+            depth -= 1
+        elif char == ',' and depth == 0:
+            arguments.append(current)
+            current = ''
+            continue
+        current += char
+    if current.strip():
+        arguments.append(current)
+    return arguments
+
+
+def projection(columns: str) -> str:
+    """Top-level column list of a PostgREST select, without embedded resources"""
+    columns = re.sub(r'\w+\s*(?:!\w+)?\s*\([^()]*\)', '', columns)
+    names = [name.strip() for name in columns.replace('\n', ' ').split(',') if name.strip()]
+    return '*' if not names or '*' in names else ', '.join(names)
+
+
+def chain_shape(table: str, text: str, position: int):
+    """Shape of the builder chain following `.table(name)` at text[position:]"""
+    shape = QueryShape(table)
+    filters, order = [], []
+    while True:
+        method = METHOD.match(text, position)
+        if not method:
+            break
+        arguments, position = balanced_arguments(text, method.end())
+        name = method.group(1)
+        first = string_literal(arguments)
+        if name == 'select':
+            shape.columns = projection(first or '*')
+        elif name in FILTER_METHODS and first:
+            filters.append((first, FILTER_METHODS[name]))
+            parts = split_arguments(arguments)
+            value = value_literal(parts[1]) if len(parts) > 1 else None
+            if value is not None and name in ('eq', 'is_', 'is') and not first.endswith('id'):
+                shape.literals[first] = value
+        elif name == 'order' and first:
+            order.append(first)
+        elif name == 'limit':
+            shape.limit = value_literal(arguments)
+        elif name in WRITE_METHODS:
+            shape.action = name
+        elif name == 'execute':
+            break
+    shape.filters = tuple(dict.fromkeys(filters))
+    shape.order = tuple(order)
+    return shape
+
+
+def iter_table_shape(arguments: str):
+    """(table or None, shape) of an iter_table(client, table, columns=..., filters=...) call"""
+    parts = split_arguments(arguments)
+    table = string_literal(parts[1]) if len(parts) > 1 else None
+    shape = QueryShape(table, order=('id',), limit=DEFAULT_PAGE_SIZE)
+    for part in parts[2:]:
+        name, _, value = part.partition('=')
+        name = name.strip()
+        if name == 'columns':
+            literal = string_literal(value)
+            if literal:
+                names = projection(literal)
+                shape.columns = names if names == '*' or 'id' in names.split(', ') else f"id, {names}"
+        elif name == 'filters':
+            pairs = re.findall(r'([\'"])(\w+)\1\s*:\s*([^,}]+)', value)
+            shape.filters = tuple((column, '=') for _, column, _ in pairs) or None
+            for _, column, raw in pairs:
+                literal = value_literal(raw)
+                if literal is not None and not column.endswith('id'):
+                    shape.literals[column] = literal
+    return table, shape
+
+
+def collect_shapes(root: Path = SCHEMA_DIR) -> list:
+    """QueryShapes used anywhere in SOURCE_GLOBS; unresolved tables have table=None"""
+    shapes = []
+    for pattern in SOURCE_GLOBS:
+        for path in sorted(root.glob(pattern)):
+            if 'node_modules' in path.parts:
+                continue
+            relative = path.relative_to(root).as_posix()
+            if relative in SKIP_SOURCES:
+                continue
+            text = path.read_text(encoding='utf-8', errors='replace')
+            for match in TABLE_CALL.finditer(text):
+                shape = chain_shape(match.group(2), text, match.end())
+                shape.sources.append(f"{relative}:{text.count(chr(10), 0, match.start()) + 1}")
+                shapes.append(shape)
+            if path.suffix == '.py':
+                for match in ITER_TABLE_CALL.finditer(text):
+                    if text[max(match.start() - 4, 0):match.start()] == 'def ':
+                        continue
+                    arguments, _ = balanced_arguments(text, match.end())
+                    table, shape = iter_table_shape(arguments)
+                    shape.table = table
+                    shape.sources.append(f"{relative}:{text.count(chr(10), 0, match.start()) + 1}")
+                    shapes.append(shape)
+    return shapes
+
+
+def resolve_shapes(shapes, table_columns: dict) -> tuple:
+    """(shapes, skipped) with variable tables expanded and shapes merged by key
+
+    A shape without a table name is replayed on every table that has its
+    filter columns; one without literal filter keys (cell_delta.load_slice)
+    on every table with SCOPE_FIELDS, the slice every import loads.
+    """
+    merged, skipped = {}, []
+    for shape in shapes:
+        if shape.filters is None:
+            shape.filters = tuple((column, '=') for column in SCOPE_FIELDS)
+        # Inserts, and upserts without filters, only probe the unique index of their conflict target
+        if shape.action == 'insert' or (shape.action == 'upsert' and not shape.filters):
+            continue
+        if shape.table:
+            candidates = [shape]
+        else:
+            needed = {column for column, _ in shape.filters}
+            candidates = [QueryShape(table, shape.action, shape.columns, shape.filters, shape.order,
+                                     shape.limit, dict(shape.literals), list(shape.sources))
+                          for table, columns in table_columns.items() if needed and needed <= set(columns)]
+        for candidate in candidates:
+            columns = table_columns.get(candidate.table)
+            used = {column for column, _ in candidate.filters} | set(candidate.order)
+            if candidate.columns != '*':
+                used |= set(candidate.columns.split(', '))
+            if columns is None or not used <= set(columns):
+                skipped.append(candidate)
+                continue
+            existing = merged.setdefault(candidate.key(), candidate)
+            if existing is not candidate:
+                existing.sources.extend(source for source in candidate.sources if source not in existing.sources)
+    return list(merged.values()), skipped
+
+
+# ---------------------------------------------------------------------------
+# Replaying shapes
+# ---------------------------------------------------------------------------
+
+def statement_for(shape: QueryShape, values: dict, table_columns=()):
+    """Executable SQL for a shape with the given filter values
+
+    Updates set updated_at where the table has it, otherwise id to itself:
+    the cost being measured is finding the rows.
+    """
+    table = sql.Identifier(shape.table)
+    conditions = sql.SQL(' AND ').join(
+        sql.SQL('{} {} {}').format(sql.Identifier(column), sql.SQL(operator),
+                                   sql.Literal(values[column]) if operator != 'IN' else
+                                   sql.SQL('({})').format(sql.Literal(values[column])))
+        for column, operator in shape.filters)
+    where = sql.SQL(' WHERE {}').format(conditions) if shape.filters else sql.SQL('')
+    if shape.action == 'delete':
+        return sql.SQL('DELETE FROM {}{}').format(table, where)
+    if shape.action in ('update', 'upsert'):
+        if 'updated_at' in table_columns:
+            return sql.SQL('UPDATE {} SET updated_at = now(){}').format(table, where)
+        return sql.SQL('UPDATE {} SET id = id{}').format(table, where)
+    columns = sql.SQL('*') if shape.columns == '*' else sql.SQL(', ').join(
+        sql.Identifier(column) for column in shape.columns.split(', '))
+    statement = sql.SQL('SELECT {} FROM {}{}').format(columns, table, where)
+    if shape.order:
+        statement += sql.SQL(' ORDER BY {}').format(sql.SQL(', ').join(map(sql.Identifier, shape.order)))
+    if shape.limit:
+        statement += sql.SQL(' LIMIT {}').format(sql.Literal(shape.limit))
+    return statement
+
+
+def representative_values(conn, shape: QueryShape) -> dict:
+    """Filter values taken from one existing row, so combined filters match something"""
+    columns = [column for column, _ in shape.filters if column not in shape.literals]
+    values = dict(shape.literals)
+    if columns:
+        row = conn.execute(sql.SQL('SELECT {} FROM {} ORDER BY random() LIMIT 1').format(
+            sql.SQL(', ').join(map(sql.Identifier, columns)), sql.Identifier(shape.table))).fetchone()
+        values.update(zip(columns, row or [None] * len(columns)))
+    return values
+
+
+def explain(conn, statement, repeat: int) -> tuple:
+    """(median execution ms, last JSON plan) over `repeat` runs after a warm-up; writes roll back"""
+    times, plan = [], None
+    for _ in range(repeat + 1):
+        with conn.transaction(force_rollback=True):
+            plan = conn.execute(sql.SQL('EXPLAIN (ANALYZE, BUFFERS, FORMAT JSON) ') + statement).fetchone()[0]
+        times.append(plan[0]['Execution Time'])
+    return statistics.median(times[1:]), plan
+
+
+def plan_findings(plan: list, table_rows: dict, min_rows: int) -> list:
+    """Problems worth an index in one plan"""
+    findings = []
+    nodes = list(plan_nodes(plan[0]['Plan']))
+    returned = plan[0]['Plan'].get('Actual Rows', 0)
+    for node in nodes:
+        relation = node.get('Relation Name')
+        loops = node.get('Actual Loops', 1)
+        removed = node.get('Rows Removed by Filter', 0) * loops
+        if node['Node Type'] == 'Seq Scan' and table_rows.get(relation, 0) >= min_rows:
+            findings.append(f"seq scan of {relation} ({table_rows[relation]:,} rows)")
+        elif removed >= min_rows and removed >= 10 * max(returned, 1):
+            findings.append(f"{node['Node Type'].lower()} of {relation} discards {removed:,} rows")
+        if node['Node Type'] in ('Sort', 'Incremental Sort') and node.get('Actual Rows', 0) * loops >= min_rows:
+            findings.append(f"sorts {node['Actual Rows'] * loops:,} rows")
+    return findings
+
+
+def used_indexes(plan: list) -> set:
+    return {node['Index Name'] for node in plan_nodes(plan[0]['Plan']) if 'Index Name' in node}
+
+
+# ---------------------------------------------------------------------------
+# Candidate indexes
+# ---------------------------------------------------------------------------
+
+@dataclass
+class Candidate:
+    table: str
+    columns: tuple
+    include: tuple = ()
+    predicate: tuple = None     # (column, value) for a partial index
+
+    @property
+    def name(self) -> str:
+        parts = ['idx', self.table, *self.columns]
+        if self.include:
+            parts.append('incl')
+        if self.predicate:
+            parts += ['where', self.predicate[0], str(self.predicate[1]).lower()]
+        return re.sub(r'\W', '_', '_'.join(parts))[:63]
+
+    def ddl(self, concurrently: bool = False):
+        statement = sql.SQL('CREATE INDEX {}{} ON {} ({})').format(
+            sql.SQL('CONCURRENTLY IF NOT EXISTS ' if concurrently else ''),
+            sql.Identifier(self.name), sql.Identifier(self.table),
+            sql.SQL(', ').join(map(sql.Identifier, self.columns)))
+        if self.include:
+            statement += sql.SQL(' INCLUDE ({})').format(sql.SQL(', ').join(map(sql.Identifier, self.include)))
+        if self.predicate:
+            statement += sql.SQL(' WHERE {} = {}').format(sql.Identifier(self.predicate[0]),
+                                                          sql.Literal(self.predicate[1]))
+        return statement
+
+
+def distinct_values(conn, table: str) -> dict:
+    """{column: estimated distinct values} from pg_stats"""
+    rows = conn.execute("SELECT s.attname, s.n_distinct, c.reltuples FROM pg_stats s "
+                        "JOIN pg_class c ON c.relname = s.tablename "
+                        "WHERE s.schemaname = 'public' AND s.tablename = %s", (table,)).fetchall()
+    return {column: n_distinct if n_distinct >= 0 else -n_distinct * reltuples
+            for column, n_distinct, reltuples in rows}
+
+
+def candidates_for(shape: QueryShape, distinct: dict) -> list:
+    """Composite, covering and partial indexes that could serve a shape"""
+    equality = [column for column, operator in shape.filters if operator in ('=', 'IS', 'IN')]
+    ranges = [column for column, operator in shape.filters if operator in ('>', '>=', '<', '<=')]
+    # Most selective equality columns first, then ranges, then the ordering
+    key = sorted(dict.fromkeys(equality), key=lambda column: -distinct.get(column, 0))
+    key += [column for column in ranges + list(shape.order) if column not in key]
+    if not key:
+        return []
+
+    candidates = [Candidate(shape.table, tuple(key))]
+    if shape.columns != '*' and shape.action == 'select':
+        extra = tuple(column for column in shape.columns.split(', ') if column not in key)
+        if 0 < len(extra) <= MAX_INCLUDE:
+            candidates.append(Candidate(shape.table, tuple(key), extra))
+    for column, value in shape.literals.items():
+        if distinct.get(column, PARTIAL_MAX_DISTINCT + 1) <= PARTIAL_MAX_DISTINCT and (column, '=') in shape.filters:
+            rest = tuple(other for other in key if other != column) or ('id',)
+            candidates.append(Candidate(shape.table, rest, predicate=(column, value)))
+    return candidates
+
+
+def try_candidate(conn, candidate: Candidate, statement, repeat: int) -> dict:
+    """Median time of a statement with the candidate index in place (rolled back)"""
+    with conn.transaction(force_rollback=True):
+        conn.execute(candidate.ddl())
+        size = conn.execute('SELECT pg_relation_size(%s::regclass)', (candidate.name,)).fetchone()[0]
+        median, plan = explain(conn, statement, repeat)
+    return {'ms': median, 'used': candidate.name in used_indexes(plan), 'size': size}
+
+
+# ---------------------------------------------------------------------------
+# Existing indexes
+# ---------------------------------------------------------------------------
+
+def index_inventory(conn) -> list:
+    return [dict(zip(('name', 'table', 'keys', 'unique', 'partial', 'size', 'definition'), row))
+            for row in conn.execute("""
+        SELECT c.relname, t.relname, string_to_array(i.indkey::text, ' ')::int[],
+               i.indisunique OR i.indisprimary, i.indpred IS NOT NULL,
+               pg_relation_size(i.indexrelid), pg_get_indexdef(i.indexrelid)
+        FROM pg_index i
+        JOIN pg_class c ON c.oid = i.indexrelid
+        JOIN pg_class t ON t.oid = i.indrelid
+        JOIN pg_namespace n ON n.oid = t.relnamespace
+        WHERE n.nspname = 'public'
+        ORDER BY t.relname, c.relname""")]
+
+
+def classify_indexes(inventory: list, used: set) -> dict:
+    """{index name: 'used' | 'unused' | 'constraint' | 'redundant (<index>)'}"""
+    status = {}
+    for index in inventory:
+        longer = next((other for other in inventory
+                       if other is not index and other['table'] == index['table'] and not other['partial']
+                       and len(other['keys']) > len(index['keys'])
+                       and other['keys'][:len(index['keys'])] == index['keys']), None)
+        if index['name'] in used:
+            status[index['name']] = 'used'
+        elif index['unique']:
+            status[index['name']] = 'constraint'
+        elif longer and not index['partial']:
+            status[index['name']] = f"redundant ({longer['name']})"
+        else:
+            status[index['name']] = 'unused'
+    return status
+
+
+# ---------------------------------------------------------------------------
+# Advisor
+# ---------------------------------------------------------------------------
+
+def advise(sandbox: LocalSandbox, shapes, repeat: int, min_rows: int, min_speedup: float) -> dict:
+    with sandbox.connect(autocommit=True) as conn:
+        conn.execute('VACUUM ANALYZE')  # visibility map, so index-only scans are possible
+    with sandbox.connect() as conn:
+        table_rows = dict(conn.execute("SELECT relname, reltuples::bigint FROM pg_class c "
+                                       "JOIN pg_namespace n ON n.oid = c.relnamespace "
+                                       "WHERE n.nspname = 'public' AND c.relkind = 'r'").fetchall())
+        columns = {}
+        for table, column in conn.execute("SELECT table_name, column_name FROM information_schema.columns "
+                                          "WHERE table_schema = 'public'").fetchall():
+            columns.setdefault(table, set()).add(column)
+        results, used, proposals = [], set(), {}
+        for shape in shapes:
+            try:
+                result = advise_shape(conn, shape, columns.get(shape.table, set()), table_rows,
+                                      repeat, min_rows, min_speedup)
+            except psycopg.Error as e:
+                # One statement the sandbox rejects should not end the run
+                conn.rollback()
+                results.append({'shape': shape, 'error': str(e).strip()})
+                continue
+            used |= set(result['indexes'])
+            if 'best' in result:
+                candidate, outcome = result['best']
+                proposal = proposals.setdefault(candidate.name, {
+                    'candidate': candidate, 'size': outcome['size'], 'shapes': []})
+                proposal['shapes'].append((shape, result['ms'], outcome['ms']))
+            results.append(result)
+        inventory = index_inventory(conn)
+    return {'results': results, 'proposals': proposals, 'inventory': inventory,
+            'index_status': classify_indexes(inventory, used), 'table_rows': table_rows}
+
+
+def advise_shape(conn, shape: QueryShape, table_columns: set, table_rows: dict, repeat: int,
+                 min_rows: int, min_speedup: float) -> dict:
+    """Replay one shape, and try candidate indexes if its plan has findings"""
+    values = representative_values(conn, shape)
+    statement = statement_for(shape, values, table_columns)
+    baseline, plan = explain(conn, statement, repeat)
+    result = {'shape': shape, 'sql': statement.as_string(conn), 'ms': baseline,
+              'indexes': sorted(used_indexes(plan)),
+              'findings': plan_findings(plan, table_rows, min_rows), 'plan': plan, 'tried': []}
+    if result['findings']:
+        distinct = distinct_values(conn, shape.table)
+        for candidate in candidates_for(shape, distinct):
+            outcome = try_candidate(conn, candidate, statement, repeat)
+            outcome.update(index=candidate.name, ddl=candidate.ddl().as_string(conn))
+            result['tried'].append(outcome)
+            if outcome['used'] and outcome['ms'] * min_speedup <= baseline:
+                result.setdefault('qualifying', []).append((candidate, outcome))
+        if 'qualifying' in result:
+            fastest = min(outcome['ms'] for _, outcome in result['qualifying'])
+            result['best'] = min((entry for entry in result.pop('qualifying')
+                                  if entry[1]['ms'] <= fastest * TIME_TOLERANCE),
+                                 key=lambda entry: entry[1]['size'])
+    return result
+
+
+def print_report(advice: dict):
+    results = advice['results']
+    print()
+    print(f"🔎 {len(results)} query shapes replayed")
+    for result in results:
+        shape = result['shape']
+        if 'error' in result:
+            print(f"  ❌ {'failed':>11}  {shape.describe()}")
+            print(f"         {result['error'].splitlines()[0]}")
+            continue
+        marker = '⚠️ ' if result['findings'] else '✅'
+        print(f"  {marker} {result['ms']:8.2f} ms  {shape.describe()}")
+        print(f"         indexes: {', '.join(result['indexes']) or 'none'}; from {', '.join(shape.sources[:3])}"
+              + (f" (+{len(shape.sources) - 3})" if len(shape.sources) > 3 else ''))
+        for finding in result['findings']:
+            print(f"         - {finding}")
+
+    print()
+    print("📇 Existing indexes")
+    for index in advice['inventory']:
+        status = advice['index_status'][index['name']]
+        print(f"  {status:<45} {index['name']:<45} {index['size'] / 1024:>8.0f} KB")
+
+    print()
+    if not advice['proposals']:
+        print("✅ No index would make a flagged shape at least --min-speedup faster")
+        return
+    print("💡 Proposed indexes")
+    for proposal in advice['proposals'].values():
+        print(f"  {proposal['candidate'].name}  ({proposal['size'] / 1024:.0f} KB)")
+        for shape, before, after in proposal['shapes']:
+            print(f"      {before:8.2f} ms → {after:8.2f} ms  ({before / max(after, 0.001):.1f}x)  {shape.describe()}")
+
+
+def proposals_sql(advice: dict, conn) -> str:
+    lines = ['-- Index proposals from scripts/index_advisor.py (sandbox timings, review before applying)', '']
+    for proposal in advice['proposals'].values():
+        for shape, before, after in proposal['shapes']:
+            lines.append(f"-- {before:.2f} ms -> {after:.2f} ms: {shape.describe()}")
+        lines.append(proposal['candidate'].ddl(concurrently=True).as_string(conn) + ';')
+        lines.append('')
+    droppable = [name for name, status in advice['index_status'].items()
+                 if status == 'unused' or status.startswith('redundant')]
+    if droppable:
+        lines.append('-- Not used by any collected query shape (check other consumers before dropping):')
+        lines += [f"-- DROP INDEX CONCURRENTLY IF EXISTS {name};  -- {advice['index_status'][name]}"
+                  for name in droppable]
+    return '\n'.join(lines) + '\n'
+
+
+def report_json(advice: dict) -> dict:
+    return {
+        'shapes': [{
+            'query': result['shape'].describe(), 'sources': result['shape'].sources, 'error': result['error'],
+        } if 'error' in result else {
+            'query': result['shape'].describe(), 'sql': result['sql'], 'sources': result['shape'].sources,
+            'ms': result['ms'], 'indexes': result['indexes'], 'findings': result['findings'],
+            'tried': result['tried'], 'plan': result['plan'],
+        } for result in advice['results']],
+        'indexes': [{**index, 'status': advice['index_status'][index['name']]} for index in advice['inventory']],
+        'table_rows': advice['table_rows'],
+    }
+
+
+def main():
+    utf8_console()
+
+    parser = argparse.ArgumentParser(description='Replay the code\'s query shapes on a scaled sandbox and advise on indexes')
+    parser.add_argument('--dsn', help='Admin connection string of a local server (default: LOCAL_DATABASE_URL)')
+    parser.add_argument('--countries', type=int, default=18, help='Number of countries to seed')
+    parser.add_argument('--years', type=int, default=12, help='Number of academic years to seed')
+    parser.add_argument('--seed', type=int, default=42, help='Random seed for the synthetic data')
+    parser.add_argument('--repeat', type=int, default=5, help='Measured runs per query (after one warm-up)')
+    parser.add_argument('--min-rows', type=int, default=5000,
+                        help='Only flag scans of tables (or discarded rows) at least this large')
+    parser.add_argument('--min-speedup', type=float, default=1.5,
+                        help='Propose an index only if it makes the shape this many times faster')
+    parser.add_argument('--list-shapes', action='store_true', help='Print the collected shapes and exit')
+    parser.add_argument('--output', help='Write the proposals as SQL to this path')
+    parser.add_argument('--report', help='Write shapes, plans, candidates and indexes as JSON')
+    args = parser.parse_args()
+
+    print("=" * 80)
+    print("INDEX ADVISOR")
+    print("=" * 80)
+
+    try:
+        raw_shapes = collect_shapes()
+        print(f"📚 Collected {len(raw_shapes)} table calls from {', '.join(SOURCE_GLOBS)}")
+
+        table_columns = {table: [column.name for column in columns] for table, columns in schema_tables().items()}
+        shapes, skipped = resolve_shapes(raw_shapes, table_columns)
+        print(f"🧩 {len(shapes)} distinct shapes to replay; "
+              f"{len(skipped)} skipped (tables or columns not in the schema files)")
+        for shape in skipped:
+            print(f"   - {shape.describe()}  ({', '.join(shape.sources[:2])})")
+
+        if args.list_shapes:
+            print()
+            for shape in shapes:
+                print(f"  {shape.describe()}")
+                print(f"      ← {', '.join(shape.sources)}")
+            return
+
+        started = time.perf_counter()
+        with LocalSandbox(args.dsn, countries=args.countries, years=args.years, seed=args.seed) as sandbox:
+            print(f"✅ Sandbox with {args.countries} countries × {args.years} years "
+                  f"ready in {time.perf_counter() - started:.1f}s")
+            advice = advise(sandbox, shapes, args.repeat, args.min_rows, args.min_speedup)
+            print_report(advice)
+
+            with sandbox.connect() as conn:
+                if args.output:
+                    write_atomic(args.output, proposals_sql(advice, conn))
+                    print()
+                    print(f"💾 Proposals written to {args.output}")
+            if args.report:
+                write_atomic(args.report, json.dumps(report_json(advice), indent=2, default=str))
+                print(f"💾 Report written to {args.report}")
+    except Exception as e:
+        print(f"\n❌ Error during index analysis: {e}")
+        import traceback
+        traceback.print_exc()
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,688 @@
+"""
+In-memory indicator cubes over the imported tables, with precomputed marginals
+
+Dashboards and diagnostics slice the same country × year × level × ownership
+× gender numbers over and over, and each slice used to be re-summed from raw
+rows. An `IndicatorCube` loads a table once into NumPy arrays and keeps its
+marginals precomputed, so every roll-up or drill-down is an array index.
+
+Each marginal is an "augmented" array: every dimension has one extra slot at
+the end holding the total over that dimension (ALL). The marginal over
+(country, year, gender) therefore also holds every country's total over
+years, every year's total over countries, the grand total, and so on. A slice
+picks a label or ALL on each axis and sums only over label subsets. A cube
+stores the facts (coordinates + values) and:
+
+- dense mode (the augmented array over all dimensions fits in `dense_limit`
+  cells): one augmented array is built up front and any query is a view of it
+- sparse mode: an augmented marginal is built for (country, year, d) for every
+  other dimension d; other combinations are built from the facts the first
+  time they are asked for and then cached, or taken from a cached superset
+  by indexing ALL on the extra axes
+
+`refresh(country, year)` re-reads one (country, year) after a re-import and
+applies the difference to every cached marginal: where a marginal has both
+country and year axes only the four (country|ALL, year|ALL) blocks change.
+A new label (country, year or category) rebuilds the cube.
+
+Cubes (CUBES): enrollment, enrollment_by_grade, enrollment_by_age,
+institutions, staff_qualifications, staff_age, staff_service, population.
+Data comes from Supabase (service role) or from a directory of CSVs written
+by generate_synthetic_data.py.
+
+Needs NumPy (pip install numpy).
+
+Usage:
+    python indicator_cube.py --cube enrollment --by country year --where gender=female
+    python indicator_cube.py --csv synthetic/supabase --cube staff_age --by age_range --where country=GRD
+    python indicator_cube.py --csv synthetic/supabase --benchmark
+
+    from indicator_cube import CubeService
+
+    service = CubeService.from_supabase()
+    enrollment = service['enrollment']
+    enrollment.value(country='GRD', year='2023-2024', education_level='primary')
+    enrollment.query(by=('country', 'gender'), year='2023-2024').rows()
+    service.refresh('GRD', '2023-2024')          # after re-importing Grenada 2023-24
+"""
+
+import argparse
+import csv
+import random
+import sys
+import time
+from dataclasses import dataclass
+from pathlib import Path
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+from console import utf8_console
+from export_digest_workbooks import DIGEST_COUNTRIES
+from generate_synthetic_data import (
+    AGE_RANGES, ENROLLMENT_GRID, QUALIFICATION_CATEGORIES, SERVICE_RANGES, STAFF_LEVELS,
+)
+
+# Position of the total in every augmented axis
+ALL = -1
+
+SCOPE_DIMS = ('country', 'year')
+DEFAULT_DENSE_LIMIT = 4_000_000   # cells (8 bytes each)
+
+# Labels for NULL keys, as in student_enrollment's unique index
+NULL_LABELS = {'ownership_type': 'national', 'category': 'none'}
+
+
+def unique_in_order(values) -> tuple:
+    return tuple(dict.fromkeys(values))
+
+
+# Display order of labels; labels not listed sort after these, naturally
+LABEL_ORDERS = {
+    'country': tuple(iso for _, iso in DIGEST_COUNTRIES),
+    'education_level': unique_in_order([level for level, *_ in ENROLLMENT_GRID] + list(STAFF_LEVELS)),
+    'ownership_type': ('public', 'private', 'private_church', 'private_non_affiliated', 'national'),
+    'age_group': unique_in_order(age for _, _, ages, _ in ENROLLMENT_GRID for age in ages),
+    'category': unique_in_order([category for *_, categories in ENROLLMENT_GRID
+                                 for category in categories if category] + ['none']),
+    'gender': ('male', 'female'),
+    'role': ('principal', 'deputy_principal', 'principal_deputy', 'teacher'),
+    'qualification_category': QUALIFICATION_CATEGORIES,
+    'age_range': AGE_RANGES,
+    'service_range': SERVICE_RANGES,
+    'institution_level': ('daycare', 'preschool', 'primary', 'secondary', 'special_ed', 'tvet',
+                          'post_secondary'),
+}
+
+
+def require_numpy():
+    if np is None:
+        raise RuntimeError('Indicator cubes need NumPy: pip install numpy')
+
+
+def natural_key(label):
+    text = str(label)
+    return (0, int(text), '') if text.lstrip('-').isdigit() else (1, 0, text)
+
+
+def order_labels(dim: str, labels) -> list:
+    known = {label: index for index, label in enumerate(LABEL_ORDERS.get(dim, ()))}
+    return sorted(labels, key=lambda label: (known.get(label, len(known)), natural_key(label)))
+
+
+def institution_cells(row):
+    """Institutions is wide: one fact per <level>_<ownership> count column"""
+    for column, value in row.items():
+        for ownership in ('private_church', 'private_non_affiliated', 'public', 'private'):
+            if column.endswith('_' + ownership) and column != 'country_id':
+                yield (column[:-len(ownership) - 1], ownership), value
+                break
+
+
+def population_cells(row):
+    """population_data is wide by sex: one fact per (age, gender)"""
+    for gender in ('male', 'female'):
+        yield (str(row['age']), gender), row[gender]
+
+
+@dataclass(frozen=True)
+class CubeSpec:
+    """A cube over one table: dimensions after (country, year) and the measure
+
+    `cells` turns a wide row into ((dimension values), value) pairs; without
+    it each row is one fact read from `dims` and `measure`.
+    """
+
+    table: str
+    dims: tuple
+    measure: str = 'count'
+    cells: object = None
+
+    @property
+    def columns(self) -> str:
+        if self.cells is not None:
+            return '*'
+        return ', '.join(('country_id', 'academic_year_id') + self.dims + (self.measure,))
+
+    def facts(self, row):
+        if self.cells is not None:
+            yield from self.cells(row)
+            return
+        yield tuple(NULL_LABELS.get(dim, '') if row[dim] is None or row[dim] == '' else row[dim]
+                    for dim in self.dims), row[self.measure]
+
+
+CUBES = {
+    'enrollment': CubeSpec('student_enrollment', ('education_level', 'ownership_type', 'gender')),
+    'enrollment_by_grade': CubeSpec('student_enrollment', ('education_level', 'category', 'gender')),
+    'enrollment_by_age': CubeSpec('student_enrollment', ('education_level', 'age_group', 'gender')),
+    'institutions': CubeSpec('institutions', ('institution_level', 'ownership_type'), cells=institution_cells),
+    'staff_qualifications': CubeSpec('staff_qualifications',
+                                     ('education_level', 'ownership_type', 'role', 'qualification_category',
+                                      'gender')),
+    'staff_age': CubeSpec('staff_age_distribution',
+                          ('role', 'education_level', 'ownership_type', 'age_range', 'gender')),
+    'staff_service': CubeSpec('staff_years_of_service',
+                              ('role', 'education_level', 'ownership_type', 'service_range', 'gender')),
+    'population': CubeSpec('population_data', ('age', 'gender'), cells=population_cells),
+}
+
+
+def number(value):
+    if value is None or value == '':
+        return 0
+    if isinstance(value, str):
+        return float(value) if '.' in value else int(value)
+    return value
+
+
+def augment(array):
+    """Append the total over each axis as that axis's last slot (ALL)"""
+    for axis in range(array.ndim):
+        array = np.concatenate([array, array.sum(axis=axis, keepdims=True)], axis=axis)
+    return array
+
+
+def aggregate(coords, values, shape, axes, dtype):
+    """Augmented marginal of the facts over `axes` (positions into coords' columns)"""
+    kept = tuple(shape[axis] for axis in axes)
+    size = int(np.prod(kept, dtype=np.int64)) if kept else 1
+    if axes:
+        flat = np.ravel_multi_index(tuple(coords[:, axis] for axis in axes), kept)
+    else:
+        flat = np.zeros(len(values), dtype=np.intp)
+    sums = np.bincount(flat, weights=values, minlength=size)
+    if np.issubdtype(dtype, np.integer):
+        sums = np.rint(sums)
+    return augment(sums.astype(dtype).reshape(kept))
+
+
+class CubeSlice:
+    """Result of IndicatorCube.query(): labels per `by` dimension and the values"""
+
+    __slots__ = ('dims', 'labels', 'values')
+
+    def __init__(self, dims, labels, values):
+        self.dims = dims
+        self.labels = labels
+        self.values = values
+
+    @property
+    def total(self):
+        return self.values.sum().item()
+
+    def rows(self) -> list:
+        """[{dim: label, ..., 'value': v}] for every cell of the slice"""
+        if not self.dims:
+            return [{'value': self.values.item()}]
+        result = []
+        for index in np.ndindex(self.values.shape):
+            row = {dim: self.labels[axis][position] for axis, (dim, position) in enumerate(zip(self.dims, index))}
+            row['value'] = self.values[index].item()
+            result.append(row)
+        return result
+
+
+class IndicatorCube:
+    """Facts of one CubeSpec with cached augmented marginals; see the module docstring
+
+    Facts are kept in one block per (country, year), so a refresh only
+    touches the block it replaces.
+    """
+
+    def __init__(self, name: str, dims: tuple, labels: dict, coords, values,
+                 dense_limit: int = DEFAULT_DENSE_LIMIT):
+        require_numpy()
+        self.name = name
+        self.dims = tuple(dims)
+        self.axis = {dim: position for position, dim in enumerate(self.dims)}
+        self.scope = (self.axis['country'], self.axis['year'])
+        self.dense_limit = dense_limit
+        self.set_facts(labels, coords, values)
+
+    @classmethod
+    def from_facts(cls, name: str, dims: tuple, facts, dense_limit: int = DEFAULT_DENSE_LIMIT):
+        """Build from an iterable of ((label per dim), value)"""
+        keys, values = [], []
+        for key, value in facts:
+            keys.append(key)
+            values.append(value)
+        labels = {dim: order_labels(dim, {key[axis] for key in keys}) for axis, dim in enumerate(dims)}
+        index = {dim: {label: position for position, label in enumerate(labels[dim])} for dim in dims}
+        coords = encode(keys, dims, index)
+        dtype = np.float64 if any(isinstance(value, float) for value in values) else np.int64
+        return cls(name, dims, labels, coords, np.array(values, dtype=dtype), dense_limit)
+
+    def set_facts(self, labels: dict, coords, values):
+        """(Re)build the cube: label indexes, per-(country, year) blocks and the eager marginals"""
+        self.labels = {dim: list(labels[dim]) for dim in self.dims}
+        self.index = {dim: {label: position for position, label in enumerate(self.labels[dim])}
+                      for dim in self.dims}
+        self.shape = tuple(len(self.labels[dim]) for dim in self.dims)
+        self.dtype = values.dtype
+
+        country_axis, year_axis = self.scope
+        order = np.lexsort((coords[:, year_axis], coords[:, country_axis]))
+        coords, values = coords[order], values[order]
+        starts = np.flatnonzero(np.diff(coords[:, country_axis]) | np.diff(coords[:, year_axis])) + 1
+        bounds = zip(np.concatenate([[0], starts]).tolist(), np.concatenate([starts, [len(values)]]).tolist())
+        self.blocks = {(int(coords[start, country_axis]), int(coords[start, year_axis])):
+                       (coords[start:end], values[start:end]) for start, end in bounds if end > start}
+        self.stacked = (coords, values)
+
+        self.marginals = {}
+        full = int(np.prod([size + 1 for size in self.shape], dtype=np.int64))
+        self.dense = full <= self.dense_limit
+        if self.dense:
+            self.build_marginal(tuple(range(len(self.dims))))
+        else:
+            for axis in range(len(self.dims)):
+                if axis not in self.scope:
+                    self.build_marginal(tuple(sorted(self.scope + (axis,))))
+
+    def facts(self):
+        """(coords, values) of every fact, stacked on demand after a refresh"""
+        if self.stacked is None:
+            blocks = list(self.blocks.values())
+            self.stacked = (np.concatenate([coords for coords, _ in blocks]),
+                            np.concatenate([values for _, values in blocks]))
+        return self.stacked
+
+    @property
+    def size(self) -> int:
+        return sum(len(values) for _, values in self.blocks.values())
+
+    @property
+    def nbytes(self) -> int:
+        return (sum(array.nbytes for array in self.marginals.values())
+                + sum(coords.nbytes + values.nbytes for coords, values in self.blocks.values()))
+
+    def build_marginal(self, axes: tuple):
+        coords, values = self.facts()
+        self.marginals[axes] = aggregate(coords, values, self.shape, axes, self.dtype)
+        return self.marginals[axes]
+
+    def marginal(self, axes: tuple):
+        """Augmented marginal over `axes` (sorted positions): cached, cut from a superset, or built"""
+        if axes in self.marginals:
+            return self.marginals[axes]
+        supersets = [key for key in self.marginals if set(axes) <= set(key)]
+        if supersets:
+            key = min(supersets, key=lambda candidate: self.marginals[candidate].size)
+            return self.marginals[key][tuple(slice(None) if axis in axes else ALL for axis in key)]
+        return self.build_marginal(axes)
+
+    def position(self, dim: str, label):
+        try:
+            return self.index[dim][label]
+        except KeyError:
+            # Numeric labels (population ages) may be passed as ints
+            if str(label) in self.index[dim]:
+                return self.index[dim][str(label)]
+            raise KeyError(f"{self.name}: no {dim} {label!r}") from None
+
+    def query(self, by=(), **where) -> CubeSlice:
+        """Values by the `by` dimensions, with `where` fixing dimensions to a label or a list of labels
+
+        Dimensions in neither are rolled up (ALL). A list in `where` on a
+        dimension not in `by` sums over those labels.
+        """
+        by = tuple(by)
+        for dim in by + tuple(where):
+            if dim not in self.axis:
+                raise ValueError(f"{self.name} has no dimension {dim!r} (dimensions: {', '.join(self.dims)})")
+        axes = tuple(sorted({self.axis[dim] for dim in by + tuple(where)}))
+
+        # One index per axis; label lists are applied afterwards, one axis at a time
+        index, lists, kept, labels = [], [], [], {}
+        for axis in axes:
+            dim = self.dims[axis]
+            selector = where.get(dim)
+            if selector is None:
+                index.append(slice(0, self.shape[axis]))
+                labels[dim] = self.labels[dim]
+            elif isinstance(selector, (list, tuple, set)):
+                chosen = [self.position(dim, label) for label in selector]
+                index.append(slice(None))
+                lists.append((len(kept), chosen, dim in by))
+                labels[dim] = [self.labels[dim][position] for position in chosen]
+            elif dim in by:
+                position = self.position(dim, selector)
+                index.append(slice(position, position + 1))
+                labels[dim] = [selector]
+            else:
+                index.append(self.position(dim, selector))
+                continue
+            kept.append(dim)
+        array = self.marginal(axes)[tuple(index)]
+        for position, chosen, grouped in reversed(lists):
+            array = np.take(array, chosen, axis=position)
+            if not grouped:
+                array = array.sum(axis=position)
+                del kept[position]
+        if tuple(kept) != by:
+            array = np.transpose(array, [kept.index(dim) for dim in by])
+        return CubeSlice(by, [labels[dim] for dim in by], array)
+
+    def value(self, **where):
+        """A single number: the cube rolled up over every dimension not in `where`"""
+        return self.query((), **where).values.sum().item()
+
+    def replace(self, country, year, facts) -> bool:
+        """Replace the facts of one (country, year); returns False if the cube had to be rebuilt"""
+        keys, values = [], []
+        for key, value in facts:
+            keys.append(key)
+            values.append(value)
+        values = np.array(values, dtype=self.dtype)
+        if any(key[axis] not in self.index[dim] for key in keys for axis, dim in enumerate(self.dims)) \
+                or country not in self.index['country'] or year not in self.index['year']:
+            self.rebuild_with(country, year, keys, values)
+            return False
+
+        slot = (self.index['country'][country], self.index['year'][year])
+        added = encode(keys, self.dims, self.index)
+        old_coords, old_values = self.blocks.pop(slot, (added[:0], values[:0]))
+        if len(values):
+            self.blocks[slot] = (added, values)
+        self.stacked = None
+        delta_coords = np.concatenate([added, old_coords])
+        delta_values = np.concatenate([values, -old_values])
+
+        country_axis, year_axis = self.scope
+        for axes, array in self.marginals.items():
+            if country_axis in axes and year_axis in axes:
+                # Only the (country|ALL) × (year|ALL) blocks change
+                rest = tuple(axis for axis in axes if axis not in self.scope)
+                block = aggregate(delta_coords, delta_values, self.shape, rest, self.dtype)
+                for country_slot in (slot[0], ALL):
+                    for year_slot in (slot[1], ALL):
+                        target = tuple(country_slot if axis == country_axis else year_slot if axis == year_axis
+                                       else slice(None) for axis in axes)
+                        array[target] += block
+            else:
+                array += aggregate(delta_coords, delta_values, self.shape, axes, self.dtype)
+        return True
+
+    def rebuild_with(self, country, year, keys, values):
+        """Replace one (country, year) when it brings labels the cube has not seen"""
+        seen = {(country, year)} | {(key[self.scope[0]], key[self.scope[1]]) for key in keys}
+        labels = {dim: order_labels(dim, set(self.labels[dim]) | {key[axis] for key in keys}
+                                    | ({country} if dim == 'country' else {year} if dim == 'year' else set()))
+                  for axis, dim in enumerate(self.dims)}
+        index = {dim: {label: position for position, label in enumerate(labels[dim])} for dim in self.dims}
+        remap = [np.array([index[dim][label] for label in self.labels[dim]], dtype=np.int32) for dim in self.dims]
+        coords, old_values = self.facts()
+        coords = np.column_stack([remap[axis][coords[:, axis]] for axis in range(len(self.dims))]) \
+            .astype(np.int32).reshape(len(coords), len(self.dims))
+        keep = np.ones(len(coords), dtype=bool)
+        for seen_country, seen_year in seen:
+            keep &= ((coords[:, self.scope[0]] != index['country'][seen_country])
+                     | (coords[:, self.scope[1]] != index['year'][seen_year]))
+        self.set_facts(labels, np.concatenate([coords[keep], encode(keys, self.dims, index)]),
+                       np.concatenate([old_values[keep], values]))
+
+
+def encode(keys, dims, index):
+    """Label tuples -> (n, len(dims)) int32 coordinates"""
+    return np.array([[index[dim][key[axis]] for axis, dim in enumerate(dims)] for key in keys],
+                    dtype=np.int32).reshape(len(keys), len(dims))
+
+
+# ---- sources ---------------------------------------------------------------------------
+
+class SupabaseSource:
+    """Rows from the Supabase tables (service role, keyset-paginated)"""
+
+    def __init__(self, client=None):
+        from supabase_client import get_client
+        self.client = client or get_client()
+
+    def countries(self) -> dict:
+        return {row['id']: row['country_code']
+                for row in self.client.table('countries').select('id, country_code').execute().data}
+
+    def years(self) -> dict:
+        return {row['id']: row['year_label']
+                for row in self.client.table('academic_years').select('id, year_label').execute().data}
+
+    def rows(self, table: str, columns: str = '*', country_id=None, year_id=None):
+        from table_reader import iter_table
+        filters = {}
+        if country_id is not None:
+            filters['country_id'] = country_id
+        if year_id is not None:
+            filters['academic_year_id'] = year_id
+        return iter_table(self.client, table, columns=columns, filters=filters)
+
+
+class CsvSource:
+    """Rows from a directory of table CSVs (generate_synthetic_data.py's supabase/ output)"""
+
+    def __init__(self, directory):
+        self.directory = Path(directory)
+
+    def read(self, table: str):
+        with open(self.directory / f"{table}.csv", encoding='utf-8', newline='') as handle:
+            yield from csv.DictReader(handle)
+
+    def countries(self) -> dict:
+        return {int(row['id']): row['country_code'] for row in self.read('countries')}
+
+    def years(self) -> dict:
+        return {int(row['id']): row['year_label'] for row in self.read('academic_years')}
+
+    def rows(self, table: str, columns: str = '*', country_id=None, year_id=None):
+        for row in self.read(table):
+            if country_id is not None and int(row['country_id']) != country_id:
+                continue
+            if year_id is not None and int(row['academic_year_id']) != year_id:
+                continue
+            yield row
+
+
+class CubeService:
+    """The cubes of CUBES over one source, loading each table once"""
+
+    def __init__(self, source, names=None, dense_limit: int = DEFAULT_DENSE_LIMIT):
+        require_numpy()
+        self.source = source
+        self.names = list(names or CUBES)
+        self.dense_limit = dense_limit
+        self.cubes = {}
+        self.load()
+
+    @classmethod
+    def from_supabase(cls, names=None, **kwargs):
+        return cls(SupabaseSource(), names, **kwargs)
+
+    @classmethod
+    def from_csv(cls, directory, names=None, **kwargs):
+        return cls(CsvSource(directory), names, **kwargs)
+
+    def __getitem__(self, name: str) -> IndicatorCube:
+        return self.cubes[name]
+
+    def tables(self) -> dict:
+        """{table: [cube names]} so each table is read once for all its cubes"""
+        tables = {}
+        for name in self.names:
+            tables.setdefault(CUBES[name].table, []).append(name)
+        return tables
+
+    def scoped_facts(self, spec: CubeSpec, rows):
+        for row in rows:
+            country = self.country_codes.get(number(row['country_id']))
+            year = self.year_labels.get(number(row['academic_year_id']))
+            if country is None or year is None:
+                continue
+            for key, value in spec.facts(row):
+                yield (country, year) + tuple(key), number(value)
+
+    def load(self):
+        self.country_codes = self.source.countries()
+        self.year_labels = self.source.years()
+        for table, names in self.tables().items():
+            columns = {CUBES[name].columns for name in names}
+            rows = list(self.source.rows(table, '*' if len(columns) > 1 else columns.pop()))
+            for name in names:
+                spec = CUBES[name]
+                self.cubes[name] = IndicatorCube.from_facts(
+                    name, SCOPE_DIMS + spec.dims, self.scoped_facts(spec, rows), self.dense_limit)
+
+    def refresh(self, country_code: str, year_label: str) -> dict:
+        """Re-read one (country, year) from the source and update every cube in place
+
+        Returns {cube: 'incremental' | 'rebuilt'}.
+        """
+        country_ids = {code: id_ for id_, code in self.country_codes.items()}
+        year_ids = {label: id_ for id_, label in self.year_labels.items()}
+        if country_code not in country_ids or year_label not in year_ids:
+            # A new country or year: pick up the reference tables, then the slice
+            self.country_codes = self.source.countries()
+            self.year_labels = self.source.years()
+            country_ids = {code: id_ for id_, code in self.country_codes.items()}
+            year_ids = {label: id_ for id_, label in self.year_labels.items()}
+
+        outcome = {}
+        for table, names in self.tables().items():
+            rows = list(self.source.rows(table, '*', country_ids[country_code], year_ids[year_label]))
+            for name in names:
+                facts = self.scoped_facts(CUBES[name], rows)
+                done = self.cubes[name].replace(country_code, year_label, facts)
+                outcome[name] = 'incremental' if done else 'rebuilt'
+        return outcome
+
+
+# ---- CLI -----------------------------------------------------------------------------------
+
+def parse_where(items) -> dict:
+    where = {}
+    for item in items or []:
+        dim, _, value = item.partition('=')
+        if not value:
+            raise ValueError(f"--where expects dim=value[,value...], got {item!r}")
+        values = value.split(',')
+        where[dim] = values if len(values) > 1 else values[0]
+    return where
+
+
+def print_slice(cube_slice: CubeSlice):
+    if len(cube_slice.dims) == 2:
+        rows, cols = cube_slice.labels
+        width = max([len(str(label)) for label in rows] + [8])
+        print(f"\n{cube_slice.dims[0]:<{width}} " + ' '.join(f"{str(col):>12}" for col in cols))
+        print("-" * (width + 13 * len(cols)))
+        for label, values in zip(rows, cube_slice.values):
+            print(f"{str(label):<{width}} " + ' '.join(f"{value:>12,}" for value in values.tolist()))
+    else:
+        for row in cube_slice.rows():
+            value = row.pop('value')
+            print(f"   {' / '.join(str(label) for label in row.values()) or 'total':<50} {value:>14,}")
+    print(f"\n   Total: {cube_slice.total:,}")
+
+
+def naive_query(rows, by, where):
+    """What the pages do today: re-sum the raw facts for every slice"""
+    totals = {}
+    for key, value in rows:
+        if all(key[dim] in (want if isinstance(want, list) else (want,)) for dim, want in where.items()):
+            group = tuple(key[dim] for dim in by)
+            totals[group] = totals.get(group, 0) + value
+    return totals
+
+
+def run_benchmark(service: CubeService, queries: int = 2000, seed: int = 1):
+    rng = random.Random(seed)
+    print(f"\n{'Cube':<22} {'Mode':<7} {'Facts':>10} {'MB':>7} {'µs/query':>9} {'µs naive':>10} "
+          f"{'refresh ms':>11} {'rebuild ms':>11}")
+    print("-" * 95)
+    for name, cube in service.cubes.items():
+        # Random slices: 0-2 grouping dims, 0-2 fixed dims
+        workload = []
+        for _ in range(queries):
+            dims = rng.sample(cube.dims, min(len(cube.dims), rng.randint(0, 4)))
+            by, fixed = dims[:rng.randint(0, min(2, len(dims)))], dims[len(dims) // 2 + 1:]
+            where = {dim: rng.choice(cube.labels[dim]) for dim in fixed if dim not in by}
+            workload.append((tuple(by), where))
+
+        start = time.perf_counter()
+        for by, where in workload:
+            cube.query(by, **where)
+        per_query = (time.perf_counter() - start) / len(workload) * 1e6
+
+        coords, values = cube.facts()
+        facts = [({dim: cube.labels[dim][index] for dim, index in zip(cube.dims, coord)}, value)
+                 for coord, value in zip(coords.tolist(), values.tolist())]
+        sample = workload[:50]
+        start = time.perf_counter()
+        for by, where in sample:
+            naive_query(facts, by, where)
+        naive = (time.perf_counter() - start) / len(sample) * 1e6
+
+        # Re-import one (country, year) with every count bumped, then check
+        # the updated marginals against a cube rebuilt from scratch
+        slot = next(iter(cube.blocks))
+        block_coords, block_values = cube.blocks[slot]
+        changed = [(tuple(cube.labels[dim][index] for dim, index in zip(cube.dims, coord)), value + 1)
+                   for coord, value in zip(block_coords.tolist(), block_values.tolist())]
+        start = time.perf_counter()
+        cube.replace(cube.labels['country'][slot[0]], cube.labels['year'][slot[1]], changed)
+        refresh_ms = (time.perf_counter() - start) * 1000
+        refreshed = {axes: array.copy() for axes, array in cube.marginals.items()}
+        start = time.perf_counter()
+        cube.set_facts(cube.labels, *cube.facts())
+        rebuild_ms = (time.perf_counter() - start) * 1000
+        if any(not np.array_equal(array, cube.marginal(axes)) for axes, array in refreshed.items()):
+            raise RuntimeError(f"{name}: refreshed marginals differ from a rebuild")
+
+        print(f"{name:<22} {'dense' if cube.dense else 'sparse':<7} {cube.size:>10,} "
+              f"{cube.nbytes / 1e6:>7.1f} {per_query:>9.1f} {naive:>10,.0f} {refresh_ms:>11.2f} {rebuild_ms:>11.1f}")
+
+
+def main():
+    utf8_console()
+
+    parser = argparse.ArgumentParser(description='Query in-memory indicator cubes over the digest tables')
+    parser.add_argument('--csv', help='Directory of table CSVs (generate_synthetic_data.py output) instead of Supabase')
+    parser.add_argument('--cube', choices=list(CUBES), help='Cube to query')
+    parser.add_argument('--by', nargs='*', default=[], help='Dimensions to group by, e.g. country year')
+    parser.add_argument('--where', nargs='*', help='Fixed dimensions, e.g. gender=female education_level=primary,secondary')
+    parser.add_argument('--benchmark', action='store_true',
+                        help='Time slices against re-summing raw rows, and refresh against rebuild')
+    parser.add_argument('--queries', type=int, default=2000, help='Random slices per cube for --benchmark')
+    parser.add_argument('--dense-limit', type=int, default=DEFAULT_DENSE_LIMIT,
+                        help='Largest augmented cube (cells) kept fully precomputed')
+    args = parser.parse_args()
+    require_numpy()
+
+    print("\n" + "=" * 80)
+    print("🧊 INDICATOR CUBES")
+    print("=" * 80)
+    names = [args.cube] if args.cube and not args.benchmark else None
+    start = time.perf_counter()
+    if args.csv:
+        service = CubeService.from_csv(args.csv, names, dense_limit=args.dense_limit)
+    else:
+        service = CubeService.from_supabase(names, dense_limit=args.dense_limit)
+    print(f"\n   Built {len(service.cubes)} cubes in {time.perf_counter() - start:.2f}s")
+    for name, cube in service.cubes.items():
+        print(f"   • {name}: {' × '.join(f'{dim}({len(cube.labels[dim])})' for dim in cube.dims)}")
+
+    if args.benchmark:
+        run_benchmark(service, args.queries)
+    elif args.cube:
+        cube = service[args.cube]
+        print_slice(cube.query(args.by, **parse_where(args.where)))
+
+
+if __name__ == '__main__':
+    try:
+        main()
+    except Exception as e:
+        print(f"\n❌ Error querying indicator cubes: {e}")
+        import traceback
+        traceback.print_exc()
+        sys.exit(1)
@@ -0,0 +1,355 @@
+"""
+Throwaway local Postgres databases with the digest schema and Supabase stubs
+
+Policies, indexes and query shapes can only be measured against a real
+Postgres, and the hosted Supabase project is the one place that must not be
+experimented on. `LocalSandbox` creates a scratch database on a local server,
+installs the pieces of Supabase the schema files rely on, applies the schema
+files from the repository root, and loads the synthetic multi-year dataset of
+generate_synthetic_data.py:
+
+- roles anon, authenticated and service_role (BYPASSRLS), as on Supabase
+- auth.users, auth.uid() and auth.role(), reading the JWT claims from the
+  same settings PostgREST sets (request.jwt.claims / request.jwt.claim.sub)
+- SCHEMA_FILES applied in order, with two compatibility rewrites: the
+  enrollment and staff demographics files declare country_id and
+  academic_year_id as UUID although countries and academic_years have
+  SERIAL ids, and student_enrollment's UNIQUE constraint over COALESCE()
+  expressions is only valid as a unique index
+- the generator's countries, academic years and users (one statistician per
+  country plus an admin and a viewer, in auth.users and user_profiles)
+  replace the rows the schema files insert, and every other table the
+  schema files define gets the generator's rows for each (country, academic
+  year), loaded with COPY. The sandbox, the RLS benchmark and the index
+  advisor therefore measure the same data the CSV files hold.
+
+`sandbox.as_user(conn, user)` switches a transaction to the user's role and
+claims, so statements run under the same RLS policies as PostgREST requests.
+
+Needs psycopg 3 and a local server (any Postgres 13+). The admin connection
+string comes from --dsn or LOCAL_DATABASE_URL (environment or .env.local), e.g.
+    LOCAL_DATABASE_URL=postgresql://postgres@localhost:5432/postgres
+
+Only local hosts are accepted; DATABASE_URL (the hosted database) is never used.
+
+Usage:
+    python local_postgres.py                       # create, seed, report, drop
+    python local_postgres.py --keep --years 10     # keep it for psql / other scripts
+    python local_postgres.py --countries 30 --years 12 --seed 7
+
+    from local_postgres import LocalSandbox
+
+    with LocalSandbox(years=10) as sandbox:
+        with sandbox.connect() as conn, conn.transaction(force_rollback=True):
+            sandbox.as_user(conn, sandbox.users['statistician'][0])
+            conn.execute('SELECT count(*) FROM student_enrollment').fetchone()
+"""
+
+import argparse
+import json
+import os
+import re
+import sys
+import time
+from dataclasses import dataclass
+from pathlib import Path
+
+import supabase_client  # noqa: F401  (loads .env.local)
+from console import utf8_console
+from digest_records import SCHEMA_DIR
+from generate_synthetic_data import REFERENCE_TABLES, SyntheticDigest, user_uuid, users
+
+try:
+    import psycopg
+    from psycopg import sql
+    from psycopg.conninfo import conninfo_to_dict, make_conninfo
+except ImportError:
+    psycopg = sql = conninfo_to_dict = make_conninfo = None
+
+# Applied in this order: supabase-schema.sql defines countries, academic_years,
+# user_profiles and update_updated_at_column(), which the others reference
+SCHEMA_FILES = [
+    'supabase-schema.sql',
+    'supabase-enrollment-table.sql',
+    'supabase-staff-demographics-table.sql',
+    'supabase-staff-qualifications-table.sql',
+    'supabase-population-table.sql',
+    'supabase-education-indicators-table.sql',
+    'supabase-import-audit-table.sql',
+]
+
+SANDBOX_PREFIX = 'digest_sandbox'
+LOCAL_HOSTS = {'', 'localhost', '127.0.0.1', '::1'}
+
+SUPABASE_ROLES = ('anon', 'authenticated', 'service_role')
+
+SUPABASE_STUBS = """
+DO $$ BEGIN
+    CREATE ROLE anon NOLOGIN NOINHERIT;
+EXCEPTION WHEN duplicate_object THEN NULL; END $$;
+DO $$ BEGIN
+    CREATE ROLE authenticated NOLOGIN NOINHERIT;
+EXCEPTION WHEN duplicate_object THEN NULL; END $$;
+DO $$ BEGIN
+    CREATE ROLE service_role NOLOGIN NOINHERIT BYPASSRLS;
+EXCEPTION WHEN duplicate_object THEN NULL; END $$;
+
+CREATE SCHEMA IF NOT EXISTS auth;
+CREATE TABLE IF NOT EXISTS auth.users (
+    id UUID PRIMARY KEY,
+    email VARCHAR(255),
+    raw_user_meta_data JSONB DEFAULT '{}'::jsonb,
+    created_at TIMESTAMP WITH TIME ZONE DEFAULT NOW()
+);
+
+-- Same definitions as Supabase: the claims PostgREST puts in the transaction settings
+CREATE OR REPLACE FUNCTION auth.uid() RETURNS UUID LANGUAGE sql STABLE AS $$
+    SELECT coalesce(
+        nullif(current_setting('request.jwt.claim.sub', true), ''),
+        (nullif(current_setting('request.jwt.claims', true), '')::jsonb ->> 'sub')
+    )::uuid
+$$;
+CREATE OR REPLACE FUNCTION auth.role() RETURNS TEXT LANGUAGE sql STABLE AS $$
+    SELECT coalesce(
+        nullif(current_setting('request.jwt.claim.role', true), ''),
+        (nullif(current_setting('request.jwt.claims', true), '')::jsonb ->> 'role')
+    )::text
+$$;
+"""
+
+# Supabase's default privileges: RLS, not GRANTs, is what restricts access
+SUPABASE_GRANTS = """
+GRANT USAGE ON SCHEMA public, auth TO anon, authenticated, service_role;
+GRANT ALL ON ALL TABLES IN SCHEMA public TO anon, authenticated, service_role;
+GRANT ALL ON ALL SEQUENCES IN SCHEMA public TO anon, authenticated, service_role;
+GRANT EXECUTE ON ALL FUNCTIONS IN SCHEMA auth TO anon, authenticated, service_role;
+"""
+
+@dataclass(frozen=True)
+class SandboxUser:
+    """A seeded auth.users + user_profiles row"""
+
+    id: str
+    email: str
+    role: str
+    country_id: int = None
+
+
+def require_psycopg():
+    if psycopg is None:
+        raise RuntimeError('The local Postgres sandbox needs psycopg 3: pip install "psycopg[binary]"')
+
+
+def admin_dsn(dsn: str = None) -> str:
+    """Admin connection string, refusing anything that is not a local server"""
+    require_psycopg()
+    dsn = dsn or os.getenv('LOCAL_DATABASE_URL')
+    if not dsn:
+        raise RuntimeError('Pass --dsn or set LOCAL_DATABASE_URL to a local Postgres '
+                           '(e.g. postgresql://postgres@localhost:5432/postgres)')
+    hosts = conninfo_to_dict(dsn).get('host') or ''
+    for host in hosts.split(','):
+        if host not in LOCAL_HOSTS and not host.startswith('/'):
+            raise RuntimeError(f"Refusing to create sandboxes on non-local host {host!r}")
+    return dsn
+
+
+def read_schema_file(filename: str, schema_dir: Path = SCHEMA_DIR) -> str:
+    """Schema file text with the compatibility rewrites applied"""
+    text = (Path(schema_dir) / filename).read_text(encoding='utf-8')
+    text = re.sub(r'\b(country_id|academic_year_id) UUID\b', r'\1 INTEGER', text)
+    return re.sub(
+        r',\s*(?:--[^\n]*\s*)?CONSTRAINT (\w+) UNIQUE \(([^;]*?COALESCE.*?)\)\s*\n\);',
+        lambda match: f"\n);\nCREATE UNIQUE INDEX {match.group(1)} ON {table_of(text, match.start())} ({match.group(2)});",
+        text, flags=re.S)
+
+
+def table_of(text: str, position: int) -> str:
+    """Name of the CREATE TABLE statement enclosing `position`"""
+    return re.findall(r'CREATE TABLE (?:IF NOT EXISTS )?(\w+)', text[:position])[-1]
+
+
+class LocalSandbox:
+    """A scratch database on a local server: schema, Supabase stubs and seed data
+
+    Used as a context manager it is created on entry and dropped on exit
+    (unless keep=True). `clone()` makes cheap copies from it as a template,
+    so variants can be measured from the same starting state.
+    """
+
+    def __init__(self, dsn: str = None, name: str = SANDBOX_PREFIX, countries: int = 9,
+                 years: int = 4, seed: int = 42, keep: bool = False, schema_dir: Path = SCHEMA_DIR):
+        if not name.startswith(SANDBOX_PREFIX):
+            raise ValueError(f"Sandbox database names must start with {SANDBOX_PREFIX!r}")
+        self.admin = admin_dsn(dsn)
+        self.name = name
+        self.countries = countries
+        self.years = years
+        self.seed = seed
+        self.keep = keep
+        self.schema_dir = schema_dir
+        self.clones = []
+        self.users = {}
+
+    def __enter__(self):
+        self.create()
+        return self
+
+    def __exit__(self, *exc):
+        for clone in self.clones:
+            self.drop_database(clone)
+        if not self.keep:
+            self.drop_database(self.name)
+
+    def dsn(self, database: str = None) -> str:
+        return make_conninfo(self.admin, dbname=database or self.name)
+
+    def connect(self, database: str = None, **kwargs):
+        return psycopg.connect(self.dsn(database), **kwargs)
+
+    def admin_execute(self, statement):
+        # CREATE/DROP DATABASE cannot run inside a transaction block
+        with psycopg.connect(self.admin, autocommit=True) as conn:
+            conn.execute(statement)
+
+    def drop_database(self, name: str):
+        self.admin_execute(sql.SQL('DROP DATABASE IF EXISTS {} WITH (FORCE)').format(sql.Identifier(name)))
+
+    def create(self):
+        """(Re)create the database, install stubs and schema, and seed it"""
+        self.drop_database(self.name)
+        self.admin_execute(sql.SQL('CREATE DATABASE {}').format(sql.Identifier(self.name)))
+        with self.connect() as conn:
+            conn.execute(SUPABASE_STUBS)
+            for filename in SCHEMA_FILES:
+                self.apply(conn, read_schema_file(filename, self.schema_dir), filename)
+            conn.execute(SUPABASE_GRANTS)
+            self.load_synthetic(conn)
+        self.users = self.load_users()
+        return self
+
+    def load_synthetic(self, conn):
+        """COPY generate_synthetic_data's rows into every table the schema files created"""
+        synth = SyntheticDigest(self.countries, self.years, self.seed, schema_dir=self.schema_dir)
+        tables = {row[0] for row in conn.execute("SELECT tablename FROM pg_tables WHERE schemaname = 'public'")}
+        # Reference tables first: the data tables' foreign keys point at them
+        specs = sorted((spec for spec in synth.specs(['supabase']) if spec.name in tables),
+                       key=lambda spec: spec.name not in REFERENCE_TABLES['supabase'])
+        models = [synth.model(country, year) for country in synth.countries for year in synth.years]
+
+        conn.execute('TRUNCATE countries, academic_years RESTART IDENTITY CASCADE')
+        with conn.cursor() as cursor:
+            with cursor.copy('COPY auth.users (id, email) FROM STDIN') as copy:
+                for _, email, *_ in users(synth):
+                    copy.write_row((user_uuid(email), email))
+            for spec in specs:
+                columns = spec.output_columns
+                statement = sql.SQL('COPY {} ({}) FROM STDIN').format(
+                    sql.Identifier(spec.name), sql.SQL(', ').join(map(sql.Identifier, columns)))
+                with cursor.copy(statement) as copy:
+                    for row in synth.table_rows(spec, models):
+                        copy.write_row([row.get(column) for column in columns])
+        # Reference rows carry their ids; move the sequences past them
+        for table in ('countries', 'academic_years'):
+            conn.execute(sql.SQL("SELECT setval(pg_get_serial_sequence({}, 'id'), max(id)) FROM {}").format(
+                sql.Literal(table), sql.Identifier(table)))
+        conn.execute('ANALYZE')
+
+    @staticmethod
+    def apply(conn, text: str, label: str = 'SQL'):
+        """Run a multi-statement SQL script, naming the script in errors"""
+        try:
+            conn.execute(text)
+        except psycopg.Error as error:
+            raise RuntimeError(f"{label}: {error}") from error
+
+    def apply_file(self, conn, path):
+        path = Path(path)
+        self.apply(conn, path.read_text(encoding='utf-8'), path.name)
+
+    def clone(self, suffix: str) -> str:
+        """Copy of the sandbox (CREATE DATABASE ... TEMPLATE); returns its name"""
+        name = f"{self.name}_{suffix}"
+        self.drop_database(name)
+        self.admin_execute(sql.SQL('CREATE DATABASE {} TEMPLATE {}').format(
+            sql.Identifier(name), sql.Identifier(self.name)))
+        self.clones.append(name)
+        return name
+
+    def load_users(self) -> dict:
+        """{profile role: [SandboxUser, ...]}, statisticians ordered by country id"""
+        users = {}
+        with self.connect() as conn:
+            rows = conn.execute('SELECT id::text, email, role, country_id FROM user_profiles '
+                                'ORDER BY role, country_id').fetchall()
+        for row in rows:
+            users.setdefault(row[2], []).append(SandboxUser(*row[:2], row[2], row[3]))
+        return users
+
+    @staticmethod
+    def as_user(conn, user: SandboxUser = None, role: str = None):
+        """Make the current transaction run as PostgREST would for `user`
+
+        With no user the transaction runs as `role` (default anon) with no
+        claims, like a request with the anon key. Settings are LOCAL, so
+        they end with the transaction.
+        """
+        role = role or ('authenticated' if user else 'anon')
+        claims = {'role': role}
+        if user:
+            claims.update(sub=user.id, email=user.email)
+        conn.execute(sql.SQL('SET LOCAL ROLE {}').format(sql.Identifier(role)))
+        conn.execute("SELECT set_config('request.jwt.claims', %s, true), "
+                     "set_config('request.jwt.claim.sub', %s, true), "
+                     "set_config('request.jwt.claim.role', %s, true)",
+                     (json.dumps(claims), claims.get('sub', ''), role))
+
+    def table_counts(self, database: str = None) -> dict:
+        with self.connect(database) as conn:
+            tables = [row[0] for row in conn.execute(
+                "SELECT tablename FROM pg_tables WHERE schemaname = 'public' ORDER BY tablename")]
+            return {table: conn.execute(sql.SQL('SELECT count(*) FROM {}').format(sql.Identifier(table))).fetchone()[0]
+                    for table in tables}
+
+
+def main():
+    utf8_console()
+
+    parser = argparse.ArgumentParser(description='Create a seeded local Postgres sandbox of the digest schema')
+    parser.add_argument('--dsn', help='Admin connection string of a local server (default: LOCAL_DATABASE_URL)')
+    parser.add_argument('--name', default=SANDBOX_PREFIX, help=f'Database name (must start with {SANDBOX_PREFIX})')
+    parser.add_argument('--countries', type=int, default=9, help='Number of countries (default: the 9 OECS members)')
+    parser.add_argument('--years', type=int, default=4, help='Number of academic years to seed')
+    parser.add_argument('--seed', type=int, default=42,
+                        help='Random seed for the synthetic data (as in generate_synthetic_data.py)')
+    parser.add_argument('--keep', action='store_true', help='Keep the database instead of dropping it on exit')
+    args = parser.parse_args()
+
+    print("=" * 80)
+    print("LOCAL POSTGRES SANDBOX")
+    print("=" * 80)
+
+    try:
+        started = time.perf_counter()
+        with LocalSandbox(args.dsn, args.name, args.countries, args.years, args.seed, args.keep) as sandbox:
+            print(f"✅ Created {sandbox.name} in {time.perf_counter() - started:.1f}s")
+            print()
+            for table, count in sandbox.table_counts().items():
+                print(f"  {table:<35} {count:>10,}")
+            print()
+            for role, users in sandbox.users.items():
+                print(f"  {role:<13} {len(users)} user(s), e.g. {users[0].email} ({users[0].id})")
+            print()
+            if args.keep:
+                print(f"📌 Kept: {sandbox.dsn()}")
+            else:
+                print(f"🗑️  Dropping {sandbox.name} (use --keep to inspect it)")
+    except Exception as e:
+        print(f"\n❌ Error creating sandbox: {e}")
+        import traceback
+        traceback.print_exc()
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,107 @@
+"""
+Merged-range index for resolving cells to their anchor
+
+The digest workbooks merge heavily: chapter and table headers span several
+columns, and row labels such as "> 1 year" span the M and F rows beneath
+them. openpyxl only stores a value in the top-left (anchor) cell of a merged
+range; every other cell of the range is an empty MergedCell. Checking a
+coordinate against `ws.merged_cells.ranges` means scanning every range.
+
+`MergedRangeIndex` is built once per sheet. Merged ranges never overlap, so
+the sheet is cut into row bands at every range's first row and one past its
+last row; within a band the active ranges are disjoint column intervals
+sorted by first column. A lookup is one bisect over the band boundaries and
+one over that band's intervals, O(log n) in the number of ranges.
+
+Usage:
+    from merged_ranges import MergedRangeIndex
+
+    merged = MergedRangeIndex.from_sheet(ws)
+    merged.anchor(7, 1)                    # (6, 1): A7 belongs to A6:A7
+    merged.value(ws, 7, 1)                 # '> 1 year'
+    merged.column_headers(ws, [4, 5], 1, 2)
+    # {1: ('PUBLIC', 'Age as of Oct. 15th'), 2: ('PUBLIC', 'Sex')}
+"""
+
+from bisect import bisect_right
+
+
+class MergedRangeIndex:
+    """Point lookups over a sheet's merged ranges, given as (min_col, min_row, max_col, max_row)"""
+
+    __slots__ = ('boundaries', 'bands', 'count')
+
+    def __init__(self, ranges=()):
+        ranges = sorted(set(ranges), key=lambda bounds: (bounds[1], bounds[0]))
+        self.count = len(ranges)
+        self.boundaries = sorted({row for _, min_row, _, max_row in ranges for row in (min_row, max_row + 1)})
+
+        # bands[i] covers rows boundaries[i] .. boundaries[i + 1] - 1:
+        # ([first columns], [ranges]) for the ranges spanning those rows
+        self.bands = []
+        active = []
+        pending = iter(ranges)
+        upcoming = next(pending, None)
+        for start in self.boundaries[:-1]:
+            active = [bounds for bounds in active if bounds[3] >= start]
+            while upcoming is not None and upcoming[1] <= start:
+                active.append(upcoming)
+                upcoming = next(pending, None)
+            active.sort()
+            self.bands.append(([bounds[0] for bounds in active], list(active)))
+
+    @classmethod
+    def from_sheet(cls, ws) -> 'MergedRangeIndex':
+        """Index of a worksheet's merged ranges (empty for read-only worksheets, which have none)"""
+        merged_cells = getattr(ws, 'merged_cells', None)
+        return cls(merged.bounds for merged in merged_cells.ranges) if merged_cells is not None else cls()
+
+    def __len__(self):
+        return self.count
+
+    def find(self, row: int, col: int):
+        """Bounds (min_col, min_row, max_col, max_row) of the range containing the cell, or None"""
+        band = bisect_right(self.boundaries, row) - 1
+        if band < 0 or band >= len(self.bands):
+            return None
+        starts, ranges = self.bands[band]
+        position = bisect_right(starts, col) - 1
+        if position < 0 or ranges[position][2] < col:
+            return None
+        return ranges[position]
+
+    def anchor(self, row: int, col: int) -> tuple:
+        """(row, col) of the cell holding the value: the range's top-left, or the cell itself"""
+        bounds = self.find(row, col)
+        return (bounds[1], bounds[0]) if bounds else (row, col)
+
+    def is_follower(self, row: int, col: int) -> bool:
+        """True for the empty, non-anchor cells of a merged range"""
+        return self.anchor(row, col) != (row, col)
+
+    def value(self, ws, row: int, col: int):
+        """Value shown at (row, col): the anchor's value for merged cells"""
+        return ws.cell(*self.anchor(row, col)).value
+
+    def column_headers(self, ws, header_rows, min_col: int, max_col: int) -> dict:
+        """{col: (label, ...)} reading `header_rows` top to bottom with merges resolved
+
+        Empty levels are left out, and a label repeated by a vertical merge is
+        kept once, so column B under 'PUBLIC' (A4:E4) and 'Sex' gets
+        ('PUBLIC', 'Sex').
+        """
+        headers = {}
+        for col in range(min_col, max_col + 1):
+            labels = []
+            anchors = set()
+            for row in header_rows:
+                anchor = self.anchor(row, col)
+                value = ws.cell(*anchor).value
+                if value is None or anchor in anchors:
+                    continue
+                anchors.add(anchor)
+                label = str(value).strip()
+                if label:
+                    labels.append(label)
+            headers[col] = tuple(labels)
+        return headers
@@ -0,0 +1,262 @@
+"""
+Direct PostgreSQL COPY loader for bulk imports
+
+The REST path sends every row through PostgREST as JSON. With `--backend copy`
+the importers instead connect straight to Postgres, stream the rows into a
+temporary staging table with binary COPY, and merge the staging table into
+the target with one statement:
+
+    WITH deleted  AS (DELETE stored rows of the slices that are not staged),
+         updated  AS (UPDATE stored rows whose values differ),
+         inserted AS (INSERT staged rows that are not stored)
+    SELECT counts
+
+Rows are matched on their key columns: `=` for NOT NULL columns (so Postgres
+can hash-join staging and target) and IS NOT DISTINCT FROM for nullable ones,
+so it works for tables whose unique constraints contain NULLable columns or
+expressions (e.g. student_enrollment). Each merge runs in its own transaction; a dry run rolls
+it back after reading the counts.
+
+Needs psycopg 3 (not required for the REST path):
+    pip install "psycopg[binary]"
+
+and a direct connection string in .env.local:
+    DATABASE_URL=postgresql://postgres:<password>@db.<project>.supabase.co:5432/postgres
+
+(Supabase dashboard → Project Settings → Database → Connection string). Any
+local Postgres with the digest schema works too, e.g.
+DATABASE_URL=postgresql://postgres@localhost:5432/oecs_digest.
+
+Usage:
+    from pg_copy_loader import CopyLoader
+
+    with CopyLoader() as loader:
+        counts = loader.merge('student_enrollment', rows, KEY_FIELDS, ['count'],
+                              slices=[(country_id, year_id)])
+"""
+
+import os
+import uuid
+from decimal import Decimal
+
+import supabase_client  # noqa: F401  (loads .env.local)
+from import_audit import change_set as audit_change_set
+
+try:
+    import psycopg
+    from psycopg import sql
+except ImportError:
+    psycopg = None
+
+# Columns identifying the slice a set of rows replaces
+SCOPE_FIELDS = ('country_id', 'academic_year_id')
+
+# Python value conversions binary COPY needs, by Postgres type name
+CONVERTERS = {
+    'uuid': lambda value: value if isinstance(value, uuid.UUID) else uuid.UUID(str(value)),
+    'numeric': lambda value: value if isinstance(value, Decimal) else Decimal(str(value)),
+}
+
+
+def database_url():
+    return os.getenv('DATABASE_URL')
+
+
+def copy_value(type_name: str, value):
+    """Python value in the form binary COPY expects for a column type"""
+    if value is None or type_name not in CONVERTERS:
+        return value
+    return CONVERTERS[type_name](value)
+
+
+class CopyLoader:
+    """One direct Postgres connection used for COPY + merge loads"""
+
+    def __init__(self, dsn: str = None):
+        if psycopg is None:
+            raise RuntimeError('The copy backend needs psycopg 3: pip install "psycopg[binary]"')
+        dsn = dsn or database_url()
+        if not dsn:
+            raise RuntimeError('The copy backend needs DATABASE_URL (a direct Postgres connection string) in .env.local')
+        # Autocommit, so each merge's transaction() is a real transaction and
+        # its ON COMMIT DROP staging table goes away when it ends
+        self.conn = psycopg.connect(dsn, autocommit=True)
+        self.types = {}
+        self.not_null = {}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def close(self):
+        self.conn.close()
+
+    def column_types(self, table: str) -> dict:
+        """Column name -> Postgres type name for a public table"""
+        if table not in self.types:
+            rows = self.conn.execute(
+                """
+                SELECT a.attname, t.typname, a.attnotnull
+                FROM pg_attribute a
+                JOIN pg_type t ON t.oid = a.atttypid
+                WHERE a.attrelid = %s::regclass AND a.attnum > 0 AND NOT a.attisdropped
+                """,
+                [f'public.{table}'],
+            ).fetchall()
+            if not rows:
+                raise ValueError(f"Table not found: {table}")
+            self.types[table] = {name: type_name for name, type_name, _ in rows}
+            self.not_null[table] = {name for name, _, not_null in rows if not_null}
+        return self.types[table]
+
+    def merge(self, table: str, rows: list, key_fields, value_fields, slices: list = None,
+              scope_fields=SCOPE_FIELDS, dry_run: bool = False, audit=None, source_file=None,
+              within: dict = None) -> dict:
+        """Make the stored rows of `slices` equal to `rows`; returns inserted/updated/deleted/unchanged
+
+        `slices` are tuples of `scope_fields` values (by default the distinct
+        ones found in `rows`). Stored rows in those slices whose keys are not
+        in `rows` are deleted. `within` ({column: values}) narrows the slices
+        further, e.g. to the education levels a template covers, so stored
+        rows outside it are left alone.
+
+        With an `audit` trail (import_audit.AuditTrail) the statement returns
+        the changed rows instead of counting them, and their entry is
+        appended to import_audit in the same transaction.
+        """
+        scope_fields, key_fields, value_fields = tuple(scope_fields), tuple(key_fields), tuple(value_fields)
+        columns = scope_fields + key_fields + value_fields
+        types = self.column_types(table)
+        missing = [column for column in columns if column not in types]
+        if missing:
+            raise ValueError(f"{table} has no column(s): {', '.join(missing)}")
+        seen = set()
+        for row in rows:
+            key = tuple(row.get(field) for field in scope_fields + key_fields)
+            if key in seen:
+                raise ValueError(f"Rows repeat the key {', '.join(f'{f}={v}' for f, v in zip(scope_fields + key_fields, key))}")
+            seen.add(key)
+        if slices is None:
+            slices = sorted({tuple(row[field] for field in scope_fields) for row in rows}, key=str)
+
+        target = sql.Identifier('public', table)
+        staging = sql.Identifier(f'staging_{table}')
+        column_list = sql.SQL(', ').join(map(sql.Identifier, columns))
+
+        not_null = self.not_null[table]
+
+        def join_on(left: str, right: str, fields) -> sql.Composable:
+            return sql.SQL(' AND ').join(
+                sql.SQL('{} = {}' if field in not_null else '{} IS NOT DISTINCT FROM {}')
+                .format(sql.Identifier(left, field), sql.Identifier(right, field))
+                for field in fields
+            ) if fields else sql.SQL('TRUE')
+
+        in_scope = sql.SQL('({}) IN (SELECT * FROM unnest({}))').format(
+            sql.SQL(', ').join(sql.Identifier('t', field) for field in scope_fields),
+            sql.SQL(', ').join(
+                sql.SQL('{}::{}[]').format(sql.Placeholder(), sql.Identifier(types[field]))
+                for field in scope_fields
+            ),
+        )
+        scope_values = [[copy_value(types[field], slice_[i]) for slice_ in slices]
+                        for i, field in enumerate(scope_fields)]
+        within = within or {}
+        for field, values in within.items():
+            if field not in types:
+                raise ValueError(f"{table} has no column: {field}")
+            in_scope = sql.SQL('{} AND {} = ANY({}::{}[])').format(
+                in_scope, sql.Identifier('t', field), sql.Placeholder(), sql.Identifier(types[field]))
+            scope_values.append([copy_value(types[field], value) for value in values])
+        match = join_on('t', 's', scope_fields + key_fields)
+        changed = sql.SQL(' OR ').join(
+            sql.SQL('{} IS DISTINCT FROM {}').format(sql.Identifier('t', field), sql.Identifier('s', field))
+            for field in value_fields
+        )
+
+        # Audited merges return each changed row's key and old/new values;
+        # the UPDATE joins the target a second time (same row, by ctid) to read
+        # the values it is replacing
+        audited = audit is not None and not dry_run
+        key_columns = (key_fields if len(slices) == 1 else scope_fields + key_fields)
+
+        def array_of(alias: str, fields) -> sql.Composable:
+            return sql.SQL('jsonb_build_array({})').format(
+                sql.SQL(', ').join(sql.Identifier(alias, field) for field in fields))
+
+        if audited:
+            returning = {
+                'deleted': sql.SQL('{}, {}').format(array_of('t', key_columns), array_of('t', value_fields)),
+                'updated': sql.SQL('{}, {}, {}').format(array_of('t', key_columns), array_of('o', value_fields),
+                                                        array_of('t', value_fields)),
+                'inserted': sql.SQL('{}, {}').format(array_of('t', key_columns), array_of('t', value_fields)),
+            }
+            old_rows = sql.SQL(', {} o').format(target)
+            same_row = sql.SQL(' AND o.ctid = t.ctid')
+            inserted_alias = sql.SQL(' AS t')
+            result = sql.SQL("""
+                SELECT 'inserted', *, NULL::jsonb FROM inserted
+                UNION ALL SELECT 'updated', * FROM updated
+                UNION ALL SELECT 'deleted', *, NULL::jsonb FROM deleted
+            """)
+        else:
+            returning = dict.fromkeys(('deleted', 'updated', 'inserted'), sql.SQL('1'))
+            old_rows = same_row = inserted_alias = sql.SQL('')
+            result = sql.SQL(
+                'SELECT (SELECT count(*) FROM inserted), (SELECT count(*) FROM updated), (SELECT count(*) FROM deleted)')
+
+        merge_statement = sql.SQL("""
+            WITH deleted AS (
+                DELETE FROM {target} t
+                WHERE {in_scope}
+                  AND NOT EXISTS (SELECT 1 FROM {staging} s WHERE {match})
+                RETURNING {returning_deleted}
+            ), updated AS (
+                UPDATE {target} t SET {assignments}
+                FROM {staging} s{old_rows}
+                WHERE {match} AND ({changed}){same_row}
+                RETURNING {returning_updated}
+            ), inserted AS (
+                INSERT INTO {target}{inserted_alias} ({columns})
+                SELECT {columns} FROM {staging} s
+                WHERE NOT EXISTS (SELECT 1 FROM {target} t WHERE {match})
+                RETURNING {returning_inserted}
+            )
+            {result}
+        """).format(
+            target=target, staging=staging, in_scope=in_scope, match=match, changed=changed,
+            columns=column_list, old_rows=old_rows, same_row=same_row, inserted_alias=inserted_alias,
+            returning_deleted=returning['deleted'], returning_updated=returning['updated'],
+            returning_inserted=returning['inserted'], result=result,
+            assignments=sql.SQL(', ').join(
+                sql.SQL('{} = {}').format(sql.Identifier(field), sql.Identifier('s', field))
+                for field in value_fields
+            ),
+        )
+
+        with self.conn.transaction(force_rollback=dry_run), self.conn.cursor() as cur:
+            cur.execute(sql.SQL('CREATE TEMP TABLE {} ON COMMIT DROP AS SELECT {} FROM {} WITH NO DATA')
+                        .format(staging, column_list, target))
+            with cur.copy(sql.SQL('COPY {} ({}) FROM STDIN (FORMAT BINARY)').format(staging, column_list)) as copy:
+                copy.set_types([types[column] for column in columns])
+                for row in rows:
+                    copy.write_row([copy_value(types[column], row.get(column)) for column in columns])
+            cur.execute(sql.SQL('ANALYZE {}').format(staging))
+            cur.execute(merge_statement, scope_values)
+            if audited:
+                changed_rows = {'inserted': [], 'updated': [], 'deleted': []}
+                for kind, key, first, second in cur.fetchall():
+                    changed_rows[kind].append((key, first, second) if kind == 'updated' else (key, first))
+                inserted, updated, deleted = (len(changed_rows[kind]) for kind in ('inserted', 'updated', 'deleted'))
+                changes = audit_change_set(key_columns, value_fields, **changed_rows)
+                scope = dict(zip(scope_fields, slices[0])) if len(slices) == 1 else {}
+                entry = audit.entry(table, changes, scope, source_file)
+                if entry is not None:
+                    audit.write(cur, entry)
+            else:
+                inserted, updated, deleted = cur.fetchone()
+
+        return {'inserted': inserted, 'updated': updated, 'deleted': deleted,
+                'unchanged': len(rows) - inserted - updated}
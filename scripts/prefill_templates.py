@@ -0,0 +1,375 @@
+"""
+Generate prefilled member-state templates for the next collection round
+
+Every cycle each country starts from an empty `Blank OECS MS Template.xlsx`
+and re-types numbers that are already in the database. This script writes
+one template per country and year with the stored values in the mapped input
+cells (template_mapping.py) and the totals computed:
+
+- prior-year tables (D6-D8) get the stored values for the year before the
+  template year, which is what they ask for
+- current-year tables get the same prior-year values as a starting point to
+  correct (--blank-current leaves them empty)
+- total cells get cached values computed from the formulas in the generated
+  mappings (generate_cell_mappings.py), and the workbook is flagged to
+  recalculate when it is opened
+- year labels ('2023-2024', 'D6. ... 2022-2023', '2022-23') are moved to the
+  requested year
+
+The blank template is read once and each mapped worksheet's XML is cut once
+into the text between the cells to fill. For each year the shared strings
+are relabelled once. A country's template is then the cut pieces joined
+with its cell XML, with every other part of the package copied unchanged,
+so no workbook is parsed per country. Templates are compressed and written
+by a thread pool (zlib releases the GIL), and stored values are read with
+one paged query per table for all countries.
+
+Usage:
+    python scripts/prefill_templates.py --year 2024-2025
+    python scripts/prefill_templates.py --year 2024-2025 --year 2025-2026 --output prefilled/
+    python scripts/prefill_templates.py --year 2024-2025 --countries GRD LCA --blank-current
+"""
+
+import sys
+import os
+import re
+import time
+import zipfile
+import argparse
+import tempfile
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from pathlib import Path
+
+from openpyxl.formula import Tokenizer
+from openpyxl.utils import get_column_letter, range_boundaries
+
+from console import utf8_console
+from import_member_templates import TABLES, load_academic_year_ids, load_country_ids, prior_year_label
+from supabase_client import get_client
+from table_reader import iter_table
+from template_mapping import (TEMPLATE_PATH, generated_mappings, mapped_cells, table_fields, total_formulas,
+                              unmatched_cells)
+from workbook_slim import read_workbook
+
+# One cell element of a sheet: <c r="E8" s="42"/> or <c r="G8" s="43"><f>...</f><v>0</v></c>
+CELL_ELEMENT = re.compile(r'<c r="([A-Z]+\d+)"([^>]*?)(?:/>|>(.*?)</c>)', re.S)
+FORMULA_ELEMENT = re.compile(r'<f\b[^>]*?(?:/>|>.*?</f>)', re.S)
+TYPE_ATTRIBUTE = re.compile(r'\s+t="[^"]*"')
+CALC_PROPERTIES = re.compile(r'<calcPr\b([^>]*?)/>')
+
+# '2023-2024', '2022-23'; only shifted when the end is the year after the start
+YEAR_RANGE = re.compile(r'\b(\d{4})(\s*-\s*)(\d{4}|\d{2})\b')
+
+DEFAULT_OUTPUT = 'prefilled_templates'
+
+
+def shift_years(text: str, shift: int) -> str:
+    """Move every academic-year label in `text` by `shift` years, keeping its format"""
+    def replace(match):
+        start, separator, end = match.groups()
+        if int(end) % 100 != (int(start) + 1) % 100:
+            return match.group(0)
+        new_start = int(start) + shift
+        return f"{new_start}{separator}{str(new_start + 1)[-len(end):]}"
+    return YEAR_RANGE.sub(replace, text) if shift else text
+
+
+def flag_recalculation(workbook_xml: str) -> str:
+    """Ask Excel to recalculate every formula when the workbook is opened"""
+    def replace(match):
+        attributes = re.sub(r'\s+fullCalcOnLoad="[^"]*"', '', match.group(1))
+        return f'<calcPr{attributes} fullCalcOnLoad="1"/>'
+    return CALC_PROPERTIES.sub(replace, workbook_xml, count=1)
+
+
+def sum_expression(formula: str):
+    """'=SUM(C20:D21)+E5' -> "SUM(R('C20:D21'))+R('E5')", or None for anything but SUM, + and -"""
+    try:
+        tokens = Tokenizer(formula).items
+    except Exception:
+        return None
+    parts = []
+    for token in tokens:
+        if token.type == 'OPERAND' and token.subtype == 'RANGE' and '!' not in token.value:
+            parts.append(f"R({token.value.replace('$', '')!r})")
+        elif token.type == 'OPERAND' and token.subtype == 'NUMBER':
+            parts.append(token.value)
+        elif token.type == 'FUNC' and token.value.upper() in ('SUM(', ')'):
+            parts.append(token.value.upper())
+        elif token.type in ('OPERATOR-INFIX', 'OPERATOR-PREFIX') and token.value in ('+', '-'):
+            parts.append(token.value)
+        elif token.type in ('SEP', 'PAREN') and token.value in (',', '(', ')'):
+            parts.append(token.value)
+        elif token.type != 'WHITE-SPACE':
+            return None
+    return ''.join(parts) or None
+
+
+class TotalEvaluator:
+    """Cached values for one worksheet's total cells
+
+    Built once from {coordinate: formula}; formulas are translated to Python
+    expressions over range lookups once, then evaluated per country. Totals
+    of totals are resolved recursively. Formulas using other functions or
+    other sheets evaluate to None and are left to Excel's recalculation.
+    """
+
+    def __init__(self, formulas: dict):
+        self.expressions = {coordinate: sum_expression(formula) for coordinate, formula in formulas.items()}
+
+    def evaluate(self, values: dict) -> dict:
+        """{coordinate: total or None} given the input values ({coordinate: number}, blanks are 0)"""
+        results = {}
+
+        def cell_value(coordinate):
+            return total(coordinate) if coordinate in self.expressions else values.get(coordinate, 0)
+
+        def lookup(reference):
+            min_col, min_row, max_col, max_row = range_boundaries(reference)
+            terms = [cell_value(f"{get_column_letter(col)}{row}")
+                     for row in range(min_row, max_row + 1) for col in range(min_col, max_col + 1)]
+            if None in terms:
+                raise LookupError(reference)
+            return sum(terms)
+
+        def total(coordinate):
+            if coordinate not in results:
+                results[coordinate] = None    # also what a circular reference sees
+                expression = self.expressions[coordinate]
+                if expression is not None:
+                    try:
+                        results[coordinate] = eval(expression, {'__builtins__': {}},
+                                                   {'R': lookup, 'SUM': lambda *terms: sum(terms)})
+                    except (LookupError, TypeError, SyntaxError):
+                        pass
+            return results[coordinate]
+
+        for coordinate in self.expressions:
+            total(coordinate)
+        return results
+
+
+class SheetTemplate:
+    """A worksheet's XML cut once around the cells to fill"""
+
+    __slots__ = ('pieces', 'cells')
+
+    def __init__(self, xml: str, coordinates):
+        wanted = set(coordinates)
+        self.pieces = []    # text before each cut cell, then the rest of the sheet
+        self.cells = []     # (coordinate, opening tag without t=, <f> element, original element)
+        position = 0
+        for match in CELL_ELEMENT.finditer(xml):
+            coordinate = match.group(1)
+            if coordinate not in wanted:
+                continue
+            formula = FORMULA_ELEMENT.search(match.group(3) or '')
+            self.pieces.append(xml[position:match.start()])
+            self.cells.append((coordinate, f'<c r="{coordinate}"{TYPE_ATTRIBUTE.sub("", match.group(2))}',
+                               formula.group(0) if formula else '', match.group(0)))
+            position = match.end()
+        self.pieces.append(xml[position:])
+
+    def coordinates(self) -> set:
+        return {cell[0] for cell in self.cells}
+
+    def render(self, values: dict) -> bytes:
+        """The sheet XML with `values` ({coordinate: number}) in the cut cells
+
+        Input cells without a value keep their original element; formula
+        cells without a value keep the formula and lose the stale cached value.
+        """
+        parts = [self.pieces[0]]
+        for (coordinate, opening, formula, original), piece in zip(self.cells, self.pieces[1:]):
+            value = values.get(coordinate)
+            if value is not None:
+                parts.append(f'{opening}>{formula}<v>{value}</v></c>')
+            elif formula:
+                parts.append(f'{opening}>{formula}</c>')
+            else:
+                parts.append(original)
+            parts.append(piece)
+        return ''.join(parts).encode('utf-8')
+
+
+class TemplatePack:
+    """The blank template, read and cut once, from which every prefilled copy is written"""
+
+    def __init__(self, path, sheet_cells: dict):
+        """`sheet_cells`: {worksheet name: coordinates to fill (inputs and totals)}"""
+        with zipfile.ZipFile(path) as archive:
+            self.names = archive.namelist()
+            self.parts = {name: archive.read(name) for name in self.names}
+            sheets, self.shared_strings, _ = read_workbook(archive)
+        self.sheet_parts = {name: part for name, part, _ in sheets}
+        self.sheets = {
+            self.sheet_parts[name]: SheetTemplate(self.parts[self.sheet_parts[name]].decode('utf-8'), coordinates)
+            for name, coordinates in sheet_cells.items() if name in self.sheet_parts
+        }
+        self.missing = {name: set(coordinates) - self.sheets[self.sheet_parts[name]].coordinates()
+                        for name, coordinates in sheet_cells.items() if name in self.sheet_parts}
+
+    def year_parts(self, shift: int) -> dict:
+        """Package parts that differ for a year: relabelled shared strings, workbook set to recalculate"""
+        parts = {'xl/workbook.xml': flag_recalculation(self.parts['xl/workbook.xml'].decode('utf-8')).encode('utf-8')}
+        if self.shared_strings in self.parts:
+            parts[self.shared_strings] = shift_years(self.parts[self.shared_strings].decode('utf-8'), shift).encode('utf-8')
+        return parts
+
+    def write(self, path: Path, year_parts: dict, values: dict) -> int:
+        """Write one copy with `values` ({worksheet: {coordinate: number}}); returns its size"""
+        sheet_values = {self.sheet_parts[sheet]: cells for sheet, cells in values.items()}
+        path.parent.mkdir(parents=True, exist_ok=True)
+        # Write under a unique name and rename, so an interrupted run leaves no truncated workbook
+        fd, partial = tempfile.mkstemp(suffix='.xlsx', dir=path.parent)
+        os.close(fd)
+        try:
+            with zipfile.ZipFile(partial, 'w', zipfile.ZIP_DEFLATED) as archive:
+                for name in self.names:
+                    if name in self.sheets:
+                        data = self.sheets[name].render(sheet_values.get(name, {}))
+                    else:
+                        data = year_parts.get(name, self.parts[name])
+                    archive.writestr(name, data)
+            os.replace(partial, path)
+        finally:
+            if os.path.exists(partial):
+                os.unlink(partial)
+        return path.stat().st_size
+
+
+def template_year(mappings: dict) -> str:
+    """Academic year of the blank template ('2023-2024'), from the worksheet headers"""
+    years = [mapping['academic_year'] for mapping in mappings.values() if mapping.get('academic_year')]
+    if not years:
+        raise ValueError("No academic year found in the template's worksheet headers")
+    return max(set(years), key=years.count)
+
+
+def load_stored_values(client, year_id) -> dict:
+    """{country_id: {(table, ((column, value), ...)): value}} for one academic year, all countries"""
+    stored = defaultdict(dict)
+    for table in TABLES:
+        key_fields, value_field = table_fields()[table]
+        columns = ', '.join(['id', 'country_id', *key_fields, value_field])
+        for row in iter_table(client, table, columns=columns, filters={'academic_year_id': year_id}):
+            key = tuple((field, row.get(field)) for field in key_fields)
+            stored[row['country_id']][(table, key)] = row.get(value_field)
+    return stored
+
+
+def country_values(cells, stored: dict, evaluators: dict, blank_current: bool = False) -> dict:
+    """{worksheet: {coordinate: value}} for one country: its stored inputs plus computed totals"""
+    values = defaultdict(dict)
+    for cell in cells:
+        if blank_current and cell.year_offset == 0:
+            continue
+        value = stored.get((cell.table, cell.fields))
+        if value is not None:
+            values[cell.sheet][cell.coordinate] = value
+    for sheet, evaluator in evaluators.items():
+        inputs = values[sheet]
+        inputs.update({coordinate: total for coordinate, total in evaluator.evaluate(inputs).items()
+                       if total is not None})
+    return values
+
+
+def prefill_templates(year_labels, output_dir, countries=None, blank_current=False, workers=None) -> list:
+    """Write a prefilled template per country and year; returns [(path, cells filled, bytes)]"""
+    start = time.perf_counter()
+    mappings = generated_mappings()
+    base_year = template_year(mappings)
+    cells = mapped_cells()
+
+    totals = total_formulas(mappings, sheets={cell.sheet for cell in cells})
+    evaluators = {sheet: TotalEvaluator(formulas) for sheet, formulas in totals.items()}
+
+    sheet_cells = defaultdict(set)
+    for cell in cells:
+        sheet_cells[cell.sheet].add(cell.coordinate)
+    for sheet, formulas in totals.items():
+        sheet_cells[sheet].update(formulas)
+    pack = TemplatePack(TEMPLATE_PATH, sheet_cells)
+    for sheet, missing in pack.missing.items():
+        if missing:
+            print(f"   ⚠️  {sheet}: {len(missing)} mapped cells not in the template XML, left blank")
+    unmatched = unmatched_cells(mappings, cells)
+    if unmatched:
+        print(f"   ⚠️  {len(unmatched)} mapped cells are not input cells of the template "
+              f"(e.g. {unmatched[0].sheet}!{unmatched[0].coordinate}); check the cell mappings")
+    print(f"\n📄 Template {TEMPLATE_PATH.name} ({base_year}) cut in {time.perf_counter() - start:.2f}s")
+
+    country_ids = load_country_ids()
+    year_ids = load_academic_year_ids()
+    if countries:
+        unknown = [code for code in countries if code not in country_ids]
+        if unknown:
+            raise ValueError(f"Unknown country code(s): {', '.join(unknown)}")
+        country_ids = {code: country_ids[code] for code in countries}
+
+    client = get_client()
+    jobs = []
+    for year_label in year_labels:
+        if not re.fullmatch(r'\d{4}-\d{4}', year_label):
+            raise ValueError(f"Academic year must look like 2024-2025, got {year_label!r}")
+        source_label = prior_year_label(year_label)
+        year_id = year_ids.get(source_label)
+        if year_id is None:
+            print(f"   ⚠️  {year_label}: no academic year {source_label} in the database, templates are not prefilled")
+            stored = {}
+        else:
+            stored = load_stored_values(client, year_id)
+        year_parts = pack.year_parts(int(year_label[:4]) - int(base_year[:4]))
+        print(f"📅 {year_label}: values from {source_label} for {sum(1 for cid in country_ids.values() if stored.get(cid))}"
+              f" of {len(country_ids)} countries")
+        for code, country_id in sorted(country_ids.items()):
+            values = country_values(cells, stored.get(country_id, {}), evaluators, blank_current)
+            path = Path(output_dir) / year_label / f"{code} {year_label}.xlsx"
+            jobs.append((path, year_parts, values))
+
+    written = []
+    with ThreadPoolExecutor(max_workers=workers or min(len(jobs), os.cpu_count() or 1) or 1) as pool:
+        futures = {pool.submit(pack.write, path, year_parts, values): (path, values)
+                   for path, year_parts, values in jobs}
+        for future in as_completed(futures):
+            path, values = futures[future]
+            filled = sum(len(sheet_values) for sheet_values in values.values())
+            written.append((path, filled, future.result()))
+    return sorted(written)
+
+
+def main():
+    utf8_console()
+
+    parser = argparse.ArgumentParser(description='Write member-state templates prefilled with stored values')
+    parser.add_argument('--year', action='append', dest='years', required=True,
+                        help='Academic year of the templates, e.g. 2024-2025 (repeatable)')
+    parser.add_argument('--countries', nargs='+', help='ISO codes of the countries (default: all)')
+    parser.add_argument('--output', default=DEFAULT_OUTPUT, help=f'Output directory (default: {DEFAULT_OUTPUT})')
+    parser.add_argument('--blank-current', action='store_true',
+                        help='Leave the current-year tables empty; only prefill the prior-year tables')
+    parser.add_argument('--workers', type=int, help='Templates written in parallel (default: CPU count)')
+    args = parser.parse_args()
+
+    print("\n" + "=" * 80)
+    print("📝 PREFILLING MEMBER-STATE TEMPLATES")
+    print("=" * 80)
+
+    try:
+        start = time.perf_counter()
+        countries = [code.upper() for code in args.countries] if args.countries else None
+        written = prefill_templates(args.years, args.output, countries, args.blank_current, args.workers)
+        print()
+        for path, filled, size in written:
+            print(f"   ✓ {path}: {filled} cells, {size:,} bytes")
+        print(f"\n✅ Wrote {len(written)} templates to {args.output} in {time.perf_counter() - start:.2f}s")
+    except Exception as e:
+        print(f"\n❌ Error during prefill: {e}")
+        import traceback
+        traceback.print_exc()
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
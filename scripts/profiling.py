@@ -0,0 +1,153 @@
+"""
+Shared `--profile` support for the digest scripts
+
+Wrapping an entry point in `profiled(base_path, mode)` runs it under one
+profiler and writes its report next to the script's output:
+
+- cpu     <base>.prof       cProfile stats (open with `python -m pstats` or
+                            snakeviz); the top functions by cumulative time
+                            are also printed when the block exits
+- stacks  <base>.collapsed  sampled stacks in collapsed format, one
+                            "a;b;c count" per line, for flamegraph.pl /
+                            speedscope / inferno
+- memory  <base>.memory.txt tracemalloc peak plus the top allocation sites,
+                            compared against a snapshot taken on entry
+
+Only one runs per pass: tracemalloc slows every allocation and the sampler
+thread competes for the GIL, so either would skew cProfile's timings, and
+cProfile's hooks would in turn show up in the sampled stacks. Profile again
+with another mode to get its report.
+
+Usage:
+    from profiling import add_profile_argument, profiled
+
+    add_profile_argument(parser)
+    args = parser.parse_args()
+    with profiled(Path(args.output).with_suffix(''), mode=args.profile):
+        main()
+"""
+
+import cProfile
+import os
+import pstats
+import sys
+import threading
+import tracemalloc
+from collections import Counter
+from contextlib import contextmanager
+from pathlib import Path
+
+SAMPLE_INTERVAL = 0.005  # seconds between stack samples
+TOP_FUNCTIONS = 20
+TOP_ALLOCATIONS = 25
+PROFILE_MODES = ('cpu', 'stacks', 'memory')
+
+
+def add_profile_argument(parser):
+    """Add the common --profile [cpu|stacks|memory] flag to an argparse parser"""
+    parser.add_argument('--profile', nargs='?', const='cpu', choices=PROFILE_MODES,
+                        help='Profile the run with one profiler: cpu (cProfile, the default) writes <output>.prof, '
+                             'stacks (sampler) writes <output>.collapsed, memory (tracemalloc) writes '
+                             '<output>.memory.txt')
+
+
+def frame_label(frame) -> str:
+    code = frame.f_code
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+
+class StackSampler:
+    """Samples one thread's Python stack on a timer and counts collapsed stacks"""
+
+    def __init__(self, thread_id: int, interval: float = SAMPLE_INTERVAL):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks = Counter()
+        self.stop_event = threading.Event()
+        self.worker = threading.Thread(target=self.run, name='profile-sampler', daemon=True)
+
+    def run(self):
+        while not self.stop_event.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            labels = []
+            while frame is not None:
+                labels.append(frame_label(frame))
+                frame = frame.f_back
+            if labels:
+                self.stacks[';'.join(reversed(labels))] += 1
+
+    def start(self):
+        self.worker.start()
+
+    def stop(self):
+        self.stop_event.set()
+        self.worker.join()
+
+    def write(self, path: Path):
+        with open(path, 'w', encoding='utf-8') as f:
+            for stack, count in self.stacks.most_common():
+                f.write(f"{stack} {count}\n")
+
+
+def write_memory_report(path: Path, start_snapshot, end_snapshot, peak: int):
+    stats = end_snapshot.compare_to(start_snapshot, 'lineno')
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write(f"Peak traced memory: {peak / 1024 / 1024:.1f} MiB\n")
+        f.write(f"Top {TOP_ALLOCATIONS} allocation sites (growth since entry):\n\n")
+        for stat in stats[:TOP_ALLOCATIONS]:
+            f.write(f"{stat}\n")
+
+
+@contextmanager
+def profiled(base_path, mode: str = None):
+    """Profile the enclosed block with one of PROFILE_MODES, writing <base_path>.* (no-op without a mode)"""
+    if mode is None:
+        yield
+        return
+    if mode not in PROFILE_MODES:
+        raise ValueError(f"Unknown profile mode: {mode} (expected one of {', '.join(PROFILE_MODES)})")
+
+    base_path = Path(base_path)
+    if mode == 'cpu':
+        prof_path = base_path.with_name(base_path.name + '.prof')
+        profiler = cProfile.Profile()
+        profiler.enable()
+        try:
+            yield
+        finally:
+            profiler.disable()
+            profiler.dump_stats(prof_path)
+            print("\n" + "=" * 80)
+            print(f"🔬 PROFILE (top {TOP_FUNCTIONS} by cumulative time)")
+            print("=" * 80)
+            pstats.Stats(profiler, stream=sys.stdout).sort_stats('cumulative').print_stats(TOP_FUNCTIONS)
+            print(f"   cProfile stats:     {prof_path}")
+    elif mode == 'stacks':
+        collapsed_path = base_path.with_name(base_path.name + '.collapsed')
+        sampler = StackSampler(threading.get_ident())
+        sampler.start()
+        try:
+            yield
+        finally:
+            sampler.stop()
+            sampler.write(collapsed_path)
+            print("\n" + "=" * 80)
+            print("🔬 PROFILE (sampled stacks)")
+            print("=" * 80)
+            print(f"   Collapsed stacks:   {collapsed_path} ({sum(sampler.stacks.values())} samples)")
+    else:
+        memory_path = base_path.with_name(base_path.name + '.memory.txt')
+        tracemalloc.start()
+        start_snapshot = tracemalloc.take_snapshot()
+        try:
+            yield
+        finally:
+            end_snapshot = tracemalloc.take_snapshot()
+            _, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+            write_memory_report(memory_path, start_snapshot, end_snapshot, peak)
+            print("\n" + "=" * 80)
+            print("🔬 PROFILE (memory)")
+            print("=" * 80)
+            print(f"   Peak traced memory: {peak / 1024 / 1024:.1f} MiB")
+            print(f"   Memory report:      {memory_path}")
@@ -0,0 +1,353 @@
+"""
+RLS policy overhead benchmark against a local Postgres
+
+The policies in the schema files check every row with correlated subqueries
+on user_profiles, e.g.
+
+    country_id IN (SELECT country_id FROM user_profiles WHERE id = auth.uid())
+    OR EXISTS (SELECT 1 FROM user_profiles WHERE id = auth.uid() AND role IN (...))
+
+and fix_rls_policies.py can only print the SQL to paste into the dashboard.
+This harness measures what a policy variant costs before it is shipped:
+
+1. Builds a seeded sandbox (local_postgres.LocalSandbox): schema files,
+   Supabase roles and auth.uid() stubs, synthetic multi-year data
+2. Clones it once per policy variant and applies the variant's steps
+3. Runs the dashboard and data-entry queries of the web app as each persona
+   (service_role as the no-RLS baseline, anon, a statistician, a viewer and
+   an admin), with the role and JWT claims PostgREST would set
+4. Captures EXPLAIN (ANALYZE, BUFFERS) for each, repeated, and reports the
+   median execution time, rows returned, shared buffers touched and how many
+   times user_profiles was probed (the per-row policy subqueries)
+
+Writes are executed by EXPLAIN ANALYZE inside a transaction that is always
+rolled back, so every measurement starts from the same data. Rejected
+statements (e.g. anon inserting) are reported with Postgres' error.
+
+Built-in variants:
+    schema                        policies as created by the schema files
+    public-dashboard-v2           + fix-rls-for-public-dashboard-v2.sql
+    initplan                      auth.uid() wrapped as (SELECT auth.uid()), so
+                                  Postgres evaluates it once per statement
+    public-dashboard-v2+initplan  both
+Any other policy SQL can be measured with --variant-file (applied on top of
+the schema policies).
+
+Usage:
+    python rls_benchmark.py --dsn postgresql://postgres@localhost:5432/postgres
+    python rls_benchmark.py --years 10 --countries 20 --repeat 7
+    python rls_benchmark.py --variants schema initplan --queries enrollment_load
+    python rls_benchmark.py --variant-file ../supabase-final-rls-solution.sql
+    python rls_benchmark.py --report rls_report.json   # plans + timings as JSON
+"""
+
+import argparse
+import json
+import re
+import statistics
+import sys
+import time
+from dataclasses import dataclass
+from pathlib import Path
+
+from console import utf8_console
+from import_metrics import write_atomic
+from local_postgres import LocalSandbox, SCHEMA_DIR, psycopg, sql
+
+
+@dataclass(frozen=True)
+class BenchQuery:
+    """One statement the web app issues; {country} and {year} are filled in"""
+
+    name: str
+    kind: str            # 'dashboard' or 'data-entry'
+    statement: str
+    setup: str = None    # run as the table owner before switching roles
+
+
+# Mirrors lib/supabase-data-service.ts and the app/data-entry pages
+QUERIES = [
+    BenchQuery('active_year', 'dashboard', 'SELECT id FROM academic_years WHERE is_active = true'),
+    BenchQuery('countries', 'dashboard',
+               'SELECT country_code, country_name, region FROM countries ORDER BY country_name'),
+    BenchQuery('institutions_summary', 'dashboard',
+               'SELECT i.*, c.country_code, c.country_name FROM institutions i '
+               'LEFT JOIN countries c ON c.id = i.country_id WHERE i.academic_year_id = {year}'),
+    BenchQuery('enrollment_by_level', 'dashboard',
+               'SELECT country_id, education_level, gender, sum(count) FROM student_enrollment '
+               'WHERE academic_year_id = {year} GROUP BY country_id, education_level, gender'),
+    BenchQuery('enrollment_trend', 'dashboard',
+               'SELECT academic_year_id, sum(count) FROM student_enrollment GROUP BY academic_year_id'),
+    BenchQuery('staff_by_level', 'dashboard',
+               'SELECT country_id, education_level, sum(count) FROM staff_qualifications '
+               'WHERE academic_year_id = {year} GROUP BY country_id, education_level'),
+    BenchQuery('population_by_country', 'dashboard',
+               'SELECT country_id, sum(male), sum(female) FROM population_data '
+               'WHERE academic_year_id = {year} GROUP BY country_id'),
+
+    BenchQuery('own_profile', 'data-entry', 'SELECT * FROM user_profiles WHERE id = auth.uid()'),
+    BenchQuery('enrollment_load', 'data-entry',
+               'SELECT * FROM student_enrollment WHERE country_id = {country} AND academic_year_id = {year}'),
+    BenchQuery('institutions_load', 'data-entry',
+               'SELECT * FROM institutions WHERE country_id = {country} AND academic_year_id = {year}'),
+    BenchQuery('staff_qualifications_load', 'data-entry',
+               'SELECT * FROM staff_qualifications WHERE country_id = {country} AND academic_year_id = {year}'),
+    BenchQuery('population_load', 'data-entry',
+               'SELECT * FROM population_data WHERE country_id = {country} AND academic_year_id = {year}'),
+    BenchQuery('institutions_upsert', 'data-entry',
+               'INSERT INTO institutions (country_id, academic_year_id, daycare_public) '
+               'VALUES ({country}, {year}, 1) ON CONFLICT (country_id, academic_year_id) '
+               'DO UPDATE SET daycare_public = EXCLUDED.daycare_public'),
+    BenchQuery('enrollment_update', 'data-entry',
+               'UPDATE student_enrollment SET count = count + 1 '
+               'WHERE country_id = {country} AND academic_year_id = {year}'),
+    BenchQuery('population_delete', 'data-entry',
+               'DELETE FROM population_data WHERE country_id = {country} AND academic_year_id = {year}'),
+    BenchQuery('population_insert', 'data-entry',
+               'INSERT INTO population_data (country_id, academic_year_id, age, male, female) '
+               'SELECT {country}, {year}, age, 500, 500 FROM generate_series(0, 100) AS age',
+               setup='DELETE FROM population_data WHERE country_id = {country} AND academic_year_id = {year}'),
+]
+
+# (persona, Postgres role); personas other than anon/service_role are seeded users
+PERSONAS = [
+    ('service_role', 'service_role'),
+    ('anon', 'anon'),
+    ('statistician', 'authenticated'),
+    ('viewer', 'authenticated'),
+    ('admin', 'authenticated'),
+]
+
+AUTH_CALL = re.compile(r'(?<!SELECT )\bauth\.(uid|role)\(\)')
+
+
+def wrap_auth_calls(conn):
+    """Rewrite every policy's auth.uid()/auth.role() as a scalar subquery
+
+    A bare STABLE function call in a policy is evaluated for every row the
+    policy checks; `(SELECT auth.uid())` becomes an InitPlan that runs once
+    per statement.
+    """
+    policies = conn.execute(
+        "SELECT schemaname, tablename, policyname, qual, with_check FROM pg_policies "
+        "WHERE qual ~ 'auth\\.(uid|role)\\(\\)' OR with_check ~ 'auth\\.(uid|role)\\(\\)'").fetchall()
+    for schema, table, policy, qual, with_check in policies:
+        clauses = []
+        if qual:
+            clauses.append(sql.SQL('USING ({})').format(sql.SQL(AUTH_CALL.sub(r'(SELECT auth.\1())', qual))))
+        if with_check:
+            clauses.append(sql.SQL('WITH CHECK ({})').format(
+                sql.SQL(AUTH_CALL.sub(r'(SELECT auth.\1())', with_check))))
+        conn.execute(sql.SQL('ALTER POLICY {} ON {}.{} ').format(
+            sql.Identifier(policy), sql.Identifier(schema), sql.Identifier(table)) + sql.SQL(' ').join(clauses))
+
+
+# Steps are SQL files (relative to the repository root) or functions taking a connection
+VARIANTS = {
+    'schema': [],
+    'public-dashboard-v2': ['fix-rls-for-public-dashboard-v2.sql'],
+    'initplan': [wrap_auth_calls],
+    'public-dashboard-v2+initplan': ['fix-rls-for-public-dashboard-v2.sql', wrap_auth_calls],
+}
+
+
+def apply_variant(sandbox: LocalSandbox, database: str, steps):
+    with sandbox.connect(database) as conn:
+        for step in steps:
+            if callable(step):
+                step(conn)
+            else:
+                path = Path(step) if Path(step).is_absolute() else SCHEMA_DIR / step
+                sandbox.apply_file(conn, path)
+        conn.execute('ANALYZE')
+
+
+def plan_nodes(plan: dict):
+    yield plan
+    for child in plan.get('Plans', []):
+        yield from plan_nodes(child)
+
+
+def summarize_plan(explain: list) -> dict:
+    """Headline numbers of one EXPLAIN (ANALYZE, BUFFERS, FORMAT JSON) result"""
+    root = explain[0]['Plan']
+    nodes = list(plan_nodes(root))
+    # ModifyTable returns nothing without RETURNING; count the rows it was fed
+    rows_node = root['Plans'][0] if root['Node Type'] == 'ModifyTable' and root.get('Plans') else root
+    return {
+        'execution_ms': explain[0]['Execution Time'],
+        'planning_ms': explain[0]['Planning Time'],
+        'rows': rows_node['Actual Rows'],
+        'shared_buffers': sum(root.get(key, 0) for key in ('Shared Hit Blocks', 'Shared Read Blocks')),
+        'rows_removed_by_filter': sum(node.get('Rows Removed by Filter', 0) * node.get('Actual Loops', 1)
+                                      for node in nodes),
+        'profile_lookups': sum(node.get('Actual Loops', 0) for node in nodes
+                               if node.get('Relation Name') == 'user_profiles'),
+        'subplans': sum(1 for node in nodes if node.get('Parent Relationship') == 'SubPlan'),
+        'initplans': sum(1 for node in nodes if node.get('Parent Relationship') == 'InitPlan'),
+    }
+
+
+def persona_user(sandbox: LocalSandbox, persona: str, country_id: int):
+    """Seeded user for a persona: the country's statistician, the admin, the viewer, or None"""
+    if persona == 'statistician':
+        return next(user for user in sandbox.users['statistician'] if user.country_id == country_id)
+    users = sandbox.users.get(persona)
+    return users[0] if users else None
+
+
+def explain_once(sandbox: LocalSandbox, conn, query: BenchQuery, params: dict, persona: str, role: str):
+    user = persona_user(sandbox, persona, params['country'])
+    with conn.transaction(force_rollback=True):
+        if query.setup:
+            conn.execute(query.setup.format(**params))
+        sandbox.as_user(conn, user, role)
+        return conn.execute('EXPLAIN (ANALYZE, BUFFERS, FORMAT JSON) ' + query.statement.format(**params)).fetchone()[0]
+
+
+def measure(sandbox: LocalSandbox, database: str, query: BenchQuery, params: dict,
+            persona: str, role: str, repeat: int) -> dict:
+    """Median timings over `repeat` runs (after one warm-up) plus the last plan"""
+    with sandbox.connect(database) as conn:
+        try:
+            runs = [explain_once(sandbox, conn, query, params, persona, role) for _ in range(repeat + 1)][1:]
+        except psycopg.Error as error:
+            return {'error': str(error).splitlines()[0]}
+    summaries = [summarize_plan(run) for run in runs]
+    result = summaries[-1]
+    result['execution_ms'] = statistics.median(summary['execution_ms'] for summary in summaries)
+    result['planning_ms'] = statistics.median(summary['planning_ms'] for summary in summaries)
+    result['plan'] = runs[-1]
+    return result
+
+
+def format_cell(result: dict) -> str:
+    if 'error' in result:
+        return 'denied' if 'row-level security' in result['error'] else 'error'
+    return f"{result['execution_ms']:.2f}ms/{result['rows']}"
+
+
+def print_variant(name: str, results: dict, personas):
+    print()
+    print(f"📊 {name}  (median execution time / rows; profile lookups in brackets when > 1)")
+    print(f"  {'query':<28}" + ''.join(f"{persona:>22}" for persona in personas))
+    for query, by_persona in results.items():
+        cells = []
+        for persona in personas:
+            result = by_persona[persona]
+            cell = format_cell(result)
+            if result.get('profile_lookups', 0) > 1:
+                cell += f" [{result['profile_lookups']}]"
+            cells.append(f"{cell:>22}")
+        print(f"  {query:<28}" + ''.join(cells))
+
+
+def print_comparison(report: dict, personas):
+    """Execution time of each variant relative to the first one"""
+    variants = list(report)
+    if len(variants) < 2:
+        return
+    baseline = variants[0]
+    print()
+    print(f"⚖️  Relative to {baseline} (execution time ratio; < 1 is faster)")
+    for variant in variants[1:]:
+        print(f"  {variant}")
+        for query, by_persona in report[variant].items():
+            ratios = []
+            for persona in personas:
+                before, after = report[baseline][query][persona], by_persona[persona]
+                if 'error' in before or 'error' in after or not before['execution_ms']:
+                    ratios.append(f"{format_cell(after):>14}")
+                else:
+                    ratios.append(f"{after['execution_ms'] / before['execution_ms']:>13.2f}x")
+            print(f"    {query:<26}" + ''.join(ratios))
+
+
+def run_benchmark(sandbox: LocalSandbox, variants: dict, queries, personas, country_code: str, repeat: int) -> dict:
+    with sandbox.connect() as conn:
+        country = conn.execute('SELECT id FROM countries WHERE country_code = %s', (country_code,)).fetchone()
+        year = conn.execute('SELECT id FROM academic_years WHERE is_active ORDER BY start_year DESC LIMIT 1').fetchone()
+    if not country:
+        raise ValueError(f"Country {country_code} is not in the sandbox")
+    if not year:
+        raise ValueError('The sandbox has no active academic year')
+    params = {'country': country[0], 'year': year[0]}
+
+    report = {}
+    for index, (name, steps) in enumerate(variants.items()):
+        started = time.perf_counter()
+        database = sandbox.clone(f"v{index}")
+        apply_variant(sandbox, database, steps)
+        report[name] = {
+            query.name: {persona: measure(sandbox, database, query, params, persona, role, repeat)
+                         for persona, role in personas}
+            for query in queries
+        }
+        sandbox.drop_database(database)
+        print(f"✅ {name}: {len(queries) * len(personas)} measurements in {time.perf_counter() - started:.1f}s")
+    return report
+
+
+def main():
+    utf8_console()
+
+    parser = argparse.ArgumentParser(description='Measure RLS policy variants on a seeded local Postgres')
+    parser.add_argument('--dsn', help='Admin connection string of a local server (default: LOCAL_DATABASE_URL)')
+    parser.add_argument('--countries', type=int, default=9, help='Number of countries to seed')
+    parser.add_argument('--years', type=int, default=6, help='Number of academic years to seed')
+    parser.add_argument('--seed', type=int, default=42, help='Random seed for the synthetic data')
+    parser.add_argument('--country', default='GRD', help="Statistician's country for data-entry queries")
+    parser.add_argument('--repeat', type=int, default=5, help='Measured runs per query (after one warm-up)')
+    parser.add_argument('--variants', nargs='+', choices=list(VARIANTS), default=list(VARIANTS),
+                        help='Built-in policy variants to measure')
+    parser.add_argument('--variant-file', action='append', default=[],
+                        help='Extra policy SQL to measure on top of the schema policies (repeatable)')
+    parser.add_argument('--queries', nargs='+', choices=[query.name for query in QUERIES],
+                        help='Only these queries (default: all)')
+    parser.add_argument('--personas', nargs='+', choices=[persona for persona, _ in PERSONAS],
+                        help='Only these personas (default: all)')
+    parser.add_argument('--report', help='Write timings and full plans as JSON to this path')
+    args = parser.parse_args()
+
+    variants = {name: VARIANTS[name] for name in args.variants}
+    for path in args.variant_file:
+        variants[Path(path).stem] = [str(Path(path).resolve())]
+    queries = [query for query in QUERIES if not args.queries or query.name in args.queries]
+    personas = [(persona, role) for persona, role in PERSONAS if not args.personas or persona in args.personas]
+    persona_names = [persona for persona, _ in personas]
+
+    print("=" * 80)
+    print("RLS POLICY BENCHMARK")
+    print("=" * 80)
+    print(f"Variants: {', '.join(variants)}")
+    print(f"Data: {args.countries} countries × {args.years} academic years (seed {args.seed})")
+    print()
+
+    try:
+        started = time.perf_counter()
+        with LocalSandbox(args.dsn, countries=args.countries, years=args.years, seed=args.seed) as sandbox:
+            print(f"✅ Sandbox {sandbox.name} ready in {time.perf_counter() - started:.1f}s")
+            report = run_benchmark(sandbox, variants, queries, personas, args.country, args.repeat)
+
+        for name, results in report.items():
+            print_variant(name, results, persona_names)
+        print_comparison(report, persona_names)
+
+        if args.report:
+            write_atomic(args.report, json.dumps({
+                'settings': {'countries': args.countries, 'years': args.years, 'seed': args.seed,
+                             'country': args.country, 'repeat': args.repeat},
+                'queries': {query.name: query.statement for query in queries},
+                'variants': report,
+            }, indent=2))
+            print()
+            print(f"💾 Report with plans written to {args.report}")
+    except Exception as e:
+        print(f"\n❌ Error during benchmark: {e}")
+        import traceback
+        traceback.print_exc()
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -1,80 +1,89 @@
 """
-Set 2022-2023 as the active academic year (since that's where our data is)
+Set the active academic year (the one the dashboard shows)
+
+Defaults to 2022-2023, since that's where our data is.
+
+Usage:
+    python scripts/set_active_year.py
+    python scripts/set_active_year.py 2023-2024
+    python scripts/digest.py set-active-year 2023-2024
 """
-import os
+import argparse
 import sys
-import io
-from pathlib import Path
-from dotenv import load_dotenv
-from supabase import create_client, Client
-
-# Fix Windows console encoding
-if sys.platform == 'win32':
-    sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8', errors='replace')
-    sys.stderr = io.TextIOWrapper(sys.stderr.buffer, encoding='utf-8', errors='replace')
-
-# Load environment variables
-env_path = Path(__file__).parent.parent / '.env.local'
-load_dotenv(dotenv_path=env_path)
-
-# Get Supabase credentials
-supabase_url = os.getenv('NEXT_PUBLIC_SUPABASE_URL')
-supabase_key = os.getenv('SUPABASE_SERVICE_ROLE_KEY')
-
-if not supabase_url or not supabase_key:
-    print("ERROR: Missing Supabase credentials")
-    sys.exit(1)
-
-# Create Supabase client
-supabase: Client = create_client(supabase_url, supabase_key)
-
-print("=" * 80)
-print("SETTING 2022-2023 AS ACTIVE ACADEMIC YEAR")
-print("=" * 80)
-print()
-
-# First, set all years to inactive
-print("1. Setting all academic years to inactive...")
-try:
-    response = supabase.table('academic_years').update({'is_active': False}).neq('id', 0).execute()
-    print(f"   ✓ Updated all years to inactive")
-except Exception as e:
-    print(f"   ✗ ERROR: {e}")
-    sys.exit(1)
-
-# Then, set 2022-2023 to active
-print()
-print("2. Setting 2022-2023 as active...")
-try:
-    response = supabase.table('academic_years').update({'is_active': True}).eq('year_label', '2022-2023').execute()
-    if response.data:
-        print(f"   ✓ Set 2022-2023 (ID: {response.data[0]['id']}) as active")
-    else:
-        print("   ✗ Could not find 2022-2023 year")
-        sys.exit(1)
-except Exception as e:
-    print(f"   ✗ ERROR: {e}")
-    sys.exit(1)
-
-# Verify
-print()
-print("3. Verifying active year...")
-try:
+
+from console import utf8_console
+
+DEFAULT_YEAR = '2022-2023'
+
+
+def set_active_year(supabase, year_label: str) -> dict:
+    """Make `year_label` the only active academic year; returns its row
+
+    The requested year is activated first, so a label that does not exist
+    raises before any other year is touched.
+    """
+    print(f"1. Setting {year_label} as active...")
+    response = supabase.table('academic_years').update({'is_active': True}).eq('year_label', year_label).execute()
+    if not response.data:
+        raise ValueError(f"Academic year not found: {year_label}")
+    print(f"   ✓ Set {year_label} (ID: {response.data[0]['id']}) as active")
+
+    # Then, set every other year to inactive
+    print()
+    print("2. Setting the other academic years to inactive...")
+    supabase.table('academic_years').update({'is_active': False}).neq('year_label', year_label).execute()
+    print("   ✓ Updated the other years to inactive")
+    return response.data[0]
+
+
+def verify_active_year(supabase):
+    """Print the active year and how many institution records it has"""
+    print()
+    print("3. Verifying active year...")
     response = supabase.table('academic_years').select('*').eq('is_active', True).single().execute()
-    if response.data:
-        year = response.data
-        print(f"   ✓ Active year is now: {year['year_label']} (ID: {year['id']})")
-
-        # Check how many institutions for this year
-        inst_response = supabase.table('institutions').select('id').eq('academic_year_id', year['id']).execute()
-        count = len(inst_response.data) if inst_response.data else 0
-        print(f"   ✓ This year has {count} institution records")
-    else:
+    if not response.data:
         print("   ✗ No active year found")
-except Exception as e:
-    print(f"   ✗ ERROR: {e}")
+        return
+    year = response.data
+    print(f"   ✓ Active year is now: {year['year_label']} (ID: {year['id']})")
+
+    # Count institutions for this year without fetching them (the row limit would cap len(data))
+    institutions = (supabase.table('institutions').select('id', count='exact')
+                    .eq('academic_year_id', year['id']).limit(1).execute())
+    print(f"   ✓ This year has {institutions.count or 0} institution records")
+
+
+def main():
+    utf8_console()
+
+    parser = argparse.ArgumentParser(description='Set the active academic year shown on the dashboard')
+    parser.add_argument('year', nargs='?', default=DEFAULT_YEAR,
+                        help=f'Academic year to activate, e.g. 2023-2024 (default: {DEFAULT_YEAR})')
+    args = parser.parse_args()
+
+    from supabase_client import get_client
+    supabase = get_client()
+
+    print("=" * 80)
+    print(f"SETTING {args.year} AS ACTIVE ACADEMIC YEAR")
+    print("=" * 80)
+    print()
+
+    try:
+        set_active_year(supabase, args.year)
+    except Exception as e:
+        print(f"   ✗ ERROR: {e}")
+        sys.exit(1)
+    try:
+        verify_active_year(supabase)
+    except Exception as e:
+        print(f"   ✗ ERROR: {e}")
+
+    print()
+    print("=" * 80)
+    print(f"✓ COMPLETE - Dashboard should now display {args.year} data!")
+    print("=" * 80)
+
 
-print()
-print("=" * 80)
-print("✓ COMPLETE - Dashboard should now display 2022-2023 data!")
-print("=" * 80)
+if __name__ == '__main__':
+    main()
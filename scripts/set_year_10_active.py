@@ -1,25 +1,13 @@
 """
 Set academic year 2021-2022 (ID: 10) as active since that's where the data is
 """
-import os
-import sys
-import io
-from pathlib import Path
-from dotenv import load_dotenv
-from supabase import create_client, Client
-
-# Fix Windows console encoding
-if sys.platform == 'win32':
-    sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8', errors='replace')
-    sys.stderr = io.TextIOWrapper(sys.stderr.buffer, encoding='utf-8', errors='replace')
-
-# Load environment variables
-env_path = Path(__file__).parent.parent / '.env.local'
-load_dotenv(dotenv_path=env_path)
-
-supabase_url = os.getenv('NEXT_PUBLIC_SUPABASE_URL')
-supabase_key = os.getenv('SUPABASE_SERVICE_ROLE_KEY')
-supabase: Client = create_client(supabase_url, supabase_key)
+from console import utf8_console
+from supabase_client import get_client
+
+utf8_console()
+
+# Create Supabase client
+supabase = get_client()
 
 print("=" * 80)
 print("SETTING 2021-2022 (ID: 10) AS ACTIVE")
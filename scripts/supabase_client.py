@@ -0,0 +1,269 @@
+"""
+Shared Supabase client for the import, export and diagnostic scripts
+
+Every script used to repeat `load_dotenv` + `create_client(...)`. This module
+does it once and gives all PostgREST traffic in the process one pooled HTTP
+transport:
+
+- keep-alive connections (HTTP/2 where available) reused across requests and
+  across clients, so bulk imports pay the TLS handshake once
+- configurable timeouts (SUPABASE_TIMEOUT, seconds)
+- retry with exponential backoff and full jitter for idempotent calls
+  (GET/HEAD/OPTIONS/PUT/DELETE and upserts) on connection errors and on
+  429/502/503/504, honouring Retry-After (SUPABASE_RETRIES attempts)
+- per-request latency logging on the `digest.supabase` logger
+  (set SUPABASE_LOG_LEVEL=DEBUG to see every request)
+
+Importing it only loads .env.local: httpx, postgrest and supabase (with its
+auth, storage, realtime and functions clients) are imported when the first
+client is created, so scripts and `digest` subcommands that never reach the
+API start quickly.
+
+Usage:
+    from supabase_client import get_client
+
+    supabase = get_client()             # service role key
+    anon = get_client('anon')           # anon key, like the dashboard
+    user = get_user_postgrest(token)    # PostgREST as a signed-in user (RLS)
+"""
+
+import logging
+import os
+import random
+import sys
+import threading
+import time
+from pathlib import Path
+from typing import TYPE_CHECKING
+
+from dotenv import load_dotenv
+
+if TYPE_CHECKING:
+    import httpx
+    from postgrest import SyncPostgrestClient
+    from supabase import Client
+
+# Load environment variables from .env.local
+ENV_PATH = Path(__file__).parent.parent / '.env.local'
+load_dotenv(dotenv_path=ENV_PATH)
+
+# Environment variable holding the key for each client type
+KEY_ENV_VARS = {
+    'service': 'SUPABASE_SERVICE_ROLE_KEY',
+    'anon': 'NEXT_PUBLIC_SUPABASE_ANON_KEY',
+}
+
+DEFAULT_TIMEOUT = float(os.getenv('SUPABASE_TIMEOUT', '30'))
+DEFAULT_RETRIES = int(os.getenv('SUPABASE_RETRIES', '3'))
+BACKOFF_BASE = 0.5   # seconds
+BACKOFF_MAX = 20.0   # seconds
+
+POOL_LIMITS = {'max_connections': 20, 'max_keepalive_connections': 10, 'keepalive_expiry': 60}  # httpx.Limits
+
+IDEMPOTENT_METHODS = {'GET', 'HEAD', 'OPTIONS', 'PUT', 'DELETE'}
+RETRY_STATUSES = {429, 502, 503, 504}
+
+logger = logging.getLogger('digest.supabase')
+if os.getenv('SUPABASE_LOG_LEVEL'):
+    logging.basicConfig(format='%(asctime)s %(name)s %(levelname)s %(message)s')
+    logger.setLevel(os.getenv('SUPABASE_LOG_LEVEL').upper())
+
+
+class RequestStats:
+    """Running totals of request count, retries and latency for this process"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.requests = 0
+        self.retries = 0
+        self.failures = 0
+        self.total_seconds = 0.0
+        self.max_seconds = 0.0
+
+    def record(self, elapsed: float, retried: bool = False, failed: bool = False):
+        with self.lock:
+            self.requests += 1
+            self.retries += int(retried)
+            self.failures += int(failed)
+            self.total_seconds += elapsed
+            self.max_seconds = max(self.max_seconds, elapsed)
+
+    def summary(self) -> str:
+        with self.lock:
+            mean_ms = (self.total_seconds / self.requests * 1000) if self.requests else 0.0
+            return (f"{self.requests} requests, {self.retries} retries, {self.failures} failures, "
+                    f"mean {mean_ms:.0f} ms, max {self.max_seconds * 1000:.0f} ms")
+
+
+request_stats = RequestStats()
+
+
+def is_idempotent(request: 'httpx.Request') -> bool:
+    """Whether a request can be safely re-sent"""
+    if request.method in IDEMPOTENT_METHODS:
+        return True
+    # PostgREST upserts (POST + Prefer: resolution=...) converge to the same state
+    return request.method == 'POST' and 'resolution=' in request.headers.get('prefer', '')
+
+
+def backoff_delay(attempt: int, retry_after: str = None) -> float:
+    """Exponential backoff with full jitter, or the server's Retry-After if given"""
+    if retry_after:
+        try:
+            return min(float(retry_after), BACKOFF_MAX)
+        except ValueError:
+            pass
+    return random.uniform(0, min(BACKOFF_MAX, BACKOFF_BASE * (2 ** attempt)))
+
+
+def retry_transport(retries: int = DEFAULT_RETRIES) -> 'httpx.BaseTransport':
+    """Pooled keep-alive transport that retries idempotent requests and logs latency
+
+    The class is defined on first use, so that importing this module does not
+    import httpx.
+    """
+    import httpx
+
+    class RetryTransport(httpx.BaseTransport):
+        def __init__(self):
+            self.retries = retries
+            self.transport = httpx.HTTPTransport(http2=True, limits=httpx.Limits(**POOL_LIMITS))
+
+        def handle_request(self, request: httpx.Request) -> httpx.Response:
+            retryable = is_idempotent(request)
+            attempt = 0
+
+            while True:
+                start = time.perf_counter()
+                try:
+                    response = self.transport.handle_request(request)
+                except httpx.TransportError as e:
+                    elapsed = time.perf_counter() - start
+                    if not retryable or attempt >= self.retries:
+                        request_stats.record(elapsed, failed=True)
+                        logger.warning("%s %s failed after %.0f ms: %s",
+                                       request.method, request.url.path, elapsed * 1000, e)
+                        raise
+                    delay = backoff_delay(attempt)
+                    request_stats.record(elapsed, retried=True)
+                    logger.info("%s %s %s, retrying in %.2fs (attempt %d/%d)",
+                                request.method, request.url.path, type(e).__name__,
+                                delay, attempt + 1, self.retries)
+                    time.sleep(delay)
+                    attempt += 1
+                    continue
+
+                elapsed = time.perf_counter() - start
+                if retryable and response.status_code in RETRY_STATUSES and attempt < self.retries:
+                    delay = backoff_delay(attempt, response.headers.get('retry-after'))
+                    response.close()
+                    request_stats.record(elapsed, retried=True)
+                    logger.info("%s %s -> %d, retrying in %.2fs (attempt %d/%d)",
+                                request.method, request.url.path, response.status_code,
+                                delay, attempt + 1, self.retries)
+                    time.sleep(delay)
+                    attempt += 1
+                    continue
+
+                request_stats.record(elapsed)
+                logger.debug("%s %s -> %d in %.0f ms",
+                             request.method, request.url.path, response.status_code, elapsed * 1000)
+                return response
+
+        def close(self):
+            self.transport.close()
+
+    return RetryTransport()
+
+
+_transport = None
+_transport_lock = threading.Lock()
+
+
+def get_transport() -> 'httpx.BaseTransport':
+    """Process-wide transport, so every client shares one connection pool"""
+    global _transport
+    with _transport_lock:
+        if _transport is None:
+            _transport = retry_transport()
+        return _transport
+
+
+def pooled_postgrest(rest_url: str, headers: dict, schema: str = 'public',
+                     timeout: float = DEFAULT_TIMEOUT) -> 'SyncPostgrestClient':
+    """PostgREST client whose session runs over the shared transport"""
+    from postgrest import SyncPostgrestClient
+    from postgrest.utils import SyncClient
+
+    postgrest = SyncPostgrestClient(rest_url, headers=headers, schema=schema, timeout=timeout)
+    default_session = postgrest.session
+    postgrest.session = SyncClient(
+        base_url=default_session.base_url,
+        headers=default_session.headers,
+        timeout=default_session.timeout,
+        transport=get_transport(),
+        follow_redirects=True,
+    )
+    default_session.close()
+    return postgrest
+
+
+_client_class = None
+
+
+def pooled_client_class():
+    """Supabase Client subclass whose PostgREST sessions run over the shared transport
+
+    Defined on first use, so that importing this module does not import supabase.
+    """
+    global _client_class
+    if _client_class is None:
+        from supabase import Client
+
+        class PooledClient(Client):
+            def _init_postgrest_client(self, rest_url, headers, schema,
+                                       timeout=DEFAULT_TIMEOUT, verify=True, proxy=None):
+                return pooled_postgrest(rest_url, headers, schema, timeout)
+
+        _client_class = PooledClient
+    return _client_class
+
+
+def load_credentials(key_type: str = 'service'):
+    """Return (url, key) from .env.local, exiting with a clear message if missing"""
+    key_var = KEY_ENV_VARS[key_type]
+    url = os.getenv('NEXT_PUBLIC_SUPABASE_URL')
+    key = os.getenv(key_var)
+
+    if not url or not key:
+        print("❌ Error: Missing Supabase credentials in .env.local file")
+        print(f"   Required: NEXT_PUBLIC_SUPABASE_URL and {key_var}")
+        sys.exit(1)
+
+    return url, key
+
+
+_clients = {}
+_clients_lock = threading.Lock()
+
+
+def get_client(key_type: str = 'service', timeout: float = DEFAULT_TIMEOUT) -> 'Client':
+    """Shared Supabase client for the given key type ('service' or 'anon'), created on first use"""
+    with _clients_lock:
+        if key_type not in _clients:
+            from supabase import ClientOptions
+
+            url, key = load_credentials(key_type)
+            options = ClientOptions(postgrest_client_timeout=timeout)
+            _clients[key_type] = pooled_client_class().create(url, key, options)
+        return _clients[key_type]
+
+
+def get_user_postgrest(access_token: str, timeout: float = DEFAULT_TIMEOUT) -> 'SyncPostgrestClient':
+    """PostgREST client acting as a signed-in user, so row level security applies
+
+    Built per call (the token differs per user) but over the shared transport.
+    """
+    url, anon_key = load_credentials('anon')
+    headers = {'apikey': anon_key, 'Authorization': f'Bearer {access_token}'}
+    return pooled_postgrest(f"{url}/rest/v1", headers, timeout=timeout)
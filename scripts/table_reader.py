@@ -0,0 +1,138 @@
+"""
+Keyset-paginated bulk reader for Supabase tables
+
+A plain `select('*').execute()` is silently capped by the PostgREST row limit
+and loads the whole result into memory. `iter_table()` instead walks a table
+in pages ordered by a unique key column (`WHERE key > last_key ORDER BY key
+LIMIT n`), projects only the requested columns, and yields rows one at a time.
+
+Keyset pages are sequential by nature (each page starts after the last key of
+the previous one), so concurrency comes from a background fetcher that keeps
+up to `prefetch` pages queued ahead of the consumer: the next HTTP round trip
+overlaps with whatever the caller does with the current page.
+
+Usage:
+    from table_reader import iter_table
+
+    for row in iter_table(supabase, 'student_enrollment',
+                          columns='country_id, age_group, gender, count',
+                          filters={'academic_year_id': year_id}):
+        ...
+"""
+
+import queue
+import threading
+
+DEFAULT_PAGE_SIZE = 1000
+DEFAULT_PREFETCH = 2
+
+# Sentinel marking the end of the page stream
+_DONE = object()
+
+
+def _with_key_column(columns: str, key: str) -> str:
+    """Make sure the keyset column is part of the projection"""
+    if columns.strip() == '*':
+        return columns
+    names = [name.strip() for name in columns.split(',')]
+    if key in names:
+        return columns
+    return f"{key}, {columns}"
+
+
+def fetch_pages(client, table: str, columns: str = '*', filters: dict = None,
+                key: str = 'id', page_size: int = DEFAULT_PAGE_SIZE, apply=None):
+    """Yield successive keyset pages (lists of rows) from a table"""
+    columns = _with_key_column(columns, key)
+    filters = filters or {}
+    last_key = None
+
+    while True:
+        query = client.table(table).select(columns).order(key).limit(page_size)
+        for column, value in filters.items():
+            query = query.eq(column, value)
+        if apply is not None:
+            query = apply(query)
+        if last_key is not None:
+            query = query.gt(key, last_key)
+
+        page = query.execute().data or []
+        if not page:
+            return
+
+        yield page
+
+        if len(page) < page_size:
+            return
+        last_key = page[-1][key]
+
+
+def _prefetch_pages(pages, prefetch: int):
+    """Run a page generator on a background thread, keeping `prefetch` pages buffered"""
+    buffer = queue.Queue(maxsize=prefetch)
+    stop = threading.Event()
+
+    def put(item) -> bool:
+        # Block while the window is full, but give up if the consumer went away
+        while not stop.is_set():
+            try:
+                buffer.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def producer():
+        try:
+            for page in pages:
+                if not put(page):
+                    return
+        except BaseException as e:
+            put(e)
+            return
+        put(_DONE)
+
+    worker = threading.Thread(target=producer, name='table-reader-prefetch', daemon=True)
+    worker.start()
+
+    try:
+        while True:
+            item = buffer.get()
+            if item is _DONE:
+                return
+            if isinstance(item, BaseException):
+                raise item
+            yield item
+    finally:
+        stop.set()
+        worker.join(timeout=1)
+
+
+def iter_table(client, table: str, columns: str = '*', filters: dict = None,
+               key: str = 'id', page_size: int = DEFAULT_PAGE_SIZE,
+               prefetch: int = DEFAULT_PREFETCH, apply=None):
+    """Yield every row of a table matching `filters`, one page in memory at a time
+
+    Args:
+        client: Supabase client
+        table: Table name
+        columns: PostgREST select list; the key column is added if missing
+        filters: Column -> value equality filters
+        key: Unique, sortable column used as the keyset cursor
+        page_size: Rows per request (keep at or below the PostgREST max-rows limit)
+        prefetch: Pages fetched ahead in the background (0 disables prefetching)
+        apply: Optional callable receiving and returning the query builder,
+               for filters other than equality
+    """
+    pages = fetch_pages(client, table, columns, filters, key, page_size, apply)
+    if prefetch > 0:
+        pages = _prefetch_pages(pages, prefetch)
+
+    for page in pages:
+        yield from page
+
+
+def count_rows(client, table: str, filters: dict = None, key: str = 'id',
+               page_size: int = DEFAULT_PAGE_SIZE) -> int:
+    """Count matching rows by streaming only the key column"""
+    return sum(len(page) for page in fetch_pages(client, table, key, filters, key, page_size))
@@ -0,0 +1,419 @@
+"""
+Cell mappings for the member-state data template
+
+Turns the worksheet mapping documents in DIGEST_WEB
+(`StudentEnrollment_CellMapping.json`, `LeadersTeachersQualifications_CellMapping.json`)
+into one flat list of `MappedCell`s: which input cell of the template holds
+which database value. The labels used in the template are translated to the
+keys the data-entry pages write (e.g. '16+yr' -> 'over_15', 'Care Givers' ->
+'care_giver'), so template imports and the web forms produce identical rows.
+
+`extract_workbook()` reads a returned template with a single streaming pass
+per worksheet and returns the mapped values; it does no database work, so it
+can run in worker processes.
+
+The mappings generated from the template itself (generate_cell_mappings.py)
+are read here too: `total_formulas()` gives the formula of every total cell,
+and `unmatched_cells()` lists hand-mapped cells that the template does not
+treat as input cells, which is how a template change that moves a table
+shows up.
+
+Usage:
+    from template_mapping import mapped_cells, extract_workbook
+
+    cells = mapped_cells()
+    result = extract_workbook('returns/GRD.xlsx', cells)
+"""
+
+import json
+import re
+import time
+from collections import defaultdict
+from functools import lru_cache
+from pathlib import Path
+from typing import NamedTuple, Optional
+
+import openpyxl
+from openpyxl.utils import column_index_from_string, get_column_letter
+from openpyxl.utils.cell import coordinate_from_string
+
+from generate_cell_mappings import OUTPUT_DIR as GENERATED_MAPPING_DIR, TEMPLATE_PATH, write_mappings
+from workbook_slim import slim_workbook
+
+MAPPING_DIR = Path(__file__).parent.parent / 'DIGEST_WEB'
+STUDENT_ENROLMENT_MAPPING = MAPPING_DIR / 'StudentEnrollment_CellMapping.json'
+STAFF_QUALIFICATIONS_MAPPING = MAPPING_DIR / 'LeadersTeachersQualifications_CellMapping.json'
+
+# Cell holding the academic year label on each mapped worksheet
+YEAR_CELLS = {
+    'Student Enrolment': 'C1',
+    'LeadersTeachersQualifications': 'F1',
+}
+
+# Mapping table name fragment -> student_enrollment.education_level
+ENROLMENT_LEVELS = {
+    'EarlyChildhood': 'early_childhood',
+    'SpecialSchools': 'special_education',
+    'Primary': 'primary',
+    'Secondary': 'secondary',
+    'PostSecondary': 'post_secondary',
+}
+
+# Template programme / form labels -> student_enrollment.category
+ENROLMENT_CATEGORIES = {
+    'Form1.0': 'F1', 'Form2.0': 'F2', 'Form3.0': 'F3', 'Form4.0': 'F4', 'Form5.0': 'F5',
+    'CAPE/A-Levels': 'CAPE',
+}
+
+# Template stage labels -> education_level used by the staff tables
+STAFF_LEVELS = {
+    'Pre-schools': 'pre_primary',
+    'Pre-schools & Daycares': 'pre_primary',
+    'Primary': 'primary',
+    'Secondary': 'secondary',
+    'Post-secondary/Tertiary': 'post_secondary',
+}
+
+STAFF_ROLES = {
+    'Administrators': 'administrator',
+    'Deputy Principal': 'deputy_principal',
+    'Care Givers': 'care_giver',
+    'Principal': 'principal',
+    'Teachers': 'teacher',
+}
+
+ACADEMIC_QUALIFICATIONS = {
+    'CSEC/O-Level': 'csec',
+    'CAPE/A-Levels': 'cape',
+    'Certificate': 'certificate',
+    'Associate degree': 'associate',
+    'Bachelors degree': 'bachelors',
+    'Post-graduate degree': 'postgraduate',
+    'Masters degree': 'masters',
+    'Other': 'other',
+    'Unknown/Unavailable': 'unknown',
+}
+
+SPECIALIZATIONS = {
+    'Agriculture': 'agriculture',
+    'French': 'french',
+    'Home Economics': 'home_economics',
+    'I T': 'it',
+    'Music': 'music',
+    'PE & Sports': 'pe_sports',
+    'Plumbing': 'plumbing',
+    'Reading': 'reading',
+    'Spanish': 'spanish',
+    'Special Education': 'special_education',
+    'Threatre Arts': 'theatre_arts',
+    'Theatre Arts': 'theatre_arts',
+    'HFLE': 'hfle',
+    '(Reserved - Additional Specialty 1)': 'other_1',
+    '(Reserved - Additional Specialty 2)': 'other_2',
+}
+
+
+class MappedCell(NamedTuple):
+    """One input cell of the template and the database row value it feeds"""
+    sheet: str
+    coordinate: str
+    table: str
+    fields: tuple           # ((column, value), ...) identifying the row
+    value_field: str        # column the cell value is written to
+    year_offset: int = 0    # 0 = template year, -1 = prior year tables
+
+
+def to_count(value) -> int:
+    """Convert a template cell to a non-negative count (blank, '-', text -> 0)"""
+    if value is None or value == '' or value == '-':
+        return 0
+    try:
+        if isinstance(value, str):
+            value = value.replace(',', '').replace(' ', '').strip()
+        return max(int(float(value)), 0)
+    except (ValueError, TypeError):
+        return 0
+
+
+def age_group_code(label: str) -> Optional[str]:
+    """Template age label -> student_enrollment.age_group ('<1yr' -> 'under_1', '16+yr' -> 'over_15')
+
+    Returns None for bands the database cannot represent (e.g. '6-10yr').
+    """
+    if label == 'AgeUnknown':
+        return 'unknown'
+    match = re.fullmatch(r'([<>])?(\d+)(\+)?yr', label)
+    if not match:
+        return None
+    sign, age, plus = match.groups()
+    if sign == '<':
+        return f'under_{age}'
+    if sign == '>':
+        return f'over_{age}'
+    if plus:
+        return f'over_{int(age) - 1}'
+    return age
+
+
+def cell_position(coordinate: str) -> tuple:
+    """'C49' -> (49, 3)"""
+    column, row = coordinate_from_string(coordinate)
+    return row, column_index_from_string(column)
+
+
+def shift_column(column: str, offset: int) -> str:
+    return get_column_letter(column_index_from_string(column) + offset)
+
+
+def first_range(text: str):
+    """'C49:I49, C51:I51, ...' -> ('C', 'I')"""
+    match = re.search(r'([A-Z]+)\d+:([A-Z]+)\d+', text)
+    return match.group(1), match.group(2)
+
+
+def enrolment_cells(mapping: dict) -> tuple:
+    """Mapped cells for the Student Enrolment worksheet, plus skipped tables and reasons"""
+    sheet = mapping['worksheet']
+    current_start = int(mapping['overview']['current_year'][:4])
+    tables = mapping['tables']
+    cells = []
+    skipped = {}
+
+    # Historical tables only describe what differs from their current-year twin
+    by_level = {}
+    for name, spec in tables.items():
+        level_name = name.split('_')[1]
+        by_level.setdefault(level_name, spec)
+
+    for name, spec in tables.items():
+        level_name = name.split('_')[1]
+        level = ENROLMENT_LEVELS[level_name]
+        base = {**by_level[level_name], **spec}
+
+        year_match = re.search(r'_(\d{4})-\d{2}$', name)
+        year_offset = int(year_match.group(1)) - current_start if year_match else 0
+
+        ages = [age_group_code(label) for label in base['age_groups']]
+        if None in ages:
+            skipped[name] = f"age bands {base['age_groups']} have no matching age_group codes"
+            continue
+
+        def add(coordinate, ownership, age, category, gender):
+            cells.append(MappedCell(
+                sheet, coordinate, 'student_enrollment',
+                (('education_level', level), ('ownership_type', ownership), ('age_group', age),
+                 ('category', category), ('gender', gender)),
+                'count', year_offset,
+            ))
+
+        if 'public_input_males' in base:
+            # Explicit cell lists (no grade/programme breakdown)
+            for ownership in ('public', 'private'):
+                for gender, suffix in (('male', 'males'), ('female', 'females')):
+                    for coordinate, age in zip(base[f'{ownership}_input_{suffix}'], ages):
+                        add(coordinate, ownership, age, None, gender)
+            continue
+
+        # Range tables: "Rows 49-76: 14 ages x 2 sexes", one column per grade/form/programme
+        first_row = int(re.search(r'Rows (\d+)-(\d+)', spec['data_entry_pattern']).group(1))
+        male_ranges = spec.get('male_data') or spec['public_data']['males']
+        first_col, last_col = first_range(male_ranges)
+        columns = [get_column_letter(i) for i in range(column_index_from_string(first_col),
+                                                      column_index_from_string(last_col) + 1)]
+        labels = base.get('grades') or base.get('forms') or base.get('programmes')
+        categories = [ENROLMENT_CATEGORIES.get(label, label) for label in labels]
+
+        private = re.search(r'PRIVATE \(([A-Z]+)-', base['structure'])
+        sections = [('public', 0), ('private', column_index_from_string(private.group(1)) - 1)] if private else [(None, 0)]
+
+        for ownership, offset in sections:
+            for age_index, age in enumerate(ages):
+                for gender_index, gender in enumerate(('male', 'female')):
+                    row = first_row + age_index * 2 + gender_index
+                    for column, category in zip(columns, categories):
+                        add(f'{shift_column(column, offset)}{row}', ownership, age, category, gender)
+
+    return cells, skipped
+
+
+def staff_cells(mapping: dict) -> list:
+    """Mapped cells for the LeadersTeachersQualifications worksheet"""
+    sheet = mapping['worksheet_name']
+    tables = mapping['tables']
+    cells = []
+
+    def add(coordinate, table, fields, value_field='count'):
+        cells.append(MappedCell(sheet, coordinate, table, tuple(fields), value_field))
+
+    # B1-B4: qualification x training by role, public and private
+    for name in ('B1', 'B2', 'B3', 'B4'):
+        spec = tables[name]
+        level = STAFF_LEVELS[spec['title'].split(': ')[-1].strip()]
+        for ownership in ('Public', 'Private'):
+            for qualification in spec['school_types'][ownership]['qualifications']:
+                category = qualification['level'].lower().replace('-', '_')
+                if qualification.get('training'):
+                    category += '_' + qualification['training'].lower()
+                for role_label, columns in spec['role_columns'].items():
+                    for gender in ('male', 'female'):
+                        add(f"{columns[gender]}{qualification['row']}", 'staff_qualifications', [
+                            ('education_level', level), ('ownership_type', ownership.lower()),
+                            ('role', STAFF_ROLES[role_label]), ('qualification_category', category),
+                            ('gender', gender),
+                        ])
+
+        # Leadership degree holders: 'male' (principals) or 'principal_male' / 'deputy_male'
+        leadership = spec.get('additional_fields', {}).get('leadership_degree')
+        if leadership:
+            for column, key in leadership['input_cells'].items():
+                role, _, gender = key.rpartition('_')
+                role = {'': 'principal', 'principal': 'principal', 'deputy': 'deputy_principal'}[role]
+                add(f"{column}{leadership['row']}", 'leadership_degree_holders', [
+                    ('education_level', level), ('role', role), ('gender', gender),
+                ])
+
+    # B5: highest academic qualification by stage
+    spec = tables['B5']
+    for qualification in spec['qualification_levels']:
+        for stage, columns in spec['education_stages'].items():
+            for gender in ('male', 'female'):
+                add(f"{columns[gender]}{qualification['row']}", 'teacher_academic_qualifications', [
+                    ('education_level', STAFF_LEVELS[stage]),
+                    ('qualification', ACADEMIC_QUALIFICATIONS[qualification['qualification']]),
+                    ('gender', gender),
+                ])
+
+    # B6: specialist teachers
+    spec = tables['B6']
+    for specialization in spec['specializations']:
+        for gender in ('male', 'female'):
+            add(f"{spec['columns'][gender]}{specialization['row']}", 'specialist_teachers', [
+                ('specialization', SPECIALIZATIONS[specialization['area']]), ('gender', gender),
+            ])
+
+    # B7: CPD participation, e.g. "Number of Primary school principals engaged ..."
+    for metric in tables['B7']['metrics']:
+        match = re.search(r'(Primary|Secondary) school (principals|teachers)', metric['description'])
+        level, role = match.group(1).lower(), match.group(2)[:-1]
+        add(metric['input_cell'], 'professional_development', [
+            ('education_level', level), ('role', role),
+        ], value_field='participants_count')
+
+    return cells
+
+
+@lru_cache(maxsize=None)
+def load_mappings() -> tuple:
+    """(cells, skipped) for every mapped worksheet, loaded once per process"""
+    with open(STUDENT_ENROLMENT_MAPPING, encoding='utf-8') as f:
+        cells, skipped = enrolment_cells(json.load(f))
+    with open(STAFF_QUALIFICATIONS_MAPPING, encoding='utf-8') as f:
+        cells += staff_cells(json.load(f))
+    return tuple(cells), skipped
+
+
+def mapped_cells() -> tuple:
+    return load_mappings()[0]
+
+
+def generated_mappings(template_path=TEMPLATE_PATH, output_dir=GENERATED_MAPPING_DIR) -> dict:
+    """{worksheet: generated mapping document}, generating them first if missing or stale"""
+    index = write_mappings(template_path, output_dir)
+    return {sheet: json.loads((Path(output_dir) / filename).read_text(encoding='utf-8'))
+            for sheet, filename in index['sheets'].items()}
+
+
+def total_formulas(generated: dict, sheets=None) -> dict:
+    """{worksheet: {coordinate: formula}} of the total cells in the generated mappings"""
+    return {sheet: {coordinate: formula for table in mapping['tables'].values()
+                    for coordinate, formula in table['total_cells'].items()}
+            for sheet, mapping in generated.items() if sheets is None or sheet in sheets}
+
+
+def unmatched_cells(generated: dict, cells=None) -> list:
+    """Mapped cells that are not input cells of their worksheet in the generated mappings"""
+    inputs = {sheet: {coordinate for table in mapping['tables'].values() for coordinate in table['input_cells']}
+              for sheet, mapping in generated.items()}
+    return [cell for cell in (cells or mapped_cells())
+            if cell.coordinate not in inputs.get(cell.sheet, ())]
+
+
+@lru_cache(maxsize=None)
+def table_fields() -> dict:
+    """table -> (key field names, value field), as used by the mapped cells"""
+    fields = {}
+    for cell in mapped_cells():
+        fields.setdefault(cell.table, (tuple(field for field, _ in cell.fields), cell.value_field))
+    return fields
+
+
+@lru_cache(maxsize=None)
+def mapped_levels(table: str, year_offset: int = 0) -> tuple:
+    """Education levels the template maps for a table and year, or () if the table has none
+
+    Writes must stay within these: the template has no cells for the rest
+    (D2 special schools, prior-year early childhood), which are entered elsewhere.
+    """
+    levels = {dict(cell.fields).get('education_level') for cell in mapped_cells()
+              if cell.table == table and cell.year_offset == year_offset}
+    levels.discard(None)
+    return tuple(sorted(levels))
+
+
+def extract_workbook(path, cells=None, slim: bool = True) -> dict:
+    """Read every mapped cell of a returned template in one pass per worksheet
+
+    Returns {'file', 'years': {sheet: year label}, 'values': [(MappedCell, count), ...],
+    'missing_sheets': [...], 'seconds', 'bytes'}. Only cells with a count above zero are returned,
+    matching what the data-entry pages save.
+
+    With `slim`, the mapped worksheets are read from a cached value-only copy of
+    the workbook (workbook_slim.py); pass False for one-off files such as uploads.
+    """
+    cells = cells if cells is not None else mapped_cells()
+
+    wanted = defaultdict(dict)  # sheet -> {(row, col): [cells]}
+    for cell in cells:
+        wanted[cell.sheet].setdefault(cell_position(cell.coordinate), []).append(cell)
+    year_positions = {sheet: cell_position(coordinate) for sheet, coordinate in YEAR_CELLS.items()}
+    for sheet, position in year_positions.items():
+        wanted[sheet].setdefault(position, [])
+
+    start = time.perf_counter()
+    source = slim_workbook(path, list(wanted)) if slim else path
+    wb = openpyxl.load_workbook(source, read_only=True, data_only=True)
+    values = []
+    years = {}
+    missing_sheets = []
+    try:
+        for sheet, positions in wanted.items():
+            if sheet not in wb.sheetnames:
+                missing_sheets.append(sheet)
+                continue
+            rows = sorted({row for row, _ in positions})
+            max_col = max(col for _, col in positions)
+
+            # One streaming pass over the rows that hold mapped cells
+            row_values = wb[sheet].iter_rows(min_row=rows[0], max_row=rows[-1],
+                                             max_col=max_col, values_only=True)
+            for row_index, row in enumerate(row_values, start=rows[0]):
+                for col_index, value in enumerate(row, start=1):
+                    targets = positions.get((row_index, col_index))
+                    if targets is None:
+                        continue
+                    if (row_index, col_index) == year_positions.get(sheet):
+                        years[sheet] = str(value).strip() if value is not None else None
+                    count = to_count(value)
+                    if count > 0:
+                        values.extend((cell, count) for cell in targets)
+    finally:
+        wb.close()
+
+    return {
+        'file': str(path),
+        'years': years,
+        'values': values,
+        'missing_sheets': missing_sheets,
+        'seconds': time.perf_counter() - start,
+        'bytes': Path(path).stat().st_size,
+    }
@@ -0,0 +1,319 @@
+"""
+HTTP service for saving data-entry grids and returned templates
+
+Instead of the browser deleting a country's rows and re-inserting the whole
+grid, clients send the grid (or a returned template workbook) here once. The
+service parses it, validates every cell against the template cell mappings
+(template_mapping.py) and applies it with a single call to the
+`save_digest_changes` database function
+(supabase-save-digest-rows-function.sql), which deletes cleared cells,
+updates changed ones and inserts new ones in one transaction.
+
+Requests must carry the user's Supabase access token
+(`Authorization: Bearer <token>`); the service talks to PostgREST as that
+user, so the usual row level security policies decide what may be written.
+
+Endpoints:
+    GET  /health
+    POST /grids/{table}      JSON: {"country_id", "academic_year_id", "grid" | "rows"}
+                             "grid" uses the data-entry page keys, e.g.
+                             {"primary|public|5|G1|male": 12, ...}
+    POST /templates?country_id=...[&year=2023-2024]
+                             body: the returned .xlsx workbook
+
+Add `?dry_run=true` to either POST to get the cells that would be inserted,
+updated and deleted (see cell_delta.py) without writing anything.
+
+Requires FastAPI and uvicorn (not needed by the other scripts):
+    pip install fastapi uvicorn
+
+Usage:
+    python scripts/template_upload_service.py
+    python scripts/template_upload_service.py --host 0.0.0.0 --port 8080
+"""
+
+import sys
+import os
+import argparse
+import tempfile
+from collections import defaultdict
+
+try:
+    from fastapi import FastAPI, Header, HTTPException, Request
+    from fastapi.concurrency import run_in_threadpool
+except ImportError:
+    FastAPI = None
+
+from postgrest.exceptions import APIError
+
+from console import utf8_console
+from import_member_templates import TABLES, group_rows, template_scope, template_year
+from cell_delta import compute_delta, load_slice
+from supabase_client import get_user_postgrest, load_credentials
+from template_mapping import extract_workbook, mapped_cells, table_fields
+
+MAX_UPLOAD_BYTES = 10 * 1024 * 1024
+MAX_COUNT = 1_000_000
+MAX_ERRORS = 50
+MAX_REPORT_LINES = 200
+
+# Grid key parts that stand for NULL (see enrollKey in the data-entry pages)
+NULL_KEY_PARTS = {'none', 'national'}
+
+# D2 is not in the template mapping, but the enrollment page enters it with
+# these age groups
+SPECIAL_EDUCATION_AGE_GROUPS = ['5_8', '9_11', '12_14', '15_17', '18_20', 'over_20', 'unknown']
+
+
+def cell_keys() -> tuple:
+    """({table: key field names}, {table: value field}, {table: set of allowed key tuples})"""
+    fields = table_fields()
+    key_fields = {table: keys for table, (keys, _) in fields.items()}
+    value_fields = {table: value for table, (_, value) in fields.items()}
+    allowed = defaultdict(set)
+    for cell in mapped_cells():
+        allowed[cell.table].add(tuple(value for _, value in cell.fields))
+
+    for ownership in ('public', 'private'):
+        for age_group in SPECIAL_EDUCATION_AGE_GROUPS:
+            for gender in ('male', 'female'):
+                allowed['student_enrollment'].add(
+                    ('special_education', ownership, age_group, None, gender))
+
+    return key_fields, value_fields, dict(allowed)
+
+
+KEY_FIELDS, VALUE_FIELDS, ALLOWED_KEYS = cell_keys()
+
+
+def grid_to_rows(table: str, grid: dict) -> list:
+    """Convert page-style {"a|b|c": count} keys into row dicts"""
+    fields = KEY_FIELDS[table]
+    rows = []
+    for key, count in grid.items():
+        parts = [None if part in NULL_KEY_PARTS else part for part in str(key).split('|')]
+        if len(parts) != len(fields):
+            rows.append({'_key': key})  # reported by validate_rows
+            continue
+        rows.append({**dict(zip(fields, parts)), VALUE_FIELDS[table]: count})
+    return rows
+
+
+def validate_rows(table: str, rows: list) -> list:
+    """Error messages for rows that are not cells of `table` in the template"""
+    if table not in KEY_FIELDS:
+        return [f"unknown table: {table}"]
+
+    fields = KEY_FIELDS[table]
+    value_field = VALUE_FIELDS[table]
+    expected = set(fields) | {value_field}
+    allowed = ALLOWED_KEYS[table]
+
+    errors = []
+    if len(rows) > len(allowed):
+        errors.append(f"{len(rows)} cells sent, but {table} only has {len(allowed)}")
+
+    seen = set()
+    for index, row in enumerate(rows):
+        if not isinstance(row, dict):
+            errors.append(f"row {index}: not an object")
+            continue
+        if set(row) == {'_key'}:
+            errors.append(f"row {index}: key {row['_key']!r} should have {len(fields)} parts ({'|'.join(fields)})")
+            continue
+        if set(row) != expected:
+            errors.append(f"row {index}: expected fields {sorted(expected)}, got {sorted(row)}")
+            continue
+
+        key = tuple(row[field] for field in fields)
+        bad = [field for field, part in zip(fields, key) if part is not None and not isinstance(part, str)]
+        if bad:  # lists or objects would not even be hashable
+            errors.append(f"row {index}: {', '.join(bad)} must be a string or null")
+        elif key not in allowed:
+            errors.append(f"row {index}: {dict(zip(fields, key))} is not a cell of {table}")
+        elif key in seen:
+            errors.append(f"row {index}: duplicate cell {dict(zip(fields, key))}")
+        else:
+            seen.add(key)
+
+        value = row[value_field]
+        if isinstance(value, bool) or not isinstance(value, int) or not 0 <= value <= MAX_COUNT:
+            errors.append(f"row {index}: {value_field} must be a whole number from 0 to {MAX_COUNT}, got {value!r}")
+
+        if len(errors) >= MAX_ERRORS:
+            break
+
+    return errors
+
+
+def save_changes(postgrest, country_id, changes: list) -> list:
+    """Apply [{'table', 'academic_year_id', 'rows'[, 'scope']}] in one transaction"""
+    result = postgrest.rpc('save_digest_changes', {
+        'p_country_id': str(country_id),
+        'p_changes': [{**change, 'academic_year_id': str(change['academic_year_id'])} for change in changes],
+    }).execute()
+    return result.data
+
+
+def preview_changes(postgrest, country_id, changes: list) -> list:
+    """What save_changes would do, per change, without writing (cell_delta against stored rows)"""
+    previews = []
+    for change in changes:
+        key_fields, value_field = table_fields()[change['table']]
+        stored = load_slice(postgrest, change['table'], key_fields, [value_field],
+                            {'country_id': country_id, 'academic_year_id': change['academic_year_id']},
+                            within=change.get('scope'))
+        incoming = [row for row in change['rows'] if row.get(value_field)]  # zeros are not stored
+        delta = compute_delta(stored, incoming, key_fields, [value_field])
+        previews.append({'table': change['table'], 'academic_year_id': change['academic_year_id'],
+                         **delta.counts(), 'changes': delta.report_lines(limit=MAX_REPORT_LINES)})
+    return previews
+
+
+def template_changes(result: dict, year_label: str, year_ids: dict) -> tuple:
+    """(changes, missing year labels) for one extracted template
+
+    Each change is scoped to the education levels the template maps for its
+    year, so levels the template has no cells for are left as stored.
+    """
+    changes, missing = [], []
+    grouped = group_rows(result, year_label)
+    for (table, label), rows in sorted(grouped.items(), key=lambda item: (TABLES.index(item[0][0]), item[0][1])):
+        if label not in year_ids:
+            missing.append(label)
+            continue
+        change = {'table': table, 'academic_year_id': year_ids[label], 'rows': rows}
+        scope = template_scope(table, 0 if label == year_label else -1)
+        if scope:
+            change['scope'] = {field: list(values) for field, values in scope.items()}
+        changes.append(change)
+    return changes, missing
+
+
+def extract_upload(body: bytes) -> dict:
+    """Run extract_workbook on uploaded bytes (openpyxl needs a file)"""
+    fd, path = tempfile.mkstemp(suffix='.xlsx')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(body)
+        return extract_workbook(path, slim=False)
+    finally:
+        os.unlink(path)
+
+
+def bearer_token(authorization: str) -> str:
+    if not authorization or not authorization.lower().startswith('bearer '):
+        raise HTTPException(status_code=401, detail='Missing bearer token')
+    return authorization[7:].strip()
+
+
+def create_app():
+    """Build the FastAPI application"""
+    if FastAPI is None:
+        raise RuntimeError("FastAPI is not installed (pip install fastapi uvicorn)")
+
+    load_credentials('anon')  # fail at startup, not on the first request
+    app = FastAPI(title='OECS Digest template upload service')
+
+    def apply(token: str, country_id, changes: list, dry_run: bool = False) -> dict:
+        postgrest = get_user_postgrest(token)
+        try:
+            if dry_run:
+                results = preview_changes(postgrest, country_id, changes)
+            else:
+                results = save_changes(postgrest, country_id, changes)
+        except APIError as e:
+            raise HTTPException(status_code=400, detail=e.message)
+        return {'results': results, 'rows': sum(len(change['rows']) for change in changes),
+                'dry_run': dry_run}
+
+    @app.get('/health')
+    def health():
+        return {'status': 'ok'}
+
+    @app.post('/grids/{table}')
+    def save_grid(table: str, payload: dict, dry_run: bool = False, authorization: str = Header(None)):
+        token = bearer_token(authorization)
+        if table not in KEY_FIELDS:
+            raise HTTPException(status_code=404, detail=f"Unknown table: {table}")
+        if not payload.get('country_id') or not payload.get('academic_year_id'):
+            raise HTTPException(status_code=422, detail='country_id and academic_year_id are required')
+
+        if isinstance(payload.get('grid'), dict):
+            rows = grid_to_rows(table, payload['grid'])
+        elif isinstance(payload.get('rows'), list):
+            rows = payload['rows']
+        else:
+            raise HTTPException(status_code=422, detail='Send either "grid" (object) or "rows" (array)')
+
+        errors = validate_rows(table, rows)
+        if errors:
+            raise HTTPException(status_code=422, detail={'errors': errors})
+
+        changes = [{'table': table, 'academic_year_id': payload['academic_year_id'], 'rows': rows}]
+        return apply(token, payload['country_id'], changes, dry_run)
+
+    @app.post('/templates')
+    async def upload_template(request: Request, country_id: str, year: str = None, dry_run: bool = False,
+                              authorization: str = Header(None)):
+        token = bearer_token(authorization)
+        if int(request.headers.get('content-length') or 0) > MAX_UPLOAD_BYTES:
+            raise HTTPException(status_code=413, detail=f"Templates are limited to {MAX_UPLOAD_BYTES} bytes")
+        body = await request.body()
+        if not body or len(body) > MAX_UPLOAD_BYTES:
+            raise HTTPException(status_code=413 if body else 422, detail='Send the .xlsx workbook as the request body')
+
+        try:
+            result = await run_in_threadpool(extract_upload, body)
+        except Exception as e:
+            raise HTTPException(status_code=422, detail=f"Could not read workbook: {e}")
+
+        year_label = template_year(result, year)
+        if year_label is None:
+            raise HTTPException(status_code=422, detail='No academic year in the worksheet headers (pass ?year=)')
+
+        postgrest = get_user_postgrest(token)
+        years = await run_in_threadpool(
+            lambda: postgrest.table('academic_years').select('id, year_label').execute())
+        year_ids = {row['year_label']: row['id'] for row in years.data}
+
+        changes, missing = template_changes(result, year_label, year_ids)
+        if missing:
+            raise HTTPException(status_code=422, detail=f"Academic years not found: {', '.join(sorted(set(missing)))}")
+        if not changes:
+            raise HTTPException(status_code=422, detail='The template has no values')
+
+        response = await run_in_threadpool(apply, token, country_id, changes, dry_run)
+        response['year'] = year_label
+        response['missing_sheets'] = result['missing_sheets']
+        return response
+
+    return app
+
+
+def main():
+    utf8_console()
+
+    parser = argparse.ArgumentParser(description='Serve grid and template uploads for the data-entry pages')
+    parser.add_argument('--host', default='127.0.0.1', help='Interface to listen on (default: 127.0.0.1)')
+    parser.add_argument('--port', type=int, default=8000, help='Port to listen on (default: 8000)')
+    args = parser.parse_args()
+
+    try:
+        import uvicorn
+    except ImportError:
+        uvicorn = None
+    if FastAPI is None or uvicorn is None:
+        print("❌ Error: the upload service needs FastAPI and uvicorn")
+        print("   Install them with: pip install fastapi uvicorn")
+        sys.exit(1)
+
+    print("\n" + "=" * 80)
+    print("📤 TEMPLATE UPLOAD SERVICE")
+    print("=" * 80)
+    print(f"   Listening on http://{args.host}:{args.port}")
+    uvicorn.run(create_app(), host=args.host, port=args.port)
+
+
+if __name__ == '__main__':
+    main()
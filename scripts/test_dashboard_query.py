@@ -1,43 +1,29 @@
 """
 Test the exact query that the dashboard runs
 """
-import os
 import sys
-import io
-from pathlib import Path
-from dotenv import load_dotenv
-from supabase import create_client, Client
+import itertools
 
-# Fix Windows console encoding
-if sys.platform == 'win32':
-    sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8', errors='replace')
-    sys.stderr = io.TextIOWrapper(sys.stderr.buffer, encoding='utf-8', errors='replace')
+from console import utf8_console
+from supabase_client import get_client, load_credentials
+from table_reader import iter_table
 
-# Load environment variables
-env_path = Path(__file__).parent.parent / '.env.local'
-load_dotenv(dotenv_path=env_path)
-
-# Get Supabase credentials - USING ANON KEY like dashboard does
-supabase_url = os.getenv('NEXT_PUBLIC_SUPABASE_URL')
-supabase_anon_key = os.getenv('NEXT_PUBLIC_SUPABASE_ANON_KEY')
+utf8_console()
 
 print("=" * 80)
 print("TESTING DASHBOARD QUERY WITH ANON KEY")
 print("=" * 80)
 print()
 
-if not supabase_url or not supabase_anon_key:
-    print("✗ Missing Supabase credentials")
-    print(f"URL: {supabase_url[:30]}..." if supabase_url else "MISSING")
-    print(f"Anon Key: {supabase_anon_key[:30]}..." if supabase_anon_key else "MISSING")
-    sys.exit(1)
+# Get Supabase credentials - USING ANON KEY like dashboard does
+supabase_url, supabase_anon_key = load_credentials('anon')
 
 print(f"Using URL: {supabase_url}")
 print(f"Using Anon Key: {supabase_anon_key[:20]}...")
 print()
 
 # Create Supabase client with ANON key (like the dashboard)
-supabase: Client = create_client(supabase_url, supabase_anon_key)
+supabase = get_client('anon')
 
 # Step 1: Get active academic year
 print("Step 1: Get active academic year")
@@ -60,47 +46,42 @@ print()
 print("Step 2: Get institutions with country data")
 print("-" * 80)
 try:
-    response = supabase.from_('institutions').select('''
+    institutions = iter_table(supabase, 'institutions', columns='''
         *,
         countries (
             country_code,
             country_name
         )
-    ''').eq('academic_year_id', active_year['id']).execute()
+    ''', filters={'academic_year_id': active_year['id']})
+    inst = next(institutions, None)
 
-    if response.data:
-        print(f"✓ Found {len(response.data)} institution records")
+    if inst:
+        # Show first record in detail
+        print("Sample Record:")
+        print(f"  Country: {inst.get('countries', {}).get('country_name', 'N/A')}")
+        print(f"  Country Code: {inst.get('countries', {}).get('country_code', 'N/A')}")
+        print(f"  Daycare Public: {inst.get('daycare_public', 0)}")
+        print(f"  Daycare Private Church: {inst.get('daycare_private_church', 0)}")
+        print(f"  Daycare Private Non-Affiliated: {inst.get('daycare_private_non_affiliated', 0)}")
+        daycare_total = inst.get('daycare_public', 0) + inst.get('daycare_private_church', 0) + inst.get('daycare_private_non_affiliated', 0)
+        print(f"  → Total Daycare: {daycare_total}")
         print()
 
-        # Show first record in detail
-        if response.data:
-            inst = response.data[0]
-            print("Sample Record:")
-            print(f"  Country: {inst.get('countries', {}).get('country_name', 'N/A')}")
-            print(f"  Country Code: {inst.get('countries', {}).get('country_code', 'N/A')}")
-            print(f"  Daycare Public: {inst.get('daycare_public', 0)}")
-            print(f"  Daycare Private Church: {inst.get('daycare_private_church', 0)}")
-            print(f"  Daycare Private Non-Affiliated: {inst.get('daycare_private_non_affiliated', 0)}")
-            daycare_total = inst.get('daycare_public', 0) + inst.get('daycare_private_church', 0) + inst.get('daycare_private_non_affiliated', 0)
-            print(f"  → Total Daycare: {daycare_total}")
-            print()
-
-            preschool_total = inst.get('preschool_public', 0) + inst.get('preschool_private_church', 0) + inst.get('preschool_private_non_affiliated', 0)
-            print(f"  Preschool Total: {preschool_total}")
-
-            primary_total = inst.get('primary_public', 0) + inst.get('primary_private_church', 0) + inst.get('primary_private_non_affiliated', 0)
-            print(f"  Primary Total: {primary_total}")
-
-            secondary_total = inst.get('secondary_public', 0) + inst.get('secondary_private_church', 0) + inst.get('secondary_private_non_affiliated', 0)
-            print(f"  Secondary Total: {secondary_total}")
-
-            post_sec_total = inst.get('post_secondary_public', 0) + inst.get('post_secondary_private', 0)
-            print(f"  Post-Secondary Total: {post_sec_total}")
-            print()
-
-        # Calculate totals across all countries
-        print("Aggregated Totals Across All Countries:")
-        print("-" * 80)
+        preschool_total = inst.get('preschool_public', 0) + inst.get('preschool_private_church', 0) + inst.get('preschool_private_non_affiliated', 0)
+        print(f"  Preschool Total: {preschool_total}")
+
+        primary_total = inst.get('primary_public', 0) + inst.get('primary_private_church', 0) + inst.get('primary_private_non_affiliated', 0)
+        print(f"  Primary Total: {primary_total}")
+
+        secondary_total = inst.get('secondary_public', 0) + inst.get('secondary_private_church', 0) + inst.get('secondary_private_non_affiliated', 0)
+        print(f"  Secondary Total: {secondary_total}")
+
+        post_sec_total = inst.get('post_secondary_public', 0) + inst.get('post_secondary_private', 0)
+        print(f"  Post-Secondary Total: {post_sec_total}")
+        print()
+
+        # Calculate totals across all countries, streaming the remaining pages
+        record_count = 0
         total_daycare = 0
         total_preschool = 0
         total_primary = 0
@@ -109,7 +90,8 @@ try:
         total_tvet = 0
         total_post_sec = 0
 
-        for inst in response.data:
+        for inst in itertools.chain([inst], institutions):
+            record_count += 1
             total_daycare += inst.get('daycare_public', 0) + inst.get('daycare_private_church', 0) + inst.get('daycare_private_non_affiliated', 0)
             total_preschool += inst.get('preschool_public', 0) + inst.get('preschool_private_church', 0) + inst.get('preschool_private_non_affiliated', 0)
             total_primary += inst.get('primary_public', 0) + inst.get('primary_private_church', 0) + inst.get('primary_private_non_affiliated', 0)
@@ -118,6 +100,10 @@ try:
             total_tvet += inst.get('tvet_public', 0) + inst.get('tvet_private_church', 0) + inst.get('tvet_private_non_affiliated', 0)
             total_post_sec += inst.get('post_secondary_public', 0) + inst.get('post_secondary_private', 0)
 
+        print(f"✓ Found {record_count} institution records")
+        print()
+        print("Aggregated Totals Across All Countries:")
+        print("-" * 80)
         print(f"Early Childhood (Daycare + Preschool): {total_daycare + total_preschool}")
         print(f"  - Daycare: {total_daycare}")
         print(f"  - Preschool: {total_preschool}")
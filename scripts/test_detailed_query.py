@@ -1,29 +1,15 @@
 """
 Test the exact query structure to see what's being returned
 """
-import os
-import sys
-import io
 import json
-from pathlib import Path
-from dotenv import load_dotenv
-from supabase import create_client, Client
 
-# Fix Windows console encoding
-if sys.platform == 'win32':
-    sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8', errors='replace')
-    sys.stderr = io.TextIOWrapper(sys.stderr.buffer, encoding='utf-8', errors='replace')
+from console import utf8_console
+from supabase_client import get_client
 
-# Load environment variables
-env_path = Path(__file__).parent.parent / '.env.local'
-load_dotenv(dotenv_path=env_path)
+utf8_console()
 
-# Get Supabase credentials - USING ANON KEY like dashboard does
-supabase_url = os.getenv('NEXT_PUBLIC_SUPABASE_URL')
-supabase_anon_key = os.getenv('NEXT_PUBLIC_SUPABASE_ANON_KEY')
-
-# Create Supabase client
-supabase: Client = create_client(supabase_url, supabase_anon_key)
+# Create Supabase client with ANON key (like the dashboard)
+supabase = get_client('anon')
 
 print("=" * 80)
 print("DETAILED QUERY TEST")
@@ -0,0 +1,346 @@
+"""
+Slim copies of Excel workbooks for faster parsing
+
+Many of the digest workbooks carry far more markup than data: the 2021-22
+Chapter 1 file is 209 KB against about 20 KB for the other years because
+each of its sheets has 1,000 styled rows × 26 columns of empty cells, and
+openpyxl builds a cell object, with its style, for every one of them.
+
+`slim_workbook()` rewrites a workbook to just what the extraction code
+reads: the requested worksheets, the cells that hold a value (the cached
+result for formulas), merged ranges, and the shared strings those cells use.
+Styles, column widths, drawings, images, comments, calcChain, printer
+settings and document properties are dropped. Sheets are streamed with
+iterparse, so slimming needs little memory even for the large chapters.
+
+The slim copy is cached under the SHA-256 of the original file (and the
+sheet selection), so a workbook is slimmed once and every later load reads
+the slim copy until the file changes. Set DIGEST_CACHE_DIR to move the cache
+(default: <temp dir>/oecs_digest_cache).
+
+Slim copies are meant for `load_workbook(..., data_only=True)`: formulas,
+number formats and styles are gone, so dates come back as serial numbers.
+
+Usage:
+    from workbook_slim import slim_workbook
+
+    wb = openpyxl.load_workbook(slim_workbook(path, ['Table 1.1']), data_only=True)
+
+    python scripts/workbook_slim.py "DIGEST_WEB/Extracted Chapters/Chapter 1/2021-22.xlsx"
+"""
+
+import sys
+import os
+import argparse
+import hashlib
+import posixpath
+import tempfile
+import time
+import zipfile
+from pathlib import Path
+from xml.etree.ElementTree import iterparse
+from xml.sax.saxutils import escape, quoteattr
+
+from openpyxl.utils import column_index_from_string, get_column_letter
+from openpyxl.utils.cell import coordinate_from_string
+
+from console import utf8_console
+
+# Bump when the slim format changes, so old cache entries are not reused
+SLIM_VERSION = 1
+
+MAIN_NS = 'http://schemas.openxmlformats.org/spreadsheetml/2006/main'
+REL_NS = 'http://schemas.openxmlformats.org/officeDocument/2006/relationships'
+PACKAGE_REL_NS = 'http://schemas.openxmlformats.org/package/2006/relationships'
+WORKSHEET_REL = f'{REL_NS}/worksheet'
+SHARED_STRINGS_REL = f'{REL_NS}/sharedStrings'
+
+CONTENT_TYPE = 'application/vnd.openxmlformats-officedocument.spreadsheetml'
+
+CHUNK_SIZE = 1024 * 1024
+
+
+def cache_dir() -> Path:
+    return Path(os.getenv('DIGEST_CACHE_DIR') or Path(tempfile.gettempdir()) / 'oecs_digest_cache') / 'slim'
+
+
+def file_digest(path) -> str:
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(CHUNK_SIZE), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def tag(name: str) -> str:
+    return f'{{{MAIN_NS}}}{name}'
+
+
+CELL, ROW, VALUE, INLINE, MERGE_CELL = tag('c'), tag('row'), tag('v'), tag('is'), tag('mergeCell')
+
+
+def text_of(element) -> str:
+    """Plain text of a shared/inline string (rich-text runs joined, phonetic runs skipped)"""
+    own = element.find(tag('t'))
+    if own is not None:
+        return own.text or ''
+    return ''.join(run.findtext(tag('t')) or '' for run in element.iter(tag('r')))
+
+
+def read_shared_strings(archive: zipfile.ZipFile, name: str) -> list:
+    if name is None or name not in archive.namelist():
+        return []
+    strings = []
+    with archive.open(name) as f:
+        for _, element in iterparse(f):
+            if element.tag == tag('si'):
+                strings.append(text_of(element))
+                element.clear()
+    return strings
+
+
+def resolve_target(base: str, target: str) -> str:
+    """Part name for a relationship target relative to `base` (e.g. 'xl/')"""
+    if target.startswith('/'):
+        return target.lstrip('/')
+    return posixpath.normpath(posixpath.join(base, target))
+
+
+def read_workbook(archive: zipfile.ZipFile) -> tuple:
+    """([(sheet name, part name, state)], shared strings part, date1904)"""
+    with archive.open('xl/_rels/workbook.xml.rels') as f:
+        rels = {}
+        shared_strings = None
+        for _, element in iterparse(f):
+            if element.tag == f'{{{PACKAGE_REL_NS}}}Relationship':
+                target = resolve_target('xl', element.get('Target'))
+                rels[element.get('Id')] = (element.get('Type'), target)
+                if element.get('Type') == SHARED_STRINGS_REL:
+                    shared_strings = target
+
+    sheets = []
+    date1904 = False
+    with archive.open('xl/workbook.xml') as f:
+        for _, element in iterparse(f):
+            if element.tag == tag('workbookPr'):
+                date1904 = element.get('date1904') in ('1', 'true')
+            elif element.tag == tag('sheet'):
+                rel_type, part = rels.get(element.get(f'{{{REL_NS}}}id'), (None, None))
+                if rel_type == WORKSHEET_REL:  # chartsheets and dialog sheets have no cells
+                    sheets.append((element.get('name'), part, element.get('state')))
+    return sheets, shared_strings, date1904
+
+
+class StringTable:
+    """Shared strings of the slim workbook: only the ones used, renumbered"""
+
+    def __init__(self, source: list):
+        self.source = source
+        self.index = {}
+        self.strings = []
+
+    def add(self, source_index: int) -> int:
+        if source_index not in self.index:
+            self.index[source_index] = len(self.strings)
+            self.strings.append(self.source[source_index])
+        return self.index[source_index]
+
+    def xml(self) -> str:
+        items = ''.join(f'<si><t xml:space="preserve">{escape(text)}</t></si>' for text in self.strings)
+        return (f'<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+                f'<sst xmlns="{MAIN_NS}" count="{len(self.strings)}" uniqueCount="{len(self.strings)}">{items}</sst>')
+
+
+def slim_sheet(source, strings: StringTable) -> tuple:
+    """Rewrite one worksheet to its valued cells; returns (xml, cells kept, cells dropped)"""
+    rows = []
+    cells = []
+    merges = []
+    kept = dropped = 0
+    max_row = max_col = 0
+    row_index = 0
+    previous = None  # reference of the previous cell in the row, parsed only when needed
+
+    def column_of(reference):
+        return column_index_from_string(coordinate_from_string(reference)[0]) if reference else 0
+
+    for event, element in iterparse(source, events=('start', 'end')):
+        if event == 'start':
+            if element.tag == ROW:
+                row_index = int(element.get('r') or row_index + 1)
+                previous = None
+                cells = []
+            continue
+
+        if element.tag == CELL:
+            # Most cells are empty styled cells; only references of kept cells are parsed
+            reference = element.get('r')
+            if reference is None:  # optional in the format: the next column
+                reference = f'{get_column_letter(column_of(previous) + 1)}{row_index}'
+            previous = reference
+
+            cell_type = element.get('t', 'n')
+            value = element.findtext(VALUE)
+            if cell_type == 'inlineStr':
+                inline = element.find(INLINE)
+                value = text_of(inline) if inline is not None else None
+            if value is None:
+                dropped += 1
+            else:
+                kept += 1
+                max_row, max_col = max(max_row, row_index), max(max_col, column_of(reference))
+                if cell_type == 's':
+                    cells.append(f'<c r="{reference}" t="s"><v>{strings.add(int(value))}</v></c>')
+                elif cell_type == 'inlineStr':
+                    cells.append(f'<c r="{reference}" t="inlineStr"><is><t xml:space="preserve">'
+                                 f'{escape(value)}</t></is></c>')
+                else:
+                    type_attr = '' if cell_type == 'n' else f' t="{cell_type}"'
+                    cells.append(f'<c r="{reference}"{type_attr}><v>{escape(value)}</v></c>')
+            element.clear()
+
+        elif element.tag == ROW:
+            if cells:
+                rows.append(f'<row r="{row_index}">{"".join(cells)}</row>')
+            element.clear()
+
+        elif element.tag == MERGE_CELL:
+            merges.append(element.get('ref'))
+
+    dimension = f'A1:{get_column_letter(max_col)}{max_row}' if kept else 'A1'
+    merge_xml = (f'<mergeCells count="{len(merges)}">'
+                 + ''.join(f'<mergeCell ref={quoteattr(ref)}/>' for ref in merges)
+                 + '</mergeCells>') if merges else ''
+    xml = (f'<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+           f'<worksheet xmlns="{MAIN_NS}"><dimension ref="{dimension}"/>'
+           f'<sheetData>{"".join(rows)}</sheetData>{merge_xml}</worksheet>')
+    return xml, kept, dropped
+
+
+def package_xml(sheet_entries: list, date1904: bool) -> dict:
+    """Workbook, relationship and content-type parts for the slim package"""
+    workbook_pr = '<workbookPr date1904="1"/>' if date1904 else ''
+    sheets = ''.join(
+        f'<sheet name={quoteattr(name)} sheetId="{i}" r:id="rId{i}"'
+        f'{f" state={quoteattr(state)}" if state else ""}/>'
+        for i, (name, state) in enumerate(sheet_entries, start=1)
+    )
+    sheet_rels = ''.join(
+        f'<Relationship Id="rId{i}" Type="{WORKSHEET_REL}" Target="worksheets/sheet{i}.xml"/>'
+        for i in range(1, len(sheet_entries) + 1)
+    )
+    sheet_types = ''.join(
+        f'<Override PartName="/xl/worksheets/sheet{i}.xml" ContentType="{CONTENT_TYPE}.worksheet+xml"/>'
+        for i in range(1, len(sheet_entries) + 1)
+    )
+    header = '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+    return {
+        '[Content_Types].xml': (
+            f'{header}<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+            '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+            '<Default Extension="xml" ContentType="application/xml"/>'
+            f'<Override PartName="/xl/workbook.xml" ContentType="{CONTENT_TYPE}.sheet.main+xml"/>'
+            f'<Override PartName="/xl/sharedStrings.xml" ContentType="{CONTENT_TYPE}.sharedStrings+xml"/>'
+            f'{sheet_types}</Types>'
+        ),
+        '_rels/.rels': (
+            f'{header}<Relationships xmlns="{PACKAGE_REL_NS}">'
+            f'<Relationship Id="rId1" Type="{REL_NS}/officeDocument" Target="xl/workbook.xml"/>'
+            '</Relationships>'
+        ),
+        'xl/workbook.xml': (
+            f'{header}<workbook xmlns="{MAIN_NS}" xmlns:r="{REL_NS}">{workbook_pr}<sheets>{sheets}</sheets></workbook>'
+        ),
+        'xl/_rels/workbook.xml.rels': (
+            f'{header}<Relationships xmlns="{PACKAGE_REL_NS}">{sheet_rels}'
+            f'<Relationship Id="rId{len(sheet_entries) + 1}" Type="{SHARED_STRINGS_REL}" Target="sharedStrings.xml"/>'
+            '</Relationships>'
+        ),
+    }
+
+
+def write_slim(source_path, target_path, sheets=None) -> dict:
+    """Write the slim copy of `source_path`; `sheets` limits it to those worksheet names"""
+    stats = {'sheets': 0, 'cells_kept': 0, 'cells_dropped': 0}
+    with zipfile.ZipFile(source_path) as archive:
+        workbook_sheets, shared_strings_part, date1904 = read_workbook(archive)
+        if sheets is not None:
+            wanted = set(sheets)
+            workbook_sheets = [entry for entry in workbook_sheets if entry[0] in wanted]
+        strings = StringTable(read_shared_strings(archive, shared_strings_part))
+
+        with zipfile.ZipFile(target_path, 'w', zipfile.ZIP_DEFLATED, compresslevel=1) as slim:
+            for i, (_, part, _) in enumerate(workbook_sheets, start=1):
+                with archive.open(part) as source:
+                    xml, kept, dropped = slim_sheet(source, strings)
+                slim.writestr(f'xl/worksheets/sheet{i}.xml', xml)
+                stats['sheets'] += 1
+                stats['cells_kept'] += kept
+                stats['cells_dropped'] += dropped
+            slim.writestr('xl/sharedStrings.xml', strings.xml())
+            for name, xml in package_xml([(name, state) for name, _, state in workbook_sheets], date1904).items():
+                slim.writestr(name, xml)
+    return stats
+
+
+def slim_workbook(path, sheets=None) -> Path:
+    """Path of the cached slim copy of `path`, creating it if needed
+
+    `sheets` (names) limits the copy to those worksheets; names that are not
+    in the workbook are ignored, so callers still see them as missing.
+    """
+    selection = ','.join(sorted(sheets)) if sheets is not None else '*'
+    digest = hashlib.sha256(f'{file_digest(path)}|{selection}|{SLIM_VERSION}'.encode()).hexdigest()
+    target = cache_dir() / f'{digest}.xlsx'
+    if target.exists():
+        return target
+
+    target.parent.mkdir(parents=True, exist_ok=True)
+    # Write under a unique name and rename, so concurrent workers never see a partial file
+    fd, partial = tempfile.mkstemp(suffix='.xlsx', dir=target.parent)
+    os.close(fd)
+    try:
+        write_slim(path, partial, sheets)
+        os.replace(partial, target)
+    finally:
+        if os.path.exists(partial):
+            os.unlink(partial)
+    return target
+
+
+def main():
+    utf8_console()
+
+    parser = argparse.ArgumentParser(description='Write slim, value-only copies of Excel workbooks')
+    parser.add_argument('paths', nargs='+', help='Workbooks to slim')
+    parser.add_argument('--sheet', action='append', dest='sheets', help='Keep only this worksheet (repeatable)')
+    parser.add_argument('--output', metavar='DIR', help='Write the slim copies here instead of the cache')
+    args = parser.parse_args()
+
+    print("\n" + "=" * 80)
+    print("🪶 SLIMMING WORKBOOKS")
+    print("=" * 80)
+
+    try:
+        for path in map(Path, args.paths):
+            start = time.perf_counter()
+            if args.output:
+                target = Path(args.output) / path.name
+                target.parent.mkdir(parents=True, exist_ok=True)
+                stats = write_slim(path, target, args.sheets)
+                detail = f", {stats['cells_kept']} cells kept, {stats['cells_dropped']} empty cells dropped"
+            else:
+                target = slim_workbook(path, args.sheets)
+                detail = ''
+            print(f"\n📄 {path.name}: {path.stat().st_size:,} → {target.stat().st_size:,} bytes"
+                  f" in {time.perf_counter() - start:.2f}s{detail}")
+            print(f"   {target}")
+    except Exception as e:
+        print(f"\n❌ Error during slimming: {e}")
+        import traceback
+        traceback.print_exc()
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,53 @@
+-- Education Indicators Table
+-- Run this in Supabase SQL Editor
+--
+-- Population-normalised enrollment indicators per country, year, level and
+-- gender, computed in batch from student_enrollment and population_data by
+-- scripts/compute_indicators.py. Pages read these instead of computing them.
+
+CREATE TABLE IF NOT EXISTS education_indicators (
+    id SERIAL PRIMARY KEY,
+    country_id INTEGER REFERENCES countries(id) NOT NULL,
+    academic_year_id INTEGER REFERENCES academic_years(id) NOT NULL,
+    education_level VARCHAR(50) NOT NULL CHECK (education_level IN (
+        'early_childhood', 'primary', 'secondary', 'post_secondary'
+    )),
+    gender VARCHAR(10) NOT NULL CHECK (gender IN ('male', 'female', 'total')),
+    official_age_from INTEGER NOT NULL,           -- official age range of the level
+    official_age_to INTEGER NOT NULL,
+    enrollment INTEGER DEFAULT 0 CHECK (enrollment >= 0),
+    official_age_enrollment INTEGER DEFAULT 0 CHECK (official_age_enrollment >= 0),
+    under_age_enrollment INTEGER DEFAULT 0 CHECK (under_age_enrollment >= 0),
+    over_age_enrollment INTEGER DEFAULT 0 CHECK (over_age_enrollment >= 0),
+    unknown_age_enrollment INTEGER DEFAULT 0 CHECK (unknown_age_enrollment >= 0),
+    official_age_population INTEGER DEFAULT 0 CHECK (official_age_population >= 0),
+    gross_enrollment_ratio DECIMAL(7,2),          -- enrollment / official-age population, %
+    net_enrollment_ratio DECIMAL(7,2),            -- official-age enrollment / official-age population, %
+    under_age_share DECIMAL(5,2),                 -- % of enrollment below the official age
+    over_age_share DECIMAL(5,2),                  -- % of enrollment above the official age
+    gender_parity_index_ger DECIMAL(6,3),         -- female / male GER ('total' rows only)
+    gender_parity_index_ner DECIMAL(6,3),         -- female / male NER ('total' rows only)
+    created_at TIMESTAMP WITH TIME ZONE DEFAULT NOW(),
+    updated_at TIMESTAMP WITH TIME ZONE DEFAULT NOW(),
+    CONSTRAINT unique_education_indicator UNIQUE(country_id, academic_year_id, education_level, gender)
+);
+
+-- Enable RLS
+ALTER TABLE education_indicators ENABLE ROW LEVEL SECURITY;
+
+-- Published aggregates: anyone can read; only the service role (batch job) writes
+CREATE POLICY "Public can view education indicators" ON education_indicators
+  FOR SELECT
+  USING (true);
+
+-- Trigger for updated_at
+CREATE TRIGGER update_education_indicators_updated_at
+  BEFORE UPDATE ON education_indicators
+  FOR EACH ROW
+  EXECUTE FUNCTION update_updated_at_column();
+
+-- Index for performance
+CREATE INDEX idx_education_indicators_country_year ON education_indicators(country_id, academic_year_id);
+
+-- Verify
+SELECT 'Education indicators table created successfully' as status;
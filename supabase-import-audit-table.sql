@@ -0,0 +1,82 @@
+-- Import Audit Table
+-- Run this in Supabase SQL Editor
+--
+-- Append-only audit trail for bulk imports. Instead of a row per changed cell
+-- (row-level triggers would add one audit write for every row an import
+-- touches), the importers write one entry per table slice they change: the
+-- source file and its SHA-256, the first and last row key written, the
+-- insert/update/delete counts, and the full change set as zlib-compressed
+-- JSON. "What changed in this import" is then one indexed lookup on
+-- import_id. Written and read by scripts/import_audit.py.
+
+CREATE TABLE IF NOT EXISTS import_audit (
+    id BIGSERIAL PRIMARY KEY,
+    import_id UUID NOT NULL,                      -- one per importer run
+    source VARCHAR(50) NOT NULL,                  -- importer, e.g. 'chapter1', 'member_templates'
+    source_file TEXT,
+    source_sha256 CHAR(64),
+    table_name VARCHAR(100) NOT NULL,
+    country_id INTEGER REFERENCES countries(id),  -- NULL when the entry spans countries
+    academic_year_id INTEGER REFERENCES academic_years(id),
+    key_fields TEXT[] NOT NULL,
+    first_key JSONB,                              -- row-key range of the changes, ordered by key
+    last_key JSONB,
+    inserted INTEGER NOT NULL DEFAULT 0 CHECK (inserted >= 0),
+    updated INTEGER NOT NULL DEFAULT 0 CHECK (updated >= 0),
+    deleted INTEGER NOT NULL DEFAULT 0 CHECK (deleted >= 0),
+    changes BYTEA NOT NULL,                       -- zlib-compressed JSON change set
+    changes_size INTEGER NOT NULL,                -- uncompressed bytes
+    imported_by VARCHAR(100),
+    created_at TIMESTAMP WITH TIME ZONE DEFAULT NOW()
+);
+
+-- Enable RLS
+ALTER TABLE import_audit ENABLE ROW LEVEL SECURITY;
+
+-- Admins can read the trail; only the service role (importers) writes
+CREATE POLICY "Admins can view import audit" ON import_audit
+    FOR SELECT USING (
+        EXISTS (
+            SELECT 1 FROM user_profiles
+            WHERE id = auth.uid() AND role = 'admin'
+        )
+    );
+
+-- Append-only: entries are never changed or removed, not even by the service role
+CREATE OR REPLACE FUNCTION reject_import_audit_change()
+RETURNS TRIGGER AS $$
+BEGIN
+    RAISE EXCEPTION 'import_audit is append-only';
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER import_audit_append_only
+  BEFORE UPDATE OR DELETE ON import_audit
+  FOR EACH ROW
+  EXECUTE FUNCTION reject_import_audit_change();
+
+-- Indexes for performance
+CREATE INDEX idx_import_audit_import ON import_audit(import_id);
+CREATE INDEX idx_import_audit_slice ON import_audit(table_name, country_id, academic_year_id, created_at);
+CREATE INDEX idx_import_audit_created_at ON import_audit(created_at);
+
+-- One row per import run (security_invoker: readers still go through the table's RLS)
+CREATE OR REPLACE VIEW import_audit_runs WITH (security_invoker = true) AS
+SELECT
+    import_id,
+    source,
+    MIN(created_at) AS started_at,
+    MAX(created_at) AS finished_at,
+    COUNT(*) AS entries,
+    COUNT(DISTINCT source_file) AS files,
+    ARRAY_AGG(DISTINCT table_name) AS tables,
+    SUM(inserted) AS inserted,
+    SUM(updated) AS updated,
+    SUM(deleted) AS deleted,
+    SUM(LENGTH(changes)) AS compressed_bytes,
+    SUM(changes_size) AS change_bytes
+FROM import_audit
+GROUP BY import_id, source;
+
+-- Verify
+SELECT 'Import audit table created successfully' as status;
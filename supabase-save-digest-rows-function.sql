@@ -0,0 +1,230 @@
+-- =====================================================
+-- OECS Education Statistical Digest
+-- Transactional save for data-entry grids
+-- =====================================================
+-- Saving a grid used to delete every row for the country/year and then
+-- re-insert the whole grid as separate API calls. These functions apply a
+-- grid as one statement batch inside a single transaction:
+--
+--   1. cells no longer in the grid are deleted
+--   2. cells whose value changed are updated in place
+--   3. new cells are inserted
+--
+-- Cells with a value of 0 are treated as absent, matching the data-entry
+-- pages, which never store zeros.
+--
+-- A grid that covers only part of a table (a returned template maps some
+-- education levels, not all of them) passes p_scope, e.g.
+-- {"education_level": ["primary", "secondary"]}: only stored cells with those
+-- key values are replaced, and cells outside it are left alone.
+--
+-- The functions run as SECURITY INVOKER, so the caller's row level security
+-- policies still decide which country they may write.
+--
+-- Used by: app/data-entry/enrollment, scripts/template_upload_service.py
+-- =====================================================
+
+-- =====================================================
+-- FUNCTION: save_digest_rows
+-- Purpose: Replace one table's cells for a country/year
+--          (only those matching p_scope, when given)
+-- Returns: {"deleted": n, "updated": n, "inserted": n}
+-- =====================================================
+
+-- Earlier versions had no p_scope; drop that signature so calls without it
+-- are not ambiguous
+DROP FUNCTION IF EXISTS save_digest_rows(TEXT, TEXT, TEXT, JSONB);
+
+CREATE OR REPLACE FUNCTION save_digest_rows(
+    p_table TEXT,
+    p_country_id TEXT,
+    p_academic_year_id TEXT,
+    p_rows JSONB,
+    p_scope JSONB DEFAULT NULL
+)
+RETURNS JSONB
+LANGUAGE plpgsql
+SECURITY INVOKER
+SET search_path = public
+AS $$
+DECLARE
+    v_value_column TEXT;
+    v_key_match TEXT;
+    v_key_list TEXT;
+    v_incoming_key_list TEXT;
+    v_key_columns TEXT[];
+    v_scope TEXT;
+    v_outside TEXT := 'false';
+    v_column TEXT;
+    v_values JSONB;
+    v_allowed TEXT;
+    v_duplicates INTEGER;
+    v_outside_count INTEGER;
+    v_deleted INTEGER;
+    v_updated INTEGER;
+    v_inserted INTEGER;
+BEGIN
+    IF p_table NOT IN (
+        'student_enrollment',
+        'staff_qualifications',
+        'leadership_degree_holders',
+        'teacher_academic_qualifications',
+        'specialist_teachers',
+        'professional_development'
+    ) THEN
+        RAISE EXCEPTION 'save_digest_rows: unsupported table %', p_table;
+    END IF;
+
+    IF jsonb_typeof(p_rows) IS DISTINCT FROM 'array' THEN
+        RAISE EXCEPTION 'save_digest_rows: p_rows must be a JSON array';
+    END IF;
+
+    IF p_scope IS NOT NULL AND jsonb_typeof(p_scope) IS DISTINCT FROM 'object' THEN
+        RAISE EXCEPTION 'save_digest_rows: p_scope must be a JSON object';
+    END IF;
+
+    v_value_column := CASE WHEN p_table = 'professional_development'
+                           THEN 'participants_count' ELSE 'count' END;
+
+    -- Every other data column identifies a cell (NULLs compare equal)
+    SELECT string_agg(format('t.%1$I IS NOT DISTINCT FROM r.%1$I', column_name), ' AND '),
+           string_agg(format('%I', column_name), ', '),
+           string_agg(format('r.%I', column_name), ', '),
+           array_agg(column_name::TEXT)
+    INTO v_key_match, v_key_list, v_incoming_key_list, v_key_columns
+    FROM information_schema.columns
+    WHERE table_schema = 'public'
+      AND table_name = p_table
+      AND column_name NOT IN ('id', 'country_id', 'academic_year_id',
+                              'created_at', 'updated_at', v_value_column);
+
+    v_scope := format('t.country_id = %L AND t.academic_year_id = %L',
+                      p_country_id, p_academic_year_id);
+
+    -- Narrow the slice to the key values the grid covers: a value or a list of them
+    FOR v_column, v_values IN SELECT * FROM jsonb_each(COALESCE(p_scope, '{}'::JSONB))
+    LOOP
+        IF NOT v_column = ANY(v_key_columns) THEN
+            RAISE EXCEPTION 'save_digest_rows: % is not a key column of %', v_column, p_table;
+        END IF;
+        IF jsonb_typeof(v_values) <> 'array' THEN
+            v_values := jsonb_build_array(v_values);
+        END IF;
+        SELECT format('ARRAY[%s]::TEXT[]', COALESCE(string_agg(quote_nullable(value), ', '), ''))
+        INTO v_allowed
+        FROM jsonb_array_elements_text(v_values);
+
+        v_scope := v_scope || format(' AND t.%1$I::TEXT = ANY(%2$s)', v_column, v_allowed);
+        v_outside := v_outside || format(' OR NOT COALESCE(r.%1$I::TEXT = ANY(%2$s), false)', v_column, v_allowed);
+    END LOOP;
+
+    -- Incoming cells, typed like the target table
+    DROP TABLE IF EXISTS pg_temp.incoming_rows;
+    EXECUTE format(
+        'CREATE TEMP TABLE incoming_rows ON COMMIT DROP AS
+         SELECT * FROM jsonb_populate_recordset(NULL::public.%I, $1)',
+        p_table
+    ) USING p_rows;
+
+    EXECUTE format('UPDATE incoming_rows SET country_id = %L, academic_year_id = %L',
+                   p_country_id, p_academic_year_id);
+    EXECUTE format('DELETE FROM incoming_rows WHERE COALESCE(%I, 0) = 0', v_value_column);
+
+    EXECUTE format('SELECT count(*) - count(DISTINCT (%s)) FROM incoming_rows', v_key_list)
+    INTO v_duplicates;
+    IF v_duplicates > 0 THEN
+        RAISE EXCEPTION 'save_digest_rows: % duplicate cells in p_rows', v_duplicates;
+    END IF;
+
+    EXECUTE format('SELECT count(*) FROM incoming_rows r WHERE %s', v_outside)
+    INTO v_outside_count;
+    IF v_outside_count > 0 THEN
+        RAISE EXCEPTION 'save_digest_rows: % cells in p_rows are outside p_scope', v_outside_count;
+    END IF;
+
+    -- 1. Cells cleared in the grid
+    EXECUTE format(
+        'DELETE FROM public.%1$I t
+         WHERE %2$s
+           AND NOT EXISTS (SELECT 1 FROM incoming_rows r WHERE %3$s)',
+        p_table, v_scope, v_key_match
+    );
+    GET DIAGNOSTICS v_deleted = ROW_COUNT;
+
+    -- 2. Cells whose value changed
+    EXECUTE format(
+        'UPDATE public.%1$I t SET %4$I = r.%4$I
+         FROM incoming_rows r
+         WHERE %2$s AND %3$s AND t.%4$I IS DISTINCT FROM r.%4$I',
+        p_table, v_scope, v_key_match, v_value_column
+    );
+    GET DIAGNOSTICS v_updated = ROW_COUNT;
+
+    -- 3. New cells
+    EXECUTE format(
+        'INSERT INTO public.%1$I (country_id, academic_year_id, %5$s, %4$I)
+         SELECT r.country_id, r.academic_year_id, %6$s, r.%4$I
+         FROM incoming_rows r
+         WHERE NOT EXISTS (SELECT 1 FROM public.%1$I t WHERE %2$s AND %3$s)',
+        p_table, v_scope, v_key_match, v_value_column, v_key_list, v_incoming_key_list
+    );
+    GET DIAGNOSTICS v_inserted = ROW_COUNT;
+
+    DROP TABLE incoming_rows;
+
+    RETURN jsonb_build_object('deleted', v_deleted, 'updated', v_updated, 'inserted', v_inserted);
+END;
+$$;
+
+-- =====================================================
+-- FUNCTION: save_digest_changes
+-- Purpose: Apply several tables/years for one country in one transaction
+-- Input: [{"table": ..., "academic_year_id": ..., "rows": [...],
+--          "scope": {...} (optional, see p_scope)}, ...]
+-- Returns: one save_digest_rows result per change, with table and year
+-- =====================================================
+
+CREATE OR REPLACE FUNCTION save_digest_changes(
+    p_country_id TEXT,
+    p_changes JSONB
+)
+RETURNS JSONB
+LANGUAGE plpgsql
+SECURITY INVOKER
+SET search_path = public
+AS $$
+DECLARE
+    v_change JSONB;
+    v_results JSONB := '[]'::JSONB;
+BEGIN
+    FOR v_change IN SELECT * FROM jsonb_array_elements(p_changes)
+    LOOP
+        v_results := v_results || jsonb_build_array(
+            jsonb_build_object(
+                'table', v_change->>'table',
+                'academic_year_id', v_change->>'academic_year_id'
+            ) || save_digest_rows(
+                v_change->>'table',
+                p_country_id,
+                v_change->>'academic_year_id',
+                v_change->'rows',
+                v_change->'scope'
+            )
+        );
+    END LOOP;
+
+    RETURN v_results;
+END;
+$$;
+
+-- =====================================================
+-- PERMISSIONS
+-- =====================================================
+
+REVOKE ALL ON FUNCTION save_digest_rows(TEXT, TEXT, TEXT, JSONB, JSONB) FROM PUBLIC;
+REVOKE ALL ON FUNCTION save_digest_changes(TEXT, JSONB) FROM PUBLIC;
+GRANT EXECUTE ON FUNCTION save_digest_rows(TEXT, TEXT, TEXT, JSONB, JSONB) TO authenticated, service_role;
+GRANT EXECUTE ON FUNCTION save_digest_changes(TEXT, JSONB) TO authenticated, service_role;
+
+COMMENT ON FUNCTION save_digest_rows IS 'Transactionally replace one table''s data-entry cells for a country/year (delete cleared, update changed, insert new)';
+COMMENT ON FUNCTION save_digest_changes IS 'Apply save_digest_rows for several tables/years of one country in a single transaction';